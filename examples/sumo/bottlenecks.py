@@ -9,6 +9,7 @@ from flow.scenarios.bottleneck import BottleneckScenario
 from flow.controllers import SimLaneChangeController, ContinuousRouter
 from flow.envs.bottleneck_env import BottleneckEnv
 from flow.core.experiment import Experiment
+from flow.core.metrics import RolloutMetrics, RunningStat
 
 import logging
 
@@ -40,36 +41,39 @@ class BottleneckDensityExperiment(Experiment):
         std_vels = []
         mean_densities = []
         mean_outflows = []
+
+        # the outflow of every rollout is accumulated by the metrics of the
+        # environment, over the whole rollout unless the environment already
+        # has metrics with a shorter window
+        if self.env.metrics is None:
+            self.env.metrics = RolloutMetrics(
+                self.env.sim_step,
+                throughput_window=num_steps * self.env.sim_step)
+
         for i in range(num_runs):
             vel = np.zeros(num_steps)
             logging.info('Iter #' + str(i))
             ret = 0
             ret_list = []
-            step_outflows = []
-            step_densities = []
+            density = RunningStat()
             state = self.env.reset()
             for j in range(num_steps):
                 state, reward, done, _ = self.env.step(rl_actions(state))
-                vel[j] = np.mean(self.env.k.vehicle.get_speed(
-                    self.env.k.vehicle.get_ids()))
+                vel[j] = np.mean(self.env.k.vehicle.get_speed_array())
                 ret += reward
                 ret_list.append(reward)
 
-                env = self.env
-                step_outflow = env.get_bottleneck_outflow_vehicles_per_hour(20)
-                density = self.env.get_bottleneck_density()
-
-                step_outflows.append(step_outflow)
-                step_densities.append(density)
+                # the density of the bottleneck is averaged after the first
+                # 100 steps
+                if j >= 100:
+                    density.push(self.env.get_bottleneck_density())
                 if done:
                     break
             rets.append(ret)
             vels.append(vel)
-            mean_densities.append(sum(step_densities[100:]) /
-                                  (num_steps - 100))
-            env = self.env
-            outflow = env.get_bottleneck_outflow_vehicles_per_hour(10000)
-            mean_outflows.append(outflow)
+            mean_densities.append(density.total / (num_steps - 100))
+            mean_outflows.append(self.env.metrics.outflow.rate(
+                num_steps * self.env.sim_step))
             mean_rets.append(np.mean(ret_list))
             ret_lists.append(ret_list)
             mean_vels.append(np.mean(vel))
@@ -95,7 +99,7 @@ class BottleneckDensityExperiment(Experiment):
 
 
 def bottleneck_example(flow_rate, horizon, restart_instance=False,
-                       render=None):
+                       render=None, seed=None):
     """
     Perform a simulation of vehicles on a bottleneck.
 
@@ -109,6 +113,8 @@ def bottleneck_example(flow_rate, horizon, restart_instance=False,
         whether to restart the instance upon reset
     render: bool, optional
         specifies whether to use the gui during execution
+    seed: int, optional
+        seed for the sumo instance
 
     Returns
     -------
@@ -123,7 +129,8 @@ def bottleneck_example(flow_rate, horizon, restart_instance=False,
         sim_step=0.5,
         render=render,
         overtake_right=False,
-        restart_instance=restart_instance)
+        restart_instance=restart_instance,
+        seed=seed)
 
     vehicles = VehicleParams()
 
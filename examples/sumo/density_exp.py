@@ -1,65 +1,105 @@
 """
 Run density experiment to generate capacity diagram for the
 bottleneck experiment
+
+Every (inflow rate, seed) pair is run as a cell of a sweep (see
+flow.core.sweep) on a local pool of processes. Results are checkpointed to a
+result store as they complete, so that an interrupted experiment may be
+resumed by running this script again with the same store.
+
+Usage
+    python density_exp.py [--store STORE] [--num_seeds N] [--num_workers N]
 """
 
+import argparse
 import multiprocessing
-import numpy as np
 import os
-import ray
+import random
 
+import numpy as np
+
+from flow.core.sweep import Sweep, group_stats
 from examples.sumo.bottlenecks import bottleneck_example
 
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         '../../data')
+
+
+def run_bottleneck(inflow, seed, num_steps):
+    """Run a single rollout of the bottleneck for a given inflow rate.
 
-@ray.remote
-def run_bottleneck(flow_rate, num_trials, num_steps, render=None):
-    print('Running experiment for inflow rate: ', flow_rate, render)
-    exp = bottleneck_example(flow_rate, num_steps, restart_instance=True)
-    info_dict = exp.run(num_trials, num_steps)
+    Parameters
+    ----------
+    inflow : float
+        total inflow rate of vehicles into the bottleneck
+    seed : int
+        seed of the rollout
+    num_steps : int
+        number of steps of the rollout
 
-    return info_dict['average_outflow'], \
-        np.mean(info_dict['velocities']), \
-        np.mean(info_dict['average_rollout_density_outflow']), \
-        info_dict['per_rollout_outflows'], \
-        flow_rate
+    Returns
+    -------
+    dict
+        outflow, average speed and average bottleneck density of the rollout
+    """
+    print('Running experiment for inflow rate: ', inflow, ', seed: ', seed)
+    random.seed(seed)
+    np.random.seed(seed)
+    exp = bottleneck_example(inflow, num_steps, restart_instance=True,
+                             seed=seed)
+    info_dict = exp.run(1, num_steps)
+
+    return {'outflow': float(info_dict['average_outflow']),
+            'velocity': float(np.mean(info_dict['velocities'])),
+            'density': float(info_dict['average_rollout_density_outflow'])}
+
+
+def create_parser():
+    """Create the parser to capture CLI arguments."""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description='Runs the density experiment of the bottleneck.')
+    parser.add_argument(
+        '--store', type=str,
+        default=os.path.join(DATA_PATH, 'density_exp.db'),
+        help='Result store of the experiment. Completed rollouts are reused.')
+    parser.add_argument(
+        '--num_seeds', type=int, default=10,
+        help='Number of rollouts per inflow rate.')
+    parser.add_argument(
+        '--num_steps', type=int, default=2000,
+        help='Number of steps per rollout.')
+    parser.add_argument(
+        '--num_workers', type=int,
+        default=max(multiprocessing.cpu_count() - 2, 1),
+        help='Number of worker processes.')
+    return parser
 
 
 if __name__ == '__main__':
-    # import the experiment variable`
+    args = create_parser().parse_args()
+
     densities = list(range(400, 3000, 100))
-    outflows = []
-    velocities = []
-    bottleneckdensities = []
-
-    per_step_densities = []
-    per_step_avg_velocities = []
-    per_step_outflows = []
-
-    rollout_inflows = []
-    rollout_outflows = []
-
-    num_cpus = multiprocessing.cpu_count()
-    ray.init(num_cpus=max(num_cpus - 2, 1))
-    bottleneck_outputs = [run_bottleneck.remote(d, 10, 2000)
-                          for d in densities]
-    for output in ray.get(bottleneck_outputs):
-        outflow, velocity, bottleneckdensity, \
-            per_rollout_outflows, flow_rate = output
-        for i, _ in enumerate(per_rollout_outflows):
-            rollout_outflows.append(per_rollout_outflows[i])
-            rollout_inflows.append(flow_rate)
-        outflows.append(outflow)
-        velocities.append(velocity)
-        bottleneckdensities.append(bottleneckdensity)
-
-    path = os.path.dirname(os.path.abspath(__file__))
-    np.savetxt(path + '/../../data/rets.csv',
-               np.matrix([densities,
-                          outflows,
-                          velocities,
-                          bottleneckdensities]).T,
+    sweep = Sweep(run_bottleneck,
+                  grid={'inflow': densities,
+                        'seed': range(args.num_seeds),
+                        'num_steps': [args.num_steps]},
+                  store_path=args.store,
+                  num_workers=args.num_workers)
+    sweep.run()
+
+    data = sweep.store.arrays(['inflow', 'outflow', 'velocity', 'density'])
+    outflows = group_stats(data['inflow'], data['outflow'])
+    velocities = group_stats(data['inflow'], data['velocity'])
+    bottleneckdensities = group_stats(data['inflow'], data['density'])
+
+    np.savetxt(os.path.join(DATA_PATH, 'rets.csv'),
+               np.array([outflows['keys'],
+                         outflows['mean'],
+                         velocities['mean'],
+                         bottleneckdensities['mean']]).T,
                delimiter=',')
-    np.savetxt(path + '/../../data/inflows_outflows.csv',
-               np.matrix([rollout_inflows,
-                          rollout_outflows]).T,
+    np.savetxt(os.path.join(DATA_PATH, 'inflows_outflows.csv'),
+               np.array([data['inflow'],
+                         data['outflow']]).T,
                delimiter=',')
@@ -4,7 +4,11 @@ import os
 
 PYTHON_COMMAND = "python"
 
-SUMO_SLEEP = 1.0  # Delay between initializing SUMO and connecting with TraCI
+# Maximum time to wait for SUMO to accept TraCI connections after starting it
+SUMO_STARTUP_TIMEOUT = 10.0
+
+# Interval between checks of whether SUMO is accepting TraCI connections
+SUMO_PROBE_INTERVAL = 0.01
 
 PROJECT_PATH = osp.abspath(osp.join(osp.dirname(__file__), '..'))
 
@@ -10,8 +10,20 @@ class BaseController:
     maximum acceleration to the controller. Provides the method
     safe_action to ensure that controls are never made that could
     cause the system to crash.
+
+    Controllers that hold no per-vehicle state other than the id of their
+    vehicle (i.e. whose attributes only depend on the type of the vehicle)
+    may set the **flyweight** attribute to True. If flyweight controllers are
+    enabled (see SumoParams.flyweight_controllers), a single instance of such
+    a controller is shared by all vehicles of the same type, and is bound to a
+    vehicle (by setting its veh_id attribute) whenever it is requested from
+    the vehicle kernel, so it should be used before the controller of another
+    vehicle of that type is requested. Subclasses that store per-vehicle
+    state (e.g. a history of speeds) must set this attribute back to False.
     """
 
+    flyweight = False
+
     def __init__(self,
                  veh_id,
                  car_following_params,
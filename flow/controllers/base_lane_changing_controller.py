@@ -6,8 +6,14 @@ class BaseLaneChangeController:
 
     Instantiates a controller and forces the user to pass a
     lane_changing duration to the controller.
+
+    Controllers without per-vehicle state may be shared by all vehicles of a
+    type by setting the **flyweight** attribute to True (see
+    flow.controllers.base_controller.BaseController).
     """
 
+    flyweight = False
+
     def __init__(self, veh_id, lane_change_params=None):
         """Instantiate the base class for lane-changing controllers.
 
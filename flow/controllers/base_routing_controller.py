@@ -6,8 +6,28 @@ class BaseRouter:
 
     These controllers are used to dynamically change the routes of vehicles
     after initialization.
+
+    Routers are only called by the environment when the event specified by
+    their **trigger** attribute occurred in the last simulation step:
+
+    * "step": the router is called at every simulation step
+    * "edge": the router is called when the vehicle enters the network or
+      moves to a new edge (including internal edges)
+    * "lane": the router is called when the vehicle enters the network, or
+      moves to a new edge or lane
+
+    Routers whose decisions depend only on the current edge (or lane) of the
+    vehicle should specify the corresponding trigger, as this avoids calling
+    them for every vehicle at every step. Defaults to "step".
+
+    Routers without per-vehicle state may also be shared by all vehicles of a
+    type by setting the **flyweight** attribute to True (see
+    flow.controllers.base_controller.BaseController).
     """
 
+    trigger = "step"
+    flyweight = False
+
     def __init__(self, veh_id, router_params):
         """Instantiate the base class for routing controllers.
 
@@ -17,6 +17,8 @@ from flow.controllers.base_controller import BaseController
 class CFMController(BaseController):
     """CFM controller."""
 
+    flyweight = True
+
     def __init__(self,
                  veh_id,
                  car_following_params,
@@ -90,6 +92,8 @@ class BCMController(BaseController):
     This model looks ahead and behind when computing its acceleration.
     """
 
+    flyweight = True
+
     def __init__(self,
                  veh_id,
                  car_following_params,
@@ -172,6 +176,8 @@ class BCMController(BaseController):
 class OVMController(BaseController):
     """Optimal Vehicle Model controller."""
 
+    flyweight = True
+
     def __init__(self,
                  veh_id,
                  car_following_params,
@@ -251,6 +257,8 @@ class OVMController(BaseController):
 class LinearOVM(BaseController):
     """Linear OVM controller."""
 
+    flyweight = True
+
     def __init__(self,
                  veh_id,
                  car_following_params,
@@ -322,6 +330,8 @@ class IDMController(BaseController):
     review E 62.2 (2000): 1805.
     """
 
+    flyweight = True
+
     def __init__(self,
                  veh_id,
                  v0=30,
@@ -408,6 +418,8 @@ class SimCarFollowingController(BaseController):
     available through sumo when initializing the parameters of the vehicle.
     """
 
+    flyweight = True
+
     def get_accel(self, env):
         """See parent class."""
         return None
@@ -7,6 +7,8 @@ from flow.controllers.base_lane_changing_controller import \
 class SimLaneChangeController(BaseLaneChangeController):
     """A controller used to enforce sumo lane-change dynamics on a vehicle."""
 
+    flyweight = True
+
     def get_lane_change_action(self, env):
         """See parent class."""
         return None
@@ -15,6 +17,8 @@ class SimLaneChangeController(BaseLaneChangeController):
 class StaticLaneChanger(BaseLaneChangeController):
     """A lane-changing model used to keep a vehicle in the same lane."""
 
+    flyweight = True
+
     def get_lane_change_action(self, env):
         """See parent class."""
         return 0
@@ -22,6 +22,8 @@ class RLController(BaseController):
         >>> rl_ids = env.k.vehicle.get_rl_ids()
     """
 
+    flyweight = True
+
     def __init__(self, veh_id, car_following_params):
         """Instantiates an RL Controller.
 
@@ -12,6 +12,9 @@ class ContinuousRouter(BaseRouter):
     same route, and repeat said route once it reaches its end.
     """
 
+    trigger = "edge"
+    flyweight = True
+
     def choose_route(self, env):
         """Adopt the current edge's route if about to leave the network."""
         if env.k.vehicle.get_edge(self.veh_id) == \
@@ -27,6 +30,9 @@ class MinicityRouter(BaseRouter):
     This class allows the vehicle to pick a random route at junctions.
     """
 
+    trigger = "lane"
+    flyweight = True
+
     def choose_route(self, env):
         """See parent class."""
         vehicles = env.k.vehicle
@@ -59,6 +65,9 @@ class MinicityRouter(BaseRouter):
 class GridRouter(BaseRouter):
     """A router used to re-route a vehicle within a grid environment."""
 
+    trigger = "edge"
+    flyweight = True
+
     def choose_route(self, env):
         if env.k.vehicle.get_edge(self.veh_id) == \
                 env.k.vehicle.get_route(self.veh_id)[-1]:
@@ -75,6 +84,8 @@ class BayBridgeRouter(ContinuousRouter):
     Extension to the Continuous Router.
     """
 
+    trigger = "lane"
+
     def choose_route(self, env):
         """See parent class."""
         edge = env.k.vehicle.get_edge(self.veh_id)
@@ -0,0 +1,218 @@
+"""Contains a vectorized estimator of the fuel consumption and emissions.
+
+Sumo computes the fuel consumption and emissions of vehicles, but they are
+only available through its emission output, which is slow to write and parse
+(see flow.core.util.emission_to_csv). This module estimates them directly in
+Flow, for all vehicles at once, from their speeds and accelerations, so that
+they can be used in reward functions (see
+flow.core.rewards.penalize_emissions) and metrics (see
+flow.core.metrics.RolloutMetrics) without any emission output.
+
+The emission rate of every pollutant follows the polynomial model of HBEFA
+(version 3, as implemented in sumo):
+
+    rate = max(0, c0 + c1*a*v + c2*a^2*v + c3*v + c4*v^2 + c5*v^3)
+
+where v is the speed of the vehicle (in m/s), a its acceleration (in m/s^2)
+and c0-c5 the coefficients of the pollutant for the emission class of the
+vehicle. All rates are in mg/s (including the fuel consumption), on flat
+roads. Unlike recent versions of sumo, the fuel is not cut off when coasting,
+so that decelerating vehicles may still emit.
+"""
+
+import numpy as np
+
+# pollutants, in the order of the rows of the coefficient tables
+POLLUTANTS = ("CO2", "CO", "HC", "NOx", "PMx", "fuel")
+
+# coefficients of the HBEFA3 emission classes of sumo, per pollutant (rows)
+# and term of the polynomial (columns: 1, a*v, a^2*v, v, v^2, v^3)
+EMISSION_CLASSES = {
+    # passenger car, gasoline, Euro norm 4
+    "PC_G_EU4": np.array([
+        [2624.72, 260.667, 0, -129.75, 7.84999, 0],
+        [164.778, 5.36667, 0, -20.3472, 0.579445, 0],
+        [0.811944, 0.0309166, 0, -0.0965555, 0.00286666, 0],
+        [1.20444, 0.123, 0, -0.0889997, 0.00380831, 0],
+        [0.0659722, 0.00680555, 0, -0.00903055, 0.000368055, 0],
+        [837.222, 83.1388, 0, -41.3888, 2.50388, 0]]),
+    # passenger car, diesel, Euro norm 4
+    "PC_D_EU4": np.array([
+        [1895.56, 206.195, 0, -54.2512, 4.57229, 0],
+        [0.584722, 0.00805001, 0, -0.00998053, 0, 0],
+        [0.0335556, 0.00458056, 0, 0.00628055, 0, 0],
+        [13.1806, 1.11417, 0, -1.12805, 0.044972, 0],
+        [0, 0, 0, 0, 0, 0],
+        [596.389, 64.8611, 0, -17.0694, 1.43833, 0]]),
+    # light delivery vehicle, gasoline, Euro norm 4
+    "LDV_G_EU4": np.array([
+        [1404.44, 281.945, 0, 79.583, 0, 0.0881109],
+        [157.611, 12.0639, 0, -21.3028, 0.727222, 0],
+        [0.57, 0.0530834, 0, -0.0736667, 0.00274667, 0],
+        [0.305556, 0.0525556, 0, 0.0244693, 0, 0],
+        [0.163667, 0.0168306, 0, -0.0210084, 0.000829447, 0],
+        [448.055, 89.9446, 0, 25.386, 0, 0.0281111]]),
+    # light delivery vehicle, diesel, Euro norm 4
+    "LDV_D_EU4": np.array([
+        [1022.78, 254.278, 0, 91.9445, 0, 0.0849998],
+        [0.478889, 0.00860833, 0, -0.00831946, 0, 0],
+        [0.00993611, 0.00512222, 0, 0.00696111, 0, 0],
+        [11.3, 1.74222, 0, -1.00361, 0.0596667, 0],
+        [0, 0, 0, 0, 0, 0],
+        [321.666, 80.0001, 0, 28.9171, 0, 0.0267337]]),
+    # heavy duty vehicle, diesel, Euro norm 4
+    "HDV_D_EU4": np.array([
+        [6747.23, 1994.44, 0, 509.722, 0, 0],
+        [14.0778, 1.84861, 0, 0.231919, 0, 0],
+        [0.310833, 0.0485278, 0, 0.00893615, 0, 0],
+        [56.1667, 11.7611, 0, 2.46055, 0, 0],
+        [0.351944, 0.0363889, 0, -0.00177909, 0, 0],
+        [2121.94, 627.5, 0, 160.306, 0, 0]]),
+    # urban bus
+    "Bus": np.array([
+        [5286.12, 1798.61, 0, 575.829, 0, 0],
+        [20.1694, 2.07833, 0, 0.176338, 0, 0],
+        [4.85, 0.235361, 0, 0.0705559, 0, 0],
+        [60.7501, 12.825, 0, 3.13053, 0, 0],
+        [2.00611, 0.222889, 0, 0.0333609, 0, 0],
+        [1671.11, 569.167, 0, 182.39, 0, 0]]),
+    # vehicles without emissions (e.g. electric vehicles)
+    "zero": np.zeros((len(POLLUTANTS), 6)),
+}
+
+# default emission class of sumo
+DEFAULT_EMISSION_CLASS = "PC_G_EU4"
+
+
+def emission_rates(speeds, accels, emission_class=DEFAULT_EMISSION_CLASS):
+    """Compute the emission rates of vehicles.
+
+    Parameters
+    ----------
+    speeds : array_like
+        speeds of the vehicles, in m/s
+    accels : array_like
+        accelerations of the vehicles, in m/s^2
+    emission_class : str or list of str, optional
+        emission class of all vehicles, or of every vehicle (see
+        EMISSION_CLASSES)
+
+    Returns
+    -------
+    np.ndarray
+        emission rate of every vehicle (rows) and pollutant (columns, see
+        POLLUTANTS), in mg/s
+
+    Raises
+    ------
+    KeyError
+        if an emission class is unknown
+    """
+    v = np.asarray(speeds, dtype=float)
+    a = np.asarray(accels, dtype=float)
+    terms = np.stack([np.ones_like(v), a * v, a * a * v, v, v * v, v ** 3],
+                     axis=-1)
+
+    if isinstance(emission_class, str):
+        rates = terms.dot(EMISSION_CLASSES[emission_class].T)
+    else:
+        coefs = np.array([EMISSION_CLASSES[c] for c in emission_class])
+        rates = np.einsum("nk,npk->np", terms,
+                          coefs.reshape(len(v), len(POLLUTANTS), 6))
+
+    return np.maximum(rates, 0)
+
+
+class EmissionsEstimator(object):
+    """Estimator of the emissions of all vehicles in the network.
+
+    The accelerations of the vehicles are computed from the change in their
+    speeds since the last update of the estimator. Vehicles that were not in
+    the network at the last update are assumed not to accelerate.
+
+    Attributes
+    ----------
+    sim_step : float
+        duration in between updates, in seconds
+    ids : list of str
+        ids of the vehicles at the last update
+    rates : np.ndarray
+        emission rate of every vehicle (rows, ordered as ``ids``) and
+        pollutant (columns, see POLLUTANTS) at the last update, in mg/s
+    """
+
+    def __init__(self, sim_step, type_classes=None):
+        """Instantiate the estimator.
+
+        Parameters
+        ----------
+        sim_step : float
+            duration in between updates, in seconds
+        type_classes : dict < str, str >, optional
+            emission class of every vehicle type (see EMISSION_CLASSES).
+            Types that are not specified use DEFAULT_EMISSION_CLASS.
+
+        Raises
+        ------
+        KeyError
+            if an emission class is unknown
+        """
+        self.sim_step = sim_step
+        self.type_classes = type_classes or {}
+        for emission_class in self.type_classes.values():
+            if emission_class not in EMISSION_CLASSES:
+                raise KeyError(
+                    "Unknown emission class {}.".format(emission_class))
+        self.reset()
+
+    def reset(self):
+        """Forget the speeds of the vehicles, e.g. at the start of rollouts."""
+        self.ids = []
+        self.rates = np.zeros((0, len(POLLUTANTS)))
+        self._speeds = {}
+
+    def update(self, kernel):
+        """Estimate the emissions of the vehicles after a simulation step.
+
+        Parameters
+        ----------
+        kernel : flow.core.kernel.Kernel
+            the kernel of the environment, after its update
+
+        Returns
+        -------
+        np.ndarray
+            emission rate of every vehicle and pollutant, in mg/s
+        """
+        ids = list(kernel.vehicle.get_ids())
+        # vehicles without observations have a speed of -1001
+        speeds = np.maximum(kernel.vehicle.get_speed_array(), 0)
+        prev_speeds = np.array([self._speeds.get(veh_id, speed)
+                                for veh_id, speed in zip(ids, speeds)])
+        accels = (speeds - prev_speeds) / self.sim_step
+
+        classes = [self.type_classes.get(kernel.vehicle.get_type(veh_id),
+                                         DEFAULT_EMISSION_CLASS)
+                   for veh_id in ids]
+        if len(set(classes)) <= 1:
+            classes = classes[0] if classes else DEFAULT_EMISSION_CLASS
+
+        self.ids = ids
+        self.rates = emission_rates(speeds, accels, classes)
+        self._speeds = dict(zip(ids, speeds))
+        return self.rates
+
+    def total(self, pollutant="CO2"):
+        """Return the emission rate of all vehicles at the last update.
+
+        Parameters
+        ----------
+        pollutant : str, optional
+            name of the pollutant (see POLLUTANTS)
+
+        Returns
+        -------
+        float
+            total emission rate of the pollutant, in mg/s
+        """
+        return self.rates[:, POLLUTANTS.index(pollutant)].sum()
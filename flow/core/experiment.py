@@ -6,6 +6,7 @@ import numpy as np
 import time
 import os
 
+from flow.core.metrics import RolloutMetrics
 from flow.core.util import emission_to_csv
 
 
@@ -84,7 +85,8 @@ class Experiment:
         Returns
         -------
             info_dict: dict
-                contains returns, average speed per step
+                contains returns, average speed per step, and the metrics of
+                every run (see flow.core.metrics.RolloutMetrics.summary)
         """
         info_dict = {}
         if rl_actions is None:
@@ -92,12 +94,19 @@ class Experiment:
             def rl_actions(*_):
                 return None
 
+        # the metrics of every run are accumulated while the environment is
+        # stepped, see flow/core/metrics.py. Metrics attached to the
+        # environment by the user are kept.
+        if self.env.metrics is None:
+            self.env.metrics = RolloutMetrics(self.env.sim_step)
+
         rets = []
         mean_rets = []
         ret_lists = []
         vels = []
         mean_vels = []
         std_vels = []
+        summaries = []
         for i in range(num_runs):
             vel = np.zeros(num_steps)
             logging.info("Iter #" + str(i))
@@ -106,8 +115,7 @@ class Experiment:
             state = self.env.reset()
             for j in range(num_steps):
                 state, reward, done, _ = self.env.step(rl_actions(state))
-                vel[j] = np.mean(
-                    self.env.k.vehicle.get_speed(self.env.k.vehicle.get_ids()))
+                vel[j] = np.mean(self.env.k.vehicle.get_speed_array())
                 ret += reward
                 ret_list.append(reward)
                 if done:
@@ -118,12 +126,14 @@ class Experiment:
             ret_lists.append(ret_list)
             mean_vels.append(np.mean(vel))
             std_vels.append(np.std(vel))
+            summaries.append(self.env.metrics.summary())
             print("Round {0}, return: {1}".format(i, ret))
 
         info_dict["returns"] = rets
         info_dict["velocities"] = vels
         info_dict["mean_returns"] = mean_rets
         info_dict["per_step_returns"] = ret_lists
+        info_dict["metrics"] = summaries
 
         print("Average, std return: {}, {}".format(
             np.mean(rets), np.std(rets)))
@@ -0,0 +1,241 @@
+"""Contains a generator of inflow vehicles managed by Flow.
+
+Inflows are by default written to the route file of the network (see
+flow.core.kernel.scenario.traci.TraCIScenario.make_routes) and inserted by
+the simulator, so that changing their rates requires the network files to be
+generated again and the simulator to be restarted. If the inflows of a
+network are managed by Flow (``InFlows(managed=True)``), their vehicles are
+instead inserted through the vehicle kernel by an ``InflowGenerator``, and the
+rates of the inflows may be changed at any step, e.g. to randomize the demand
+at every reset:
+
+    >>> env.inflows.set_rate("flow_0", vehs_per_hour=1500)
+    >>> env.reset()
+"""
+
+import numpy as np
+
+# departure lanes drawn by the generator rather than by the simulator
+RANDOM_LANE = "random"
+
+
+class InflowGenerator(object):
+    """Generator of the vehicles of inflows.
+
+    At every step, the number of vehicles entering from every inflow is
+    computed at once for all inflows. As in sumo:
+
+    * inflows specified with ``vehs_per_hour`` insert equally spaced
+      vehicles, starting as soon as they are active, and
+    * inflows specified with ``probability`` insert a vehicle with the given
+      probability every second (i.e. with a probability of
+      ``probability * sim_step`` every step, drawn for all inflows at once).
+
+    Inflows are only active in between their "begin" and "end" times, measured
+    from the last reset. Vehicles are named "<name of the inflow>.<index>" as
+    in sumo, and added with the departure lane, position and speed of their
+    inflow ("departLane", "departPos" and "departSpeed"). Random departure
+    lanes are drawn by the generator. Vehicles that cannot enter the network
+    immediately are queued by the simulator, and removed on resets.
+
+    Attributes
+    ----------
+    names : list of str
+        names of the inflows
+    types : list of str
+        vehicle types of the inflows
+    sim_step : float
+        duration of a simulation step, in seconds
+    time : float
+        time since the last reset, in seconds
+    rng : np.random.RandomState
+        random number generator of the arrivals and departure lanes
+    """
+
+    def __init__(self, inflows, sim_step, seed=None):
+        """Instantiate the generator.
+
+        Parameters
+        ----------
+        inflows : flow.core.params.InFlows
+            the inflows of the network
+        sim_step : float
+            duration of a simulation step, in seconds
+        seed : int, optional
+            seed of the random number generator
+
+        Raises
+        ------
+        ValueError
+            if an inflow specifies neither a rate nor a probability
+        """
+        flows = inflows.get()
+        self.names = [flow["name"] for flow in flows]
+        self.sim_step = sim_step
+        self.time = 0
+        self.rng = np.random.RandomState(seed)
+
+        # rates of the inflows, in vehicles per second (or probabilities per
+        # second for random inflows)
+        self._rates = np.zeros(len(flows))
+        self._random = np.zeros(len(flows), dtype=bool)
+        for i, flow in enumerate(flows):
+            if flow.get("vehsPerHour") is not None:
+                self._rates[i] = float(flow["vehsPerHour"]) / 3600
+            elif flow.get("probability") is not None:
+                self._rates[i] = float(flow["probability"])
+                self._random[i] = True
+            else:
+                raise ValueError(
+                    "Inflow {} has neither a rate nor a probability.".format(
+                        flow["name"]))
+
+        self._begin = np.array([float(flow.get("begin", 0)) for flow in flows])
+        self._end = np.array([float(flow.get("end", np.inf))
+                              for flow in flows])
+        self.types = [flow["vtype"] for flow in flows]
+        self._edges = [flow["edge"] for flow in flows]
+        self._lanes = [str(flow.get("departLane", 0)) for flow in flows]
+        self._pos = [str(flow.get("departPos", "base")) for flow in flows]
+        self._speeds = [str(flow.get("departSpeed", 0)) for flow in flows]
+        self._random_lanes = np.array(
+            [lane == RANDOM_LANE for lane in self._lanes], dtype=bool)
+        self._num_lanes = None  # computed on the first step
+
+        # number of vehicles due for every inflow that is not random (the
+        # first vehicle enters as soon as the inflow is active)
+        self._due = np.ones(len(flows))
+        # index of the next vehicle of every inflow
+        self._counts = [0] * len(flows)
+        # vehicles that were added, but did not enter the network yet
+        self._pending = []
+
+    def _index(self, name):
+        """Return the index of an inflow."""
+        try:
+            return self.names.index(name)
+        except ValueError:
+            raise KeyError("No inflow named {}.".format(name))
+
+    def get_rate(self, name):
+        """Return the rate of an inflow.
+
+        Parameters
+        ----------
+        name : str
+            name of the inflow
+
+        Returns
+        -------
+        float
+            rate of the inflow, in vehicles per hour (for inflows specified
+            with a probability, the rate is the probability times 3600)
+        """
+        return self._rates[self._index(name)] * 3600
+
+    def set_rate(self, name, vehs_per_hour=None, probability=None):
+        """Change the rate of an inflow.
+
+        The new rate applies from the next step on. Exactly one of
+        ``vehs_per_hour`` and ``probability`` must be specified.
+
+        Parameters
+        ----------
+        name : str
+            name of the inflow
+        vehs_per_hour : float, optional
+            new rate of the inflow, with equally spaced vehicles
+        probability : float, optional
+            new probability for the inflow to insert a vehicle every second
+        """
+        if (vehs_per_hour is None) == (probability is None):
+            raise ValueError(
+                "Exactly one of vehs_per_hour and probability is required.")
+        i = self._index(name)
+        if vehs_per_hour is not None:
+            self._rates[i] = vehs_per_hour / 3600
+            self._random[i] = False
+        else:
+            self._rates[i] = probability
+            self._random[i] = True
+
+    def scale_rates(self, factor):
+        """Multiply the rates of all inflows by a factor.
+
+        The probabilities of inflows specified with a probability are capped
+        at 1.
+        """
+        self._rates *= factor
+        np.minimum(self._rates, 1, out=self._rates, where=self._random)
+
+    def step(self, kernel):
+        """Add the vehicles entering the network in the next step.
+
+        Parameters
+        ----------
+        kernel : flow.core.kernel.Kernel
+            the kernel of the environment
+
+        Returns
+        -------
+        list of str
+            names of the vehicles that were added
+        """
+        if self._num_lanes is None:
+            self._num_lanes = np.array(
+                [kernel.scenario.num_lanes(edge) for edge in self._edges])
+
+        # forget the pending vehicles that entered the network
+        if len(self._pending) > 0:
+            ids = set(kernel.vehicle.get_ids())
+            self._pending = [veh_id for veh_id in self._pending
+                             if veh_id not in ids]
+
+        active = (self._begin <= self.time) & (self.time < self._end)
+        self.time += self.sim_step
+
+        # number of vehicles entering from every inflow
+        expected = self._rates * self.sim_step * active
+        self._due += expected * ~self._random
+        due = np.floor(self._due + 1e-9) * (active & (self._rates > 0))
+        counts = np.where(
+            self._random,
+            self.rng.random_sample(len(expected)) < expected,
+            due).astype(int)
+        self._due -= counts * ~self._random
+        if not counts.any():
+            return []
+
+        indices = np.repeat(np.arange(len(counts)), counts)
+        lanes = (self.rng.random_sample(len(indices)) *
+                 self._num_lanes[indices]).astype(int)
+
+        added = []
+        for i, lane in zip(indices, lanes):
+            veh_id = "{}.{}".format(self.names[i], self._counts[i])
+            self._counts[i] += 1
+            kernel.vehicle.add(
+                veh_id=veh_id,
+                type_id=self.types[i],
+                edge=self._edges[i],
+                pos=self._pos[i],
+                lane=lane if self._random_lanes[i] else self._lanes[i],
+                speed=self._speeds[i])
+            added.append(veh_id)
+
+        self._pending.extend(added)
+        return added
+
+    def reset(self, kernel):
+        """Restart the inflows, and remove the vehicles still queued.
+
+        Parameters
+        ----------
+        kernel : flow.core.kernel.Kernel
+            the kernel of the environment
+        """
+        for veh_id in self._pending:
+            kernel.vehicle.remove(veh_id)
+        self._pending = []
+        self._due[:] = 1
+        self.time = 0
@@ -1,10 +1,19 @@
 """Script containing the Flow kernel object for interacting with simulators."""
 
-from flow.core.kernel.simulation import TraCISimulation, AimsunKernelSimulation
-from flow.core.kernel.scenario import TraCIScenario, AimsunKernelScenario
-from flow.core.kernel.vehicle import TraCIVehicle, AimsunKernelVehicle
+from copy import deepcopy
+import os
+import shutil
+import tempfile
+
+from flow.core.kernel.simulation import TraCISimulation, \
+    AimsunKernelSimulation, ReplaySimulation, ShardedTraCISimulation
+from flow.core.kernel.scenario import TraCIScenario, AimsunKernelScenario, \
+    ReplayScenario
+from flow.core.kernel.vehicle import TraCIVehicle, AimsunKernelVehicle, \
+    ReplayVehicle
 from flow.core.kernel.traffic_light import TraCITrafficLight, \
-    AimsunKernelTrafficLight
+    AimsunKernelTrafficLight, ReplayTrafficLight
+from flow.core.kernel.vehicle.recorder import TrajectoryRecorder
 
 
 class Kernel(object):
@@ -49,7 +58,7 @@ class Kernel(object):
         Parameters
         ----------
         simulator : str
-            simulator type, must be one of {"traci"}
+            simulator type, must be one of {"traci", "aimsun", "replay"}
         sim_params : flow.core.params.SimParams
             simulation-specific parameters
 
@@ -60,8 +69,23 @@ class Kernel(object):
         """
         self.kernel_api = None
 
+        # the trajectory recorder is created once the name of the scenario is
+        # known, i.e. after the first update (see ``update``). Parameters
+        # loaded from older configuration files may not have a trajectory path
+        self.recorder = None
+        self.trajectory_path = getattr(sim_params, "trajectory_path", None)
+        self.sim_step = sim_params.sim_step
+
+        # directory containing the states of the simulation saved when forking
+        # (see ``fork``), created when it is first needed
+        self._state_dir = None
+
         if simulator == "traci":
-            self.simulation = TraCISimulation(self)
+            # large networks may be partitioned across several sumo instances
+            if getattr(sim_params, "num_shards", 1) > 1:
+                self.simulation = ShardedTraCISimulation(self)
+            else:
+                self.simulation = TraCISimulation(self)
             self.scenario = TraCIScenario(self, sim_params)
             self.vehicle = TraCIVehicle(self, sim_params)
             self.traffic_light = TraCITrafficLight(self)
@@ -70,6 +94,11 @@ class Kernel(object):
             self.scenario = AimsunKernelScenario(self, sim_params)
             self.vehicle = AimsunKernelVehicle(self, sim_params)
             self.traffic_light = AimsunKernelTrafficLight(self)
+        elif simulator == 'replay':
+            self.simulation = ReplaySimulation(self)
+            self.scenario = ReplayScenario(self, sim_params)
+            self.vehicle = ReplayVehicle(self, sim_params)
+            self.traffic_light = ReplayTrafficLight(self)
         else:
             raise ValueError('Simulator type "{}" is not valid.'.
                              format(simulator))
@@ -101,7 +130,97 @@ class Kernel(object):
         self.scenario.update(reset)
         self.simulation.update(reset)
 
+        # record the trajectories of the vehicles (if requested)
+        if self.trajectory_path is not None:
+            if self.recorder is None:
+                self.recorder = TrajectoryRecorder(
+                    path=os.path.join(self.trajectory_path,
+                                      self.scenario.name + "-trajectory"),
+                    sim_step=self.sim_step)
+            self.recorder.record(self, reset)
+
+    def fast_forward(self, num_steps):
+        """Advance the simulation by several steps at once.
+
+        The simulator is advanced without any processing in between steps,
+        and the kernel subclasses are only updated after the last step. This
+        is only meant to be used when no vehicle needs to be controlled by
+        Flow in the meantime (see flow.envs.base_env.Env.can_fast_forward).
+
+        Parameters
+        ----------
+        num_steps : int
+            number of simulation steps to perform
+        """
+        self.simulation.fast_forward(num_steps)
+        self.vehicle.skip_steps(num_steps - 1)
+        self.update(reset=False)
+
+    def fork(self):
+        """Capture the current state of the simulation and the kernel.
+
+        The state of the simulator is saved to a file (in memory if a tmpfs is
+        available), and the vehicle and traffic light kernels are copied.
+
+        Returns
+        -------
+        dict
+            checkpoint of the current state, see ``restore``
+        """
+        if self._state_dir is None:
+            shm = "/dev/shm"
+            self._state_dir = tempfile.mkdtemp(
+                prefix="flow-", dir=shm if os.path.isdir(shm) else None)
+        fd, path = tempfile.mkstemp(suffix=".xml", dir=self._state_dir)
+        os.close(fd)
+
+        self.simulation.save_state(path)
+        memo = {id(self): self, id(self.kernel_api): self.kernel_api}
+        return {"path": path,
+                "vehicle": deepcopy(self.vehicle, memo),
+                "traffic_light": deepcopy(self.traffic_light, memo)}
+
+    def restore(self, checkpoint):
+        """Restore the state of the simulation and the kernel.
+
+        The same checkpoint may be restored several times, until it is
+        released (see ``release``).
+
+        Parameters
+        ----------
+        checkpoint : dict
+            checkpoint generated by ``fork``
+        """
+        self.simulation.load_state(checkpoint["path"])
+        memo = {id(self): self, id(self.kernel_api): self.kernel_api}
+        self.vehicle = deepcopy(checkpoint["vehicle"], memo)
+        self.traffic_light = deepcopy(checkpoint["traffic_light"], memo)
+
+        # loading a state may reset the subscriptions of the simulator, so the
+        # kernel api is passed again to the kernel subclasses to renew them
+        self.pass_api(self.kernel_api)
+
+    def release(self, checkpoint):
+        """Delete the saved state of a checkpoint.
+
+        Checkpoints keep the state of the simulator in a file until the kernel
+        is closed. Releasing the checkpoints that are no longer needed keeps
+        planners that fork at every step from accumulating them. A released
+        checkpoint cannot be restored.
+
+        Parameters
+        ----------
+        checkpoint : dict
+            checkpoint generated by ``fork``
+        """
+        self.simulation.release_state(checkpoint["path"])
+
     def close(self):
         """Terminate all components within the simulation and scenario."""
         self.scenario.close()
         self.simulation.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self._state_dir is not None:
+            shutil.rmtree(self._state_dir, ignore_errors=True)
+            self._state_dir = None
@@ -1,5 +1,7 @@
 from flow.core.kernel.scenario.base import KernelScenario
 from flow.core.kernel.scenario.traci import TraCIScenario
 from flow.core.kernel.scenario.aimsun import AimsunKernelScenario
+from flow.core.kernel.scenario.replay import ReplayScenario
 
-__all__ = ["KernelScenario", "TraCIScenario", "AimsunKernelScenario"]
+__all__ = ["KernelScenario", "TraCIScenario", "AimsunKernelScenario",
+           "ReplayScenario"]
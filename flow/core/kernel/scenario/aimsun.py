@@ -6,6 +6,7 @@ import subprocess
 import os.path as osp
 import os
 import time
+import numpy as np
 from flow.core.kernel.scenario.base import KernelScenario
 
 # length of vehicles in the network, in meters
@@ -29,6 +30,8 @@ class AimsunKernelScenario(KernelScenario):
         self._edges = None
         self._edge_list = None
         self._junction_list = None
+        # connections between edges are not read from Aimsun networks
+        self._connections = {"next": {}, "prev": {}}
         self.__max_speed = None
         self.__length = None
         self.rts = None
@@ -39,6 +42,10 @@ class AimsunKernelScenario(KernelScenario):
     def generate_network(self, scenario):
         self.network = scenario
 
+        # route engines are built from the new network when first requested
+        self._route_engines = {}
+        self._start_pos_cache = {}
+
         output = {
             "edges": scenario.edges,
             "nodes": scenario.nodes,
@@ -162,9 +169,38 @@ class AimsunKernelScenario(KernelScenario):
 
         self.total_edgestarts_dict = dict(self.total_edgestarts)
 
+        # assign an integer index to every edge and junction
+        self._intern_edges()
+
         # specify routes vehicles can take  # TODO: move into a method
         self.rts = self.network.routes
 
+    def _intern_edges(self):
+        """Assign a dense integer index to every edge and junction.
+
+        Edges are indexed first, followed by junctions, and their properties
+        are stored in the ``edge_*`` attributes of the parent class (see
+        flow.core.kernel.scenario.traci.TraCIScenario._intern_edges).
+        """
+        edge_list = self.get_edge_list()
+        junction_list = sorted(set(self._edges.keys()) - set(edge_list))
+        self.edge_ids = edge_list + junction_list
+        self.edge_index = {edge: i for i, edge in enumerate(self.edge_ids)}
+        self.edge_lengths = np.array(
+            [self.edge_length(edge) for edge in self.edge_ids])
+        self.edge_num_lanes = np.array(
+            [self.num_lanes(edge) for edge in self.edge_ids], dtype=int)
+        self.edge_speed_limits = np.array(
+            [self.speed_limit(edge) for edge in self.edge_ids])
+        self.edge_is_internal = np.array(
+            [edge[0] == ':' for edge in self.edge_ids], dtype=bool)
+
+        # absolute starting position of every edge, or -1001 if the edge has
+        # no starting position
+        self.edge_offsets = np.array(
+            [self.total_edgestarts_dict.get(edge, -1001)
+             for edge in self.edge_ids], dtype=float)
+
     def pass_api(self, kernel_api):
         """See parent class."""
         self.kernel_api = kernel_api
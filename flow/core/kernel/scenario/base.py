@@ -3,6 +3,7 @@
 import logging
 import random
 import numpy as np
+from flow.core.routing import RouteEngine
 
 # length of vehicles in the network, in meters
 VEHICLE_LENGTH = 5
@@ -71,6 +72,26 @@ class KernelScenario(object):
         self.total_edgestarts = None
         self.total_edgestarts_dict = None
 
+        # Interned edges: every edge and internal link (junction) in the
+        # network is assigned a dense integer index, with per-index arrays of
+        # their properties. Indices of -1 denote unknown edges (e.g. vehicles
+        # that were removed after a collision)
+        self.edge_ids = None
+        self.edge_index = None
+        self.edge_lengths = None
+        self.edge_num_lanes = None
+        self.edge_speed_limits = None
+        self.edge_is_internal = None
+        self.edge_offsets = None
+
+        # route engines of the network, by weight (see get_route_engine)
+        self._route_engines = {}
+
+        # deterministic (uniform and unperturbed) starting positions, by
+        # number of vehicles and initial config (see
+        # generate_starting_positions)
+        self._start_pos_cache = {}
+
     def generate_network(self, network):
         """Generate the necessary prerequisites for the simulating a network.
 
@@ -201,6 +222,44 @@ class KernelScenario(object):
         """
         raise NotImplementedError
 
+    def get_edge_index(self, edge):
+        """Return the interned index of an edge, or -1 if it is unknown.
+
+        Parameters
+        ----------
+        edge : str or list of str
+            edge id, or list of edge ids
+
+        Returns
+        -------
+        int or list of int
+        """
+        if isinstance(edge, (list, np.ndarray)):
+            return [self.edge_index.get(e, -1) for e in edge]
+        return self.edge_index.get(edge, -1)
+
+    def get_route_engine(self, weight="length"):
+        """Return a shortest-path route engine for the network.
+
+        The engine is built from the connections between edges the first time
+        it is requested, and is then shared until a new network is generated.
+
+        Parameters
+        ----------
+        weight : str, optional
+            the cost of traversing an edge, one of {"length", "time"}. See
+            flow.core.routing.RouteEngine
+
+        Returns
+        -------
+        flow.core.routing.RouteEngine
+            the route engine
+        """
+        if weight not in self._route_engines:
+            self._route_engines[weight] = RouteEngine.from_scenario(
+                self, weight=weight)
+        return self._route_engines[weight]
+
     ###########################################################################
     #            Methods for generating initial vehicle positions.            #
     ###########################################################################
@@ -227,6 +286,21 @@ class KernelScenario(object):
         """
         num_vehicles = num_vehicles or self.network.vehicles.num_vehicles
 
+        # uniform starting positions without perturbations are always the
+        # same, and are therefore only computed once
+        key = None
+        if initial_config.spacing == "uniform" and \
+                initial_config.perturbation <= 0:
+            edges_distribution = initial_config.edges_distribution
+            if not isinstance(edges_distribution, str):
+                edges_distribution = tuple(edges_distribution)
+            key = (num_vehicles, initial_config.x0, initial_config.min_gap,
+                   initial_config.bunching, initial_config.lanes_distribution,
+                   edges_distribution)
+            if key in self._start_pos_cache:
+                startpositions, startlanes = self._start_pos_cache[key]
+                return list(startpositions), list(startlanes)
+
         if initial_config.spacing == "uniform":
             startpositions, startlanes = self.gen_even_start_pos(
                 initial_config, num_vehicles)
@@ -240,6 +314,10 @@ class KernelScenario(object):
             raise ValueError('"spacing" argument in initial_config does not '
                              'contain a valid option')
 
+        if key is not None:
+            self._start_pos_cache[key] = \
+                (list(startpositions), list(startlanes))
+
         return startpositions, startlanes
 
     def gen_even_start_pos(self, initial_config, num_vehicles):
@@ -278,10 +356,17 @@ class KernelScenario(object):
         # when consecutive edges do not have the same number of lanes, vehicles
         # are not allowed to be in between edges (as a lane might not exist on
         # the other side)
-        flag = False
-        lanes = [self.num_lanes(edge) for edge in self.get_edge_list()]
-        if any(lanes[0] != lanes[i] for i in range(1, len(lanes))):
-            flag = True
+        lanes = set(self.num_lanes(edge) for edge in self.get_edge_list())
+        flag = len(lanes) > 1
+
+        # internal edges, and the index of every edge in total_edgestarts
+        # (which has the edges ordered by position)
+        internal_edges = set(edge for edge, _ in self.internal_edgestarts)
+        edge_order = {}
+        for i, (edge, _) in enumerate(self.total_edgestarts):
+            edge_order.setdefault(edge, i)
+        available_edges = set(available_edges)
+        length = self.length()
 
         x = x0
         car_count = 0
@@ -293,26 +378,19 @@ class KernelScenario(object):
             pos = self.get_edge(x)
 
             # ensures that vehicles are not placed in an internal junction
-            while pos[0] in dict(self.internal_edgestarts).keys():
-                # find the location of the internal edge in total_edgestarts,
-                # which has the edges ordered by position
-                edges = [tup[0] for tup in self.total_edgestarts]
-                indx_edge = next(
-                    i for i, edge in enumerate(edges) if edge == pos[0])
-
+            while pos[0] in internal_edges:
                 # take the next edge in the list, and place the car at the
                 # beginning of this edge
-                if indx_edge == len(edges) - 1:
-                    next_edge_pos = self.total_edgestarts[0]
-                else:
-                    next_edge_pos = self.total_edgestarts[indx_edge + 1]
+                indx_edge = edge_order[pos[0]]
+                next_edge_pos = self.total_edgestarts[
+                    (indx_edge + 1) % len(self.total_edgestarts)]
 
                 x = next_edge_pos[1]
                 pos = (next_edge_pos[0], 0)
 
             # ensures that you are in an acceptable edge
             while pos[0] not in available_edges:
-                x = (x + self.edge_length(pos[0])) % self.length()
+                x = (x + self.edge_length(pos[0])) % length
                 pos = self.get_edge(x)
 
             # ensure that in variable lane settings vehicles always start a
@@ -326,24 +404,24 @@ class KernelScenario(object):
                              (num_vehicles - car_count)
 
             # place vehicles side-by-side in all available lanes on this edge
-            for lane in range(min([self.num_lanes(pos[0]), lanes_distr])):
-                car_count += 1
-                startpositions.append(pos)
-                startlanes.append(lane)
-
-                if car_count == num_vehicles:
-                    break
+            num_lanes = min(self.num_lanes(pos[0]), lanes_distr,
+                            num_vehicles - car_count)
+            startpositions.extend([pos] * num_lanes)
+            startlanes.extend(range(num_lanes))
+            car_count += num_lanes
 
-            x = (x + increment + VEHICLE_LENGTH + min_gap) % self.length()
+            x = (x + increment + VEHICLE_LENGTH + min_gap) % length
 
         # add a perturbation to each vehicle, while not letting the vehicle
         # leave its current edge
         if initial_config.perturbation > 0:
-            for i in range(num_vehicles):
-                perturb = np.random.normal(0, initial_config.perturbation)
-                edge, pos = startpositions[i]
-                pos = max(0, min(self.edge_length(edge), pos + perturb))
-                startpositions[i] = (edge, pos)
+            edges = [edge for edge, _ in startpositions]
+            perturb = np.random.normal(
+                0, initial_config.perturbation, num_vehicles)
+            pos = np.array([pos for _, pos in startpositions]) + perturb
+            pos = np.maximum(0, np.minimum(
+                [self.edge_length(edge) for edge in edges], pos))
+            startpositions = list(zip(edges, pos.tolist()))
 
         return startpositions, startlanes
 
@@ -377,44 +455,41 @@ class KernelScenario(object):
             available_length -= efs * min([self.num_lanes(edge), lanes_distr])
 
         # choose random positions for each vehicle
-        init_absolute_pos = [random.random() * available_length
-                             for _ in range(num_vehicles)]
-        init_absolute_pos.sort()
+        init_absolute_pos = np.sort([random.random() * available_length
+                                     for _ in range(num_vehicles)])
 
         # these positions do not include the length of the vehicle, which need
         # to be added
-        for i in range(num_vehicles):
-            init_absolute_pos[i] += (VEHICLE_LENGTH + min_gap) * i
-
-        decrement = 0
-        edge_indx = 0
-        startpositions = []
-        startlanes = []
-        for i in range(num_vehicles):
-            edge_i = available_edges[edge_indx]
-            pos_i = (init_absolute_pos[i] - decrement) % (
-                    self.edge_length(edge_i) - efs)
-            lane_i = int(((init_absolute_pos[i] - decrement) - pos_i) /
-                         (self.edge_length(edge_i) - efs))
-
-            pos_i += efs
-
-            while lane_i > min([self.num_lanes(edge_i), lanes_distr]) - 1:
-                decrement += min([self.num_lanes(edge_i), lanes_distr]) \
-                             * (self.edge_length(edge_i) - efs)
-                edge_indx += 1
-
-                edge_i = available_edges[edge_indx]
-                pos_i = (init_absolute_pos[i] - decrement) % (
-                        self.edge_length(edge_i) - efs)
-
-                lane_i = int(((init_absolute_pos[i] - decrement) - pos_i) /
-                             (self.edge_length(edge_i) - efs))
-
-                pos_i += efs
-
-            startpositions.append((edge_i, pos_i))
-            startlanes.append(lane_i)
+        init_absolute_pos += (VEHICLE_LENGTH + min_gap) * np.arange(
+            num_vehicles)
+
+        # usable length and number of lanes of every edge, and the position
+        # at which every edge starts when the lanes of all edges are placed
+        # one after the other
+        lengths = np.array(
+            [self.edge_length(edge) for edge in available_edges]) - efs
+        lanes = np.array(
+            [min([self.num_lanes(edge), lanes_distr])
+             for edge in available_edges])
+        ends = np.cumsum(lanes * lengths)
+        decrements = np.concatenate(([0.], ends[:-1]))
+
+        # find the edge of every vehicle, and its lane and position on it
+        edge_indx = np.searchsorted(ends, init_absolute_pos, side="right")
+        while True:
+            rel_pos = init_absolute_pos - decrements[edge_indx]
+            pos = rel_pos % lengths[edge_indx]
+            lane = ((rel_pos - pos) / lengths[edge_indx]).astype(int)
+            # vehicles at the very end of an edge (up to rounding errors) are
+            # moved to the next edge
+            beyond = lane > lanes[edge_indx] - 1
+            if not beyond.any():
+                break
+            edge_indx[beyond] += 1
+
+        startpositions = list(zip([available_edges[i] for i in edge_indx],
+                                  (pos + efs).tolist()))
+        startlanes = lane.tolist()
 
         return startpositions, startlanes
 
@@ -0,0 +1,89 @@
+"""Script containing the replay scenario kernel class."""
+
+from flow.core.kernel.scenario.traci import TraCIScenario
+from flow.core.kernel.vehicle.recorder import read_meta
+from flow.utils.exceptions import FatalFlowError
+
+
+class ReplayScenario(TraCIScenario):
+    """Replay scenario kernel.
+
+    Recreates the network of recorded trajectories from the description
+    stored by the trajectory recorder (see
+    flow.core.kernel.vehicle.recorder), instead of generating it with sumo.
+    All network-specific methods are then shared with the sumo scenario
+    kernel.
+    """
+
+    def generate_network(self, network):
+        """See parent class.
+
+        Raises
+        ------
+        flow.utils.exceptions.FatalFlowError
+            if the network was not recorded with the trajectories
+        """
+        self.network = network
+        self.orig_name = network.orig_name
+        self.name = network.name
+        self._route_engines = {}
+        self._start_pos_cache = {}
+
+        description = read_meta(self.sim_params.replay_path)["network"]
+        if description is None:
+            raise FatalFlowError(
+                "The network was not recorded in {}, the trajectories cannot "
+                "be replayed.".format(self.sim_params.replay_path))
+
+        # json stores lanes as strings and edge/lane pairs as lists
+        self._edges = description["edges"]
+        self._connections = {
+            key: {edge: {int(lane): [tuple(link) for link in links]
+                         for lane, links in lanes.items()}
+                  for edge, lanes in description["connections"][key].items()}
+            for key in ["next", "prev"]
+        }
+
+        # list of edges and internal links (junctions)
+        self._edge_list = [
+            edge_id for edge_id in self._edges.keys() if edge_id[0] != ':'
+        ]
+        self._junction_list = list(
+            set(self._edges.keys()) - set(self._edge_list))
+
+        self._max_speed = max(
+            self.speed_limit(edge) for edge in self.get_edge_list())
+        self._length = sum(
+            self.edge_length(edge_id) for edge_id in self.get_edge_list())
+
+        # starting positions of the edges, as used in the recorded simulation
+        self.total_edgestarts = [
+            tuple(start) for start in description["edge_starts"]]
+        self.total_edgestarts_dict = dict(self.total_edgestarts)
+        self._edgestart_positions = [pos for _, pos in self.total_edgestarts]
+        self.edgestarts = [start for start in self.total_edgestarts
+                           if start[0] in self._edge_list]
+        self.internal_edgestarts = [
+            tuple(start) for start in description["internal_edge_starts"]]
+        self.internal_edgestarts_dict = dict(self.internal_edgestarts)
+        self.intersection_edgestarts = []
+
+        # assign integer indices to all edges and junctions
+        self._intern_edges()
+
+        self.rts = self.network.routes
+
+    def close(self):
+        """See parent class.
+
+        No files are generated by this kernel, so there is nothing to delete.
+        """
+        pass
+
+    def length(self):
+        """See parent class."""
+        return self._length
+
+    def max_speed(self):
+        """See parent class."""
+        return self._max_speed
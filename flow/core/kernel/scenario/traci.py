@@ -6,7 +6,8 @@ import time
 import os
 import sys
 import subprocess
-import xml.etree.ElementTree as ElementTree
+import numpy as np
+from bisect import bisect_right
 from lxml import etree
 
 E = etree.Element
@@ -101,6 +102,10 @@ class TraCIScenario(KernelScenario):
         self.orig_name = network.orig_name
         self.name = network.name
 
+        # route engines are built from the new network when first requested
+        self._route_engines = {}
+        self._start_pos_cache = {}
+
         # names of the soon-to-be-generated xml and sumo config files
         self.nodfn = '%s.nod.xml' % self.network.name
         self.edgfn = '%s.edg.xml' % self.network.name
@@ -202,6 +207,11 @@ class TraCIScenario(KernelScenario):
         self.total_edgestarts.sort(key=lambda tup: tup[1])
 
         self.total_edgestarts_dict = dict(self.total_edgestarts)
+        # starting positions of the edges, used to find edges by position
+        self._edgestart_positions = [pos for _, pos in self.total_edgestarts]
+
+        # assign integer indices to all edges and junctions
+        self._intern_edges()
 
         # create the sumo configuration files
         cfg_name = self.generate_cfg(self.network.net_params,
@@ -251,28 +261,73 @@ class TraCIScenario(KernelScenario):
 
     def get_edge(self, x):
         """See parent class."""
-        for (edge, start_pos) in reversed(self.total_edgestarts):
-            if x >= start_pos:
-                return edge, x - start_pos
+        index = bisect_right(self._edgestart_positions, x) - 1
+        if index >= 0:
+            edge, start_pos = self.total_edgestarts[index]
+            return edge, x - start_pos
 
     def get_x(self, edge, position):
         """See parent class."""
+        index = self.edge_index.get(edge)
+        if index is not None:
+            return self.edge_offsets[index] + self._x_scales[index] * position
+
         # if there was a collision which caused the vehicle to disappear,
         # return an x value of -1001
         if len(edge) == 0:
             return -1001
 
+        # edges that are not in the network may still be specified in the
+        # edge starts of the scenario (e.g. names of groups of internal links)
         if edge[0] == ':':
             try:
                 return self.internal_edgestarts_dict[edge] + position
             except KeyError:
-                # in case several internal links are being generalized for
-                # by a single element (for backwards compatibility)
                 edge_name = edge.rsplit('_', 1)[0]
                 return self.total_edgestarts_dict.get(edge_name, -1001)
         else:
             return self.total_edgestarts_dict[edge] + position
 
+    def _intern_edges(self):
+        """Assign a dense integer index to every edge and junction.
+
+        Edges are indexed first, followed by junctions. The properties of all
+        edges are stored in arrays that can be accessed by index (see the
+        ``edge_*`` attributes of the parent class). This includes the starting
+        position of every edge, which is used by ``get_x``.
+        """
+        self.edge_ids = self._edge_list + sorted(self._junction_list)
+        self.edge_index = {edge: i for i, edge in enumerate(self.edge_ids)}
+        self.edge_lengths = np.array(
+            [self._edges[edge]['length'] for edge in self.edge_ids])
+        self.edge_num_lanes = np.array(
+            [self._edges[edge]['lanes'] for edge in self.edge_ids], dtype=int)
+        self.edge_speed_limits = np.array(
+            [self._edges[edge]['speed'] for edge in self.edge_ids])
+        self.edge_is_internal = np.array(
+            [edge[0] == ':' for edge in self.edge_ids], dtype=bool)
+
+        # absolute starting position of every edge, and whether the position
+        # of a vehicle on the edge should be added to it to compute its x
+        # value. Edges without a starting position are assigned -1001.
+        num_edges = len(self.edge_ids)
+        self.edge_offsets = np.full(num_edges, -1001.)
+        self._x_scales = np.zeros(num_edges)
+        for i, edge in enumerate(self.edge_ids):
+            if not self.edge_is_internal[i]:
+                if edge in self.total_edgestarts_dict:
+                    self.edge_offsets[i] = self.total_edgestarts_dict[edge]
+                    self._x_scales[i] = 1
+            elif edge in self.internal_edgestarts_dict:
+                self.edge_offsets[i] = self.internal_edgestarts_dict[edge]
+                self._x_scales[i] = 1
+            else:
+                # in case several internal links are being generalized for
+                # by a single element (for backwards compatibility)
+                edge_name = edge.rsplit('_', 1)[0]
+                self.edge_offsets[i] = self.total_edgestarts_dict.get(
+                    edge_name, -1001)
+
     def edge_length(self, edge_id):
         """See parent class."""
         try:
@@ -766,8 +821,10 @@ class TraCIScenario(KernelScenario):
             }
             routes.append(E('vType', id=params['veh_id'], **type_params_str))
 
-        # add the inflows from various edges to the xml file
-        if self.network.net_params.inflows is not None:
+        # add the inflows from various edges to the xml file (inflows managed
+        # by Flow are instead inserted by flow.core.inflows.InflowGenerator)
+        inflows = self.network.net_params.inflows
+        if inflows is not None and not getattr(inflows, "managed", False):
             total_inflows = self.network.net_params.inflows.get()
             for inflow in total_inflows:
                 for key in inflow:
@@ -787,6 +844,11 @@ class TraCIScenario(KernelScenario):
         network configuration file, and returns the information on the edges
         and junctions located in the file.
 
+        The file is parsed incrementally, and every element is discarded once
+        the attributes needed by Flow were collected from it, so that large
+        networks (e.g. imported from OpenStreetMap) can be imported without
+        loading the entire document in memory.
+
         Returns
         -------
         net_data : dict <dict>
@@ -800,103 +862,84 @@ class TraCIScenario(KernelScenario):
                     Element = list of edge/lane pairs preceding or following
                     the edge/lane pairs
         """
-        # import the .net.xml file containing all edge/type data
-        parser = etree.XMLParser(recover=True)
-        tree = ElementTree.parse(
-            os.path.join(self.cfg_path, self.netfn), parser=parser)
-
-        root = tree.getroot()
+        no_internal_links = self.network.net_params.no_internal_links
 
         # Collect information on the available types (if any are available).
         # This may be used when specifying some edge data.
         types_data = dict()
 
-        for typ in root.findall('type'):
-            type_id = typ.attrib['id']
-            types_data[type_id] = dict()
-
-            if 'speed' in typ.attrib:
-                types_data[type_id]['speed'] = float(typ.attrib['speed'])
-            else:
-                types_data[type_id]['speed'] = None
-
-            if 'numLanes' in typ.attrib:
-                types_data[type_id]['numLanes'] = int(typ.attrib['numLanes'])
-            else:
-                types_data[type_id]['numLanes'] = None
-
         net_data = dict()
         next_conn_data = dict()  # forward looking connections
         prev_conn_data = dict()  # backward looking connections
 
-        # collect all information on the edges and junctions
-        for edge in root.findall('edge'):
-            edge_id = edge.attrib['id']
+        # edge names are repeated in many connections, and are therefore
+        # interned to be shared by all of them
+        intern = sys.intern
 
-            # create a new key for this edge
-            net_data[edge_id] = dict()
+        context = etree.iterparse(
+            os.path.join(self.cfg_path, self.netfn), events=('end',),
+            tag=('type', 'edge', 'connection'), recover=True, huge_tree=True)
 
-            # check for speed
-            if 'speed' in edge:
-                net_data[edge_id]['speed'] = float(edge.attrib['speed'])
-            else:
-                net_data[edge_id]['speed'] = None
-
-            # if the edge has a type parameters, check that type for a
-            # speed and parameter if one was not already found
-            if 'type' in edge.attrib and edge.attrib['type'] in types_data:
-                if net_data[edge_id]['speed'] is None:
-                    net_data[edge_id]['speed'] = \
-                        float(types_data[edge.attrib['type']]['speed'])
-
-            # collect the length from the lane sub-element in the edge, the
-            # number of lanes from the number of lane elements, and if needed,
-            # also collect the speed value (assuming it is there)
-            net_data[edge_id]['lanes'] = 0
-            for i, lane in enumerate(edge):
-                net_data[edge_id]['lanes'] += 1
-                if i == 0:
-                    net_data[edge_id]['length'] = float(lane.attrib['length'])
-                    if net_data[edge_id]['speed'] is None \
-                            and 'speed' in lane.attrib:
-                        net_data[edge_id]['speed'] = float(
-                            lane.attrib['speed'])
-
-            # if no speed value is present anywhere, set it to some default
-            if net_data[edge_id]['speed'] is None:
-                net_data[edge_id]['speed'] = 30
-
-        # collect connection data
-        for connection in root.findall('connection'):
-            from_edge = connection.attrib['from']
-            from_lane = int(connection.attrib['fromLane'])
-
-            no_internal_links = self.network.net_params.no_internal_links
-            if from_edge[0] != ":" and not no_internal_links:
-                # if the edge is not an internal links and the network is
-                # allowed to have internal links, then get the next edge/lane
-                # pair from the "via" element
-                via = connection.attrib['via'].rsplit('_', 1)
-                to_edge = via[0]
-                to_lane = int(via[1])
-            else:
-                to_edge = connection.attrib['to']
-                to_lane = int(connection.attrib['toLane'])
-
-            if from_edge not in next_conn_data:
-                next_conn_data[from_edge] = dict()
+        for _, elem in context:
+            get = elem.get
 
-            if from_lane not in next_conn_data[from_edge]:
-                next_conn_data[from_edge][from_lane] = list()
+            if elem.tag == 'connection':
+                from_edge = intern(get('from'))
+                from_lane = int(get('fromLane'))
 
-            if to_edge not in prev_conn_data:
-                prev_conn_data[to_edge] = dict()
-
-            if to_lane not in prev_conn_data[to_edge]:
-                prev_conn_data[to_edge][to_lane] = list()
+                if from_edge[0] != ":" and not no_internal_links:
+                    # if the edge is not an internal links and the network is
+                    # allowed to have internal links, then get the next
+                    # edge/lane pair from the "via" element
+                    via = get('via').rsplit('_', 1)
+                    to_edge = intern(via[0])
+                    to_lane = int(via[1])
+                else:
+                    to_edge = intern(get('to'))
+                    to_lane = int(get('toLane'))
+
+                next_conn_data.setdefault(from_edge, {}).setdefault(
+                    from_lane, []).append((to_edge, to_lane))
+                prev_conn_data.setdefault(to_edge, {}).setdefault(
+                    to_lane, []).append((from_edge, from_lane))
+
+            elif elem.tag == 'edge':
+                speed = get('speed')
+                speed = None if speed is None else float(speed)
+
+                # if the edge has a type parameters, check that type for a
+                # speed and parameter if one was not already found
+                if speed is None and get('type') in types_data:
+                    speed = types_data[get('type')]['speed']
+
+                # collect the length from the lane sub-element in the edge, the
+                # number of lanes from the number of lane elements, and if
+                # needed, also collect the speed value (assuming it is there)
+                lanes = elem.findall('lane')
+                edge_data = {'lanes': len(lanes)}
+                if len(lanes) > 0:
+                    edge_data['length'] = float(lanes[0].get('length'))
+                    if speed is None and lanes[0].get('speed') is not None:
+                        speed = float(lanes[0].get('speed'))
+
+                # if no speed value is present anywhere, set it to some default
+                edge_data['speed'] = 30 if speed is None else speed
+                net_data[intern(get('id'))] = edge_data
 
-            next_conn_data[from_edge][from_lane].append((to_edge, to_lane))
-            prev_conn_data[to_edge][to_lane].append((from_edge, from_lane))
+            else:
+                speed = get('speed')
+                num_lanes = get('numLanes')
+                types_data[get('id')] = {
+                    'speed': None if speed is None else float(speed),
+                    'numLanes': None if num_lanes is None else int(num_lanes)
+                }
+
+            # free the memory used by the element and its predecessors
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+        del context
 
         connection_data = {'next': next_conn_data, 'prev': prev_conn_data}
 
@@ -1,6 +1,9 @@
 from flow.core.kernel.simulation.base import KernelSimulation
 from flow.core.kernel.simulation.traci import TraCISimulation
 from flow.core.kernel.simulation.aimsun import AimsunKernelSimulation
+from flow.core.kernel.simulation.replay import ReplaySimulation
+from flow.core.kernel.simulation.sharded import ShardedTraCISimulation
 
 
-__all__ = ['KernelSimulation', 'TraCISimulation', 'AimsunKernelSimulation']
+__all__ = ['KernelSimulation', 'TraCISimulation', 'AimsunKernelSimulation',
+           'ReplaySimulation', 'ShardedTraCISimulation']
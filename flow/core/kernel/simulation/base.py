@@ -1,5 +1,7 @@
 """Script containing the base simulation kernel class."""
 
+import os
+
 
 class KernelSimulation(object):
     """Base simulation kernel.
@@ -56,6 +58,51 @@ class KernelSimulation(object):
         """
         raise NotImplementedError
 
+    def fast_forward(self, num_steps):
+        """Advance the simulation by several steps.
+
+        The other kernels are not updated in between these steps. By default,
+        the simulation is advanced one step at a time.
+
+        Parameters
+        ----------
+        num_steps : int
+            number of simulation steps to perform
+        """
+        for _ in range(num_steps):
+            self.simulation_step()
+
+    def save_state(self, path):
+        """Save the current state of the simulation to a file.
+
+        Parameters
+        ----------
+        path : str
+            path to the file the state is saved to
+        """
+        raise NotImplementedError
+
+    def load_state(self, path):
+        """Load a state of the simulation from a file.
+
+        Parameters
+        ----------
+        path : str
+            path to a file generated by ``save_state``
+        """
+        raise NotImplementedError
+
+    def release_state(self, path):
+        """Delete a state of the simulation saved by ``save_state``.
+
+        Parameters
+        ----------
+        path : str
+            path to a file generated by ``save_state``
+        """
+        if os.path.exists(path):
+            os.remove(path)
+
     def update(self, reset):
         """Update the internal attributes of the simulation kernel.
 
@@ -0,0 +1,79 @@
+"""Script containing the replay simulation kernel class."""
+
+from flow.core.kernel.simulation.base import KernelSimulation
+from flow.core.kernel.vehicle.recorder import TrajectoryReader
+
+
+class ReplaySimulation(KernelSimulation):
+    """Replay simulation kernel.
+
+    Replays trajectories recorded by the trajectory recorder (see
+    flow.core.kernel.vehicle.recorder) instead of running a simulator. The
+    kernel API passed to the other kernels is a TrajectoryReader, from which
+    the vehicle kernel reads the state of the vehicles at every step.
+    """
+
+    def __init__(self, master_kernel):
+        """Instantiate the replay simulation kernel.
+
+        Parameters
+        ----------
+        master_kernel : flow.core.kernel.Kernel
+            the higher level kernel (used to call methods from other
+            sub-kernels)
+        """
+        KernelSimulation.__init__(self, master_kernel)
+
+    def start_simulation(self, scenario, sim_params):
+        """Open the recorded trajectories.
+
+        Parameters
+        ----------
+        scenario : flow.core.kernel.scenario.KernelScenario
+            an object containing relevant network-specific features such as
+            the locations and properties of nodes and edges in the network
+        sim_params : flow.core.params.ReplayParams
+            replay-specific parameters, including the path to the recorded
+            trajectories
+
+        Returns
+        -------
+        flow.core.kernel.vehicle.recorder.TrajectoryReader
+            reader of the recorded trajectories
+
+        Raises
+        ------
+        ValueError
+            if rendering is requested, since the shapes of the lanes and the
+            coordinates of the vehicles needed by the renderers are not
+            recorded
+        """
+        if sim_params.render is not False:
+            raise ValueError(
+                "Replayed trajectories cannot be rendered (render={}). The "
+                "rollout may be rendered while it is simulated instead."
+                .format(sim_params.render))
+        return TrajectoryReader(sim_params.replay_path)
+
+    def simulation_step(self):
+        """See parent class.
+
+        The next frame of the replay is loaded by the vehicle kernel when it
+        is updated.
+        """
+        pass
+
+    def update(self, reset):
+        """See parent class."""
+        pass
+
+    def check_collision(self):
+        """See parent class.
+
+        Collisions are not recorded, and are never reported.
+        """
+        return False
+
+    def close(self):
+        """See parent class."""
+        self.kernel_api = None
@@ -0,0 +1,822 @@
+"""Script containing the sharded TraCI simulation kernel class.
+
+Very large networks may be simulated by several sumo instances (shards) in
+parallel. The network is partitioned into regions (see
+``partition_network``), and every shard simulates the vehicles located in one
+region. All shards load the complete network, so that vehicles can be handed
+off from one shard to another once they enter an edge of another region: the
+vehicle is removed from its current shard, and inserted with the same type,
+route, lane, position and speed in the shard of the new region. Vehicles that
+cannot be inserted in their new shard within ``MAX_HANDOFF_STEPS`` steps are
+removed from the simulation.
+
+The shards are presented to the other kernels as a single TraCI connection
+(see ``ShardedConnection``). Commands are sent to the shard simulating the
+vehicle, traffic light, edge or lane they refer to, and the results of all
+shards are merged. The vehicle, scenario and traffic light kernels of sumo
+may therefore be used without modification. The sharded simulation is used
+if ``SumoParams.num_shards`` is larger than 1.
+
+Note that vehicles do not interact with vehicles simulated by other shards,
+e.g. a vehicle does not see its leader if this leader is located in another
+region. Regions should therefore be large compared to the distances over
+which vehicles interact.
+"""
+
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+import logging
+import os
+import signal
+import traceback
+
+from lxml import etree
+import traci
+import traci.constants as tc
+
+from flow.core.kernel.simulation.traci import TraCISimulation, SERVER_POOL, \
+    RETRIES_ON_ERROR, wait_for_server
+
+# number of steps a handed-off vehicle may wait to be inserted in its new shard
+# (e.g. if its position is blocked) before it is removed from the simulation
+MAX_HANDOFF_STEPS = 20
+
+
+def partition_network(net_path, num_shards):
+    """Partition the edges and junctions of a network into regions.
+
+    The network is cut into vertical strips, such that every strip contains
+    a similar total length of lanes. Edges are assigned to the strip
+    containing the point in between their junctions.
+
+    Parameters
+    ----------
+    net_path : str
+        path to the .net.xml file of the network
+    num_shards : int
+        number of regions
+
+    Returns
+    -------
+    dict < str, int >
+        region of every edge (excluding internal edges)
+    dict < str, int >
+        region of every junction
+    """
+    junction_x = dict()
+    edges = []
+
+    for _, elem in etree.iterparse(net_path, events=('end',),
+                                   tag=('edge', 'junction'), recover=True,
+                                   huge_tree=True):
+        if elem.tag == 'junction':
+            junction_x[elem.get('id')] = float(elem.get('x', 0))
+        elif elem.get('id')[0] != ':':
+            length = sum(float(lane.get('length'))
+                         for lane in elem.findall('lane'))
+            edges.append((elem.get('id'), elem.get('from'), elem.get('to'),
+                          length))
+
+        # free the memory used by the element and its predecessors
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+    # sort the edges by the position of the point in between their junctions
+    edges = sorted(
+        ((junction_x.get(from_node, 0) + junction_x.get(to_node, 0)) / 2,
+         edge_id, length) for edge_id, from_node, to_node, length in edges)
+    total_length = sum(length for _, _, length in edges) or 1
+
+    edge_shards = dict()
+    cuts = []  # position at which every region (but the first) starts
+    cumulative_length = 0
+    for x, edge_id, length in edges:
+        shard = min(int(num_shards * cumulative_length / total_length),
+                    num_shards - 1)
+        while len(cuts) < shard:
+            cuts.append(x)
+        edge_shards[edge_id] = shard
+        cumulative_length += length
+
+    junction_shards = {junction_id: bisect_right(cuts, x)
+                       for junction_id, x in junction_x.items()}
+
+    return edge_shards, junction_shards
+
+
+class ShardedDomain(object):
+    """Domain of the TraCI api (e.g. "trafficlight") across all shards.
+
+    Commands changing the state of the simulation (i.e. "set" and "add"
+    commands) are sent to all shards, so that the shards are kept consistent.
+    Other commands are sent to the shard simulating the object they refer to
+    (their first argument), or to the first shard if the domain has no notion
+    of location. Subscription results are merged across all shards.
+    """
+
+    def __init__(self, sharded, name, shard_fn=None):
+        """Instantiate the domain.
+
+        Parameters
+        ----------
+        sharded : flow.core.kernel.simulation.sharded.ShardedConnection
+            the connection to all shards
+        name : str
+            name of the domain in the TraCI api
+        shard_fn : callable, optional
+            function returning the shard simulating an object of the domain,
+            given its ID
+        """
+        self._sharded = sharded
+        self._name = name
+        self._shard_fn = shard_fn
+
+    def _domain(self, shard):
+        """Return the domain of a specific shard."""
+        return getattr(self._sharded.connections[shard], self._name)
+
+    def __getattr__(self, method):
+        """Return a function sending a command to the relevant shards."""
+        num_shards = len(self._sharded.connections)
+
+        if method.startswith("set") or method == "add":
+            def call(*args, **kwargs):
+                results = [getattr(self._domain(shard), method)(
+                    *args, **kwargs) for shard in range(num_shards)]
+                return results[0]
+
+        elif method in ("getSubscriptionResults",
+                        "getAllSubscriptionResults"):
+            def call(*args, **kwargs):
+                if len(args) > 0 and args[0] is not None:
+                    return getattr(self._domain(self._shard(args[0])),
+                                   method)(*args, **kwargs)
+                results = dict()
+                for shard in range(num_shards):
+                    results.update(getattr(self._domain(shard), method)())
+                return results
+
+        else:
+            def call(*args, **kwargs):
+                shard = self._shard(args[0]) if len(args) > 0 else 0
+                return getattr(self._domain(shard), method)(*args, **kwargs)
+
+        return call
+
+    def _shard(self, object_id):
+        """Return the shard simulating an object of the domain."""
+        if self._shard_fn is None or not isinstance(object_id, str):
+            return 0
+        return self._shard_fn(object_id)
+
+
+class ShardedVehicleDomain(ShardedDomain):
+    """Vehicle domain of the TraCI api across all shards.
+
+    Commands are sent to the shard currently simulating the vehicle. The
+    subscriptions and persistent settings of every vehicle are recorded, so
+    that they can be applied again when the vehicle is handed off to another
+    shard.
+    """
+
+    # commands modifying the vehicle until they are called again
+    PERSISTENT_COMMANDS = {
+        "setSpeedMode", "setLaneChangeMode", "setMaxSpeed", "setColor",
+        "setSpeedFactor", "setSpeed", "setType", "setMinGap", "setTau",
+        "setAccel", "setDecel"
+    }
+
+    # subscription commands
+    SUBSCRIPTION_COMMANDS = {"subscribe", "subscribeLeader"}
+
+    def __init__(self, sharded):
+        """Instantiate the domain.
+
+        Parameters
+        ----------
+        sharded : flow.core.kernel.simulation.sharded.ShardedConnection
+            the connection to all shards
+        """
+        super(ShardedVehicleDomain, self).__init__(
+            sharded, "vehicle", sharded.vehicle_shard)
+
+    def __getattr__(self, method):
+        """Return a function sending a command to the shard of a vehicle."""
+        sharded = self._sharded
+
+        def call(*args, **kwargs):
+            veh_id = args[0] if len(args) > 0 else kwargs.get("vehID")
+            domain = self._domain(sharded.vehicle_shard(veh_id))
+
+            if method not in self.SUBSCRIPTION_COMMANDS:
+                result = getattr(domain, method)(*args, **kwargs)
+                # record the settings that must be applied again on hand-offs
+                if method in self.PERSISTENT_COMMANDS:
+                    sharded.settings.setdefault(veh_id, {})[method] = \
+                        (args, kwargs)
+                return result
+
+            # subscriptions of vehicles in transit are sent once the vehicle
+            # is inserted in its new shard
+            sharded.subscriptions.setdefault(veh_id, {})[method] = \
+                (args, kwargs)
+            if veh_id not in sharded.in_transit:
+                getattr(domain, method)(*args, **kwargs)
+                # as in traci, the results of new subscriptions are available
+                # immediately
+                sharded.vehicle_results().setdefault(veh_id, {}).update(
+                    domain.getSubscriptionResults(veh_id))
+
+        return call
+
+    def add(self, vehID, routeID, *args, **kwargs):
+        """Add a vehicle to the shard simulating the start of its route."""
+        shard = self._sharded.edge_shard(self._sharded.route_start(routeID))
+        self._domain(shard).add(vehID, routeID, *args, **kwargs)
+        self._sharded.assign(vehID, shard)
+
+    def addFull(self, vehID, routeID, *args, **kwargs):
+        """Add a vehicle to the shard simulating the start of its route."""
+        shard = self._sharded.edge_shard(self._sharded.route_start(routeID))
+        self._domain(shard).addFull(vehID, routeID, *args, **kwargs)
+        self._sharded.assign(vehID, shard)
+
+    def remove(self, vehID, *args, **kwargs):
+        """Remove a vehicle from the shard simulating it."""
+        shard = self._sharded.vehicle_shard(vehID)
+        self._domain(shard).remove(vehID, *args, **kwargs)
+        self._sharded.in_transit.pop(vehID, None)
+        self._sharded.transit_steps.pop(vehID, None)
+
+    def unsubscribe(self, vehID):
+        """Remove the subscriptions of a vehicle."""
+        self._domain(self._sharded.vehicle_shard(vehID)).unsubscribe(vehID)
+        self._sharded.subscriptions.pop(vehID, None)
+
+    def getIDList(self):
+        """Return the IDs of the vehicles in all shards."""
+        ids = []
+        for shard in range(len(self._sharded.connections)):
+            ids.extend(self._domain(shard).getIDList())
+
+        # vehicles that were handed off in the last step are only inserted
+        # in their new shard in the next step
+        id_set = set(ids)
+        ids.extend(veh_id for veh_id in self._sharded.in_transit
+                   if veh_id not in id_set)
+        return ids
+
+    def getIDCount(self):
+        """Return the number of vehicles in all shards."""
+        return len(self.getIDList())
+
+    def getSubscriptionResults(self, vehID=None):
+        """Return the subscription results of the vehicles in all shards."""
+        results = self._sharded.vehicle_results()
+        if vehID is None:
+            return results
+        return results.get(vehID, {})
+
+    def getAllSubscriptionResults(self):
+        """Return the subscription results of the vehicles in all shards."""
+        return self._sharded.vehicle_results()
+
+
+class ShardedSimulationDomain(ShardedDomain):
+    """Simulation domain of the TraCI api across all shards.
+
+    The vehicles that departed or arrived in the last step are merged across
+    all shards, excluding the vehicles that were handed off between shards.
+    """
+
+    def __init__(self, sharded):
+        """Instantiate the domain.
+
+        Parameters
+        ----------
+        sharded : flow.core.kernel.simulation.sharded.ShardedConnection
+            the connection to all shards
+        """
+        super(ShardedSimulationDomain, self).__init__(sharded, "simulation")
+
+    def subscribe(self, varIDs, *args, **kwargs):
+        """Subscribe simulation variables in all shards."""
+        for shard in range(len(self._sharded.connections)):
+            self._domain(shard).subscribe(varIDs, *args, **kwargs)
+
+    def getSubscriptionResults(self):
+        """Return the merged subscription results of all shards."""
+        return self._sharded.simulation_results()
+
+    def getDepartedIDList(self):
+        """Return the vehicles that entered the network in the last step."""
+        return self._sharded.simulation_results()[
+            tc.VAR_DEPARTED_VEHICLES_IDS]
+
+    def getArrivedIDList(self):
+        """Return the vehicles that exited the network in the last step."""
+        return self._sharded.simulation_results()[
+            tc.VAR_ARRIVED_VEHICLES_IDS]
+
+    def getMinExpectedNumber(self):
+        """Return the number of vehicles still expected in all shards."""
+        return sum(self._domain(shard).getMinExpectedNumber()
+                   for shard in range(len(self._sharded.connections)))
+
+    def saveState(self, fileName):
+        """Save the state of all shards.
+
+        The state of shard i is saved to "<fileName>.<i>".
+        """
+        for shard in range(len(self._sharded.connections)):
+            self._domain(shard).saveState("{}.{}".format(fileName, shard))
+        self._sharded.save_bookkeeping(fileName)
+
+    def loadState(self, fileName):
+        """Load the state of all shards, as saved by ``saveState``."""
+        for shard in range(len(self._sharded.connections)):
+            self._domain(shard).loadState("{}.{}".format(fileName, shard))
+        self._sharded.load_bookkeeping(fileName)
+
+    def releaseState(self, fileName):
+        """Delete the state of all shards, as saved by ``saveState``."""
+        for shard in range(len(self._sharded.connections)):
+            path = "{}.{}".format(fileName, shard)
+            if os.path.exists(path):
+                os.remove(path)
+        self._sharded.release_bookkeeping(fileName)
+
+
+class ShardedConnection(object):
+    """TraCI connection to several sumo instances simulating one network.
+
+    See the description of the module. The connections to all shards are
+    advanced in parallel, after which vehicles that entered a region
+    simulated by another shard are handed off to this shard.
+
+    Attributes
+    ----------
+    connections : list of traci.connection.Connection
+        connections to the sumo instances of every shard
+    edge_shards : dict < str, int >
+        shard simulating every edge (excluding internal edges)
+    junction_shards : dict < str, int >
+        shard simulating every junction, including its internal edges and
+        traffic lights
+    owners : dict < str, int >
+        shard currently simulating every vehicle
+    settings : dict < str, dict >
+        persistent settings of every vehicle, by command
+    subscriptions : dict < str, dict >
+        subscriptions of every vehicle, by command
+    in_transit : dict < str, dict >
+        last subscription results of the vehicles that were handed off, and
+        are not inserted in their new shard yet
+    transit_steps : dict < str, int >
+        number of steps every vehicle in transit has waited to be inserted.
+        Vehicles still waiting after ``MAX_HANDOFF_STEPS`` are dropped
+    num_handoffs : int
+        number of vehicles handed off between shards so far
+    num_dropped : int
+        number of vehicles removed so far as they could not be inserted in
+        their new shard
+    """
+
+    def __init__(self, connections, edge_shards, junction_shards):
+        """Instantiate the connection.
+
+        Parameters
+        ----------
+        connections : list of traci.connection.Connection
+            connections to the sumo instances of every shard
+        edge_shards : dict < str, int >
+            shard simulating every edge (see ``partition_network``)
+        junction_shards : dict < str, int >
+            shard simulating every junction (see ``partition_network``)
+        """
+        self.connections = connections
+        self.edge_shards = edge_shards
+        self.junction_shards = junction_shards
+
+        self.owners = dict()
+        self.settings = dict()
+        self.subscriptions = dict()
+        self.in_transit = dict()
+        self.transit_steps = dict()
+        self.num_handoffs = 0
+        self.num_dropped = 0
+        # vehicles removed from every shard by Flow, whose arrival should
+        # not be reported (e.g. vehicles that were handed off)
+        self._hidden_arrivals = [set() for _ in connections]
+        # bookkeeping of the saved states of the simulation, by path
+        self._saved = dict()
+
+        # first edge of every route, and length of every lane
+        self._route_starts = dict()
+        self._lane_lengths = dict()
+        self._delta_t = None
+
+        # merged results of the last step, computed when first needed
+        self._step_results = [dict() for _ in connections]
+        self._departed_ids = []
+        self._arrived_ids = []
+        self._vehicle_results = None
+        self._simulation_results = None
+
+        # shards are advanced in parallel, as sumo runs while waiting for
+        # the results of a step
+        self._executor = ThreadPoolExecutor(max_workers=len(connections))
+
+        self.vehicle = ShardedVehicleDomain(self)
+        self.simulation = ShardedSimulationDomain(self)
+        self.trafficlight = ShardedDomain(
+            self, "trafficlight", self.junction_shard)
+        self.edge = ShardedDomain(self, "edge", self.edge_shard)
+        self.lane = ShardedDomain(self, "lane", self.lane_shard)
+
+    def __getattr__(self, name):
+        """Return any other domain of the TraCI api across all shards."""
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return ShardedDomain(self, name)
+
+    def edge_shard(self, edge_id):
+        """Return the shard simulating an edge."""
+        if edge_id.startswith(":"):
+            return self.junction_shard(edge_id[1:].rsplit("_", 1)[0])
+        return self.edge_shards.get(edge_id, 0)
+
+    def lane_shard(self, lane_id):
+        """Return the shard simulating a lane."""
+        return self.edge_shard(lane_id.rsplit("_", 1)[0])
+
+    def junction_shard(self, junction_id):
+        """Return the shard simulating a junction (or traffic light)."""
+        return self.junction_shards.get(junction_id, 0)
+
+    def vehicle_shard(self, veh_id):
+        """Return the shard simulating a vehicle."""
+        return self.owners.get(veh_id, 0)
+
+    def route_start(self, route_id):
+        """Return the first edge of a route."""
+        if route_id not in self._route_starts:
+            self._route_starts[route_id] = \
+                self.connections[0].route.getEdges(route_id)[0]
+        return self._route_starts[route_id]
+
+    def assign(self, veh_id, shard):
+        """Assign a new vehicle to a shard, with no settings."""
+        self.owners[veh_id] = shard
+        self.settings.pop(veh_id, None)
+        self.subscriptions.pop(veh_id, None)
+        self.in_transit.pop(veh_id, None)
+        self.transit_steps.pop(veh_id, None)
+
+    def simulationStep(self, step=0.):
+        """Advance all shards by one step, or until a given time.
+
+        Vehicles are handed off between shards after every step.
+        """
+        if step <= 0:
+            self._step()
+            return
+
+        if self._delta_t is None:
+            self._delta_t = self.connections[0].simulation.getDeltaT()
+        while self.connections[0].simulation.getTime() + \
+                self._delta_t / 2 < step:
+            self._step()
+
+    def _step(self):
+        """Advance all shards by one step, and hand off vehicles."""
+        list(self._executor.map(
+            lambda connection: connection.simulationStep(), self.connections))
+
+        self._vehicle_results = None
+        self._simulation_results = None
+        self._departed_ids = []
+        self._arrived_ids = []
+
+        for shard, connection in enumerate(self.connections):
+            results = connection.simulation.getSubscriptionResults()
+            if tc.VAR_DEPARTED_VEHICLES_IDS not in results:
+                # the simulation variables are not subscribed yet
+                results = dict(results)
+                results[tc.VAR_DEPARTED_VEHICLES_IDS] = \
+                    connection.simulation.getDepartedIDList()
+                results[tc.VAR_ARRIVED_VEHICLES_IDS] = \
+                    connection.simulation.getArrivedIDList()
+            self._step_results[shard] = results
+
+            for veh_id in results[tc.VAR_ARRIVED_VEHICLES_IDS]:
+                self._arrive(veh_id, shard)
+
+            for veh_id in results[tc.VAR_DEPARTED_VEHICLES_IDS]:
+                self._depart(veh_id, shard)
+
+        # vehicles whose insertion in their new shard keeps failing are
+        # dropped instead of being reported at their last position forever
+        for veh_id in list(self.in_transit):
+            self.transit_steps[veh_id] = self.transit_steps.get(veh_id, 0) + 1
+            if self.transit_steps[veh_id] > MAX_HANDOFF_STEPS:
+                self._drop(veh_id)
+
+        # hand off the vehicles that entered the region of another shard
+        for shard, connection in enumerate(self.connections):
+            results = connection.vehicle.getSubscriptionResults()
+            for veh_id, veh_results in results.items():
+                edge = veh_results.get(tc.VAR_ROAD_ID)
+                if not edge or edge[0] == ":" or \
+                        self.owners.get(veh_id) != shard:
+                    continue
+                target = self.edge_shards.get(edge, shard)
+                if target != shard:
+                    self._hand_off(veh_id, shard, target, veh_results)
+
+    def _arrive(self, veh_id, shard):
+        """Process a vehicle that exited a shard in the last step."""
+        if veh_id in self._hidden_arrivals[shard]:
+            # the vehicle was handed off or removed as a duplicate
+            self._hidden_arrivals[shard].discard(veh_id)
+            return
+
+        self._arrived_ids.append(veh_id)
+        if self.owners.get(veh_id) == shard:
+            del self.owners[veh_id]
+            self.settings.pop(veh_id, None)
+            self.subscriptions.pop(veh_id, None)
+
+    def _depart(self, veh_id, shard):
+        """Process a vehicle that entered a shard in the last step."""
+        owner = self.owners.get(veh_id)
+
+        if owner == shard and veh_id in self.in_transit:
+            # the hand-off of the vehicle is complete
+            del self.in_transit[veh_id]
+            self.transit_steps.pop(veh_id, None)
+            for method, (args, kwargs) in \
+                    self.subscriptions.get(veh_id, {}).items():
+                getattr(self.connections[shard].vehicle, method)(
+                    *args, **kwargs)
+            return
+
+        if owner is None:
+            # vehicles inserted by sumo (e.g. inflows) are inserted by all
+            # shards, and are only kept by the shard simulating their edge
+            edge = self.connections[shard].vehicle.getRoadID(veh_id)
+            owner = self.edge_shard(edge)
+            if owner == shard:
+                self.owners[veh_id] = shard
+
+        if owner != shard:
+            self.connections[shard].vehicle.remove(veh_id)
+            self._hidden_arrivals[shard].add(veh_id)
+            return
+
+        self._departed_ids.append(veh_id)
+
+    def _hand_off(self, veh_id, source, target, veh_results):
+        """Move a vehicle from one shard to another.
+
+        The vehicle is inserted in the target shard during the next step,
+        and is therefore placed where it is expected to be by then.
+        """
+        src = self.connections[source].vehicle
+        dst = self.connections[target]
+
+        edge = veh_results[tc.VAR_ROAD_ID]
+        lane = veh_results.get(tc.VAR_LANE_INDEX)
+        if lane is None:
+            lane = src.getLaneIndex(veh_id)
+        pos = veh_results.get(tc.VAR_LANEPOSITION)
+        if pos is None:
+            pos = src.getLanePosition(veh_id)
+        speed = veh_results.get(tc.VAR_SPEED)
+        if speed is None:
+            speed = src.getSpeed(veh_id)
+        route = src.getRoute(veh_id)[src.getRouteIndex(veh_id):]
+
+        lane_id = "{}_{}".format(edge, lane)
+        if lane_id not in self._lane_lengths:
+            self._lane_lengths[lane_id] = dst.lane.getLength(lane_id)
+        if self._delta_t is None:
+            self._delta_t = self.connections[0].simulation.getDeltaT()
+        pos = min(pos + speed * self._delta_t, self._lane_lengths[lane_id])
+
+        route_id = "flow_handoff_{}".format(self.num_handoffs)
+        self.num_handoffs += 1
+        dst.route.add(route_id, route)
+        dst.vehicle.addFull(
+            veh_id, route_id,
+            typeID=src.getTypeID(veh_id),
+            departLane=str(lane),
+            departPos=str(pos),
+            departSpeed=str(speed))
+
+        # apply the settings of the vehicle again (its subscriptions are
+        # renewed once it is inserted, see ``_depart``)
+        for method, (args, kwargs) in self.settings.get(veh_id, {}).items():
+            getattr(dst.vehicle, method)(*args, **kwargs)
+
+        src.unsubscribe(veh_id)
+        src.remove(veh_id)
+        self._hidden_arrivals[source].add(veh_id)
+        self.owners[veh_id] = target
+        self.in_transit[veh_id] = veh_results
+        self.transit_steps[veh_id] = 0
+
+    def _drop(self, veh_id):
+        """Remove a vehicle that could not be inserted in its new shard.
+
+        The vehicle is removed from the insertion queue of the shard, and is
+        reported as having exited the network.
+        """
+        logging.warning(" Vehicle {} could not be handed off to shard {} "
+                        "within {} steps, and is removed".format(
+                            veh_id, self.owners[veh_id], MAX_HANDOFF_STEPS))
+        try:
+            self.connections[self.owners[veh_id]].vehicle.remove(veh_id)
+        except traci.TraCIException:
+            pass
+
+        del self.owners[veh_id]
+        del self.in_transit[veh_id]
+        del self.transit_steps[veh_id]
+        self.settings.pop(veh_id, None)
+        self.subscriptions.pop(veh_id, None)
+        self._arrived_ids.append(veh_id)
+        self.num_dropped += 1
+
+    def vehicle_results(self):
+        """Return the subscription results of the vehicles in all shards."""
+        if self._vehicle_results is None:
+            results = dict()
+            for connection in self.connections:
+                results.update(connection.vehicle.getSubscriptionResults())
+            # vehicles in transit keep their last results until inserted
+            results.update(self.in_transit)
+            self._vehicle_results = results
+        return self._vehicle_results
+
+    def simulation_results(self):
+        """Return the merged simulation subscription results of all shards.
+
+        Lists of vehicles are merged, while other values are the ones of the
+        first shard.
+        """
+        if self._simulation_results is None:
+            results = dict(self._step_results[0])
+            for var, value in results.items():
+                if isinstance(value, (list, tuple)):
+                    results[var] = tuple(
+                        veh_id for shard_results in self._step_results
+                        for veh_id in shard_results.get(var, ()))
+            results[tc.VAR_DEPARTED_VEHICLES_IDS] = tuple(self._departed_ids)
+            results[tc.VAR_ARRIVED_VEHICLES_IDS] = tuple(self._arrived_ids)
+            self._simulation_results = results
+        return self._simulation_results
+
+    def save_bookkeeping(self, path):
+        """Save the assignment of vehicles to shards with a state."""
+        self._saved[path] = deepcopy(
+            (self.owners, self.settings, self.subscriptions,
+             self.in_transit, self.transit_steps, self.num_handoffs,
+             self.num_dropped, self._hidden_arrivals))
+
+    def load_bookkeeping(self, path):
+        """Load the assignment of vehicles to shards of a saved state."""
+        self.owners, self.settings, self.subscriptions, self.in_transit, \
+            self.transit_steps, self.num_handoffs, self.num_dropped, \
+            self._hidden_arrivals = deepcopy(self._saved[path])
+        self._step_results = [dict() for _ in self.connections]
+        self._departed_ids = []
+        self._arrived_ids = []
+        self._vehicle_results = None
+        self._simulation_results = None
+
+    def release_bookkeeping(self, path):
+        """Drop the assignment of vehicles to shards of a saved state."""
+        self._saved.pop(path, None)
+
+    def close(self):
+        """Close the connections to all shards."""
+        for connection in self.connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        self._executor.shutdown(wait=False)
+
+
+class ShardedTraCISimulation(TraCISimulation):
+    """Sumo simulation kernel simulating a network on several sumo instances.
+
+    See the description of the module. The kernel api passed to the other
+    kernels is a ``ShardedConnection``.
+
+    Extends flow.core.kernel.simulation.TraCISimulation
+    """
+
+    def __init__(self, master_kernel):
+        """Instantiate the sharded sumo simulator kernel.
+
+        Parameters
+        ----------
+        master_kernel : flow.core.kernel.Kernel
+            the higher level kernel (used to call methods from other
+            sub-kernels)
+        """
+        TraCISimulation.__init__(self, master_kernel)
+        # contains the subprocess.Popen instances of all shards
+        self.sumo_procs = []
+
+    def start_simulation(self, scenario, sim_params):
+        """Start the sumo instances of all shards.
+
+        The instances are launched at once, and connected to once they are
+        all started. Sumo servers are not pooled in sharded simulations, and
+        the emission output of shard i (if requested) is suffixed by "-i".
+        """
+        error = None
+        for _ in range(RETRIES_ON_ERROR):
+            try:
+                sumo_binary = "sumo-gui" if sim_params.render is True \
+                    else "sumo"
+                sumo_options = self.get_sumo_options(scenario, sim_params)
+
+                self.sumo_binary = sumo_binary
+                self.sumo_options = sumo_options
+                self.pool_size = 0
+
+                servers = []
+                for shard in range(sim_params.num_shards):
+                    servers.append(SERVER_POOL.launch(
+                        sumo_binary, self._shard_options(sumo_options, shard)))
+                self.sumo_procs = [proc for proc, _ in servers]
+                logging.info(" Starting {} SUMO shards on ports {}".format(
+                    len(servers), [port for _, port in servers]))
+
+                connections = []
+                for proc, port in servers:
+                    wait_for_server(proc, port)
+                    connection = traci.connect(port, numRetries=100)
+                    connection.setOrder(0)
+                    connections.append(connection)
+
+                edge_shards, junction_shards = partition_network(
+                    os.path.join(scenario.cfg_path, scenario.netfn),
+                    sim_params.num_shards)
+                traci_connection = ShardedConnection(
+                    connections, edge_shards, junction_shards)
+
+                traci_connection.simulationStep()
+
+                return traci_connection
+            except Exception as e:
+                print("Error during start: {}".format(traceback.format_exc()))
+                error = e
+                self.teardown_sumo()
+        raise error
+
+    @staticmethod
+    def _shard_options(sumo_options, shard):
+        """Return the command line options of a specific shard."""
+        options = list(sumo_options)
+        if "--emission-output" in options:
+            index = options.index("--emission-output") + 1
+            root, ext = os.path.splitext(options[index])
+            options[index] = "{}-{}{}".format(root, shard, ext)
+        return options
+
+    def release_state(self, path):
+        """See parent class.
+
+        The states of all shards, and the bookkeeping saved with them, are
+        deleted.
+        """
+        self.kernel_api.simulation.releaseState(path)
+        super().release_state(path)
+
+    def close(self):
+        """See parent class.
+
+        The sumo instances of all shards are also shut down, as they are not
+        tracked by ``sumo_proc``.
+        """
+        super().close()
+        self.teardown_sumo()
+
+    def teardown_sumo(self):
+        """Kill the sumo subprocess instances of all shards."""
+        for proc in self.sumo_procs:
+            if proc.poll() is not None:
+                # the instance already exited
+                continue
+            try:
+                os.killpg(proc.pid, signal.SIGTERM)
+            except Exception as e:
+                print("Error during teardown: {}".format(e))
+        self.sumo_procs = []
@@ -2,21 +2,291 @@
 
 from flow.core.kernel.simulation import KernelSimulation
 from flow.core.util import ensure_dir
+from flow.utils.exceptions import FatalFlowError
 import flow.config as config
 import traci.constants as tc
 import traci
+import sumolib
 import traceback
 import os
 import time
 import logging
 import subprocess
 import signal
+import atexit
+import collections
 
 
 # Number of retries on restarting SUMO before giving up
 RETRIES_ON_ERROR = 10
 
 
+# Paths of the kernel tables of TCP sockets, and state of listening sockets
+PROC_NET_TCP = ("/proc/net/tcp", "/proc/net/tcp6")
+TCP_LISTEN = "0A"
+
+
+def listening_ports():
+    """Return the local ports of all TCP sockets in the LISTEN state.
+
+    The ports are read from the kernel tables of TCP sockets, which does not
+    take the port (as binding to it would, racing with the server's own bind)
+    and does not open a connection to the server (which sumo would count as
+    one of its ``--num-clients`` clients).
+
+    Returns
+    -------
+    set of int or None
+        the listening ports, or None if the tables are not available (e.g.
+        on systems other than Linux)
+    """
+    ports = set()
+    found = False
+    for path in PROC_NET_TCP:
+        try:
+            with open(path) as f:
+                lines = f.readlines()[1:]
+        except (IOError, OSError):
+            continue
+        found = True
+        for line in lines:
+            fields = line.split()
+            # fields: sl, local_address, rem_address, st, ...
+            if len(fields) > 3 and fields[3] == TCP_LISTEN:
+                ports.add(int(fields[1].rsplit(":", 1)[1], 16))
+    return ports if found else None
+
+
+def is_listening(port):
+    """Check whether a server is listening on a local port.
+
+    Parameters
+    ----------
+    port : int
+        port number to probe
+
+    Returns
+    -------
+    bool or None
+        True if a socket is listening on the port, False otherwise, and None
+        if this cannot be determined (see ``listening_ports``)
+    """
+    ports = listening_ports()
+    if ports is None:
+        return None
+    return port in ports
+
+
+def wait_for_server(proc, port, timeout=None):
+    """Block until a sumo server is ready to accept a TraCI connection.
+
+    Parameters
+    ----------
+    proc : subprocess.Popen
+        the sumo process that is expected to open the port
+    port : int
+        the port passed to sumo via ``--remote-port``
+    timeout : float, optional
+        maximum time to wait, in seconds. Defaults to
+        ``flow.config.SUMO_STARTUP_TIMEOUT``
+
+    Raises
+    ------
+    flow.utils.exceptions.FatalFlowError
+        if the process exits or the timeout elapses before the port is opened
+    """
+    timeout = config.SUMO_STARTUP_TIMEOUT if timeout is None else timeout
+    deadline = time.time() + timeout
+    while True:
+        listening = is_listening(port)
+        # if the state of the port cannot be read, connecting is left to the
+        # retries of traci.connect
+        if listening or listening is None:
+            return
+        if proc.poll() is not None:
+            raise FatalFlowError(
+                msg="sumo exited with code {} before opening port {}".format(
+                    proc.returncode, port))
+        if time.time() > deadline:
+            raise FatalFlowError(
+                msg="sumo did not open port {} within {} seconds".format(
+                    port, timeout))
+        time.sleep(config.SUMO_PROBE_INTERVAL)
+
+
+class SumoServerPool(object):
+    """Pool of running sumo servers that may be reused across simulations.
+
+    Idle servers keep their TraCI connection open. A server is handed to a new
+    simulation by reloading it with that simulation's command line options
+    (see ``traci.load``), which avoids launching a new process and waiting for
+    it to accept connections. Servers are grouped by the binary they run
+    ("sumo" or "sumo-gui"), since this cannot be changed by a reload.
+
+    Servers may also be pre-launched (see ``prewarm``). These are connected to
+    the first time they are acquired, and are only reloaded if they were
+    started with different options than the ones requested.
+    """
+
+    def __init__(self):
+        """Instantiate an empty pool."""
+        # Key = sumo binary
+        # Element = list of (process, port, connection, options) of idle
+        #           servers, where connection is None if the server has not
+        #           been connected to yet
+        self._idle = collections.defaultdict(list)
+
+    def num_idle(self, binary=None):
+        """Return the number of idle servers (for a given binary)."""
+        if binary is not None:
+            return len(self._idle[binary])
+        return sum(len(servers) for servers in self._idle.values())
+
+    def launch(self, binary, options, port=None):
+        """Start a new sumo server without waiting for it to be ready.
+
+        Parameters
+        ----------
+        binary : str
+            name of the sumo binary
+        options : list of str
+            command line options, excluding the remote port
+        port : int, optional
+            port for the server to listen on, a free port is chosen if none
+            is specified
+
+        Returns
+        -------
+        subprocess.Popen
+            the sumo process
+        int
+            the port the server will be listening on
+        """
+        port = port or sumolib.miscutils.getFreeSocketPort()
+        sumo_call = [binary] + list(options) + ["--remote-port", str(port)]
+        proc = subprocess.Popen(sumo_call, preexec_fn=os.setsid)
+        return proc, port
+
+    def prewarm(self, binary, options, num_servers):
+        """Launch servers until the pool holds a number of idle servers.
+
+        Parameters
+        ----------
+        binary : str
+            name of the sumo binary
+        options : list of str
+            command line options the servers are started with
+        num_servers : int
+            number of idle servers the pool should contain for this binary
+        """
+        while len(self._idle[binary]) < num_servers:
+            proc, port = self.launch(binary, options)
+            self._idle[binary].append((proc, port, None, list(options)))
+
+    def acquire(self, binary, options):
+        """Return a connected server running the requested simulation.
+
+        Idle servers are reused when available; otherwise, None is returned
+        and the caller is expected to launch a new server.
+
+        Parameters
+        ----------
+        binary : str
+            name of the sumo binary
+        options : list of str
+            command line options of the requested simulation, excluding the
+            remote port
+
+        Returns
+        -------
+        tuple (subprocess.Popen, int, traci.connection.Connection) or None
+            the process, port and connection of the server, or None if no
+            idle server could be reused
+        """
+        servers = self._idle[binary]
+        while len(servers) > 0:
+            proc, port, connection, server_options = servers.pop()
+            try:
+                if connection is None:
+                    wait_for_server(proc, port)
+                    connection = traci.connect(port, numRetries=100)
+                    connection.setOrder(0)
+                    if server_options == list(options):
+                        return proc, port, connection
+                connection.load(self._reload_options(options))
+                return proc, port, connection
+            except Exception:
+                print("Error during reuse: {}".format(traceback.format_exc()))
+                self._kill(proc, connection)
+        return None
+
+    def release(self, proc, port, connection, binary, options, max_idle):
+        """Return a server to the pool, or shut it down if the pool is full.
+
+        Parameters
+        ----------
+        proc : subprocess.Popen
+            the sumo process
+        port : int
+            the port the server is listening on
+        connection : traci.connection.Connection
+            the open TraCI connection to the server
+        binary : str
+            name of the sumo binary
+        options : list of str
+            command line options the server is currently running with
+        max_idle : int
+            maximum number of idle servers to keep for this binary
+        """
+        if proc.poll() is None and len(self._idle[binary]) < max_idle:
+            self._idle[binary].append((proc, port, connection, list(options)))
+        else:
+            self._kill(proc, connection)
+
+    def close(self):
+        """Shut down all idle servers."""
+        for servers in self._idle.values():
+            for proc, _, connection, _ in servers:
+                self._kill(proc, connection)
+        self._idle.clear()
+
+    @staticmethod
+    def _reload_options(options):
+        """Return the options to reload a server with.
+
+        The number of clients is fixed when the server is started, and may not
+        be modified by a reload.
+        """
+        reload_options = []
+        skip = False
+        for option in options:
+            if skip:
+                skip = False
+            elif option == "--num-clients":
+                skip = True
+            else:
+                reload_options.append(option)
+        return reload_options
+
+    @staticmethod
+    def _kill(proc, connection):
+        """Close a connection (if any) and kill the corresponding process."""
+        try:
+            if connection is not None:
+                connection.close()
+        except Exception:
+            pass
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+        except Exception:
+            pass
+
+
+# pool of sumo servers shared by all simulations in this process
+SERVER_POOL = SumoServerPool()
+atexit.register(SERVER_POOL.close)
+
+
 class TraCISimulation(KernelSimulation):
     """Sumo simulation kernel.
 
@@ -35,6 +305,15 @@ class TraCISimulation(KernelSimulation):
         KernelSimulation.__init__(self, master_kernel)
         # contains the subprocess.Popen instance used to start traci
         self.sumo_proc = None
+        # port, binary, and command line options of the current sumo server
+        self.sumo_port = None
+        self.sumo_binary = None
+        self.sumo_options = None
+        # maximum number of idle servers to return to the server pool once
+        # this simulation is closed (0 disables pooling)
+        self.pool_size = 0
+        # subscription results of the simulation in the last step
+        self._sim_obs = {}
 
     def pass_api(self, kernel_api):
         """See parent class.
@@ -55,17 +334,139 @@ class TraCISimulation(KernelSimulation):
         """See parent class."""
         self.kernel_api.simulationStep()
 
-    def update(self, reset):
+    def fast_forward(self, num_steps):
+        """See parent class.
+
+        The steps are performed by sumo in a single call, by specifying the
+        time the simulation should be advanced to.
+        """
+        target_time = self.kernel_api.simulation.getTime() + \
+            num_steps * self.master_kernel.sim_step
+        self.kernel_api.simulationStep(round(target_time, 6))
+
+    def save_state(self, path):
         """See parent class."""
-        pass
+        self.kernel_api.simulation.saveState(path)
+
+    def load_state(self, path):
+        """See parent class.
+
+        Note that sumo drops all subscriptions when a state is loaded. These
+        are renewed by passing the kernel api to the kernel subclasses again
+        (see flow.core.kernel.Kernel.restore).
+        """
+        self.kernel_api.simulation.loadState(path)
+        self._sim_obs = {}
+
+    def update(self, reset):
+        """See parent class.
+
+        Collects the subscribed simulation data of the last step.
+        """
+        self._sim_obs = self.kernel_api.simulation.getSubscriptionResults()
 
     def close(self):
-        """See parent class."""
-        self.kernel_api.close()
+        """See parent class.
+
+        If server pooling is enabled, the sumo server is returned to the pool
+        with its connection still open instead of being shut down.
+        """
+        if self.pool_size > 0 and self.sumo_proc is not None:
+            SERVER_POOL.release(self.sumo_proc, self.sumo_port,
+                                self.kernel_api, self.sumo_binary,
+                                self.sumo_options, self.pool_size)
+            self.sumo_proc = None
+        else:
+            self.kernel_api.close()
 
     def check_collision(self):
-        """See parent class."""
-        return self.kernel_api.simulation.getStartingTeleportNumber() != 0
+        """See parent class.
+
+        Collisions are detected from the vehicles that started teleporting in
+        the last step, which are part of the simulation subscription.
+        """
+        return len(self._sim_obs.get(
+            tc.VAR_TELEPORT_STARTING_VEHICLES_IDS, ())) != 0
+
+    def get_sumo_options(self, scenario, sim_params):
+        """Return the command line options used to start sumo.
+
+        The remote port is not included, as it cannot be changed when a
+        server is reloaded.
+
+        Parameters
+        ----------
+        scenario : flow.core.kernel.scenario.TraCIScenario
+            the scenario kernel, containing the configuration files of the
+            network
+        sim_params : flow.core.params.SumoParams
+            simulation-specific parameters
+
+        Returns
+        -------
+        list of str
+            command line options
+        """
+        sumo_options = [
+            "-c", scenario.cfg,
+            "--num-clients", str(sim_params.num_clients),
+            "--step-length", str(sim_params.sim_step)
+        ]
+
+        # add step logs (if requested)
+        if sim_params.no_step_log:
+            sumo_options.append("--no-step-log")
+
+        # add the lateral resolution of the sublanes (if requested)
+        if sim_params.lateral_resolution is not None:
+            sumo_options.append("--lateral-resolution")
+            sumo_options.append(str(sim_params.lateral_resolution))
+
+        # add the emission path to the sumo command (if requested)
+        if sim_params.emission_path is not None:
+            ensure_dir(sim_params.emission_path)
+            emission_out = sim_params.emission_path + \
+                "{0}-emission.xml".format(scenario.name)
+            sumo_options.append("--emission-output")
+            sumo_options.append(emission_out)
+        else:
+            emission_out = None
+
+        if sim_params.overtake_right:
+            sumo_options.append("--lanechange.overtake-right")
+            sumo_options.append("true")
+
+        # specify a simulation seed (if requested)
+        if sim_params.seed is not None:
+            sumo_options.append("--seed")
+            sumo_options.append(str(sim_params.seed))
+
+        if not sim_params.print_warnings:
+            sumo_options.append("--no-warnings")
+            sumo_options.append("true")
+
+        # set the time it takes for a gridlock teleport to occur
+        sumo_options.append("--time-to-teleport")
+        sumo_options.append(str(int(sim_params.teleport_time)))
+
+        # check collisions at intersections
+        sumo_options.append("--collision.check-junctions")
+        sumo_options.append("true")
+
+        # save the complete state of the simulation when forking an
+        # environment (see flow.envs.base_env.Env.fork)
+        sumo_options.append("--save-state.rng")
+        sumo_options.append("true")
+        sumo_options.append("--save-state.precision")
+        sumo_options.append("17")
+
+        logging.debug(" Cfg file: " + str(scenario.cfg))
+        if sim_params.num_clients > 1:
+            logging.info(" Num clients are" + str(sim_params.num_clients))
+        logging.debug(" Emission file: " + str(emission_out))
+        logging.debug(" Step length: " + str(sim_params.sim_step))
+
+        return sumo_options
 
     def start_simulation(self, scenario, sim_params):
         """Start a sumo simulation instance.
@@ -73,87 +474,66 @@ class TraCISimulation(KernelSimulation):
         This method uses the configuration files created by the scenario class
         to initialize a sumo instance. Also initializes a traci connection to
         interface with sumo from Python.
+
+        If ``sim_params.pool_size`` is positive, an idle server from the server
+        pool is reloaded with the new configuration when one is available, and
+        a new server is only launched otherwise. If ``sim_params.prewarm_pool``
+        is also set, idle servers are then launched with the same configuration
+        until the pool is full, so that they are ready upon the next restart.
         """
         error = None
-        for _ in range(RETRIES_ON_ERROR):
+        for attempt in range(RETRIES_ON_ERROR):
             try:
+                # choose a new port if the previous attempt failed, as the port
+                # may have been taken by another process in the meantime
+                if attempt > 0:
+                    sim_params.port = sumolib.miscutils.getFreeSocketPort()
+
                 # port number the sumo instance will be run on
                 port = sim_params.port
 
                 sumo_binary = "sumo-gui" if sim_params.render is True \
                     else "sumo"
 
-                # command used to start sumo
-                sumo_call = [
-                    sumo_binary, "-c", scenario.cfg,
-                    "--remote-port", str(sim_params.port),
-                    "--num-clients", str(sim_params.num_clients),
-                    "--step-length", str(sim_params.sim_step)
-                ]
-
-                # add step logs (if requested)
-                if sim_params.no_step_log:
-                    sumo_call.append("--no-step-log")
-
-                # add the lateral resolution of the sublanes (if requested)
-                if sim_params.lateral_resolution is not None:
-                    sumo_call.append("--lateral-resolution")
-                    sumo_call.append(str(sim_params.lateral_resolution))
-
-                # add the emission path to the sumo command (if requested)
-                if sim_params.emission_path is not None:
-                    ensure_dir(sim_params.emission_path)
-                    emission_out = sim_params.emission_path + \
-                        "{0}-emission.xml".format(scenario.name)
-                    sumo_call.append("--emission-output")
-                    sumo_call.append(emission_out)
-                else:
-                    emission_out = None
-
-                if sim_params.overtake_right:
-                    sumo_call.append("--lanechange.overtake-right")
-                    sumo_call.append("true")
-
-                # specify a simulation seed (if requested)
-                if sim_params.seed is not None:
-                    sumo_call.append("--seed")
-                    sumo_call.append(str(sim_params.seed))
-
-                if not sim_params.print_warnings:
-                    sumo_call.append("--no-warnings")
-                    sumo_call.append("true")
-
-                # set the time it takes for a gridlock teleport to occur
-                sumo_call.append("--time-to-teleport")
-                sumo_call.append(str(int(sim_params.teleport_time)))
-
-                # check collisions at intersections
-                sumo_call.append("--collision.check-junctions")
-                sumo_call.append("true")
-
-                logging.info(" Starting SUMO on port " + str(port))
-                logging.debug(" Cfg file: " + str(scenario.cfg))
-                if sim_params.num_clients > 1:
-                    logging.info(" Num clients are" +
-                                 str(sim_params.num_clients))
-                logging.debug(" Emission file: " + str(emission_out))
-                logging.debug(" Step length: " + str(sim_params.sim_step))
-
-                # Opening the I/O thread to SUMO
-                self.sumo_proc = subprocess.Popen(
-                    sumo_call, preexec_fn=os.setsid)
-
-                # wait a small period of time for the subprocess to activate
-                # before trying to connect with traci
-                if os.environ.get("TEST_FLAG", 0):
-                    time.sleep(0.1)
+                # command line options used to start sumo (the remote port is
+                # added separately, as it cannot be changed upon reloading)
+                sumo_options = self.get_sumo_options(scenario, sim_params)
+
+                self.sumo_binary = sumo_binary
+                self.sumo_options = sumo_options
+                # servers expecting several clients cannot be shared
+                self.pool_size = sim_params.pool_size \
+                    if sim_params.num_clients == 1 else 0
+
+                # try to reuse an idle server from the pool
+                server = None
+                if self.pool_size > 0:
+                    server = SERVER_POOL.acquire(sumo_binary, sumo_options)
+
+                if server is not None:
+                    self.sumo_proc, self.sumo_port, traci_connection = server
+                    logging.info(" Reusing SUMO on port " +
+                                 str(self.sumo_port))
                 else:
-                    time.sleep(config.SUMO_SLEEP)
+                    logging.info(" Starting SUMO on port " + str(port))
+
+                    # Opening the I/O thread to SUMO
+                    self.sumo_proc, self.sumo_port = SERVER_POOL.launch(
+                        sumo_binary, sumo_options, port)
+
+                    # wait for the server to open its port before trying to
+                    # connect with traci
+                    wait_for_server(self.sumo_proc, port)
+
+                    traci_connection = traci.connect(port, numRetries=100)
+                    traci_connection.setOrder(0)
 
-                traci_connection = traci.connect(port, numRetries=100)
-                traci_connection.setOrder(0)
                 traci_connection.simulationStep()
 
+                if self.pool_size > 0 and sim_params.prewarm_pool:
+                    SERVER_POOL.prewarm(sumo_binary, sumo_options,
+                                        self.pool_size)
+
                 return traci_connection
             except Exception as e:
                 print("Error during start: {}".format(traceback.format_exc()))
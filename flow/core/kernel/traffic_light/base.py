@@ -83,6 +83,22 @@ class KernelTrafficLight(object):
         """
         raise NotImplementedError
 
+    def set_states(self, node_ids, states):
+        """Set the state of the traffic lights on several nodes.
+
+        The lights on all links of every node are updated. Simulators that
+        support it may send all changes at once.
+
+        Parameters
+        ----------
+        node_ids : list of str
+            names of the nodes with the controlled traffic lights
+        states : list of str
+            desired state of the traffic lights of every node
+        """
+        for node_id, state in zip(node_ids, states):
+            self.set_state(node_id, state)
+
     def get_state(self, node_id):
         """Return the state of the traffic light(s) at the specified node.
 
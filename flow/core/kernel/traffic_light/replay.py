@@ -0,0 +1,37 @@
+"""Script containing the replay traffic light kernel class."""
+from flow.core.kernel.traffic_light.base import KernelTrafficLight
+
+
+class ReplayTrafficLight(KernelTrafficLight):
+    """Replay traffic light kernel.
+
+    The states of traffic lights are not recorded by the trajectory recorder,
+    so no traffic lights are available in a replay, and commands are ignored.
+    """
+
+    def __init__(self, master_kernel):
+        """Instantiate the replay traffic light kernel.
+
+        Parameters
+        ----------
+        master_kernel : flow.core.kernel.Kernel
+            the higher level kernel (used to call methods from other
+            sub-kernels)
+        """
+        KernelTrafficLight.__init__(self, master_kernel)
+
+    def update(self, reset):
+        """See parent class."""
+        pass
+
+    def get_ids(self):
+        """See parent class."""
+        return []
+
+    def set_state(self, node_id, state, link_index="all"):
+        """See parent class."""
+        pass
+
+    def get_state(self, node_id):
+        """See parent class."""
+        return ""
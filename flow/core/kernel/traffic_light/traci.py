@@ -23,6 +23,7 @@ class TraCITrafficLight(KernelTrafficLight):
 
         self.__tls = dict()  # contains current time step traffic light data
         self.__tls_properties = dict()  # traffic light xml properties
+        self.__written = dict()  # last states of all links set by Flow
 
         # names of nodes with traffic lights
         self.__ids = []
@@ -52,21 +53,34 @@ class TraCITrafficLight(KernelTrafficLight):
         """See parent class."""
         tls_obs = self.kernel_api.trafficlight.getSubscriptionResults()
         self.__tls = tls_obs.copy()
+        if reset:
+            self.__written.clear()
 
     def get_ids(self):
         """See parent class."""
         return self.__ids
 
     def set_state(self, node_id, state, link_index="all"):
-        """See parent class."""
+        """See parent class.
+
+        When the lights on all lanes are changed, the command is only sent to
+        sumo if the state differs from the one last set by Flow, or from the
+        current state of the traffic light.
+        """
         if link_index == "all":
             # if lights on all lanes are changed
+            if self.__written.get(node_id) == state and \
+                    self.__tls.get(node_id, {}).get(
+                        tc.TL_RED_YELLOW_GREEN_STATE) == state:
+                return
             self.kernel_api.trafficlight.setRedYellowGreenState(
                 tlsID=node_id, state=state)
+            self.__written[node_id] = state
         else:
             # if lights on a single lane is changed
             self.kernel_api.trafficlight.setLinkState(
                 tlsID=node_id, tlsLinkIndex=link_index, state=state)
+            self.__written.pop(node_id, None)
 
     def get_state(self, node_id):
         """See parent class."""
@@ -424,6 +424,15 @@ class AimsunKernelVehicle(KernelVehicle):
         """See parent class."""
         return self.__ids
 
+    def get_routing_ids(self):
+        """See parent class.
+
+        Transitions between edges are not tracked by this kernel, so all
+        vehicles with routing controllers are returned.
+        """
+        return [veh_id for veh_id in self.__ids
+                if self.__vehicles[veh_id]["router"] is not None]
+
     def get_human_ids(self):
         """See parent class."""
         return self.__human_ids
@@ -527,6 +536,15 @@ class AimsunKernelVehicle(KernelVehicle):
         else:
             return self.master_kernel.scenario.flow_edge_name(edge_aimsun_id)
 
+    def get_edge_index(self, veh_id, error=-1):
+        """See parent class."""
+        if isinstance(veh_id, (list, np.ndarray)):
+            return [self.get_edge_index(veh, error) for veh in veh_id]
+        if veh_id not in self.__vehicles:
+            return error
+        return self.master_kernel.scenario.get_edge_index(
+            self.get_edge(veh_id))
+
     def get_angle(self, veh_id, error=-1001):
         """Return the angle of the vehicle.
 
@@ -1,5 +1,7 @@
 """Script containing the base vehicle kernel class."""
 
+import numpy as np
+
 
 class KernelVehicle(object):
     """Flow vehicle kernel.
@@ -80,6 +82,23 @@ class KernelVehicle(object):
         """
         raise NotImplementedError
 
+    def skip_steps(self, num_steps):
+        """Notify the kernel that the update of some steps was skipped.
+
+        This is called when the simulator was advanced by several steps
+        without the kernel being updated in between (see
+        flow.core.kernel.Kernel.fast_forward). The next update is then meant
+        to account for the vehicles that entered or exited the network during
+        these steps.
+
+        Parameters
+        ----------
+        num_steps : int
+            number of simulation steps performed without an update, in
+            addition to the step preceding the next update
+        """
+        raise NotImplementedError
+
     def add(self, veh_id, type_id, edge, pos, lane, speed):
         """Add a vehicle to the network.
 
@@ -167,6 +186,30 @@ class KernelVehicle(object):
         """
         raise NotImplementedError
 
+    def set_lane_change_mode(self, veh_id, lane_change_mode):
+        """Update the lane change mode of a vehicle in the network.
+
+        Parameters
+        ----------
+        veh_id : str
+            vehicle identifier
+        lane_change_mode : int
+            new lane change mode of the vehicle
+        """
+        raise NotImplementedError
+
+    def set_speed_mode(self, veh_id, speed_mode):
+        """Update the speed mode of a vehicle in the network.
+
+        Parameters
+        ----------
+        veh_id : str
+            vehicle identifier
+        speed_mode : int
+            new speed mode of the vehicle
+        """
+        raise NotImplementedError
+
     def set_max_speed(self, veh_id, max_speed):
         """Update the maximum allowable speed by a vehicles in the network.
 
@@ -253,6 +296,15 @@ class KernelVehicle(object):
         """Return the names of all rl-controlled vehicles in the network."""
         raise NotImplementedError
 
+    def get_routing_ids(self):
+        """Return the names of all vehicles whose routers should be called.
+
+        These are the vehicles with routing controllers whose trigger (see
+        flow.controllers.base_routing_controller.BaseRouter) occurred during
+        the last simulation step.
+        """
+        raise NotImplementedError
+
     def get_ids_by_edge(self, edges):
         """Return the names of all vehicles in the specified edge.
 
@@ -260,6 +312,57 @@ class KernelVehicle(object):
         """
         raise NotImplementedError
 
+    def get_k_closest_to_end(self, edge, k, lane=None):
+        """Return the names of the k vehicles closest to the end of an edge.
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+        k : int
+            maximum number of vehicles to return
+        lane : int, optional
+            lane to consider. If none is specified, vehicles in all lanes of
+            the edge are considered
+
+        Returns
+        -------
+        list of str
+            names of the vehicles, sorted by increasing distance to the end of
+            the edge
+        """
+        raise NotImplementedError
+
+    def get_ids_in_range(self, edge, start, end, lane=None):
+        """Return the names of the vehicles within a range of an edge.
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+        start : float
+            start of the range, i.e. the smallest position on the edge
+        end : float
+            end of the range, i.e. the largest position on the edge
+        lane : int, optional
+            lane to consider. If none is specified, vehicles in all lanes of
+            the edge are considered
+
+        Returns
+        -------
+        list of str
+            names of the vehicles whose positions are in [start, end], sorted
+            by position
+        """
+        raise NotImplementedError
+
+    def get_ids_sorted_by_x(self):
+        """Return the names of all vehicles sorted by their absolute position.
+
+        The absolute position is computed by the ``get_x_by_id`` method.
+        """
+        raise NotImplementedError
+
     def get_inflow_rate(self, time_span):
         """Return the inflow rate (in veh/hr) of vehicles from the network.
 
@@ -302,6 +405,20 @@ class KernelVehicle(object):
         """
         raise NotImplementedError
 
+    def get_speed_array(self):
+        """Return the speeds of all vehicles in the network.
+
+        This is meant for metrics and observations over all vehicles, and may
+        be cached by the kernel until its next update, so the returned array
+        should not be modified.
+
+        Returns
+        -------
+        np.ndarray
+            speed of every vehicle, in the order of ``get_ids``
+        """
+        return np.asarray(self.get_speed(self.get_ids()), dtype=float)
+
     def get_default_speed(self, veh_id, error=-1001):
         """Return the expected speed if no control were applied
 
@@ -350,6 +467,25 @@ class KernelVehicle(object):
         """
         raise NotImplementedError
 
+    def get_edge_index(self, veh_id, error=-1):
+        """Return the interned index of the edge the vehicle is currently on.
+
+        See the ``edge_index`` attribute of the scenario kernel. The index is
+        -1 if the edge of the vehicle is unknown.
+
+        Parameters
+        ----------
+        veh_id : str or list of str
+            vehicle id, or list of vehicle ids
+        error : any, optional
+            value that is returned if the vehicle is not found
+
+        Returns
+        -------
+        int
+        """
+        raise NotImplementedError
+
     def get_lane(self, veh_id, error=-1001):
         """Return the lane index of the specified vehicle.
 
@@ -659,3 +795,31 @@ class KernelVehicle(object):
         float
         """
         raise NotImplementedError
+
+    def get_speed_mode(self, veh_id):
+        """Return the speed mode of the specified vehicle.
+
+        Parameters
+        ----------
+        veh_id : str
+            vehicle identifier
+
+        Returns
+        -------
+        int
+        """
+        raise NotImplementedError
+
+    def get_lane_change_mode(self, veh_id):
+        """Return the lane change mode of the specified vehicle.
+
+        Parameters
+        ----------
+        veh_id : str
+            vehicle identifier
+
+        Returns
+        -------
+        int
+        """
+        raise NotImplementedError
@@ -0,0 +1,445 @@
+"""Contains a binary recorder of vehicle trajectories.
+
+The recorder stores the state of every vehicle in the network after each
+simulation step, as collected by the vehicle kernel, and is an alternative to
+sumo's emission output (see SimParams.emission_path) that does not slow down
+the simulator and does not need to be converted to csv afterwards.
+
+Trajectories are stored in a directory as columnar chunks: every chunk
+contains one .npy file per recorded field, with one element per vehicle and
+time step. Chunks are written by a background thread, and may be read back
+as memory-mapped arrays with ``TrajectoryReader``. The names of the vehicles,
+vehicle types and edges (which are stored as integer indices in the chunks),
+the rows at which every rollout starts and a description of the network are
+stored in a "meta.json" file. Recorded trajectories may be replayed through
+the kernel API with the "replay" simulator (see flow.core.params.ReplayParams).
+"""
+
+import collections
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+from flow.core.util import ensure_dir
+
+# fields that may be recorded, and the type they are stored as
+FIELDS = collections.OrderedDict([
+    ("id", np.int32),        # index of the vehicle id (see "veh_ids")
+    ("time", np.float64),    # time since the start of the rollout, in s
+    ("type", np.int16),      # index of the vehicle type (see "types")
+    ("edge", np.int32),      # index of the edge (see "edge_ids"), or -1
+    ("lane", np.int16),      # lane index
+    ("position", np.float64),  # position on the edge, in m
+    ("x", np.float64),       # absolute position in the network, in m
+    ("speed", np.float32),   # speed, in m/s
+    ("accel", np.float32),   # acceleration in the last time step, in m/s^2
+    ("headway", np.float32),  # headway, in m
+    ("leader", np.int32),    # index of the id of the leader, or -1
+])
+
+# fields that are always recorded
+REQUIRED_FIELDS = ["id", "time"]
+
+# name of the file containing the metadata of the trajectories
+META_FILE = "meta.json"
+
+
+def read_meta(path):
+    """Return the metadata of the trajectories stored in a directory."""
+    with open(os.path.join(path, META_FILE)) as f:
+        return json.load(f)
+
+
+def chunk_file(path, chunk, field):
+    """Return the path to the file of a field in a chunk."""
+    return os.path.join(path, "chunk_{:05d}_{}.npy".format(chunk, field))
+
+
+class TrajectoryRecorder(object):
+    """Binary recorder of vehicle trajectories.
+
+    Usage
+    -----
+    The recorder is created by the kernel if a trajectory path is specified in
+    the simulation parameters (see flow.core.params.SimParams). It may also be
+    used directly:
+
+        >>> recorder = TrajectoryRecorder("/path/to/dir", sim_step=0.1)
+        >>> recorder.record(env.k, reset=False)  # after every k.update()
+        >>> recorder.close()
+
+    Attributes
+    ----------
+    path : str
+        directory the trajectories are stored in
+    sim_step : float
+        seconds per simulation step
+    fields : list of str
+        names of the recorded fields
+    chunk_size : int
+        number of rows in a chunk
+    """
+
+    def __init__(self, path, sim_step, fields=None, chunk_size=65536):
+        """Instantiate the recorder.
+
+        Parameters
+        ----------
+        path : str
+            directory the trajectories are stored in
+        sim_step : float
+            seconds per simulation step
+        fields : list of str, optional
+            fields to record (see FIELDS). The "id" and "time" fields are
+            always recorded. Defaults to all fields.
+        chunk_size : int, optional
+            number of rows in a chunk
+
+        Raises
+        ------
+        ValueError
+            if one of the fields is not a valid field
+        """
+        fields = list(FIELDS.keys()) if fields is None else fields
+        for field in fields:
+            if field not in FIELDS:
+                raise ValueError("{} is not a valid field, must be one of "
+                                 "{}".format(field, list(FIELDS.keys())))
+
+        self.path = ensure_dir(path)
+        self.sim_step = sim_step
+        self.fields = [f for f in FIELDS if f in REQUIRED_FIELDS + fields]
+        self.chunk_size = chunk_size
+
+        # interned names of the vehicles and vehicle types
+        self._veh_ids = []
+        self._veh_index = {}
+        self._types = []
+        self._type_index = {}
+        self._edge_ids = []
+        self._network = None
+
+        # rows at which every rollout starts
+        self._rollouts = []
+        self._num_rows = 0
+        self._num_chunks = 0
+        self._step = 0
+
+        # speeds in the last step (by vehicle index), used to compute the
+        # accelerations
+        self._prev_speed = np.zeros(0)
+        self._prev_step = np.zeros(0, dtype=int)
+
+        self._buffers = self._new_buffers()
+        self._size = 0
+
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def _new_buffers(self):
+        """Allocate the buffers of a new chunk."""
+        return {field: np.empty(self.chunk_size, dtype=FIELDS[field])
+                for field in self.fields}
+
+    def _intern(self, names, index, name):
+        """Return the index of a name, adding it to the names if needed."""
+        i = index.get(name)
+        if i is None:
+            i = index[name] = len(names)
+            names.append(name)
+        return i
+
+    def record(self, kernel, reset):
+        """Record the state of all vehicles in the network.
+
+        Meant to be called after every ``update`` of the kernel.
+
+        Parameters
+        ----------
+        kernel : flow.core.kernel.Kernel
+            the kernel, after the vehicle kernel was updated
+        reset : bool
+            specifies whether the simulator was reset in the last simulation
+            step, in which case a new rollout is started
+        """
+        veh = kernel.vehicle
+        ids = veh.get_ids()
+
+        if reset or len(self._rollouts) == 0:
+            self._step = 0
+            self._rollouts.append(self._num_rows)
+            self._prev_step[:] = -2
+            if self._network is None or \
+                    list(kernel.scenario.edge_ids or []) != self._edge_ids:
+                self._edge_ids = list(kernel.scenario.edge_ids or [])
+                self._network = self._describe_network(kernel.scenario)
+        else:
+            self._step += 1
+
+        index = np.array([self._intern(self._veh_ids, self._veh_index, v)
+                          for v in ids], dtype=int)
+        num_veh = len(self._veh_ids)
+        if num_veh > len(self._prev_speed):
+            grow = max(num_veh, 2 * len(self._prev_speed)) - \
+                len(self._prev_speed)
+            self._prev_speed = np.append(self._prev_speed, np.zeros(grow))
+            self._prev_step = np.append(self._prev_step,
+                                        np.full(grow, -2, dtype=int))
+
+        columns = {"id": index,
+                   "time": np.full(len(ids), self._step * self.sim_step)}
+
+        if "type" in self.fields:
+            columns["type"] = [
+                self._intern(self._types, self._type_index, veh.get_type(v))
+                for v in ids]
+        if "edge" in self.fields:
+            # edges are unknown if the scenario kernel does not intern them
+            if kernel.scenario.edge_index is None:
+                columns["edge"] = np.full(len(ids), -1)
+            else:
+                columns["edge"] = veh.get_edge_index(ids)
+        if "lane" in self.fields:
+            columns["lane"] = veh.get_lane(ids)
+        if "position" in self.fields:
+            columns["position"] = veh.get_position(ids)
+        if "x" in self.fields:
+            columns["x"] = [veh.get_x_by_id(v) for v in ids]
+        if "speed" in self.fields or "accel" in self.fields:
+            speed = np.array(veh.get_speed(ids), dtype=float).reshape(-1)
+            columns["speed"] = speed
+            if "accel" in self.fields:
+                # vehicles that were not in the network in the last step are
+                # assigned an acceleration of zero
+                present = self._prev_step[index] == self._step - 1
+                columns["accel"] = np.where(
+                    present,
+                    (speed - self._prev_speed[index]) / self.sim_step, 0.)
+                self._prev_speed[index] = speed
+                self._prev_step[index] = self._step
+        if "headway" in self.fields:
+            columns["headway"] = veh.get_headway(ids)
+        if "leader" in self.fields:
+            columns["leader"] = [
+                self._intern(self._veh_ids, self._veh_index, leader)
+                if leader else -1 for leader in veh.get_leader(ids)]
+
+        self._append(columns, len(ids))
+
+    @staticmethod
+    def _describe_network(scenario):
+        """Return a description of the network of a scenario kernel.
+
+        The description contains everything needed to recreate the scenario
+        kernel of a recorded network without the simulator (see
+        flow.core.kernel.scenario.replay.ReplayScenario). None is returned if
+        the scenario kernel does not provide all required information.
+        """
+        try:
+            edges = {}
+            connections = {"next": {}, "prev": {}}
+            for edge in scenario.get_edge_list() + \
+                    scenario.get_junction_list():
+                lanes = scenario.num_lanes(edge)
+                edges[edge] = {"length": scenario.edge_length(edge),
+                               "lanes": lanes,
+                               "speed": scenario.speed_limit(edge)}
+                for key, fn in [("next", scenario.next_edge),
+                                ("prev", scenario.prev_edge)]:
+                    links = {lane: fn(edge, lane) for lane in range(lanes)}
+                    links = {lane: link for lane, link in links.items()
+                             if len(link) > 0}
+                    if len(links) > 0:
+                        connections[key][edge] = links
+        except NotImplementedError:
+            return None
+
+        return {"edges": edges,
+                "connections": connections,
+                "edge_starts": scenario.total_edgestarts,
+                "internal_edge_starts": scenario.internal_edgestarts}
+
+    def _append(self, columns, num_rows):
+        """Append rows to the current chunk, flushing it when it is full."""
+        start = 0
+        while start < num_rows:
+            end = min(num_rows, start + self.chunk_size - self._size)
+            for field in self.fields:
+                self._buffers[field][self._size:self._size + end - start] = \
+                    columns[field][start:end]
+            self._size += end - start
+            self._num_rows += end - start
+            start = end
+            if self._size == self.chunk_size:
+                self.flush()
+
+    def _meta(self):
+        """Return the metadata of the trajectories recorded so far."""
+        return {
+            "sim_step": self.sim_step,
+            "fields": self.fields,
+            "num_chunks": self._num_chunks,
+            "num_rows": self._num_rows,
+            "rollouts": list(self._rollouts),
+            "veh_ids": list(self._veh_ids),
+            "types": list(self._types),
+            "edge_ids": list(self._edge_ids),
+            "network": self._network,
+        }
+
+    def flush(self):
+        """Send the current chunk to be written to disk.
+
+        Chunks are written by a background thread. The metadata is written
+        after the chunk, so that the files described by the metadata are
+        always complete.
+        """
+        if self._size == 0:
+            return
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._write_chunks)
+            self._thread.daemon = True
+            self._thread.start()
+
+        self._queue.put((self._num_chunks, self._buffers, self._size,
+                         self._meta()))
+        self._num_chunks += 1
+        self._buffers = self._new_buffers()
+        self._size = 0
+
+    def _write_chunks(self):
+        """Write the chunks in the queue to disk, until None is received."""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            chunk, buffers, size, meta = job
+            for field in self.fields:
+                data = np.lib.format.open_memmap(
+                    chunk_file(self.path, chunk, field), mode="w+",
+                    dtype=FIELDS[field], shape=(size,))
+                data[:] = buffers[field][:size]
+                data.flush()
+                del data
+            meta["num_chunks"] = chunk + 1
+            tmp_file = os.path.join(self.path, META_FILE + ".tmp")
+            with open(tmp_file, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp_file, os.path.join(self.path, META_FILE))
+
+    def close(self):
+        """Write all recorded trajectories to disk.
+
+        The recorder may still be used afterwards, in which case a new writer
+        thread is started.
+        """
+        self.flush()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+class TrajectoryReader(object):
+    """Reader of trajectories stored by a TrajectoryRecorder.
+
+    Chunks are memory-mapped, and are only read from disk when accessed.
+
+    Attributes
+    ----------
+    path : str
+        directory the trajectories are stored in
+    sim_step : float
+        seconds per simulation step
+    fields : list of str
+        names of the recorded fields
+    veh_ids : list of str
+        names of the vehicles, by index
+    types : list of str
+        names of the vehicle types, by index
+    edge_ids : list of str
+        names of the edges, by index
+    network : dict or None
+        description of the network (edges, connections and starting positions
+        of the edges), if it was recorded
+    num_rows : int
+        total number of rows
+    rollouts : list of (int, int)
+        first and last (excluded) row of every rollout
+    """
+
+    def __init__(self, path):
+        """Instantiate the reader.
+
+        Parameters
+        ----------
+        path : str
+            directory the trajectories are stored in
+        """
+        self.path = path
+        meta = read_meta(path)
+
+        self.sim_step = meta["sim_step"]
+        self.fields = meta["fields"]
+        self.veh_ids = meta["veh_ids"]
+        self.types = meta["types"]
+        self.edge_ids = meta["edge_ids"]
+        self.network = meta.get("network")
+        self.num_rows = meta["num_rows"]
+        starts = meta["rollouts"]
+        self.rollouts = list(zip(starts, starts[1:] + [self.num_rows]))
+
+        self._chunks = [
+            {field: np.load(chunk_file(path, chunk, field), mmap_mode="r")
+             for field in self.fields}
+            for chunk in range(meta["num_chunks"])]
+
+    def column(self, field, start=0, end=None):
+        """Return the values of a field in a range of rows.
+
+        Parameters
+        ----------
+        field : str
+            name of the field
+        start : int, optional
+            first row
+        end : int, optional
+            last row (excluded), defaults to the last row
+
+        Returns
+        -------
+        np.ndarray
+            values of the field
+        """
+        end = self.num_rows if end is None else end
+        parts = []
+        offset = 0
+        for chunk in self._chunks:
+            size = len(chunk[field])
+            if offset + size > start and offset < end:
+                parts.append(chunk[field][max(start - offset, 0):
+                                          min(end - offset, size)])
+            offset += size
+        if len(parts) == 0:
+            return np.zeros(0, dtype=FIELDS[field])
+        return np.concatenate(parts)
+
+    def rollout(self, i):
+        """Return all fields of a rollout.
+
+        Parameters
+        ----------
+        i : int
+            index of the rollout
+
+        Returns
+        -------
+        dict of np.ndarray
+            Key = field, Element = values of the field in the rollout
+        """
+        start, end = self.rollouts[i]
+        return {field: self.column(field, start, end) for field in self.fields}
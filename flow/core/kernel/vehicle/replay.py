@@ -0,0 +1,407 @@
+"""Script containing the replay vehicle kernel class."""
+
+import collections
+
+import numpy as np
+
+from flow.controllers.rlcontroller import RLController
+from flow.core.kernel.vehicle.base import KernelVehicle
+from flow.utils.exceptions import FatalFlowError
+
+
+class ReplayVehicle(KernelVehicle):
+    """Replay vehicle kernel.
+
+    Feeds the trajectories recorded by the trajectory recorder (see
+    flow.core.kernel.vehicle.recorder) back through the vehicle kernel API,
+    one frame per update. Every reset starts the replay of a new rollout
+    (see flow.core.params.ReplayParams). Frames past the end of the rollout
+    contain no vehicles.
+
+    The replay is read-only: commands (accelerations, lane changes, routes,
+    etc.) are ignored. Since they would have no effect, no vehicle is
+    reported as having a controller (see ``get_controlled_ids``). Variables
+    that are not recorded (e.g. lane leaders and followers) are not
+    available.
+
+    Attributes
+    ----------
+    frame : int
+        index of the current frame in the rollout
+    num_frames : int
+        number of frames in the rollout
+    """
+
+    def __init__(self, master_kernel, sim_params):
+        """See parent class."""
+        KernelVehicle.__init__(self, master_kernel, sim_params)
+
+        # rollout replayed after every reset, or None to replay all rollouts
+        # in order
+        self._replayed_rollout = getattr(sim_params, "rollout", None)
+        self._rollout = -1
+
+        # recorded data of the current rollout, and the step of every row
+        self._data = {}
+        self._steps = np.zeros(0, dtype=int)
+        self.frame = 0
+        self.num_frames = 0
+
+        # state of the vehicles in the current frame
+        self.__ids = []
+        self.__rl_ids = []
+        self.__human_ids = []
+        self._rows = {}
+        self._columns = {}
+        self._ids_by_edge = {}
+        self._followers = {}
+        self._ids_sorted_by_x = None
+
+        self.num_vehicles = 0
+        self.num_rl_vehicles = 0
+        self.type_parameters = {}
+        self.minGap = {}
+        self._rl_types = set()
+        self.__observed_ids = []
+        self._colors = {}
+
+        # number of vehicles that entered/exited the network for every step
+        self._num_departed = []
+        self._num_arrived = []
+        self._departed_ids = []
+        self._arrived_ids = []
+
+    def initialize(self, vehicles):
+        """Initialize vehicle state information.
+
+        Vehicles whose type uses an RLController are reported as rl vehicles.
+
+        Parameters
+        ----------
+        vehicles : flow.core.params.VehicleParams
+            initial vehicle parameter information
+        """
+        self.type_parameters = vehicles.type_parameters
+        self.minGap = vehicles.minGap
+        self._rl_types = set(
+            type_id for type_id, params in self.type_parameters.items()
+            if params["acceleration_controller"][0] == RLController)
+
+    def update(self, reset):
+        """See parent class.
+
+        Loads the next frame of the replay, or the first frame of the next
+        rollout if reset is set to True.
+        """
+        reader = self.kernel_api
+        if reset:
+            if len(reader.rollouts) == 0:
+                raise FatalFlowError(
+                    "No rollouts were recorded in {}.".format(reader.path))
+            if self._replayed_rollout is None:
+                self._rollout = (self._rollout + 1) % len(reader.rollouts)
+            else:
+                self._rollout = self._replayed_rollout
+
+            self._data = reader.rollout(self._rollout)
+            self._steps = np.rint(
+                self._data["time"] / reader.sim_step).astype(int)
+            self.frame = 0
+            self.num_frames = self._steps[-1] + 1 if len(self._steps) else 0
+
+            self._num_departed.clear()
+            self._num_arrived.clear()
+            self._departed_ids.clear()
+            self._arrived_ids.clear()
+        else:
+            self.frame += 1
+
+        # rows of the current frame
+        start = np.searchsorted(self._steps, self.frame, side="left")
+        end = np.searchsorted(self._steps, self.frame, side="right")
+        self._columns = {field: values[start:end]
+                         for field, values in self._data.items()}
+
+        prev_ids = self.__ids
+        self.__ids = [reader.veh_ids[i] for i in self._columns["id"]]
+        self._rows = {veh_id: i for i, veh_id in enumerate(self.__ids)}
+        self.num_vehicles = len(self.__ids)
+
+        self.__rl_ids = sorted(veh_id for veh_id in self.__ids
+                               if self.get_type(veh_id) in self._rl_types)
+        rl_ids = set(self.__rl_ids)
+        self.__human_ids = [veh_id for veh_id in self.__ids
+                            if veh_id not in rl_ids]
+        self.num_rl_vehicles = len(self.__rl_ids)
+
+        # vehicles that entered or exited the network in the last step
+        if not reset:
+            prev_id_set = set(prev_ids)
+            departed_ids = [veh_id for veh_id in self.__ids
+                            if veh_id not in prev_id_set]
+            arrived_ids = [veh_id for veh_id in prev_ids
+                           if veh_id not in self._rows]
+            self._num_departed.append(len(departed_ids))
+            self._num_arrived.append(len(arrived_ids))
+            self._departed_ids.append(departed_ids)
+            self._arrived_ids.append(arrived_ids)
+
+        self._ids_by_edge = collections.defaultdict(list)
+        for veh_id, edge in zip(self.__ids, self.get_edge(self.__ids)):
+            self._ids_by_edge[edge].append(veh_id)
+
+        self._followers = {}
+        for veh_id, leader in zip(self.__ids, self.get_leader(self.__ids)):
+            if leader is not None:
+                self._followers[leader] = veh_id
+
+        self._ids_sorted_by_x = None
+
+    def _get(self, field, veh_id, error):
+        """Return the recorded value of a field for a vehicle."""
+        row = self._rows.get(veh_id)
+        if row is None or field not in self._columns:
+            return error
+        return self._columns[field][row].item()
+
+    def add(self, veh_id, type_id, edge, pos, lane, speed):
+        """See parent class.
+
+        Vehicles enter the network as recorded, so this is ignored.
+        """
+        pass
+
+    def remove(self, veh_id):
+        """See parent class.
+
+        Vehicles exit the network as recorded, so this is ignored.
+        """
+        pass
+
+    def apply_acceleration(self, veh_ids, acc):
+        """See parent class."""
+        pass
+
+    def apply_lane_change(self, veh_ids, direction):
+        """See parent class."""
+        pass
+
+    def choose_routes(self, veh_ids, route_choices):
+        """See parent class."""
+        pass
+
+    def set_max_speed(self, veh_id, max_speed):
+        """See parent class."""
+        pass
+
+    def update_vehicle_colors(self):
+        """See parent class."""
+        pass
+
+    def set_observed(self, veh_id):
+        """See parent class."""
+        if veh_id not in self.__observed_ids:
+            self.__observed_ids.append(veh_id)
+
+    def remove_observed(self, veh_id):
+        """See parent class."""
+        if veh_id in self.__observed_ids:
+            self.__observed_ids.remove(veh_id)
+
+    def get_observed_ids(self):
+        """See parent class."""
+        return self.__observed_ids
+
+    def get_color(self, veh_id):
+        """See parent class."""
+        return self._colors.get(veh_id, (255, 255, 255))
+
+    def set_color(self, veh_id, color):
+        """See parent class."""
+        self._colors[veh_id] = color
+
+    def get_type(self, veh_id):
+        """See parent class."""
+        type_index = self._get("type", veh_id, -1)
+        if type_index < 0:
+            return ""
+        return self.kernel_api.types[type_index]
+
+    def get_ids(self):
+        """See parent class."""
+        return self.__ids
+
+    def get_human_ids(self):
+        """See parent class."""
+        return self.__human_ids
+
+    def get_controlled_ids(self):
+        """See parent class."""
+        return []
+
+    def get_controlled_lc_ids(self):
+        """See parent class."""
+        return []
+
+    def get_rl_ids(self):
+        """See parent class."""
+        return self.__rl_ids
+
+    def get_routing_ids(self):
+        """See parent class."""
+        return []
+
+    def get_ids_by_edge(self, edges):
+        """See parent class."""
+        if isinstance(edges, (list, np.ndarray)):
+            return sum([self.get_ids_by_edge(edge) for edge in edges], [])
+        return self._ids_by_edge.get(edges, [])
+
+    def _get_ids_on_edge(self, edge, lane):
+        """Return the vehicles on an edge (and lane) sorted by position."""
+        ids = self.get_ids_by_edge(edge)
+        if lane is not None:
+            ids = [veh_id for veh_id in ids if self.get_lane(veh_id) == lane]
+        return sorted(ids, key=self.get_position)
+
+    def get_k_closest_to_end(self, edge, k, lane=None):
+        """See parent class."""
+        if k <= 0:
+            return []
+        return self._get_ids_on_edge(edge, lane)[::-1][:k]
+
+    def get_ids_in_range(self, edge, start, end, lane=None):
+        """See parent class."""
+        return [veh_id for veh_id in self._get_ids_on_edge(edge, lane)
+                if start <= self.get_position(veh_id) <= end]
+
+    def get_ids_sorted_by_x(self):
+        """See parent class."""
+        if self._ids_sorted_by_x is None:
+            self._ids_sorted_by_x = sorted(self.__ids, key=self.get_x_by_id)
+        return self._ids_sorted_by_x
+
+    def get_inflow_rate(self, time_span):
+        """See parent class."""
+        if len(self._num_departed) == 0:
+            return 0
+        num_inflow = self._num_departed[-int(time_span / self.sim_step):]
+        return 3600 * sum(num_inflow) / (len(num_inflow) * self.sim_step)
+
+    def get_outflow_rate(self, time_span):
+        """See parent class."""
+        if len(self._num_arrived) == 0:
+            return 0
+        num_outflow = self._num_arrived[-int(time_span / self.sim_step):]
+        return 3600 * sum(num_outflow) / (len(num_outflow) * self.sim_step)
+
+    def get_num_arrived(self):
+        """See parent class."""
+        if len(self._num_arrived) > 0:
+            return self._num_arrived[-1]
+        else:
+            return 0
+
+    def get_arrived_ids(self):
+        """See parent class."""
+        if len(self._arrived_ids) > 0:
+            return self._arrived_ids[-1]
+        else:
+            return 0
+
+    def get_departed_ids(self):
+        """See parent class."""
+        if len(self._departed_ids) > 0:
+            return self._departed_ids[-1]
+        else:
+            return 0
+
+    def get_speed(self, veh_id, error=-1001):
+        """See parent class."""
+        if isinstance(veh_id, (list, np.ndarray)):
+            return [self.get_speed(vehID, error) for vehID in veh_id]
+        return self._get("speed", veh_id, error)
+
+    def get_speed_array(self):
+        """See parent class."""
+        if "speed" not in self._columns:
+            return KernelVehicle.get_speed_array(self)
+        return self._columns["speed"].astype(float)
+
+    def get_position(self, veh_id, error=-1001):
+        """See parent class."""
+        if isinstance(veh_id, (list, np.ndarray)):
+            return [self.get_position(vehID, error) for vehID in veh_id]
+        return self._get("position", veh_id, error)
+
+    def get_edge(self, veh_id, error=""):
+        """See parent class."""
+        if isinstance(veh_id, (list, np.ndarray)):
+            return [self.get_edge(vehID, error) for vehID in veh_id]
+        edge_index = self._get("edge", veh_id, -1)
+        if edge_index < 0:
+            return error
+        return self.kernel_api.edge_ids[edge_index]
+
+    def get_edge_index(self, veh_id, error=-1):
+        """See parent class."""
+        if isinstance(veh_id, (list, np.ndarray)):
+            return [self.get_edge_index(vehID, error) for vehID in veh_id]
+        return self.master_kernel.scenario.get_edge_index(
+            self.get_edge(veh_id)) if veh_id in self._rows else error
+
+    def get_lane(self, veh_id, error=-1001):
+        """See parent class."""
+        if isinstance(veh_id, (list, np.ndarray)):
+            return [self.get_lane(vehID, error) for vehID in veh_id]
+        return self._get("lane", veh_id, error)
+
+    def get_leader(self, veh_id, error=""):
+        """See parent class."""
+        if isinstance(veh_id, (list, np.ndarray)):
+            return [self.get_leader(vehID, error) for vehID in veh_id]
+        leader = self._get("leader", veh_id, None)
+        if leader is None:
+            return error
+        return self.kernel_api.veh_ids[leader] if leader >= 0 else None
+
+    def get_follower(self, veh_id, error=""):
+        """See parent class."""
+        if isinstance(veh_id, (list, np.ndarray)):
+            return [self.get_follower(vehID, error) for vehID in veh_id]
+        if veh_id not in self._rows:
+            return error
+        return self._followers.get(veh_id)
+
+    def get_headway(self, veh_id, error=-1001):
+        """See parent class."""
+        if isinstance(veh_id, (list, np.ndarray)):
+            return [self.get_headway(vehID, error) for vehID in veh_id]
+        return self._get("headway", veh_id, error)
+
+    def get_x_by_id(self, veh_id):
+        """See parent class."""
+        x = self._get("x", veh_id, None)
+        if x is None:
+            # absolute positions may not have been recorded
+            return self.master_kernel.scenario.get_x(
+                self.get_edge(veh_id), self.get_position(veh_id))
+        return x
+
+    def get_accel(self, veh_id, error=-1001):
+        """Return the recorded acceleration of the specified vehicle.
+
+        Parameters
+        ----------
+        veh_id : str or list of str
+            vehicle id, or list of vehicle ids
+        error : any, optional
+            value that is returned if the vehicle is not found
+
+        Returns
+        -------
+        float
+        """
+        if isinstance(veh_id, (list, np.ndarray)):
+            return [self.get_accel(vehID, error) for vehID in veh_id]
+        return self._get("accel", veh_id, error)
@@ -9,7 +9,7 @@ import warnings
 from flow.controllers.car_following_models import SimCarFollowingController
 from flow.controllers.rlcontroller import RLController
 from flow.controllers.lane_change_controllers import SimLaneChangeController
-from bisect import bisect_left
+from bisect import bisect_left, bisect_right
 import itertools
 
 # colors for vehicles
@@ -36,6 +36,11 @@ class TraCIVehicle(KernelVehicle):
         self.__controlled_lc_ids = []  # ids of flow lc-controlled vehicles
         self.__rl_ids = []  # ids of rl-controlled vehicles
         self.__observed_ids = []  # ids of the observed vehicles
+        self.__routed_ids = []  # ids of vehicles with routing controllers
+
+        # ids of the vehicles whose routing controllers were triggered in the
+        # last simulation step
+        self._routing_ids = []
 
         # vehicles: Key = Vehicle ID, Value = Dictionary describing the vehicle
         # Ordered dictionary used to keep neural net inputs in order
@@ -59,6 +64,39 @@ class TraCIVehicle(KernelVehicle):
         # list of vehicle ids located in each edge in the network
         self._ids_by_edge = dict()
 
+        # Key = edge id
+        # Element = list, with the ith element containing tuples with the name
+        #           and position of all vehicles in lane i, sorted by position
+        self._lane_order = dict()
+        # Key = edge id
+        # Element = list, with the ith element containing the sorted positions
+        #           of all vehicles in lane i
+        self._lane_positions = dict()
+        # ids of all vehicles in the order they were sorted in during the last
+        # step (used to speed up sorting in the next step)
+        self._sorted_ids = []
+        # ids of all vehicles sorted by their absolute position (see
+        # get_ids_sorted_by_x), or None if this needs to be recomputed
+        self._ids_sorted_by_x = None
+        self._prev_ids_sorted_by_x = []
+        # speeds of all vehicles, in the order of the ids (see
+        # get_speed_array), or None if this needs to be recomputed
+        self._speed_array = None
+        # number of simulation steps performed without an update, in addition
+        # to the last step (see skip_steps)
+        self._num_skipped_steps = 0
+
+        # whether controllers that support it are shared by all vehicles of a
+        # type (see SumoParams.flyweight_controllers). Parameters loaded from
+        # older configuration files may not specify it
+        self._flyweight = getattr(sim_params, "flyweight_controllers", False)
+        # shared controllers, with Key = (vehicle type, controller name)
+        self._shared_controllers = dict()
+
+        # maximum speed of every type of vehicle, as specified to sumo. Used
+        # to initialize the max speed of vehicles when they depart
+        self._type_max_speeds = dict()
+
         # number of vehicles that entered the network for every time-step
         self._num_departed = []
         self._departed_ids = []
@@ -78,6 +116,20 @@ class TraCIVehicle(KernelVehicle):
         self.num_vehicles = 0
         self.num_rl_vehicles = 0
 
+    def pass_api(self, kernel_api):
+        """See parent class.
+
+        The subscriptions of the vehicles currently in the network are also
+        renewed here (needed after a state of the simulation is loaded), and
+        the max speeds of the vehicle types are queried again from a new
+        connection, as the simulation may have been restarted.
+        """
+        if kernel_api is not self.kernel_api:
+            self._type_max_speeds.clear()
+        KernelVehicle.pass_api(self, kernel_api)
+        for veh_id in self.__ids:
+            self._subscribe(veh_id)
+
     def update(self, reset):
         """See parent class.
 
@@ -98,8 +150,24 @@ class TraCIVehicle(KernelVehicle):
         vehicle_obs = self.kernel_api.vehicle.getSubscriptionResults()
         sim_obs = self.kernel_api.simulation.getSubscriptionResults()
 
+        arrived_ids = sim_obs[tc.VAR_ARRIVED_VEHICLES_IDS]
+        entered_ids = sim_obs[tc.VAR_DEPARTED_VEHICLES_IDS]
+        num_skipped = self._num_skipped_steps
+        self._num_skipped_steps = 0
+        if num_skipped > 0 and not reset:
+            # the simulation only reports the vehicles that entered or exited
+            # the network in the last step, so the vehicles are instead
+            # compared to the ones that are currently in the network
+            sim_ids = self.kernel_api.vehicle.getIDList()
+            sim_id_set = set(sim_ids)
+            id_set = set(self.__ids)
+            arrived_ids = [veh_id for veh_id in self.__ids
+                           if veh_id not in sim_id_set]
+            entered_ids = [veh_id for veh_id in sim_ids
+                           if veh_id not in id_set]
+
         # remove exiting vehicles from the vehicles class
-        for veh_id in sim_obs[tc.VAR_ARRIVED_VEHICLES_IDS]:
+        for veh_id in arrived_ids:
             if veh_id not in sim_obs[tc.VAR_TELEPORT_STARTING_VEHICLES_IDS]:
                 self.remove(veh_id)
             else:
@@ -108,7 +176,8 @@ class TraCIVehicle(KernelVehicle):
                 vehicle_obs[veh_id] = self.__sumo_obs[veh_id]
 
         # add entering vehicles into the vehicles class
-        for veh_id in sim_obs[tc.VAR_DEPARTED_VEHICLES_IDS]:
+        departed_ids = set()
+        for veh_id in entered_ids:
             veh_type = self.kernel_api.vehicle.getTypeID(veh_id)
             if veh_id in self.get_ids():
                 # this occurs when a vehicle is actively being removed and
@@ -119,6 +188,7 @@ class TraCIVehicle(KernelVehicle):
                 pass
             else:
                 self._add_departed(veh_id, veh_type)
+                departed_ids.add(veh_id)
 
         if reset:
             self.time_counter = 0
@@ -133,7 +203,7 @@ class TraCIVehicle(KernelVehicle):
             self._departed_ids.clear()
             self._arrived_ids.clear()
         else:
-            self.time_counter += 1
+            self.time_counter += 1 + num_skipped
             # update the "last_lc" variable
             for veh_id in self.__rl_ids:
                 prev_lane = self.get_lane(veh_id)
@@ -141,12 +211,18 @@ class TraCIVehicle(KernelVehicle):
                         prev_lane and veh_id in self.__rl_ids:
                     self.__vehicles[veh_id]["last_lc"] = self.time_counter
 
-            # updated the list of departed and arrived vehicles
-            self._num_departed.append(
-                len(sim_obs[tc.VAR_DEPARTED_VEHICLES_IDS]))
-            self._num_arrived.append(len(sim_obs[tc.VAR_ARRIVED_VEHICLES_IDS]))
-            self._departed_ids.append(sim_obs[tc.VAR_ARRIVED_VEHICLES_IDS])
-            self._arrived_ids.append(sim_obs[tc.VAR_ARRIVED_VEHICLES_IDS])
+            # updated the list of departed and arrived vehicles. Vehicles
+            # that entered or exited the network during skipped steps are
+            # assigned to the last step
+            for _ in range(num_skipped):
+                self._num_departed.append(0)
+                self._num_arrived.append(0)
+                self._departed_ids.append([])
+                self._arrived_ids.append([])
+            self._num_departed.append(len(entered_ids))
+            self._num_arrived.append(len(arrived_ids))
+            self._departed_ids.append(arrived_ids)
+            self._arrived_ids.append(arrived_ids)
 
         # update the "headway", "leader", and "follower" variables
         for veh_id in self.__ids:
@@ -177,8 +253,31 @@ class TraCIVehicle(KernelVehicle):
                 except KeyError:
                     pass
 
+        # collect the vehicles whose routing controllers were triggered by an
+        # event in the last step (this needs to be done before the sumo
+        # observations are updated, as they store the previous edges/lanes)
+        self._routing_ids = []
+        for veh_id in self.__routed_ids:
+            trigger = self.__vehicles[veh_id]["router"].trigger
+            if trigger == "step" or veh_id in departed_ids:
+                self._routing_ids.append(veh_id)
+                continue
+            obs = vehicle_obs.get(veh_id, {})
+            prev_obs = self.__sumo_obs.get(veh_id, {})
+            if obs.get(tc.VAR_ROAD_ID) != prev_obs.get(tc.VAR_ROAD_ID) \
+                    or trigger == "lane" and obs.get(tc.VAR_LANE_INDEX) != \
+                    prev_obs.get(tc.VAR_LANE_INDEX):
+                self._routing_ids.append(veh_id)
+
         # update the sumo observations variable
         self.__sumo_obs = vehicle_obs.copy()
+        self._speed_array = None
+
+        # update the interned index of the edge every vehicle is on
+        edge_index = self.master_kernel.scenario.edge_index
+        for veh_id in self.__ids:
+            self.__vehicles[veh_id]["edge_index"] = edge_index.get(
+                self.get_edge(veh_id), -1)
 
         # update the lane leaders data for each vehicle
         self._multi_lane_headways()
@@ -186,6 +285,10 @@ class TraCIVehicle(KernelVehicle):
         # make sure the rl vehicle list is still sorted
         self.__rl_ids.sort()
 
+    def skip_steps(self, num_steps):
+        """See parent class."""
+        self._num_skipped_steps += num_steps
+
     def _add_departed(self, veh_id, veh_type):
         """Add a vehicle that entered the network from an inflow or reset.
 
@@ -201,33 +304,30 @@ class TraCIVehicle(KernelVehicle):
 
         self.num_vehicles += 1
         self.__ids.append(veh_id)
+        self._speed_array = None
         self.__vehicles[veh_id] = dict()
 
         # specify the type
         self.__vehicles[veh_id]["type"] = veh_type
 
-        car_following_params = \
-            self.type_parameters[veh_type]["car_following_params"]
-
         # specify the acceleration controller class
         accel_controller = \
             self.type_parameters[veh_type]["acceleration_controller"]
         self.__vehicles[veh_id]["acc_controller"] = \
-            accel_controller[0](veh_id,
-                                car_following_params=car_following_params,
-                                **accel_controller[1])
+            self._new_controller(veh_id, veh_type, "acc_controller")
 
         # specify the lane-changing controller class
         lc_controller = \
             self.type_parameters[veh_type]["lane_change_controller"]
         self.__vehicles[veh_id]["lane_changer"] = \
-            lc_controller[0](veh_id=veh_id, **lc_controller[1])
+            self._new_controller(veh_id, veh_type, "lane_changer")
 
         # specify the routing controller class
         rt_controller = self.type_parameters[veh_type]["routing_controller"]
         if rt_controller is not None:
             self.__vehicles[veh_id]["router"] = \
-                rt_controller[0](veh_id=veh_id, router_params=rt_controller[1])
+                self._new_controller(veh_id, veh_type, "router")
+            self.__routed_ids.append(veh_id)
         else:
             self.__vehicles[veh_id]["router"] = None
 
@@ -243,12 +343,7 @@ class TraCIVehicle(KernelVehicle):
                 self.__controlled_lc_ids.append(veh_id)
 
         # subscribe the new vehicle
-        self.kernel_api.vehicle.subscribe(veh_id, [
-            tc.VAR_LANE_INDEX, tc.VAR_LANEPOSITION, tc.VAR_ROAD_ID,
-            tc.VAR_SPEED, tc.VAR_EDGES, tc.VAR_POSITION, tc.VAR_ANGLE,
-            tc.VAR_SPEED_WITHOUT_TRACI
-        ])
-        self.kernel_api.vehicle.subscribeLeader(veh_id, 2000)
+        self._subscribe(veh_id)
 
         # some constant vehicle parameters to the vehicles class
         self.__vehicles[veh_id]["length"] = self.kernel_api.vehicle.getLength(
@@ -265,11 +360,20 @@ class TraCIVehicle(KernelVehicle):
         speed_mode = self.type_parameters[veh_type][
             "car_following_params"].speed_mode
         self.kernel_api.vehicle.setSpeedMode(veh_id, speed_mode)
+        self.__vehicles[veh_id]["speed_mode"] = speed_mode
+
+        # the max speed of the vehicle is initially the one of its type, and
+        # is afterwards tracked by Flow (see set_max_speed)
+        if veh_type not in self._type_max_speeds:
+            self._type_max_speeds[veh_type] = \
+                self.kernel_api.vehicletype.getMaxSpeed(veh_type)
+        self.__vehicles[veh_id]["max_speed"] = self._type_max_speeds[veh_type]
 
         # set the lane changing mode for the vehicle
         lc_mode = self.type_parameters[veh_type][
             "lane_change_params"].lane_change_mode
         self.kernel_api.vehicle.setLaneChangeMode(veh_id, lc_mode)
+        self.__vehicles[veh_id]["lane_change_mode"] = lc_mode
 
         # get initial state info
         self.__sumo_obs[veh_id] = dict()
@@ -285,11 +389,85 @@ class TraCIVehicle(KernelVehicle):
         # make sure that the order of rl_ids is kept sorted
         self.__rl_ids.sort()
 
+    def _new_controller(self, veh_id, veh_type, name):
+        """Return a controller for a vehicle that entered the network.
+
+        If flyweight controllers are enabled and supported by the controller
+        class, the controller is shared by all vehicles of the same type, and
+        is only instantiated for the first of these vehicles.
+
+        Parameters
+        ----------
+        veh_id: str
+            name of the vehicle
+        veh_type: str
+            type of vehicle
+        name: str
+            one of {"acc_controller", "lane_changer", "router"}
+
+        Returns
+        -------
+        flow.controllers.BaseController or
+        flow.controllers.BaseLaneChangeController or
+        flow.controllers.BaseRouter
+            controller of the vehicle
+        """
+        key = (veh_type, name)
+        if key in self._shared_controllers:
+            return self._shared_controllers[key]
+
+        type_params = self.type_parameters[veh_type]
+        if name == "acc_controller":
+            cls, params = type_params["acceleration_controller"]
+            controller = cls(
+                veh_id,
+                car_following_params=type_params["car_following_params"],
+                **params)
+        elif name == "lane_changer":
+            cls, params = type_params["lane_change_controller"]
+            controller = cls(veh_id=veh_id, **params)
+        else:
+            cls, params = type_params["routing_controller"]
+            controller = cls(veh_id=veh_id, router_params=params)
+
+        if self._flyweight and cls.flyweight:
+            self._shared_controllers[key] = controller
+        return controller
+
+    def _get_controller(self, veh_id, name, error):
+        """Return the controller of a vehicle.
+
+        Shared (flyweight) controllers are bound to the requested vehicle.
+        """
+        controller = self.__vehicles.get(veh_id, {}).get(name, error)
+        if self._flyweight and getattr(controller, "flyweight", False):
+            controller.veh_id = veh_id
+        return controller
+
+    def _subscribe(self, veh_id):
+        """Subscribe the state of a vehicle in the network.
+
+        Parameters
+        ----------
+        veh_id: str
+            name of the vehicle
+        """
+        self.kernel_api.vehicle.subscribe(veh_id, [
+            tc.VAR_LANE_INDEX, tc.VAR_LANEPOSITION, tc.VAR_ROAD_ID,
+            tc.VAR_SPEED, tc.VAR_EDGES, tc.VAR_POSITION, tc.VAR_ANGLE,
+            tc.VAR_SPEED_WITHOUT_TRACI
+        ])
+        self.kernel_api.vehicle.subscribeLeader(veh_id, 2000)
+
     def remove(self, veh_id):
         """See parent class."""
-        # remove from sumo
+        # remove from sumo (vehicles that are still waiting to be inserted
+        # have no subscription, but can be removed as well)
         try:
             self.kernel_api.vehicle.unsubscribe(veh_id)
+        except (FatalTraCIError, TraCIException):
+            pass
+        try:
             self.kernel_api.vehicle.remove(veh_id)
         except (FatalTraCIError, TraCIException):
             pass
@@ -299,9 +477,19 @@ class TraCIVehicle(KernelVehicle):
             del self.__vehicles[veh_id]
             del self.__sumo_obs[veh_id]
             self.__ids.remove(veh_id)
+            self._speed_array = None
             self.num_vehicles -= 1
 
+            # the order by absolute position no longer matches the vehicles
+            if self._ids_sorted_by_x is not None:
+                self._prev_ids_sorted_by_x = self._ids_sorted_by_x
+            self._ids_sorted_by_x = None
+
             # remove it from all other ids (if it is there)
+            if veh_id in self.__routed_ids:
+                self.__routed_ids.remove(veh_id)
+            if veh_id in self._routing_ids:
+                self._routing_ids.remove(veh_id)
             if veh_id in self.__human_ids:
                 self.__human_ids.remove(veh_id)
                 if veh_id in self.__controlled_ids:
@@ -320,6 +508,7 @@ class TraCIVehicle(KernelVehicle):
     def test_set_speed(self, veh_id, speed):
         """Set the speed of the specified vehicle."""
         self.__sumo_obs[veh_id][tc.VAR_SPEED] = speed
+        self._speed_array = None
 
     def set_follower(self, veh_id, follower):
         """Set the follower of the specified vehicle."""
@@ -379,12 +568,59 @@ class TraCIVehicle(KernelVehicle):
         """See parent class."""
         return self.__observed_ids
 
+    def get_routing_ids(self):
+        """See parent class."""
+        return self._routing_ids
+
     def get_ids_by_edge(self, edges):
         """See parent class."""
         if isinstance(edges, (list, np.ndarray)):
             return sum([self.get_ids_by_edge(edge) for edge in edges], [])
         return self._ids_by_edge.get(edges, []) or []
 
+    def get_k_closest_to_end(self, edge, k, lane=None):
+        """See parent class."""
+        lanes = self._lane_order.get(edge, [])
+        if lane is not None:
+            lanes = lanes[lane:lane + 1]
+
+        # the vehicles closest to the end of the edge are the last k vehicles
+        # of one of the (sorted) lanes
+        candidates = list(itertools.chain.from_iterable(
+            lane_vehicles[-k:] for lane_vehicles in lanes)) if k > 0 else []
+        candidates.sort(key=lambda x: x[1], reverse=True)
+
+        return [veh_id for veh_id, _ in candidates[:k]]
+
+    def get_ids_in_range(self, edge, start, end, lane=None):
+        """See parent class."""
+        lanes = list(zip(self._lane_order.get(edge, []),
+                         self._lane_positions.get(edge, [])))
+        if lane is not None:
+            lanes = lanes[lane:lane + 1]
+
+        vehicles = []
+        for lane_vehicles, positions in lanes:
+            vehicles.extend(lane_vehicles[bisect_left(positions, start):
+                                          bisect_right(positions, end)])
+        vehicles.sort(key=lambda x: x[1])
+
+        return [veh_id for veh_id, _ in vehicles]
+
+    def get_ids_sorted_by_x(self):
+        """See parent class."""
+        if self._ids_sorted_by_x is None:
+            # start from the order of the last time this was computed, which
+            # is nearly sorted
+            prev_ids = set(self._prev_ids_sorted_by_x)
+            ids = [veh_id for veh_id in self._prev_ids_sorted_by_x
+                   if veh_id in self.__vehicles] + \
+                [veh_id for veh_id in self.get_ids() if veh_id not in prev_ids]
+            ids.sort(key=self.get_x_by_id)
+            self._ids_sorted_by_x = ids
+
+        return self._ids_sorted_by_x
+
     def get_inflow_rate(self, time_span):
         """See parent class."""
         if len(self._num_departed) == 0:
@@ -426,6 +662,15 @@ class TraCIVehicle(KernelVehicle):
             return [self.get_speed(vehID, error) for vehID in veh_id]
         return self.__sumo_obs.get(veh_id, {}).get(tc.VAR_SPEED, error)
 
+    def get_speed_array(self):
+        """See parent class."""
+        if self._speed_array is None:
+            self._speed_array = np.fromiter(
+                (self.__sumo_obs.get(veh_id, {}).get(tc.VAR_SPEED, -1001)
+                 for veh_id in self.__ids),
+                dtype=float, count=len(self.__ids))
+        return self._speed_array
+
     def get_default_speed(self, veh_id, error=-1001):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
@@ -445,6 +690,12 @@ class TraCIVehicle(KernelVehicle):
             return [self.get_edge(vehID, error) for vehID in veh_id]
         return self.__sumo_obs.get(veh_id, {}).get(tc.VAR_ROAD_ID, error)
 
+    def get_edge_index(self, veh_id, error=-1):
+        """See parent class."""
+        if isinstance(veh_id, (list, np.ndarray)):
+            return [self.get_edge_index(vehID, error) for vehID in veh_id]
+        return self.__vehicles.get(veh_id, {}).get("edge_index", error)
+
     def get_lane(self, veh_id, error=-1001):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
@@ -497,7 +748,7 @@ class TraCIVehicle(KernelVehicle):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_acc_controller(vehID, error) for vehID in veh_id]
-        return self.__vehicles.get(veh_id, {}).get("acc_controller", error)
+        return self._get_controller(veh_id, "acc_controller", error)
 
     def get_lane_changing_controller(self, veh_id, error=None):
         """See parent class."""
@@ -506,7 +757,7 @@ class TraCIVehicle(KernelVehicle):
                 self.get_lane_changing_controller(vehID, error)
                 for vehID in veh_id
             ]
-        return self.__vehicles.get(veh_id, {}).get("lane_changer", error)
+        return self._get_controller(veh_id, "lane_changer", error)
 
     def get_routing_controller(self, veh_id, error=None):
         """See parent class."""
@@ -514,7 +765,7 @@ class TraCIVehicle(KernelVehicle):
             return [
                 self.get_routing_controller(vehID, error) for vehID in veh_id
             ]
-        return self.__vehicles.get(veh_id, {}).get("router", error)
+        return self._get_controller(veh_id, "router", error)
 
     def set_lane_headways(self, veh_id, lane_headways):
         """Set the lane headways of the specified vehicle."""
@@ -591,8 +842,15 @@ class TraCIVehicle(KernelVehicle):
         #           and position of all vehicles in lane i
         edge_dict = dict.fromkeys(tot_list)
 
-        # add the vehicles to the edge_dict element
-        for veh_id in self.get_ids():
+        # add the vehicles to the edge_dict element. Vehicles are added in the
+        # order they were sorted in during the last step, followed by any new
+        # vehicles. Since vehicles rarely pass one another between steps, the
+        # lanes are then nearly sorted, which the sort below is adaptive to.
+        prev_ids = set(self._sorted_ids)
+        ordered_ids = [veh_id for veh_id in self._sorted_ids
+                       if veh_id in self.__vehicles] + \
+            [veh_id for veh_id in self.get_ids() if veh_id not in prev_ids]
+        for veh_id in ordered_ids:
             edge = self.get_edge(veh_id)
             lane = self.get_lane(veh_id)
             pos = self.get_position(veh_id)
@@ -635,6 +893,20 @@ class TraCIVehicle(KernelVehicle):
             else:
                 self._ids_by_edge[edge_id] = []
 
+        # store the sorted order of vehicles for queries and the next step
+        self._lane_order = edge_dict
+        self._lane_positions = {
+            edge: [[pos for _, pos in lane] for lane in lanes]
+            for edge, lanes in edge_dict.items()
+        }
+        self._sorted_ids = list(itertools.chain.from_iterable(
+            self._ids_by_edge.get(edge) or [] for edge in edge_dict))
+
+        # the order by absolute position is only computed if requested
+        if self._ids_sorted_by_x is not None:
+            self._prev_ids_sorted_by_x = self._ids_sorted_by_x
+        self._ids_sorted_by_x = None
+
     def _multi_lane_headways_util(self, veh_id, edge_dict, num_edges):
         """Compute multi-lane data for the specified vehicle.
 
@@ -847,11 +1119,22 @@ class TraCIVehicle(KernelVehicle):
                         self.__vehicles[veh_id]["last_lc"]
 
     def choose_routes(self, veh_ids, route_choices):
-        """See parent class."""
+        """See parent class.
+
+        Routes are only sent to sumo if they differ from the current route of
+        the vehicle. The new routes are available through ``get_route``
+        immediately.
+        """
         for i, veh_id in enumerate(veh_ids):
             if route_choices[i] is not None:
+                route = tuple(route_choices[i])
+                if veh_id in self.__sumo_obs and \
+                        self.__sumo_obs[veh_id].get(tc.VAR_EDGES) == route:
+                    continue
                 self.kernel_api.vehicle.setRoute(
                     vehID=veh_id, edgeList=route_choices[i])
+                if veh_id in self.__sumo_obs:
+                    self.__sumo_obs[veh_id][tc.VAR_EDGES] = route
 
     def get_x_by_id(self, veh_id):
         """See parent class."""
@@ -877,9 +1160,10 @@ class TraCIVehicle(KernelVehicle):
                 pass
 
         # color vehicles white if not observed and cyan if observed
+        observed_ids = set(self.get_observed_ids())
         for veh_id in self.get_human_ids():
             try:
-                color = CYAN if veh_id in self.get_observed_ids() else WHITE
+                color = CYAN if veh_id in observed_ids else WHITE
                 self.set_color(veh_id=veh_id, color=color)
             except (FatalTraCIError, TraCIException):
                 pass
@@ -891,18 +1175,61 @@ class TraCIVehicle(KernelVehicle):
     def get_color(self, veh_id):
         """See parent class.
 
-        This does not pass the last term (i.e. transparency).
+        This does not pass the last term (i.e. transparency). The color is
+        only queried from sumo if it was not set by Flow before.
         """
-        r, g, b, t = self.kernel_api.vehicle.getColor(veh_id)
-        return r, g, b
+        if "color" not in self.__vehicles[veh_id]:
+            r, g, b, t = self.kernel_api.vehicle.getColor(veh_id)
+            self.__vehicles[veh_id]["color"] = (r, g, b)
+        return self.__vehicles[veh_id]["color"]
 
     def set_color(self, veh_id, color):
         """See parent class.
 
-        The last term for sumo (transparency) is set to 255.
+        The last term for sumo (transparency) is set to 255. The command is
+        only sent to sumo if the color of the vehicle changed.
         """
         r, g, b = color
-        self.kernel_api.vehicle.setColor(vehID=veh_id, color=(r, g, b, 255))
+        if self.__vehicles[veh_id].get("color") == (r, g, b):
+            return
+        self.kernel_api.vehicle.setColor(veh_id, (r, g, b, 255))
+        self.__vehicles[veh_id]["color"] = (r, g, b)
+
+    def get_lane_change_mode(self, veh_id):
+        """See parent class.
+
+        The lane change mode is tracked by Flow, and is therefore available
+        without querying sumo.
+        """
+        return self.__vehicles[veh_id]["lane_change_mode"]
+
+    def set_lane_change_mode(self, veh_id, lane_change_mode):
+        """See parent class.
+
+        The command is only sent to sumo if the lane change mode changed.
+        """
+        if self.__vehicles[veh_id]["lane_change_mode"] == lane_change_mode:
+            return
+        self.kernel_api.vehicle.setLaneChangeMode(veh_id, lane_change_mode)
+        self.__vehicles[veh_id]["lane_change_mode"] = lane_change_mode
+
+    def get_speed_mode(self, veh_id):
+        """See parent class.
+
+        The speed mode is tracked by Flow, and is therefore available without
+        querying sumo.
+        """
+        return self.__vehicles[veh_id]["speed_mode"]
+
+    def set_speed_mode(self, veh_id, speed_mode):
+        """See parent class.
+
+        The command is only sent to sumo if the speed mode changed.
+        """
+        if self.__vehicles[veh_id]["speed_mode"] == speed_mode:
+            return
+        self.kernel_api.vehicle.setSpeedMode(veh_id, speed_mode)
+        self.__vehicles[veh_id]["speed_mode"] = speed_mode
 
     def add(self, veh_id, type_id, edge, pos, lane, speed):
         """See parent class."""
@@ -915,11 +1242,21 @@ class TraCIVehicle(KernelVehicle):
             departSpeed=str(speed))
 
     def get_max_speed(self, veh_id, error=-1001):
-        """See parent class."""
+        """See parent class.
+
+        The max speed is tracked by Flow, and is therefore available without
+        querying sumo.
+        """
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_max_speed(vehID, error) for vehID in veh_id]
-        return self.kernel_api.vehicle.getMaxSpeed(veh_id)
+        return self.__vehicles.get(veh_id, {}).get("max_speed", error)
 
     def set_max_speed(self, veh_id, max_speed):
-        """See parent class."""
+        """See parent class.
+
+        The command is only sent to sumo if the max speed changed.
+        """
+        if self.__vehicles[veh_id]["max_speed"] == max_speed:
+            return
         self.kernel_api.vehicle.setMaxSpeed(veh_id, max_speed)
+        self.__vehicles[veh_id]["max_speed"] = max_speed
@@ -0,0 +1,310 @@
+"""Contains streaming accumulators of the metrics of rollouts.
+
+The metrics of a rollout (speeds, returns, throughput, delays, densities and
+optionally emissions) are accumulated online, in constant memory, from the
+state of the kernel after every simulation step, instead of storing the full
+history of the rollout and reducing it at the end. To collect the metrics of
+an environment, attach an accumulator to it; it is then updated after every
+update of the kernel, and cleared when the environment is reset:
+
+    >>> from flow.core.metrics import RolloutMetrics
+    >>> env.metrics = RolloutMetrics(env.sim_step)
+    >>> env.reset()
+    >>> for _ in range(1000):
+    >>>     env.step(rl_actions=None)
+    >>> print(env.metrics.summary())
+
+The same accumulators are used by flow.core.experiment.Experiment, the
+visualizers and the leaderboard, so that the metrics they report are computed
+consistently.
+"""
+
+import numpy as np
+
+from flow.core.emissions import POLLUTANTS
+
+
+class RunningStat(object):
+    """Running mean and variance of a stream of values.
+
+    The moments are updated with Welford's algorithm, which is numerically
+    stable and only stores three numbers.
+
+    Attributes
+    ----------
+    count : int
+        number of values pushed so far
+    total : float
+        sum of the values
+    mean : float
+        mean of the values (nan if there are none)
+    """
+
+    def __init__(self):
+        """Instantiate an empty accumulator."""
+        self.count = 0
+        self.total = 0.
+        self.mean = float("nan")
+        self._m2 = 0.
+
+    def push(self, value):
+        """Add a value to the stream."""
+        self.count += 1
+        self.total += value
+        if self.count == 1:
+            self.mean = float(value)
+            self._m2 = 0.
+        else:
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (value - self.mean)
+
+    @property
+    def var(self):
+        """Return the (population) variance of the values."""
+        if self.count == 0:
+            return float("nan")
+        return self._m2 / self.count
+
+    @property
+    def std(self):
+        """Return the (population) standard deviation of the values."""
+        return np.sqrt(self.var)
+
+
+class WindowedRate(object):
+    """Rate of events over a sliding window of steps.
+
+    The number of events in each of the last steps is stored in a circular
+    buffer of fixed size.
+
+    Attributes
+    ----------
+    sim_step : float
+        duration of a simulation step, in seconds
+    """
+
+    def __init__(self, time_span, sim_step):
+        """Instantiate the accumulator.
+
+        Parameters
+        ----------
+        time_span : float
+            length of the window, in seconds
+        sim_step : float
+            duration of a simulation step, in seconds
+        """
+        self.sim_step = sim_step
+        self._counts = np.zeros(max(int(time_span / sim_step), 1))
+        self._index = 0
+        self._filled = 0
+
+    def push(self, count):
+        """Add the number of events of the last step."""
+        self._counts[self._index] = count
+        self._index = (self._index + 1) % len(self._counts)
+        self._filled = min(self._filled + 1, len(self._counts))
+
+    def rate(self, time_span=None):
+        """Return the rate of events in the window, per hour.
+
+        As in ``get_outflow_rate`` of the vehicle kernels, the rate is
+        computed over the steps available if the window is not full yet, and
+        is 0 if there are none.
+
+        Parameters
+        ----------
+        time_span : float, optional
+            only count the events of the last time_span seconds of the window.
+            Defaults to the whole window.
+        """
+        num_steps = self._filled
+        if time_span is not None:
+            num_steps = min(num_steps, max(int(time_span / self.sim_step), 1))
+        if num_steps == 0:
+            return 0
+        last = (self._index - 1 - np.arange(num_steps)) % len(self._counts)
+        return 3600 * self._counts[last].sum() / (num_steps * self.sim_step)
+
+    def clear(self):
+        """Remove all events."""
+        self._counts[:] = 0
+        self._index = 0
+        self._filled = 0
+
+
+class RolloutMetrics(object):
+    """Streaming accumulator of the metrics of a rollout.
+
+    The accumulator is updated from the vehicle and scenario kernels after
+    every simulation step (see ``update``), and with the rewards of the
+    environment after every step of the environment (see ``push_reward``).
+    All metrics use a constant amount of memory, regardless of the length of
+    the rollout.
+
+    Attributes
+    ----------
+    sim_step : float
+        duration of a simulation step, in seconds
+    speed : flow.core.metrics.RunningStat
+        mean speed of the vehicles in the network at every simulation step
+        with vehicles, in m/s
+    reward : flow.core.metrics.RunningStat
+        reward of every step of the environment
+    outflow : flow.core.metrics.WindowedRate
+        number of vehicles leaving the network over the last
+        ``throughput_window`` seconds
+    num_steps : int
+        number of simulation steps since the last reset
+    total_delay : float
+        total time lost by all vehicles from not driving at the speed limit
+        of their edge, in seconds
+    vehicle_hours : float
+        total time spent in the network by all vehicles, in hours
+    emissions : flow.core.emissions.EmissionsEstimator or None
+        estimator of the emissions of the vehicles, if any
+    emitted : np.ndarray
+        mass of every pollutant emitted by all vehicles (see
+        flow.core.emissions.POLLUTANTS), in grams. Only accumulated if an
+        emissions estimator is specified.
+    """
+
+    def __init__(self, sim_step, throughput_window=500, emissions=None):
+        """Instantiate the accumulator.
+
+        Parameters
+        ----------
+        sim_step : float
+            duration of a simulation step, in seconds
+        throughput_window : float, optional
+            length of the window the outflow is computed over, in seconds
+        emissions : flow.core.emissions.EmissionsEstimator, optional
+            estimator of the emissions of the vehicles, updated after every
+            simulation step. If not specified, emissions are not estimated.
+        """
+        self.sim_step = sim_step
+        self.outflow = WindowedRate(throughput_window, sim_step)
+        self.emissions = emissions
+
+        # interned edges of the network the metrics are accumulated for (see
+        # the edge_* attributes of flow.core.kernel.scenario.KernelScenario)
+        self._edge_ids = None
+        self._speed_limits = None
+        self._lengths = None
+
+        self.reset()
+
+    def reset(self):
+        """Clear all metrics, e.g. at the start of a rollout."""
+        self.speed = RunningStat()
+        self.reward = RunningStat()
+        self.outflow.clear()
+        self.num_steps = 0
+        self.total_delay = 0.
+        self.vehicle_hours = 0.
+        self.emitted = np.zeros(len(POLLUTANTS))
+        if self.emissions is not None:
+            self.emissions.reset()
+        self._density_sums = None
+
+    def _init_edges(self, kernel):
+        """Store the speed limits and lengths of all edges of the network."""
+        scenario = kernel.scenario
+        self._edge_ids = scenario.edge_ids
+        self._speed_limits = np.asarray(scenario.edge_speed_limits,
+                                        dtype=float)
+        self._lengths = np.asarray(scenario.edge_lengths, dtype=float)
+        self._density_sums = None
+
+    def update(self, kernel):
+        """Add the state of the network after a simulation step.
+
+        Parameters
+        ----------
+        kernel : flow.core.kernel.Kernel
+            the kernel of the environment, after its update
+        """
+        # the edges are read again if a new network was generated
+        if self._edge_ids is not kernel.scenario.edge_ids:
+            self._init_edges(kernel)
+        if self._density_sums is None:
+            self._density_sums = np.zeros(len(self._edge_ids))
+
+        self.num_steps += 1
+        self.outflow.push(kernel.vehicle.get_num_arrived())
+
+        if self.emissions is not None:
+            rates = self.emissions.update(kernel)
+            self.emitted += rates.sum(axis=0) * self.sim_step / 1000
+
+        ids = kernel.vehicle.get_ids()
+        if len(ids) == 0:
+            return
+
+        speeds = np.asarray(kernel.vehicle.get_speed_array(), dtype=float)
+        self.speed.push(speeds.mean())
+        self.vehicle_hours += len(ids) * self.sim_step / 3600
+
+        # interned index of the edge of every vehicle (-1 if the edge is
+        # unknown, e.g. for vehicles that are not in the network yet)
+        edges = np.array(kernel.vehicle.get_edge_index(ids), dtype=int)
+        known = edges >= 0
+        edges, speeds = edges[known], speeds[known]
+
+        limits = self._speed_limits[edges]
+        lost = np.clip(1 - speeds / np.maximum(limits, 1e-6), 0, 1)
+        self.total_delay += lost.sum() * self.sim_step
+
+        self._density_sums += np.bincount(edges,
+                                          minlength=len(self._edge_ids))
+
+    def push_reward(self, reward):
+        """Add the reward of a step of the environment.
+
+        Rewards of multi-agent environments (dictionaries of rewards) are
+        summed over all agents.
+        """
+        if isinstance(reward, dict):
+            reward = sum(reward.values())
+        self.reward.push(reward)
+
+    def edge_densities(self):
+        """Return the mean density of every edge since the last reset.
+
+        Returns
+        -------
+        dict < str, float >
+            mean number of vehicles per meter of every edge (all lanes
+            combined), for all edges of the network
+        """
+        if self._density_sums is None or self.num_steps == 0:
+            return {}
+        densities = self._density_sums / self.num_steps / \
+            np.maximum(self._lengths, 1e-6)
+        return dict(zip(self._edge_ids, densities.tolist()))
+
+    def summary(self):
+        """Return the metrics of the rollout.
+
+        Returns
+        -------
+        dict
+            the return, the mean reward per step, the mean and standard
+            deviation of the speed (in m/s), the outflow (in veh/hr), the
+            total delay (in s), the vehicle-hours and the number of steps, as
+            well as the mass of every pollutant emitted (in g) if emissions
+            are estimated
+        """
+        summary = {
+            "return": self.reward.total,
+            "mean_reward": self.reward.mean,
+            "mean_speed": self.speed.mean,
+            "std_speed": self.speed.std,
+            "outflow": self.outflow.rate(),
+            "total_delay": self.total_delay,
+            "vehicle_hours": self.vehicle_hours,
+            "num_steps": self.num_steps,
+        }
+        if self.emissions is not None:
+            summary.update(zip(POLLUTANTS, self.emitted.tolist()))
+        return summary
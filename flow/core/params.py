@@ -355,7 +355,8 @@ class SimParams(object):
                  save_render=False,
                  sight_radius=25,
                  show_radius=False,
-                 pxpm=2):
+                 pxpm=2,
+                 trajectory_path=None):
         """Instantiate SimParams.
 
         Parameters
@@ -388,6 +389,10 @@ class SimParams(object):
             specifies whether to render the radius of RL observation
         pxpm: int, optional
             specifies rendering resolution (pixel / meter)
+        trajectory_path: str, optional
+            Path to the folder in which to record the trajectories of all
+            vehicles (see flow.core.kernel.vehicle.recorder). Trajectories are
+            not recorded if this value is not specified
         """
         self.sim_step = sim_step
         self.render = render
@@ -397,6 +402,7 @@ class SimParams(object):
         self.sight_radius = sight_radius
         self.pxpm = pxpm
         self.show_radius = show_radius
+        self.trajectory_path = trajectory_path
 
 
 class AimsunParams(SimParams):
@@ -412,7 +418,8 @@ class AimsunParams(SimParams):
                  save_render=False,
                  sight_radius=25,
                  show_radius=False,
-                 pxpm=2):
+                 pxpm=2,
+                 trajectory_path=None):
         """Instantiate AimsunParams.
 
         Parameters
@@ -445,10 +452,14 @@ class AimsunParams(SimParams):
             specifies whether to render the radius of RL observation
         pxpm: int, optional
             specifies rendering resolution (pixel / meter)
+        trajectory_path: str, optional
+            Path to the folder in which to record the trajectories of all
+            vehicles (see flow.core.kernel.vehicle.recorder). Trajectories are
+            not recorded if this value is not specified
         """
         super(AimsunParams, self).__init__(
             sim_step, render, restart_instance, emission_path, save_render,
-            sight_radius, show_radius, pxpm)
+            sight_radius, show_radius, pxpm, trajectory_path)
 
 
 class SumoParams(SimParams):
@@ -479,7 +490,12 @@ class SumoParams(SimParams):
                  print_warnings=True,
                  teleport_time=-1,
                  num_clients=1,
-                 sumo_binary=None):
+                 sumo_binary=None,
+                 pool_size=0,
+                 prewarm_pool=False,
+                 trajectory_path=None,
+                 flyweight_controllers=False,
+                 num_shards=1):
         """Instantiate SumoParams.
 
         Attributes
@@ -531,11 +547,40 @@ class SumoParams(SimParams):
             they teleport after teleport_time seconds
         num_clients: int, optional
             Number of clients that will connect to Traci
+        pool_size: int, optional
+            maximum number of idle sumo servers to keep running once a
+            simulation is closed or restarted. Idle servers are reloaded with
+            the new configuration instead of starting a new sumo process,
+            which reduces the cost of setting "restart_instance" or of
+            creating several environments within the same process. Defaults
+            to 0 (no pooling). Only used if num_clients is set to 1.
+        prewarm_pool: bool, optional
+            If set to True, sumo servers are started in advance with the
+            current configuration whenever a simulation is started, so that
+            the pool holds "pool_size" idle servers that are ready by the time
+            the simulation is restarted. Only used if pool_size is positive.
+        trajectory_path: str, optional
+            Path to the folder in which to record the trajectories of all
+            vehicles (see flow.core.kernel.vehicle.recorder). This is faster
+            and more compact than the emission output of sumo. Trajectories
+            are not recorded if this value is not specified
+        flyweight_controllers: bool, optional
+            specifies whether vehicles of the same type should share a single
+            instance of their controllers, if the controllers support it (see
+            flow.controllers.base_controller.BaseController). This avoids
+            creating new controllers for every vehicle entering the network,
+            which is useful with large inflows. Defaults to False
+        num_shards: int, optional
+            number of sumo instances the network is simulated on. If larger
+            than 1, the network is partitioned into regions, each simulated by
+            a separate sumo instance in parallel, and vehicles are handed off
+            between instances when they cross regions (see
+            flow.core.kernel.simulation.sharded). Defaults to 1
 
         """
         super(SumoParams, self).__init__(
             sim_step, render, restart_instance, emission_path, save_render,
-            sight_radius, show_radius, pxpm)
+            sight_radius, show_radius, pxpm, trajectory_path)
         self.port = port
         self.lateral_resolution = lateral_resolution
         self.no_step_log = no_step_log
@@ -544,6 +589,10 @@ class SumoParams(SimParams):
         self.print_warnings = print_warnings
         self.teleport_time = teleport_time
         self.num_clients = num_clients
+        self.pool_size = pool_size
+        self.prewarm_pool = prewarm_pool
+        self.flyweight_controllers = flyweight_controllers
+        self.num_shards = num_shards
         if sumo_binary is not None:
             warnings.simplefilter("always", PendingDeprecationWarning)
             warnings.warn(
@@ -554,6 +603,53 @@ class SumoParams(SimParams):
             self.render = sumo_binary == "sumo-gui"
 
 
+class ReplayParams(SimParams):
+    """Parameters of the replay of recorded trajectories.
+
+    Extends SimParams.
+
+    Trajectories recorded by the trajectory recorder (see
+    SimParams.trajectory_path) may be replayed by using "replay" as the
+    simulator of an environment. The replay is read-only: the state of the
+    vehicles is fed back through the kernel frame by frame, and actions are
+    ignored, so that observations, rewards and metrics of archived rollouts
+    may be recomputed without a simulator. Every reset of the environment
+    starts the replay of a new rollout. Replays cannot be rendered.
+    """
+
+    def __init__(self,
+                 replay_path,
+                 rollout=None,
+                 sim_step=None,
+                 trajectory_path=None):
+        """Instantiate ReplayParams.
+
+        Parameters
+        ----------
+        replay_path: str
+            path to the directory containing the recorded trajectories (i.e.
+            the "<scenario name>-trajectory" folder created by the recorder)
+        rollout: int, optional
+            index of the rollout to replay after every reset. If not
+            specified, the recorded rollouts are replayed in order, one per
+            reset
+        sim_step: float, optional
+            seconds per simulation step. Defaults to the simulation step of the
+            recorded trajectories
+        trajectory_path: str, optional
+            Path to the folder in which to record the replayed trajectories
+        """
+        if sim_step is None:
+            # imported here to avoid a circular import with the kernel
+            from flow.core.kernel.vehicle.recorder import read_meta
+            sim_step = read_meta(replay_path)["sim_step"]
+
+        super(ReplayParams, self).__init__(
+            sim_step=sim_step, trajectory_path=trajectory_path)
+        self.replay_path = replay_path
+        self.rollout = rollout
+
+
 class EnvParams:
     """Environment and experiment-specific parameters.
 
@@ -581,7 +677,9 @@ class EnvParams:
                 number of steps performed before the initialization of training
                 during a rollout. These warmup steps are not added as steps
                 into training, and the actions of rl agents during these steps
-                are dictated by sumo. Defaults to zero
+                are dictated by sumo. If Flow has nothing to control, they are
+                performed in a single call to the simulator (see
+                flow.envs.base_env.Env.can_fast_forward). Defaults to zero
             sims_per_step: int, optional
                 number of sumo simulation steps performed in any given rollout
                 step. RL agents perform the same action for the duration of
@@ -1039,8 +1137,19 @@ class InFlows:
     Inflows can be specified for any edge that has a specified route or routes.
     """
 
-    def __init__(self):
-        """Instantiate Inflows."""
+    def __init__(self, managed=False):
+        """Instantiate Inflows.
+
+        Parameters
+        ----------
+        managed : bool, optional
+            whether the vehicles of the inflows are inserted by Flow rather
+            than by the simulator. Managed inflows are not written to the
+            network files, and their rates may be changed at any step through
+            the ``inflows`` attribute of the environment (see
+            flow.core.inflows.InflowGenerator). Defaults to False
+        """
+        self.managed = managed
         self.num_flows = 0
         self.__flows = []
 
@@ -318,3 +318,35 @@ def reward_rl_opening_headways(env, reward_gain=0.1, reward_exponent=1):
         total_reward += follower_headway ** reward_exponent
 
     return total_reward * reward_gain
+
+
+def penalize_emissions(env, estimator, pollutant="CO2", gain=1.0):
+    """Penalize the emissions of all vehicles in the network.
+
+    The emissions are estimated by Flow from the speeds and accelerations of
+    the vehicles (see flow/core/emissions.py), so that the emission output of
+    sumo is not needed.
+
+    Parameters
+    ----------
+    env : flow.envs.Env
+        the environment variable, which contains information on the current
+        state of the system.
+    estimator : flow.core.emissions.EmissionsEstimator
+        estimator of the emissions of the vehicles of the environment, which
+        is updated by this method. The method should therefore be called once
+        per step, with an estimator whose ``sim_step`` is the duration of a
+        step of the environment.
+    pollutant : str, optional
+        name of the penalized pollutant (see flow.core.emissions.POLLUTANTS)
+    gain : float, optional
+        multiplicative factor on the mass of the pollutant
+
+    Returns
+    -------
+    float
+        minus the gain times the mass of the pollutant emitted by all vehicles
+        during the last step, in grams
+    """
+    estimator.update(env.k)
+    return -gain * estimator.total(pollutant) * estimator.sim_step / 1000
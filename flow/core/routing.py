@@ -0,0 +1,340 @@
+"""Contains a shortest-path route engine for traffic networks.
+
+The engine operates on the connection graph of a network as provided by the
+scenario kernel (see flow.core.kernel.scenario.base.KernelScenario), and may
+be used by routing controllers to compute routes between any two edges of a
+network without having to specify them beforehand (this is particularly
+useful for networks imported from OpenStreetMap).
+"""
+
+import collections
+import heapq
+
+# edge/lane pairs of internal edges (junctions) start with this character
+INTERNAL_EDGE_PREFIX = ":"
+
+
+class RouteEngine(object):
+    """Cached shortest-path route engine.
+
+    Routes only consist of non-internal edges, in the format expected by the
+    simulator (see flow.core.kernel.vehicle.KernelVehicle.choose_routes).
+    Internal edges (junctions) are collapsed into the connections between the
+    edges they link, with their length (or travel time) added to the cost of
+    the connection.
+
+    Shortest-path trees are computed lazily with Dijkstra's algorithm from
+    each origin that is queried, and kept in a least-recently-used cache.
+    Routes from a cached origin are then returned without any search. The
+    cost of traversing an edge is either its length or its travel time. Travel
+    times default to free-flow times, and may be updated as the simulation
+    progresses (see ``update_travel_times``).
+
+    The route engine of a network may be acquired from the scenario kernel,
+    for example:
+
+        >>> from flow.envs.base_env import Env
+        >>> env = Env(...)
+        >>> engine = env.k.scenario.get_route_engine(weight="time")
+        >>> route = engine.route("edge_a", "edge_b")
+
+    Attributes
+    ----------
+    weight : str
+        the cost of traversing an edge, one of {"length", "time"}
+    cache_size : int
+        maximum number of shortest-path trees that are kept in memory
+    tolerance : float
+        relative change in the travel time of an edge below which updates are
+        ignored, see ``update_travel_times``
+    """
+
+    def __init__(self,
+                 edges,
+                 connections,
+                 weight="length",
+                 cache_size=256,
+                 tolerance=0.):
+        """Instantiate the route engine.
+
+        Parameters
+        ----------
+        edges : dict
+            Key = edge id (including internal edges). Element = dict with the
+            "length" (in m) and "speed" (speed limit, in m/s) of the edge
+        connections : dict
+            Key = edge id (including internal edges). Element = list of edges
+            that may be reached directly from the edge
+        weight : str, optional
+            the cost of traversing an edge, one of {"length", "time"}
+        cache_size : int, optional
+            maximum number of shortest-path trees that are kept in memory
+        tolerance : float, optional
+            relative change in the travel time of an edge below which updates
+            are ignored
+
+        Raises
+        ------
+        ValueError
+            if the weight is not one of {"length", "time"}
+        """
+        if weight not in ["length", "time"]:
+            raise ValueError("weight must be one of {{'length', 'time'}}, "
+                             "got {}".format(weight))
+
+        self.weight = weight
+        self.cache_size = cache_size
+        self.tolerance = tolerance
+
+        self._lengths = {}
+        self._travel_times = {}
+        for edge, params in edges.items():
+            self._lengths[edge] = params["length"]
+            self._travel_times[edge] = \
+                params["length"] / max(params["speed"], 1e-6)
+
+        # cost of traversing every (non-internal) edge
+        self._costs = {
+            edge: self._edge_cost(edge)
+            for edge in edges if not edge.startswith(INTERNAL_EDGE_PREFIX)
+        }
+
+        # Key = edge, Element = dict of reachable edges, with the internal
+        #       edges that are traversed to reach them (as a tuple)
+        self._successors = {edge: {} for edge in self._costs}
+        # Key = edge, Element = dict of reachable edges, with all the
+        #       sequences of internal edges that lead to them
+        self._vias = {edge: collections.OrderedDict() for edge in self._costs}
+        # Key = internal edge, Element = set of (edge, reachable edge) pairs
+        #       whose connections traverse the internal edge
+        self._via_links = collections.defaultdict(set)
+        for edge in self._costs:
+            self._collapse(edge, connections)
+
+        # Key = origin, Element = (distances, predecessors)
+        self._trees = collections.OrderedDict()
+
+    @classmethod
+    def from_scenario(cls, scenario, **kwargs):
+        """Build a route engine from a scenario kernel.
+
+        Parameters
+        ----------
+        scenario : flow.core.kernel.scenario.KernelScenario
+            the scenario kernel, after the network has been generated
+        kwargs : dict
+            additional arguments passed to the constructor
+
+        Returns
+        -------
+        RouteEngine
+            the route engine of the network
+        """
+        edges = {}
+        connections = {}
+        for edge in scenario.get_edge_list() + scenario.get_junction_list():
+            edges[edge] = {"length": scenario.edge_length(edge),
+                           "speed": scenario.speed_limit(edge)}
+            next_edges = []
+            for lane in range(scenario.num_lanes(edge)):
+                for next_edge, _ in scenario.next_edge(edge, lane):
+                    if next_edge not in next_edges:
+                        next_edges.append(next_edge)
+            connections[edge] = next_edges
+
+        return cls(edges, connections, **kwargs)
+
+    def _edge_cost(self, edge):
+        """Return the cost of traversing an edge."""
+        if self.weight == "length":
+            return self._lengths[edge]
+        return self._travel_times[edge]
+
+    def _collapse(self, edge, connections):
+        """Find the edges reachable from an edge through internal edges."""
+        # stack of (reached edge, traversed internal edges)
+        stack = [(next_edge, ()) for next_edge in connections.get(edge, [])]
+        while len(stack) > 0:
+            next_edge, via = stack.pop()
+            if not next_edge.startswith(INTERNAL_EDGE_PREFIX):
+                if next_edge not in self._costs:
+                    continue
+                vias = self._vias[edge].setdefault(next_edge, [])
+                if via not in vias:
+                    vias.append(via)
+                for internal_edge in via:
+                    self._via_links[internal_edge].add((edge, next_edge))
+            elif next_edge not in via:
+                via = via + (next_edge,)
+                stack.extend((e, via) for e in connections.get(next_edge, []))
+
+        for next_edge in self._vias[edge]:
+            self._select_via(edge, next_edge)
+
+    def _select_via(self, edge, next_edge):
+        """Pick the cheapest internal edges connecting two edges."""
+        self._successors[edge][next_edge] = min(
+            self._vias[edge][next_edge], key=self._via_cost)
+
+    def _via_cost(self, via):
+        """Return the cost of traversing a sequence of internal edges."""
+        return sum(self._edge_cost(edge) for edge in via)
+
+    def _tree(self, origin):
+        """Return the shortest-path tree from an origin edge.
+
+        The tree is computed if it is not in the cache, and is marked as the
+        most recently used one otherwise.
+
+        Returns
+        -------
+        dict
+            Key = edge, Element = cost of reaching the end of the edge from the
+            end of the origin
+        dict
+            Key = edge, Element = previous edge in the shortest path
+        """
+        if origin in self._trees:
+            self._trees.move_to_end(origin)
+            return self._trees[origin]
+
+        dist = {origin: 0.}
+        prev = {}
+        queue = [(0., origin)]
+        while len(queue) > 0:
+            d, edge = heapq.heappop(queue)
+            if d > dist[edge]:
+                continue
+            for next_edge, via in self._successors[edge].items():
+                nd = d + self._via_cost(via) + self._costs[next_edge]
+                if nd < dist.get(next_edge, float("inf")):
+                    dist[next_edge] = nd
+                    prev[next_edge] = edge
+                    heapq.heappush(queue, (nd, next_edge))
+
+        self._trees[origin] = (dist, prev)
+        if len(self._trees) > self.cache_size:
+            self._trees.popitem(last=False)
+
+        return dist, prev
+
+    def route(self, origin, destination):
+        """Return the shortest route between two edges.
+
+        Parameters
+        ----------
+        origin : str
+            edge the route starts at
+        destination : str
+            edge the route ends at
+
+        Returns
+        -------
+        list of str or None
+            the sequence of (non-internal) edges from the origin to the
+            destination, or None if the destination cannot be reached
+
+        Raises
+        ------
+        KeyError
+            if the origin is not a non-internal edge of the network
+        """
+        if origin not in self._costs:
+            raise KeyError("{} is not an edge of the network".format(origin))
+
+        dist, prev = self._tree(origin)
+        if destination not in dist:
+            return None
+
+        route = [destination]
+        while route[-1] != origin:
+            route.append(prev[route[-1]])
+        route.reverse()
+
+        return route
+
+    def distance(self, origin, destination):
+        """Return the cost of the shortest route between two edges.
+
+        This corresponds to the distance (or travel time) from the end of the
+        origin to the end of the destination.
+
+        Returns
+        -------
+        float
+            the cost of the route, or infinity if the destination cannot be
+            reached from the origin
+        """
+        if origin not in self._costs:
+            raise KeyError("{} is not an edge of the network".format(origin))
+
+        dist, _ = self._tree(origin)
+        return dist.get(destination, float("inf"))
+
+    def successors(self, edge):
+        """Return the (non-internal) edges reachable directly from an edge."""
+        return list(self._successors.get(edge, {}).keys())
+
+    def update_travel_times(self, travel_times):
+        """Update the travel times of a set of edges.
+
+        Only used if the weight of the engine is "time". Changes in the travel
+        time of an edge that are smaller than the tolerance of the engine are
+        ignored, so that the cache is not flushed by noise in measured travel
+        times.
+
+        Cached shortest-path trees are invalidated incrementally: a tree is
+        only removed if the updated edges are part of the region it settled,
+        i.e. if they can be reached from its origin. If internal edges are
+        updated, the cheapest connections through them are selected again.
+
+        Parameters
+        ----------
+        travel_times : dict
+            Key = edge id, Element = current travel time on the edge, in s
+
+        Returns
+        -------
+        bool
+            True if the travel time of any edge was updated, False otherwise
+        """
+        if self.weight != "time":
+            return False
+
+        changed_edges = set()
+        changed_links = set()
+        for edge, travel_time in travel_times.items():
+            if edge not in self._travel_times:
+                continue
+            current = self._edge_cost(edge)
+            if abs(travel_time - current) <= self.tolerance * current:
+                continue
+            self._travel_times[edge] = travel_time
+            if edge in self._costs:
+                self._costs[edge] = travel_time
+                changed_edges.add(edge)
+            else:
+                changed_links.update(self._via_links.get(edge, ()))
+
+        if len(changed_edges) == 0 and len(changed_links) == 0:
+            return False
+
+        # the connections through updated internal edges may have changed
+        for edge, next_edge in changed_links:
+            self._select_via(edge, next_edge)
+
+        # edges whose outgoing connections are more or less costly
+        changed_sources = set(edge for edge, _ in changed_links)
+
+        for origin, (dist, _) in list(self._trees.items()):
+            # the cost of the origin itself is not part of its tree
+            if any(edge in dist for edge in changed_sources) or \
+                    any(edge in dist and edge != origin
+                        for edge in changed_edges):
+                del self._trees[origin]
+
+        return True
+
+    def clear_cache(self):
+        """Remove all cached shortest-path trees."""
+        self._trees.clear()
@@ -0,0 +1,344 @@
+"""Contains a soak benchmark measuring resource growth over long runs.
+
+A soak run steps an environment for millions of steps (and thousands of
+resets), and regularly samples the resources it uses:
+
+* the size of the python heap (with tracemalloc), and the allocation sites
+  whose memory grew the most since the start of the run,
+* the resident memory of the python and sumo processes,
+* the length of every container stored by the environment and its kernels
+  (e.g. the ``_num_arrived`` history or the sumo observations of the vehicle
+  kernel), and the number of live controller objects,
+* the latency of ``Env.step`` (mean and 99th percentile).
+
+The growth rate of every quantity is then estimated by a linear fit, so that
+unbounded growth (e.g. a leak) can be detected and the memory of workers can
+be sized before long training runs. For example:
+
+    >>> from flow.core.soak import soak
+    >>> monitor = soak(env, num_steps=2000000, sample_every=10000)
+    >>> print(monitor.report())
+    >>> monitor.to_csv("soak.csv")
+
+See tests/stress_tests/soak_test.py to run a soak benchmark on the
+environments in flow/benchmarks.
+"""
+
+from collections import deque
+import csv
+import gc
+import resource
+import time
+import tracemalloc
+
+import numpy as np
+
+from flow.controllers.base_controller import BaseController
+from flow.controllers.base_lane_changing_controller import \
+    BaseLaneChangeController
+from flow.controllers.base_routing_controller import BaseRouter
+
+# containers whose length is sampled
+SIZED_TYPES = (dict, list, set, deque)
+
+# controller classes whose live instances are counted
+CONTROLLER_TYPES = (BaseController, BaseLaneChangeController, BaseRouter)
+
+
+def process_rss(pid=None):
+    """Return the resident memory of a process, in bytes.
+
+    Parameters
+    ----------
+    pid : int, optional
+        ID of the process, defaults to the current process
+
+    Returns
+    -------
+    float
+        resident set size of the process. If it cannot be read from /proc,
+        the peak resident set size of the current process is returned
+        instead (or nan for other processes).
+    """
+    path = "/proc/{}/status".format("self" if pid is None else pid)
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return float(line.split()[1]) * 1024
+    except (IOError, OSError):
+        pass
+    if pid is None:
+        # kilobytes on linux
+        return float(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) \
+            * 1024
+    return float("nan")
+
+
+def container_sizes(obj, prefix):
+    """Return the lengths of the containers stored as attributes of an object.
+
+    Parameters
+    ----------
+    obj : object
+        object whose attributes are inspected
+    prefix : str
+        prefix of the names of the returned quantities
+
+    Returns
+    -------
+    dict < str, int >
+        length of every container attribute, by name. Name mangling of
+        private attributes is removed, e.g. "_TraCIVehicle__sumo_obs" is
+        reported as "<prefix>.__sumo_obs".
+    """
+    sizes = dict()
+    for name, value in vars(obj).items():
+        if isinstance(value, SIZED_TYPES):
+            if "__" in name and not name.startswith("__"):
+                name = name[name.index("__"):]
+            sizes["{}.{}".format(prefix, name)] = len(value)
+    return sizes
+
+
+class SoakMonitor(object):
+    """Sampler of the resources used by an environment over a long run.
+
+    Step latencies are recorded after every step (see ``record_step``), and
+    the remaining quantities are sampled at regular intervals (see
+    ``sample``). The python heap is traced with tracemalloc from the creation
+    of the monitor until it is closed.
+
+    Attributes
+    ----------
+    env : flow.envs.Env
+        the monitored environment
+    steps : list of int
+        number of steps performed at every sample
+    samples : dict < str, list of float >
+        value of every quantity at every sample. Quantities that appear after
+        the first sample (e.g. new attributes) are nan in earlier samples.
+    num_resets : int
+        number of resets of the environment
+    num_restarts : int
+        number of times the sumo process was restarted
+    """
+
+    def __init__(self, env, num_top_allocators=10):
+        """Instantiate the monitor.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            the monitored environment
+        num_top_allocators : int, optional
+            number of allocation sites to report, see ``top_allocators``
+        """
+        self.env = env
+        self.num_top_allocators = num_top_allocators
+        self.steps = []
+        self.samples = dict()
+        self.num_resets = 0
+        self.num_restarts = 0
+
+        self._latencies = []
+        self._pids = self._sumo_pids()
+
+        self._stop_tracing = not tracemalloc.is_tracing()
+        if self._stop_tracing:
+            tracemalloc.start()
+        self._first_snapshot = None
+        self._last_snapshot = None
+
+    def _sumo_pids(self):
+        """Return the IDs of the sumo processes of the environment."""
+        simulation = self.env.k.simulation
+        procs = getattr(simulation, "sumo_procs", None) or \
+            [getattr(simulation, "sumo_proc", None)]
+        return [proc.pid for proc in procs if proc is not None]
+
+    def record_step(self, latency):
+        """Record the latency of a step of the environment, in seconds."""
+        self._latencies.append(latency)
+
+    def record_reset(self):
+        """Record a reset of the environment."""
+        self.num_resets += 1
+        pids = self._sumo_pids()
+        if pids != self._pids:
+            self.num_restarts += 1
+            self._pids = pids
+
+    def sample(self, step):
+        """Sample all quantities.
+
+        Parameters
+        ----------
+        step : int
+            number of steps performed so far
+        """
+        values = dict()
+
+        # python heap
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)])
+        if self._first_snapshot is None:
+            self._first_snapshot = snapshot
+        self._last_snapshot = snapshot
+        values["python.heap"] = tracemalloc.get_traced_memory()[0]
+
+        # processes
+        values["python.rss"] = process_rss()
+        values["sumo.rss"] = sum(process_rss(pid) for pid in self._pids)
+
+        # containers of the environment and its kernels
+        values.update(container_sizes(self.env, "env"))
+        for name in ("simulation", "scenario", "vehicle", "traffic_light"):
+            kernel = getattr(self.env.k, name, None)
+            if kernel is not None:
+                values.update(container_sizes(kernel, "kernel." + name))
+        values["controllers"] = sum(
+            1 for obj in gc.get_objects() if isinstance(obj, CONTROLLER_TYPES))
+
+        # latency of the steps since the last sample
+        if len(self._latencies) > 0:
+            latencies = np.array(self._latencies)
+            values["step.latency_mean"] = latencies.mean()
+            values["step.latency_p99"] = np.percentile(latencies, 99)
+            self._latencies = []
+
+        for name in set(self.samples) | set(values):
+            if name not in self.samples:
+                self.samples[name] = [float("nan")] * len(self.steps)
+            self.samples[name].append(values.get(name, float("nan")))
+        self.steps.append(step)
+
+    def slopes(self):
+        """Return the growth rate of every quantity.
+
+        Returns
+        -------
+        dict < str, float >
+            slope of a linear fit of every quantity against the number of
+            steps, per million steps (nan if there are fewer than two samples
+            of the quantity)
+        """
+        steps = np.array(self.steps, dtype=float)
+        slopes = dict()
+        for name, values in self.samples.items():
+            values = np.array(values, dtype=float)
+            valid = ~np.isnan(values)
+            if np.unique(steps[valid]).size < 2:
+                slopes[name] = float("nan")
+            else:
+                slopes[name] = np.polyfit(
+                    steps[valid], values[valid], 1)[0] * 1e6
+        return slopes
+
+    def top_allocators(self):
+        """Return the allocation sites whose memory grew the most.
+
+        Returns
+        -------
+        list of tracemalloc.StatisticDiff
+            allocation sites (by line) sorted by the growth of their memory
+            between the first and last samples
+        """
+        if self._first_snapshot is None:
+            return []
+        stats = self._last_snapshot.compare_to(self._first_snapshot, "lineno")
+        return stats[:self.num_top_allocators]
+
+    def report(self):
+        """Return a summary of the run, as printable text."""
+        slopes = self.slopes()
+        lines = ["{} steps, {} resets, {} restarts of sumo".format(
+            self.steps[-1] if self.steps else 0, self.num_resets,
+            self.num_restarts)]
+        lines.append("{:<45} {:>14} {:>14} {:>16}".format(
+            "quantity", "first", "last", "slope (per 1M)"))
+        for name in sorted(self.samples):
+            values = self.samples[name]
+            lines.append("{:<45} {:>14.6g} {:>14.6g} {:>16.6g}".format(
+                name, values[0], values[-1], slopes[name]))
+        lines.append("top allocators (growth since the first sample):")
+        for stat in self.top_allocators():
+            lines.append("  {}".format(stat))
+        return "\n".join(lines)
+
+    def to_csv(self, path):
+        """Write the samples to a csv file, with one row per sample."""
+        names = sorted(self.samples)
+        with open(path, "w") as f:
+            writer = csv.writer(f)
+            writer.writerow(["step"] + names)
+            for i, step in enumerate(self.steps):
+                writer.writerow(
+                    [step] + [self.samples[name][i] for name in names])
+
+    def close(self):
+        """Stop tracing the python heap (if started by the monitor)."""
+        if self._stop_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._first_snapshot = None
+        self._last_snapshot = None
+
+
+def soak(env, num_steps, sample_every=10000, rl_actions=None, monitor=None):
+    """Run an environment for a large number of steps, monitoring resources.
+
+    The environment is reset whenever a rollout is done or reaches the
+    horizon of the environment.
+
+    Parameters
+    ----------
+    env : flow.envs.Env
+        the environment to run
+    num_steps : int
+        total number of steps to perform, across all rollouts
+    sample_every : int, optional
+        number of steps in between samples of the resources
+    rl_actions : callable, optional
+        function returning the actions of the rl agents given the state of
+        the environment. Defaults to random actions in the action space of
+        the environment.
+    monitor : flow.core.soak.SoakMonitor, optional
+        monitor to sample the resources with. A new monitor is created if
+        none is specified.
+
+    Returns
+    -------
+    flow.core.soak.SoakMonitor
+        the monitor containing the samples of the run. It is not closed, so
+        that its allocation sites can still be inspected.
+    """
+    if rl_actions is None:
+        def rl_actions(*_):
+            return env.action_space.sample()
+
+    monitor = monitor or SoakMonitor(env)
+    horizon = env.env_params.horizon
+
+    state = env.reset()
+    monitor.sample(0)
+    step = 0
+    rollout_step = 0
+    while step < num_steps:
+        t = time.time()
+        state, _, done, _ = env.step(rl_actions(state))
+        monitor.record_step(time.time() - t)
+        step += 1
+        rollout_step += 1
+
+        if step % sample_every == 0:
+            monitor.sample(step)
+
+        if (done is True or rollout_step >= horizon) and step < num_steps:
+            state = env.reset()
+            monitor.record_reset()
+            rollout_step = 0
+
+    if monitor.steps[-1] != step:
+        monitor.sample(step)
+
+    return monitor
@@ -0,0 +1,349 @@
+"""Contains a resumable engine for parameter sweeps over experiments.
+
+A sweep runs an experiment for every cell of a grid of parameters (for
+example inflow rate x seed x scenario parameters) on a local pool of
+processes. The result of every completed cell is checkpointed to an indexed
+result store on disk, so that interrupted sweeps may be resumed: cells that
+were already computed are skipped when the sweep is run again.
+
+For example, a capacity diagram of the bottleneck can be computed as
+follows (see examples/sumo/density_exp.py):
+
+    >>> from flow.core.sweep import Sweep
+    >>> sweep = Sweep(run_bottleneck,
+    >>>               grid={"inflow": range(400, 3000, 100),
+    >>>                     "seed": range(10)},
+    >>>               store_path="data/bottleneck.db")
+    >>> sweep.run()
+    >>> data = sweep.store.arrays(["inflow", "outflow"])
+"""
+
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import traceback
+
+import numpy as np
+
+
+class ResultStore(object):
+    """Indexed store of the results of a sweep.
+
+    Results are stored in a sqlite database, indexed by the (canonical JSON
+    representation of the) parameters of the cell they were computed for.
+    Every result is committed as soon as it is added, so that the store is
+    always consistent on disk, even if the sweep is interrupted.
+
+    The parameters and the results of every cell must be dictionaries of
+    JSON-serializable values.
+    """
+
+    def __init__(self, path):
+        """Open (or create) a result store.
+
+        Parameters
+        ----------
+        path : str
+            path to the database file
+        """
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results "
+            "(key TEXT PRIMARY KEY, params TEXT, result TEXT)")
+        self._db.commit()
+
+    @staticmethod
+    def key(params):
+        """Return the key of a cell in the store.
+
+        Parameters
+        ----------
+        params : dict
+            parameters of the cell
+
+        Returns
+        -------
+        str
+            canonical (sorted) JSON representation of the parameters
+        """
+        return json.dumps(params, sort_keys=True)
+
+    def __contains__(self, params):
+        """Return whether the result of a cell is in the store."""
+        cursor = self._db.execute(
+            "SELECT 1 FROM results WHERE key = ?", (self.key(params),))
+        return cursor.fetchone() is not None
+
+    def __len__(self):
+        """Return the number of results in the store."""
+        return self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def keys(self):
+        """Return the keys of all cells in the store.
+
+        Returns
+        -------
+        set of str
+            keys of the cells, see ``key``
+        """
+        return set(row[0] for row in self._db.execute(
+            "SELECT key FROM results"))
+
+    def get(self, params):
+        """Return the result of a cell.
+
+        Parameters
+        ----------
+        params : dict
+            parameters of the cell
+
+        Returns
+        -------
+        dict or None
+            result of the cell, or None if it is not in the store
+        """
+        row = self._db.execute(
+            "SELECT result FROM results WHERE key = ?",
+            (self.key(params),)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, params, result):
+        """Add (or replace) the result of a cell, and commit it to disk.
+
+        Parameters
+        ----------
+        params : dict
+            parameters of the cell
+        result : dict
+            result of the cell
+        """
+        self._db.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+            (self.key(params), json.dumps(params, sort_keys=True),
+             json.dumps(result, sort_keys=True)))
+        self._db.commit()
+
+    def items(self):
+        """Iterate through the parameters and results of all cells.
+
+        Yields
+        ------
+        dict
+            parameters of a cell
+        dict
+            result of the cell
+        """
+        for params, result in self._db.execute(
+                "SELECT params, result FROM results ORDER BY key"):
+            yield json.loads(params), json.loads(result)
+
+    def arrays(self, fields):
+        """Return the values of parameters and results as arrays.
+
+        Parameters
+        ----------
+        fields : list of str
+            names of the parameters and/or results to return. Parameters take
+            precedence over results of the same name.
+
+        Returns
+        -------
+        dict < str, np.ndarray >
+            values of every field, with one element per cell of the store.
+            Cells missing a field are skipped.
+        """
+        columns = {field: [] for field in fields}
+        for params, result in self.items():
+            values = dict(result, **params)
+            if any(field not in values for field in fields):
+                continue
+            for field in fields:
+                columns[field].append(values[field])
+        return {field: np.asarray(columns[field]) for field in fields}
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+
+
+def _run_cell(args):
+    """Run a single cell of a sweep in a worker process.
+
+    Errors are caught and returned rather than raised, so that a single
+    failing cell does not interrupt the rest of the sweep.
+    """
+    run_fn, params, kwargs = args
+    try:
+        return params, run_fn(**dict(kwargs, **params)), None
+    except Exception:
+        return params, None, traceback.format_exc()
+
+
+class Sweep(object):
+    """Resumable parallel sweep over a grid of parameters.
+
+    The sweep calls a run function once for every cell of the cartesian
+    product of the grid (or of an explicit list of cells), with the
+    parameters of the cell as keyword arguments. Cells are executed on a
+    local pool of processes, and their results are added to the result store
+    as soon as they complete. Cells already in the store are skipped, so
+    interrupted sweeps can be resumed by running the same sweep again.
+
+    Attributes
+    ----------
+    run_fn : callable
+        function computing the result of a cell. It must be picklable (i.e.
+        defined at the top level of a module) and return a dictionary of
+        JSON-serializable values.
+    grid : dict < str, list > or list of dict
+        values of each parameter, or parameters of every cell
+    kwargs : dict
+        additional keyword arguments of the run function, shared by all cells
+        and not part of their keys. Must be picklable.
+    store : flow.core.sweep.ResultStore
+        store of the results of the sweep
+    num_workers : int
+        number of worker processes
+    """
+
+    def __init__(self, run_fn, grid, store_path, num_workers=None,
+                 kwargs=None):
+        """Instantiate a sweep.
+
+        Parameters
+        ----------
+        run_fn : callable
+            function computing the result of a cell, see class description
+        grid : dict < str, list > or list of dict
+            values of each parameter of the sweep. Fixed parameters may be
+            given as single-element lists. Alternatively, the parameters of
+            every cell may be given explicitly as a list of dictionaries
+            (e.g. when some parameters depend on others).
+        store_path : str
+            path to the database of the result store. If the database already
+            exists, its results are reused.
+        num_workers : int, optional
+            number of worker processes. Defaults to the number of cpus. If set
+            to 1, cells are executed in the current process.
+        kwargs : dict, optional
+            additional keyword arguments of the run function, see class
+            description
+        """
+        self.run_fn = run_fn
+        if isinstance(grid, dict):
+            self.grid = {name: list(values) for name, values in grid.items()}
+        else:
+            self.grid = [dict(params) for params in grid]
+        self.kwargs = kwargs or {}
+        self.store = ResultStore(store_path)
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+
+    def cells(self):
+        """Return the parameters of all cells of the sweep.
+
+        Returns
+        -------
+        list of dict
+            parameters of every cell, in a deterministic order
+        """
+        if not isinstance(self.grid, dict):
+            return [dict(params) for params in self.grid]
+        names = sorted(self.grid.keys())
+        return [dict(zip(names, values)) for values in
+                itertools.product(*[self.grid[name] for name in names])]
+
+    def pending(self):
+        """Return the parameters of the cells that were not computed yet.
+
+        Returns
+        -------
+        list of dict
+            parameters of every cell missing from the result store
+        """
+        done = self.store.keys()
+        return [params for params in self.cells()
+                if ResultStore.key(params) not in done]
+
+    def run(self):
+        """Compute all pending cells of the sweep.
+
+        Cells that fail are logged and left pending, so that they are retried
+        the next time the sweep is run.
+
+        Returns
+        -------
+        int
+            number of cells that failed
+        """
+        pending = self.pending()
+        logging.info("Running {} of {} cells.".format(
+            len(pending), len(self.cells())))
+
+        tasks = [(self.run_fn, params, self.kwargs) for params in pending]
+        if self.num_workers == 1 or len(tasks) <= 1:
+            results = map(_run_cell, tasks)
+            pool = None
+        else:
+            pool = multiprocessing.Pool(
+                processes=min(self.num_workers, len(tasks)))
+            results = pool.imap_unordered(_run_cell, tasks)
+
+        num_failed = 0
+        try:
+            for params, result, error in results:
+                if error is not None:
+                    num_failed += 1
+                    logging.error("Cell {} failed:\n{}".format(
+                        ResultStore.key(params), error))
+                    continue
+                self.store.put(params, result)
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        return num_failed
+
+
+def group_stats(keys, values):
+    """Compute statistics of values grouped by key.
+
+    Parameters
+    ----------
+    keys : array_like
+        key of every value (e.g. the inflow rate of every rollout)
+    values : array_like
+        values to aggregate (e.g. the outflow of every rollout)
+
+    Returns
+    -------
+    dict < str, np.ndarray >
+        unique keys (sorted), and the number of values, mean, standard
+        deviation, min and max per key
+    """
+    keys = np.asarray(keys)
+    values = np.asarray(values, dtype=float)
+    unique, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.ravel()
+
+    count = np.bincount(inverse, minlength=len(unique))
+    mean = np.bincount(inverse, weights=values, minlength=len(unique)) / count
+    sq_dev = (values - mean[inverse]) ** 2
+    std = np.sqrt(
+        np.bincount(inverse, weights=sq_dev, minlength=len(unique)) / count)
+
+    vmin = np.full(len(unique), np.inf)
+    vmax = np.full(len(unique), -np.inf)
+    np.minimum.at(vmin, inverse, values)
+    np.maximum.at(vmax, inverse, values)
+
+    return {"keys": unique, "count": count, "mean": mean, "std": std,
+            "min": vmin, "max": vmax}
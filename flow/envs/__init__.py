@@ -1,26 +1,27 @@
-"""Contains all callable environments in Flow."""
-from flow.envs.base_env import Env
-from flow.envs.bay_bridge.base import BayBridgeEnv
-from flow.envs.bottleneck_env import BottleNeckAccelEnv, BottleneckEnv, \
-    DesiredVelocityEnv
-from flow.envs.green_wave_env import TrafficLightGridEnv, \
-    PO_TrafficLightGridEnv, GreenWaveTestEnv
-from flow.envs.loop.lane_changing import LaneChangeAccelEnv, \
-    LaneChangeAccelPOEnv
-from flow.envs.loop.loop_accel import AccelEnv
-from flow.envs.loop.loop_merges import TwoLoopsMergePOEnv
-from flow.envs.loop.wave_attenuation import WaveAttenuationEnv, \
-    WaveAttenuationPOEnv
-from flow.envs.merge import WaveAttenuationMergePOEnv
-from flow.envs.test import TestEnv
-from flow.envs.multi_merge import VariableNumberVehicleMerge
+"""Contains all callable environments in Flow.
 
-__all__ = [
-    'Env', 'AccelEnv', 'LaneChangeAccelEnv',
-    'LaneChangeAccelPOEnv', 'GreenWaveTestEnv', 'GreenWaveTestEnv',
-    'WaveAttenuationMergePOEnv', 'TwoLoopsMergePOEnv', 'BottleneckEnv',
-    'BottleNeckAccelEnv', 'WaveAttenuationEnv', 'WaveAttenuationPOEnv',
-    'TrafficLightGridEnv', 'PO_TrafficLightGridEnv', 'DesiredVelocityEnv',
-    'TestEnv', 'BayBridgeEnv',
-    'VariableNumberVehicleMerge'
-]
+Environments are imported on first access (see flow.utils.lazy_import), so
+that importing this package does not import the modules of all environments
+and their dependencies.
+"""
+from flow.utils.lazy_import import lazy_package
+
+__all__ = lazy_package(__name__, {
+    'Env': 'flow.envs.base_env',
+    'AccelEnv': 'flow.envs.loop.loop_accel',
+    'LaneChangeAccelEnv': 'flow.envs.loop.lane_changing',
+    'LaneChangeAccelPOEnv': 'flow.envs.loop.lane_changing',
+    'GreenWaveTestEnv': 'flow.envs.green_wave_env',
+    'WaveAttenuationMergePOEnv': 'flow.envs.merge',
+    'TwoLoopsMergePOEnv': 'flow.envs.loop.loop_merges',
+    'BottleneckEnv': 'flow.envs.bottleneck_env',
+    'BottleNeckAccelEnv': 'flow.envs.bottleneck_env',
+    'WaveAttenuationEnv': 'flow.envs.loop.wave_attenuation',
+    'WaveAttenuationPOEnv': 'flow.envs.loop.wave_attenuation',
+    'TrafficLightGridEnv': 'flow.envs.green_wave_env',
+    'PO_TrafficLightGridEnv': 'flow.envs.green_wave_env',
+    'DesiredVelocityEnv': 'flow.envs.bottleneck_env',
+    'TestEnv': 'flow.envs.test',
+    'BayBridgeEnv': 'flow.envs.bay_bridge.base',
+    'VariableNumberVehicleMerge': 'flow.envs.multi_merge',
+})
@@ -1,13 +1,10 @@
 """Base environment class. This is the parent of all other environments."""
 
 from copy import deepcopy
-import os
 import atexit
-import time
 import traceback
 import numpy as np
 import random
-from flow.renderer.pyglet_renderer import PygletRenderer as Renderer
 
 import gym
 from gym.spaces import Box
@@ -23,6 +20,11 @@ try:
 except ImportError:
     serializable_flag = False
 
+from flow.controllers.car_following_models import SimCarFollowingController
+from flow.controllers.lane_change_controllers import SimLaneChangeController
+from flow.controllers.rlcontroller import RLController
+from flow.core.params import SPEED_MODES, LC_MODES
+from flow.core.inflows import InflowGenerator
 from flow.core.util import ensure_dir
 from flow.core.kernel import Kernel
 from flow.utils.exceptions import FatalFlowError
@@ -74,10 +76,6 @@ class Env(*classdef):
         self.env_params = env_params
         self.scenario = scenario
         self.sim_params = sim_params
-        time_stamp = ''.join(str(time.time()).split('.'))
-        if os.environ.get("TEST_FLAG", 0):
-            # 1.0 works with stress_test_start 10k times
-            time.sleep(1.0 * int(time_stamp[-6:]) / 1e6)
         # FIXME: this is sumo-specific
         self.sim_params.port = sumolib.miscutils.getFreeSocketPort()
         # time_counter: number of steps taken since the start of a rollout
@@ -101,6 +99,20 @@ class Env(*classdef):
         self.k = Kernel(simulator=self.simulator,
                         sim_params=sim_params)
 
+        # the vehicles of inflows managed by Flow are inserted by the
+        # environment rather than by the simulator (see flow/core/inflows.py)
+        inflows = scenario.net_params.inflows
+        if getattr(inflows, "managed", False):
+            self.inflows = InflowGenerator(
+                inflows, sim_params.sim_step,
+                seed=getattr(sim_params, "seed", None))
+        else:
+            self.inflows = None
+
+        # streaming accumulator of the metrics of rollouts, updated after
+        # every update of the kernel if specified (see flow/core/metrics.py)
+        self.metrics = None
+
         # use the scenario class's network parameters to generate the necessary
         # scenario components within the scenario kernel
         self.k.scenario.generate_network(scenario)
@@ -150,7 +162,10 @@ class Env(*classdef):
                 lane_poly = [i for pt in _lane_poly for i in pt]
                 network.append(lane_poly)
 
-            # instantiate a pyglet renderer
+            # instantiate a pyglet renderer. The renderer (and its pyglet,
+            # matplotlib and opencv dependencies) is only imported when needed
+            from flow.renderer.pyglet_renderer import PygletRenderer \
+                as Renderer
             self.renderer = Renderer(
                 network,
                 self.sim_params.render,
@@ -186,8 +201,10 @@ class Env(*classdef):
         """
         self.k.close()
 
-        # killed the sumo process if using sumo/TraCI
-        if self.simulator == 'traci':
+        # killed the sumo process if using sumo/TraCI (unless it was returned
+        # to the server pool upon closing)
+        if self.simulator == 'traci' and \
+                self.k.simulation.sumo_proc is not None:
             self.k.simulation.sumo_proc.kill()
 
         if render is not None:
@@ -287,16 +304,14 @@ class Env(*classdef):
                     direction=direction)
 
             # perform (optionally) routing actions for all vehicles in the
-            # network, including RL and SUMO-controlled vehicles
-            routing_ids = []
+            # network, including RL and SUMO-controlled vehicles. Routers are
+            # only called if their trigger occurred in the last step (see
+            # flow.controllers.base_routing_controller.BaseRouter)
+            routing_ids = list(self.k.vehicle.get_routing_ids())
             routing_actions = []
-            for veh_id in self.k.vehicle.get_ids():
-                if self.k.vehicle.get_routing_controller(veh_id) \
-                        is not None:
-                    routing_ids.append(veh_id)
-                    route_contr = self.k.vehicle.get_routing_controller(
-                        veh_id)
-                    routing_actions.append(route_contr.choose_route(self))
+            for veh_id in routing_ids:
+                route_contr = self.k.vehicle.get_routing_controller(veh_id)
+                routing_actions.append(route_contr.choose_route(self))
 
             self.k.vehicle.choose_routes(routing_ids, routing_actions)
 
@@ -304,12 +319,19 @@ class Env(*classdef):
 
             self.additional_command()
 
+            # add the vehicles of managed inflows
+            if self.inflows is not None:
+                self.inflows.step(self.k)
+
             # advance the simulation in the simulator by one step
             self.k.simulation.simulation_step()
 
             # store new observations in the vehicles and traffic lights class
             self.k.update(reset=False)
 
+            if self.metrics is not None:
+                self.metrics.update(self.k)
+
             # update the colors of vehicles
             if self.sim_params.render:
                 self.k.vehicle.update_vehicle_colors()
@@ -343,6 +365,9 @@ class Env(*classdef):
         rl_clipped = self.clip_actions(rl_actions)
         reward = self.compute_reward(rl_clipped, fail=crash)
 
+        if self.metrics is not None:
+            self.metrics.push_reward(reward)
+
         return next_observation, reward, done, infos
 
     def reset(self):
@@ -364,9 +389,10 @@ class Env(*classdef):
         # reset the time counter
         self.time_counter = 0
 
-        # warn about not using restart_instance when using inflows
+        # warn about not using restart_instance when using inflows (unless they
+        # are managed by Flow)
         if len(self.scenario.net_params.inflows.get()) > 0 and \
-                not self.sim_params.restart_instance:
+                not self.sim_params.restart_instance and self.inflows is None:
             print(
                 "**********************************************************\n"
                 "**********************************************************\n"
@@ -394,6 +420,10 @@ class Env(*classdef):
         elif self.scenario.initial_config.shuffle:
             self.setup_initial_state()
 
+        # restart the managed inflows, and remove their queued vehicles
+        if self.inflows is not None:
+            self.inflows.reset(self.k)
+
         # clear all vehicles from the network and the vehicles class
         if self.simulator == 'traci':
             for veh_id in self.k.kernel_api.vehicle.getIDList():  # FIXME: hack
@@ -471,8 +501,12 @@ class Env(*classdef):
         observation = np.copy(states)
 
         # perform (optional) warm-up steps before training
-        for _ in range(self.env_params.warmup_steps):
-            observation, _, _, _ = self.step(rl_actions=None)
+        if self.env_params.warmup_steps > 0:
+            observation = self.fast_forward(self.env_params.warmup_steps)
+
+        # the metrics of the rollout start after the warm-up steps
+        if self.metrics is not None:
+            self.metrics.reset()
 
         # render a frame
         self.render(reset=True)
@@ -483,6 +517,168 @@ class Env(*classdef):
         """Additional commands that may be performed by the step method."""
         pass
 
+    def can_fast_forward(self):
+        """Return whether the environment may be advanced without actions in
+        a single call to the simulator.
+
+        This is the case if Flow has no per-step processing to perform, i.e.
+        if:
+
+        * the simulator supports advancing several steps at once ("traci"),
+        * the simulation is not rendered or recorded,
+        * the environment does not extend the ``step`` or
+          ``additional_command`` methods, and has no inflows managed by Flow,
+        * no vehicle that is (or may enter) the network is controlled by a
+          Flow acceleration, lane-changing or routing controller (RL vehicles
+          are not controlled if no actions are provided), and
+        * vehicles entering the network from inflows have the default speed
+          and lane change modes of sumo, as their modes can only be set once
+          the kernel is updated.
+
+        Returns
+        -------
+        bool
+            True if the environment may be fast-forwarded
+        """
+        if self.simulator != "traci" or self.sim_params.render \
+                or self.k.trajectory_path is not None:
+            return False
+
+        if type(self).step is not Env.step or \
+                type(self).additional_command is not Env.additional_command:
+            return False
+
+        # vehicles of managed inflows are added by Flow at every step
+        if self.inflows is not None:
+            return False
+
+        type_parameters = self.k.vehicle.type_parameters
+        for params in type_parameters.values():
+            if params["routing_controller"] is not None:
+                return False
+            if params["acceleration_controller"][0] == RLController:
+                continue
+            if params["acceleration_controller"][0] != \
+                    SimCarFollowingController or \
+                    params["lane_change_controller"][0] != \
+                    SimLaneChangeController:
+                return False
+
+        for inflow in self.scenario.net_params.inflows.get():
+            params = type_parameters[inflow["vtype"]]
+            if params["car_following_params"].speed_mode != \
+                    SPEED_MODES["all_checks"] or \
+                    params["lane_change_params"].lane_change_mode != \
+                    LC_MODES["strategic"]:
+                return False
+
+        return True
+
+    def fast_forward(self, num_steps):
+        """Advance the environment by several steps without any actions.
+
+        If possible (see ``can_fast_forward``), the simulator is advanced by
+        all steps in a single call, and the kernel, state and observation are
+        only updated after the last step. Otherwise, the steps are performed
+        one at a time with ``step``. Collisions are not checked in between
+        steps.
+
+        Parameters
+        ----------
+        num_steps : int
+            number of environment steps to perform
+
+        Returns
+        -------
+        numpy ndarray
+            agent's observation after the last step
+        """
+        if not self.can_fast_forward():
+            observation = None
+            for _ in range(num_steps):
+                observation, _, _, _ = self.step(rl_actions=None)
+            return observation
+
+        num_sim_steps = num_steps * self.env_params.sims_per_step
+        self.time_counter += num_sim_steps
+        self.step_counter += num_sim_steps
+
+        # advance the simulation and update the kernel once
+        self.k.fast_forward(num_sim_steps)
+
+        states = self.get_state()
+
+        # collect information of the state of the network based on the
+        # environment class used
+        self.state = np.asarray(states).T
+
+        return np.copy(states)
+
+    def _fork_memo(self):
+        """Return the memo used to copy the environment when forking.
+
+        Objects in the memo are shared by the environment and its checkpoints
+        instead of being copied, as they do not change within a rollout.
+        """
+        shared = [self.k, self.scenario, self.env_params, self.sim_params,
+                  self.initial_vehicles, getattr(self, "renderer", None)]
+        return {id(obj): obj for obj in shared if obj is not None}
+
+    def fork(self):
+        """Capture the current state of the environment.
+
+        The checkpoint contains the state of the simulator and of the vehicle
+        and traffic light kernels, the attributes of the environment (e.g. the
+        time counter, or any environment-specific bookkeeping such as queues
+        of rl vehicles or traffic light timers), and the state of the random
+        number generators. This allows lookahead planners to evaluate several
+        branches from the same state without re-simulating from a reset:
+
+        >>> checkpoint = env.fork()
+        >>> for actions in candidates:
+        >>>     env.restore(checkpoint)
+        >>>     rollout(env, actions)
+
+        Checkpoints are only valid until the environment is reset with a new
+        instance of the simulator, or terminated. Checkpoints that are no
+        longer needed should be released (see ``release``).
+
+        Returns
+        -------
+        dict
+            checkpoint of the current state, see ``restore``
+        """
+        env_state = {key: value for key, value in self.__dict__.items()
+                     if key != "k"}
+        return {"kernel": self.k.fork(),
+                "env": deepcopy(env_state, self._fork_memo()),
+                "rng": (random.getstate(), np.random.get_state())}
+
+    def restore(self, checkpoint):
+        """Restore a state of the environment captured by ``fork``.
+
+        Parameters
+        ----------
+        checkpoint : dict
+            checkpoint generated by ``fork``
+        """
+        self.k.restore(checkpoint["kernel"])
+        self.__dict__.update(deepcopy(checkpoint["env"], self._fork_memo()))
+        random.setstate(checkpoint["rng"][0])
+        np.random.set_state(checkpoint["rng"][1])
+
+    def release(self, checkpoint):
+        """Free the resources held by a checkpoint captured by ``fork``.
+
+        The checkpoint cannot be restored afterwards.
+
+        Parameters
+        ----------
+        checkpoint : dict
+            checkpoint generated by ``fork``
+        """
+        self.k.release(checkpoint["kernel"])
+
     def clip_actions(self, rl_actions=None):
         """Clip the actions passed from the RL agent.
 
@@ -112,7 +112,7 @@ class BayBridgeEnv(Env):
                 if self.simulator == 'traci':
                     lane_change_mode = self.cars_before_ramp[veh_id][
                         'lane_change_mode']
-                    self.k.kernel_api.vehicle.setLaneChangeMode(
+                    self.k.vehicle.set_lane_change_mode(
                         veh_id, lane_change_mode)
                 color = self.cars_before_ramp[veh_id]['color']
                 self.k.vehicle.set_color(veh_id, color)
@@ -131,9 +131,9 @@ class BayBridgeEnv(Env):
                     if veh_id not in self.cars_waiting_for_toll:
                         if self.simulator == 'traci':
                             # Disable lane changes inside Toll Area
-                            lane_change_mode = self.k.kernel_api.vehicle.\
-                                getLaneChangeMode(veh_id)
-                            self.k.kernel_api.vehicle.setLaneChangeMode(
+                            lane_change_mode = \
+                                self.k.vehicle.get_lane_change_mode(veh_id)
+                            self.k.vehicle.set_lane_change_mode(
                                 veh_id, 512)
                         else:
                             lane_change_mode = None
@@ -152,7 +152,7 @@ class BayBridgeEnv(Env):
                 if self.simulator == 'traci':
                     lane_change_mode = \
                         self.cars_waiting_for_toll[veh_id]["lane_change_mode"]
-                    self.k.kernel_api.vehicle.setLaneChangeMode(
+                    self.k.vehicle.set_lane_change_mode(
                         veh_id, lane_change_mode)
                 color = self.cars_waiting_for_toll[veh_id]["color"]
                 self.k.vehicle.set_color(veh_id, color)
@@ -186,9 +186,9 @@ class BayBridgeEnv(Env):
                     if veh_id not in self.cars_waiting_for_toll:
                         if self.simulator == 'traci':
                             # Disable lane changes inside Toll Area
-                            lc_mode = self.k.kernel_api.vehicle.\
-                                getLaneChangeMode(veh_id)
-                            self.k.kernel_api.vehicle.setLaneChangeMode(
+                            lc_mode = self.k.vehicle.get_lane_change_mode(
+                                veh_id)
+                            self.k.vehicle.set_lane_change_mode(
                                 veh_id, 512)
                         else:
                             lc_mode = None
@@ -194,7 +194,7 @@ class BottleneckEnv(Env):
                 if self.simulator == 'traci':
                     lane_change_mode = self.cars_before_ramp[veh_id][
                         'lane_change_mode']
-                    self.k.kernel_api.vehicle.setLaneChangeMode(
+                    self.k.vehicle.set_lane_change_mode(
                         veh_id, lane_change_mode)
                 cars_that_have_left.append(veh_id)
 
@@ -211,9 +211,9 @@ class BottleneckEnv(Env):
                         if self.simulator == 'traci':
                             # Disable lane changes inside Toll Area
                             lane_change_mode = \
-                                self.k.kernel_api.vehicle.getLaneChangeMode(
+                                self.k.vehicle.get_lane_change_mode(
                                     veh_id)
-                            self.k.kernel_api.vehicle.setLaneChangeMode(
+                            self.k.vehicle.set_lane_change_mode(
                                 veh_id, 512)
                         else:
                             lane_change_mode = None
@@ -258,7 +258,7 @@ class BottleneckEnv(Env):
                 if self.simulator == 'traci':
                     lane_change_mode = \
                         self.cars_waiting_for_toll[veh_id]["lane_change_mode"]
-                    self.k.kernel_api.vehicle.setLaneChangeMode(
+                    self.k.vehicle.set_lane_change_mode(
                         veh_id, lane_change_mode)
                 if lane not in self.fast_track_lanes:
                     self.toll_wait_time[lane] = max(
@@ -289,9 +289,9 @@ class BottleneckEnv(Env):
                     if veh_id not in self.cars_waiting_for_toll:
                         # Disable lane changes inside Toll Area
                         if self.simulator == 'traci':
-                            lane_change_mode = self.k.kernel_api.vehicle.\
-                                getLaneChangeMode(veh_id)
-                            self.k.kernel_api.vehicle.setLaneChangeMode(
+                            lane_change_mode = \
+                                self.k.vehicle.get_lane_change_mode(veh_id)
+                            self.k.vehicle.set_lane_change_mode(
                                 veh_id, 512)
                         else:
                             lane_change_mode = None
@@ -331,7 +331,14 @@ class BottleneckEnv(Env):
             return -1
 
     def get_bottleneck_outflow_vehicles_per_hour(self, sample_period):
-        """Return the vehs/hour based on sample_period."""
+        """Return the vehs/hour based on sample_period.
+
+        The outflow is read from the metrics of the rollout if they are
+        accumulated (see flow.core.metrics.RolloutMetrics), in which case it
+        is limited to their throughput window.
+        """
+        if self.metrics is not None:
+            return self.metrics.outflow.rate(sample_period)
         return self.k.vehicle.get_outflow_rate(sample_period)
 
     def get_bottleneck_density(self, lanes=None):
@@ -420,6 +427,27 @@ class BottleNeckAccelEnv(BottleneckEnv):
         super().__init__(env_params, sim_params, scenario, simulator)
         self.add_rl_if_exit = env_params.get_additional_param("add_rl_if_exit")
 
+        # normalized edge numbers, indexed by the interned edge indices of the
+        # scenario kernel (see _edge_nums)
+        self._edge_nums_ids = None
+        self._edge_nums_table = None
+
+    def _edge_nums(self):
+        """Return the normalized number of every edge in the network.
+
+        Edges are numbered by their ids, divided by 6. Internal links and
+        other non-numbered edges are assigned a value of -1, as are vehicles on
+        unknown edges (which are given an index of -1 by the vehicle kernel).
+        The table is rebuilt whenever the network is generated again.
+        """
+        edge_ids = self.k.scenario.edge_ids
+        if self._edge_nums_ids is not edge_ids:
+            self._edge_nums_table = np.array([
+                int(edge) / 6 if edge.isdigit() else -1 for edge in edge_ids
+            ] + [-1])
+            self._edge_nums_ids = edge_ids
+        return self._edge_nums_table
+
     @property
     def observation_space(self):
         """See class definition."""
@@ -435,6 +463,7 @@ class BottleNeckAccelEnv(BottleneckEnv):
         headway_scale = 1000
 
         rl_ids = self.k.vehicle.get_rl_ids()
+        edge_nums = self._edge_nums()
 
         # rl vehicle data (absolute position, speed, and lane index)
         rl_obs = np.empty(0)
@@ -450,15 +479,7 @@ class BottleNeckAccelEnv(BottleneckEnv):
                 id_counter += 1
 
             # get the edge and convert it to a number
-            edge_num = self.k.vehicle.get_edge(veh_id)
-            if edge_num is None:
-                edge_num = -1
-            elif edge_num == '':
-                edge_num = -1
-            elif edge_num[0] == ':':
-                edge_num = -1
-            else:
-                edge_num = int(edge_num) / 6
+            edge_num = edge_nums[self.k.vehicle.get_edge_index(veh_id)]
             rl_obs = np.concatenate((rl_obs, [
                 self.k.vehicle.get_x_by_id(veh_id) / 1000,
                 (self.k.vehicle.get_speed(veh_id) / self.max_speed),
@@ -616,6 +637,8 @@ class DesiredVelocityEnv(BottleneckEnv):
     """
 
     def __init__(self, env_params, sim_params, scenario, simulator='traci'):
+        if env_params.additional_params.get("reset_inflow"):
+            scenario = self._managed_inflow_scenario(scenario, env_params)
         super().__init__(env_params, sim_params, scenario, simulator)
         for p in ADDITIONAL_VSL_ENV_PARAMS.keys():
             if p not in env_params.additional_params:
@@ -714,6 +737,77 @@ class DesiredVelocityEnv(BottleneckEnv):
                     ]
                 index += 1
 
+    @staticmethod
+    def _managed_inflow_scenario(scenario, env_params):
+        """Return a scenario whose inflows may be resampled at every reset.
+
+        The scenario has an inflow of followerstopper (10%) and human (90%)
+        vehicles on the first edge. Its inflows are managed by Flow (see
+        flow/core/inflows.py), so that their rates can be changed without
+        generating the network again. Their initial rate is the maximum of
+        the inflow range; they are resampled on every reset.
+        """
+        inflow_range = env_params.additional_params.get("inflow_range")
+        scaling = scenario.net_params.additional_params.get("scaling")
+        flow_rate = max(inflow_range) * scaling
+
+        inflow = InFlows(managed=True)
+        inflow.add(
+            veh_type="followerstopper",
+            edge="1",
+            name="followerstopper",
+            vehs_per_hour=flow_rate * .1,
+            departLane="random",
+            departSpeed=10)
+        inflow.add(
+            veh_type="human",
+            edge="1",
+            name="human",
+            vehs_per_hour=flow_rate * .9,
+            departLane="random",
+            departSpeed=10)
+
+        additional_net_params = {
+            "scaling": scaling,
+            "speed_limit": scenario.net_params.additional_params['speed_limit']
+        }
+        net_params = NetParams(
+            inflows=inflow,
+            no_internal_links=False,
+            additional_params=additional_net_params)
+
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="human",
+            car_following_params=SumoCarFollowingParams(
+                speed_mode=9,
+            ),
+            lane_change_controller=(SimLaneChangeController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            lane_change_params=SumoLaneChangeParams(
+                lane_change_mode=0,  # 1621,#0b100000101,
+            ),
+            num_vehicles=1 * scaling)
+        vehicles.add(
+            veh_id="followerstopper",
+            acceleration_controller=(RLController, {}),
+            lane_change_controller=(SimLaneChangeController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            car_following_params=SumoCarFollowingParams(
+                speed_mode=9,
+            ),
+            lane_change_params=SumoLaneChangeParams(
+                lane_change_mode=0,
+            ),
+            num_vehicles=1 * scaling)
+
+        return scenario.__class__(
+            name=scenario.orig_name,
+            vehicles=vehicles,
+            net_params=net_params,
+            initial_config=scenario.initial_config,
+            traffic_lights=scenario.traffic_lights)
+
     @property
     def observation_space(self):
         """See class definition."""
@@ -849,77 +943,23 @@ class DesiredVelocityEnv(BottleneckEnv):
         return reward
 
     def reset(self):
+        """See parent class.
+
+        If requested, the inflow rate is sampled from the inflow range. The
+        inflows are managed by Flow (see ``_managed_inflow_scenario``), so
+        that their rates can be changed without generating the network again.
+        """
         add_params = self.env_params.additional_params
         if add_params.get("reset_inflow"):
             inflow_range = add_params.get("inflow_range")
             flow_rate = np.random.uniform(
                 min(inflow_range), max(inflow_range)) * self.scaling
-            for _ in range(100):
-                try:
-                    inflow = InFlows()
-                    inflow.add(
-                        veh_type="followerstopper",
-                        edge="1",
-                        vehs_per_hour=flow_rate * .1,
-                        departLane="random",
-                        departSpeed=10)
-                    inflow.add(
-                        veh_type="human",
-                        edge="1",
-                        vehs_per_hour=flow_rate * .9,
-                        departLane="random",
-                        departSpeed=10)
-
-                    additional_net_params = {
-                        "scaling": self.scaling,
-                        "speed_limit": self.scenario.net_params.
-                        additional_params['speed_limit']
-                    }
-                    net_params = NetParams(
-                        inflows=inflow,
-                        no_internal_links=False,
-                        additional_params=additional_net_params)
-
-                    vehicles = VehicleParams()
-                    vehicles.add(
-                        veh_id="human",
-                        car_following_params=SumoCarFollowingParams(
-                            speed_mode=9,
-                        ),
-                        lane_change_controller=(SimLaneChangeController, {}),
-                        routing_controller=(ContinuousRouter, {}),
-                        lane_change_params=SumoLaneChangeParams(
-                            lane_change_mode=0,  # 1621,#0b100000101,
-                        ),
-                        num_vehicles=1 * self.scaling)
-                    vehicles.add(
-                        veh_id="followerstopper",
-                        acceleration_controller=(RLController, {}),
-                        lane_change_controller=(SimLaneChangeController, {}),
-                        routing_controller=(ContinuousRouter, {}),
-                        car_following_params=SumoCarFollowingParams(
-                            speed_mode=9,
-                        ),
-                        lane_change_params=SumoLaneChangeParams(
-                            lane_change_mode=0,
-                        ),
-                        num_vehicles=1 * self.scaling)
-
-                    self.scenario = self.scenario.__class__(
-                        name=self.scenario.orig_name,
-                        vehicles=vehicles,
-                        net_params=net_params,
-                        initial_config=self.scenario.initial_config,
-                        traffic_lights=self.scenario.traffic_lights)
-                    observation = super().reset()
-
-                    # reset the timer to zero
-                    self.time_counter = 0
-
-                    return observation
-
-                except Exception as e:
-                    print('error on reset ', e)
+            # inflows are looked up by vehicle type, as their names are
+            # suffixed with their index by InFlows.add
+            shares = {"followerstopper": .1, "human": .9}
+            for name, veh_type in zip(self.inflows.names, self.inflows.types):
+                self.inflows.set_rate(
+                    name, vehs_per_hour=flow_rate * shares[veh_type])
 
         # perform the generic reset function
         observation = super().reset()
@@ -88,6 +88,14 @@ class TrafficLightGridEnv(Env):
         }
         self.node_mapping = scenario.get_node_mapping()
 
+        # lookup tables of edge numbers (see _convert_edge) and of the routes
+        # vehicles are placed on once they reach a given edge (see
+        # _reroute_if_final_edge), indexed by the interned edge indices of the
+        # scenario kernel. These are generated when first needed.
+        self._edge_tables_ids = None
+        self._edge_nums = None
+        self._final_edge_routes = None
+
         # keeps track of the last time the light was allowed to change.
         self.last_change = np.zeros((self.rows * self.cols, 3))
 
@@ -97,11 +105,18 @@ class TrafficLightGridEnv(Env):
         # For third column, 0 signifies yellow and 1 green or red
         self.min_switch_time = env_params.additional_params["switch_time"]
 
+        # names of the traffic lights, and the states they are switched to
+        # when in the green/red and yellow phases, indexed by direction
+        self._tl_ids = np.array(
+            ['center{}'.format(i) for i in range(self.num_traffic_lights)])
+        self._green_states = np.array(['GrGr', 'rGrG'])
+        self._yellow_states = np.array(['yryr', 'ryry'])
+
         if self.tl_type != "actuated":
-            for i in range(self.rows * self.cols):
-                self.k.traffic_light.set_state(
-                    node_id='center' + str(i), state="GGGrrrGGGrrr")
-                self.last_change[i, 2] = 1
+            self.k.traffic_light.set_states(
+                self._tl_ids.tolist(),
+                ["GGGrrrGGGrrr"] * self.num_traffic_lights)
+            self.last_change[:, 2] = 1
 
         # # Additional Information for Plotting
         # self.edge_mapping = {"top": [], "bot": [], "right": [], "left": []}
@@ -168,11 +183,11 @@ class TrafficLightGridEnv(Env):
             self.get_distance_to_intersection(veh_id) / max_dist
             for veh_id in self.k.vehicle.get_ids()
         ]
-        edges = [
-            self._convert_edge(self.k.vehicle.get_edge(veh_id)) /
-            (self.k.scenario.network.num_edges - 1)
-            for veh_id in self.k.vehicle.get_ids()
-        ]
+        edge_nums, _ = self._edge_tables()
+        edges = (
+            edge_nums[self.k.vehicle.get_edge_index(self.k.vehicle.get_ids())]
+            / (self.k.scenario.network.num_edges - 1)
+        ).tolist()
 
         state = [
             speeds, dist_to_intersec, edges,
@@ -184,42 +199,38 @@ class TrafficLightGridEnv(Env):
         """See class definition."""
         # check if the action space is discrete
         if self.discrete:
-            # convert single value to list of 0's and 1's
-            rl_mask = [int(x) for x in list('{0:0b}'.format(rl_actions))]
-            rl_mask = [0] * (self.num_traffic_lights - len(rl_mask)) + rl_mask
+            # convert single value to an array of 0's and 1's, the first
+            # traffic light corresponding to the most significant bit
+            bits = np.arange(self.num_traffic_lights - 1, -1, -1)
+            rl_mask = (np.right_shift(int(rl_actions), bits) & 1) == 1
         else:
             # convert values less than 0.5 to zero and above to 1. 0's indicate
             # that should not switch the direction
-            rl_mask = rl_actions > 0.0
-
-        for i, action in enumerate(rl_mask):
-            # check if our timer has exceeded the yellow phase, meaning it
-            # should switch to red
-            if self.last_change[i, 2] == 0:  # currently yellow
-                self.last_change[i, 0] += self.sim_step
-                if self.last_change[i, 0] >= self.min_switch_time:
-                    if self.last_change[i, 1] == 0:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i),
-                            state="GrGr")
-                    else:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i),
-                            state='rGrG')
-                    self.last_change[i, 2] = 1
-            else:
-                if action:
-                    if self.last_change[i, 1] == 0:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i),
-                            state='yryr')
-                    else:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i),
-                            state='ryry')
-                    self.last_change[i, 0] = 0.0
-                    self.last_change[i, 1] = not self.last_change[i, 1]
-                    self.last_change[i, 2] = 0
+            rl_mask = np.asarray(rl_actions) > 0.0
+
+        # the phase of all traffic lights is updated at once
+        direction = self.last_change[:, 1].astype(int)
+        yellow = self.last_change[:, 2] == 0
+
+        # check if our timer has exceeded the yellow phase, meaning it should
+        # switch to red
+        self.last_change[yellow, 0] += self.sim_step
+        to_green = yellow & (self.last_change[:, 0] >= self.min_switch_time)
+
+        # lights that are not yellow switch direction if requested to
+        to_yellow = ~yellow & rl_mask
+
+        # send the new states of the switched traffic lights to the simulator
+        switched = to_green | to_yellow
+        states = np.where(to_green, self._green_states[direction],
+                          self._yellow_states[direction])
+        self.k.traffic_light.set_states(
+            self._tl_ids[switched].tolist(), states[switched].tolist())
+
+        self.last_change[to_green, 2] = 1
+        self.last_change[to_yellow, 0] = 0.0
+        self.last_change[to_yellow, 1] = 1 - direction[to_yellow]
+        self.last_change[to_yellow, 2] = 0
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
@@ -235,11 +246,12 @@ class TrafficLightGridEnv(Env):
         Records velocities and edges in self.obs_var_labels at each time
         step. This is used for plotting.
         """
+        edge_nums, _ = self._edge_tables()
         for i, veh_id in enumerate(self.k.vehicle.get_ids()):
             self.obs_var_labels['velocities'][
                 self.time_counter - 1, i] = self.k.vehicle.get_speed(veh_id)
             self.obs_var_labels['edges'][self.time_counter - 1, i] = \
-                self._convert_edge(self.k.vehicle.get_edge(veh_id))
+                edge_nums[self.k.vehicle.get_edge_index(veh_id)]
             x = self.k.vehicle.get_x_by_id(veh_id)
             if x > 2000:  # hardcode
                 x = 0
@@ -351,6 +363,44 @@ class TrafficLightGridEnv(Env):
         else:
             return 0
 
+    def _edge_tables(self):
+        """Return lookup tables of edge numbers and rerouting destinations.
+
+        The tables are indexed by the interned edge indices of the scenario
+        kernel, and contain an additional last element for vehicles on unknown
+        edges (index -1). They are rebuilt whenever the network is generated
+        again (e.g. when restarting the simulation).
+
+        Returns
+        -------
+        np.ndarray
+            number uniquely identifying each edge (see _convert_edge)
+        list of str or None
+            route the vehicles are placed on once they reach each edge, or None
+            if the edge is not an exit edge
+        """
+        edge_ids = self.k.scenario.edge_ids
+        if self._edge_tables_ids is not edge_ids:
+            edge_nums = []
+            final_edge_routes = []
+            for edge in edge_ids:
+                # edges that do not follow the naming convention of the grid
+                # (e.g. junctions at the boundary nodes) are not numbered
+                try:
+                    edge_nums.append(self._split_edge(edge))
+                except (AttributeError, IndexError, ValueError):
+                    edge_nums.append(0)
+                try:
+                    final_edge_routes.append(self._get_final_edge_route(edge))
+                except (AttributeError, IndexError, ValueError):
+                    final_edge_routes.append(None)
+
+            self._edge_nums = np.array(edge_nums + [0])
+            self._final_edge_routes = final_edge_routes + [None]
+            self._edge_tables_ids = edge_ids
+
+        return self._edge_nums, self._final_edge_routes
+
     def additional_command(self):
         """Used to insert vehicles that are on the exit edge and place them
         back on their entrance edge."""
@@ -360,11 +410,30 @@ class TrafficLightGridEnv(Env):
     def _reroute_if_final_edge(self, veh_id):
         """Checks if an edge is the final edge. If it is return the route it
         should start off at."""
-        edge = self.k.vehicle.get_edge(veh_id)
+        _, final_edge_routes = self._edge_tables()
+        route_id = final_edge_routes[self.k.vehicle.get_edge_index(veh_id)]
+
+        if route_id is not None:
+            type_id = self.k.vehicle.get_type(veh_id)
+            lane_index = self.k.vehicle.get_lane(veh_id)
+            # remove the vehicle
+            self.k.vehicle.remove(veh_id)
+            # reintroduce it at the start of the network
+            self.k.vehicle.add(
+                veh_id=veh_id,
+                edge=route_id,
+                type_id=str(type_id),
+                lane=str(lane_index),
+                pos="0",
+                speed="max")
+
+    def _get_final_edge_route(self, edge):
+        """Return the route a vehicle should start off at once it reaches an
+        edge, or None if the edge is not a final edge."""
         if edge == "":
-            return
+            return None
         if edge[0] == ":":  # center edge
-            return
+            return None
         pattern = re.compile(r"[a-zA-Z]+")
         edge_type = pattern.match(edge).group()
         edge = edge.split(edge_type)[1].split('_')
@@ -382,19 +451,7 @@ class TrafficLightGridEnv(Env):
         elif edge_type == 'right' and row_index == self.rows:
             route_id = "right0_{}".format(col_index)
 
-        if route_id is not None:
-            type_id = self.k.vehicle.get_type(veh_id)
-            lane_index = self.k.vehicle.get_lane(veh_id)
-            # remove the vehicle
-            self.k.vehicle.remove(veh_id)
-            # reintroduce it at the start of the network
-            self.k.vehicle.add(
-                veh_id=veh_id,
-                edge=route_id,
-                type_id=str(type_id),
-                lane=str(lane_index),
-                pos="0",
-                speed="max")
+        return route_id
 
     def k_closest_to_intersection(self, edges, k):
         """
@@ -406,23 +463,11 @@ class TrafficLightGridEnv(Env):
             raise IndexError("k must be greater than 0")
         dists = []
 
-        def sort_lambda(veh_id):
-            return self.get_distance_to_intersection(veh_id)
-
         if isinstance(edges, list):
             for edge in edges:
-                vehicles = self.k.vehicle.get_ids_by_edge(edge)
-                dist = sorted(
-                    vehicles,
-                    key=sort_lambda
-                )
-                dists += dist[:k]
+                dists += self.k.vehicle.get_k_closest_to_end(edge, k)
         else:
-            vehicles = self.k.vehicle.get_ids_by_edge(edges)
-            dist = sorted(
-                vehicles,
-                key=lambda veh_id: self.get_distance_to_intersection(veh_id))
-            dists += dist[:k]
+            dists += self.k.vehicle.get_k_closest_to_end(edges, k)
         return dists
 
 
@@ -510,6 +555,7 @@ class PO_TrafficLightGridEnv(TrafficLightGridEnv):
         max_dist = max(self.scenario.short_length, self.scenario.long_length,
                        self.scenario.inner_length)
         all_observed_ids = []
+        edge_nums, _ = self._edge_tables()
 
         for node, edges in self.scenario.get_node_mapping():
             for edge in edges:
@@ -529,10 +575,10 @@ class PO_TrafficLightGridEnv(TrafficLightGridEnv):
                      - self.k.vehicle.get_position(veh_id)) / max_dist
                     for veh_id in observed_ids
                 ]
-                edge_number += \
-                    [self._convert_edge(self.k.vehicle.get_edge(veh_id))
-                     / (self.k.scenario.network.num_edges - 1)
-                     for veh_id in observed_ids]
+                edge_number += (
+                    edge_nums[self.k.vehicle.get_edge_index(observed_ids)]
+                    / (self.k.scenario.network.num_edges - 1)
+                ).tolist()
 
                 if len(observed_ids) < self.num_observed:
                     diff = self.num_observed - len(observed_ids)
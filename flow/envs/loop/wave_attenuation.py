@@ -17,7 +17,6 @@ from gym.spaces.box import Box
 from copy import deepcopy
 import numpy as np
 import random
-from scipy.optimize import fsolve
 
 ADDITIONAL_ENV_PARAMS = {
     # maximum acceleration of autonomous vehicles
@@ -189,6 +188,9 @@ class WaveAttenuationEnv(Env):
 
             return error
 
+        # scipy is slow to import, and only needed here
+        from scipy.optimize import fsolve
+
         v_guess = 4.
         v_eq_max = fsolve(v_eq_max_function, v_guess)[0]
 
@@ -1,6 +1,12 @@
-from flow.multiagent_envs.multiagent_env import MultiEnv
-from flow.multiagent_envs.loop.wave_attenuation import \
-    MultiWaveAttenuationPOEnv
-from flow.multiagent_envs.loop.loop_accel import MultiAgentAccelEnv
+"""Contains all callable multi-agent environments in Flow.
 
-__all__ = ['MultiEnv', 'MultiAgentAccelEnv', 'MultiWaveAttenuationPOEnv']
+Environments are imported on first access (see flow.utils.lazy_import), so
+that ray is only imported when a multi-agent environment is used.
+"""
+from flow.utils.lazy_import import lazy_package
+
+__all__ = lazy_package(__name__, {
+    'MultiEnv': 'flow.multiagent_envs.multiagent_env',
+    'MultiAgentAccelEnv': 'flow.multiagent_envs.loop.loop_accel',
+    'MultiWaveAttenuationPOEnv': 'flow.multiagent_envs.loop.wave_attenuation',
+})
@@ -64,24 +64,25 @@ class MultiWaveAttenuationPOEnv(MultiEnv):
 
     def get_state(self):
         """See class definition."""
-        obs = {}
-        for rl_id in self.k.vehicle.get_rl_ids():
-            lead_id = self.k.vehicle.get_leader(rl_id) or rl_id
+        rl_ids = self.k.vehicle.get_rl_ids()
+        lead_ids = [self.k.vehicle.get_leader(rl_id) or rl_id
+                    for rl_id in rl_ids]
+
+        # normalizers
+        max_speed = 15.
+        max_length = self.env_params.additional_params['ring_length'][1]
 
-            # normalizers
-            max_speed = 15.
-            max_length = self.env_params.additional_params['ring_length'][1]
+        speed = np.array(self.k.vehicle.get_speed(rl_ids), dtype=float)
+        lead_speed = np.array(self.k.vehicle.get_speed(lead_ids), dtype=float)
+        headway = np.array(self.k.vehicle.get_headway(rl_ids), dtype=float)
 
-            observation = np.array([
-                self.k.vehicle.get_speed(rl_id) / max_speed,
-                (self.k.vehicle.get_speed(lead_id) -
-                 self.k.vehicle.get_speed(rl_id))
-                / max_speed,
-                self.k.vehicle.get_headway(rl_id) / max_length
-            ])
-            obs.update({rl_id: observation})
+        # the observations of all agents are stored in a single array
+        obs = np.empty((len(rl_ids), 3))
+        obs[:, 0] = speed / max_speed
+        obs[:, 1] = (lead_speed - speed) / max_speed
+        obs[:, 2] = headway / max_length
 
-        return obs
+        return self.agent_dict(rl_ids, obs)
 
     def _apply_rl_actions(self, rl_actions):
         """Split the accelerations by ring"""
@@ -96,27 +97,24 @@ class MultiWaveAttenuationPOEnv(MultiEnv):
         if rl_actions is None:
             return {}
 
-        rew = {}
-        for rl_id in rl_actions.keys():
-            edge_id = rl_id.split('_')[1]
-            edges = self.gen_edges(edge_id)
-            vehs_on_edge = self.k.vehicle.get_ids_by_edge(edges)
-            vel = np.array([
-                self.k.vehicle.get_speed(veh_id)
-                for veh_id in vehs_on_edge
-            ])
-            if any(vel < -100) or kwargs['fail']:
-                return 0.
+        rl_ids = list(rl_actions.keys())
+        veh_ids = self.k.vehicle.get_ids()
+        target_vel = self.env_params.additional_params['target_velocity']
 
-            target_vel = self.env_params.additional_params['target_velocity']
-            max_cost = np.array([target_vel] * len(vehs_on_edge))
-            max_cost = np.linalg.norm(max_cost)
+        # statistics of the speeds on every ring, computed once for all agents
+        vel = np.array(self.k.vehicle.get_speed(veh_ids), dtype=float)
+        vel_stats = self.get_group_stats(vel, veh_ids)
+        cost_stats = self.get_group_stats((vel - target_vel) ** 2, veh_ids)
 
-            cost = vel - target_vel
-            cost = np.linalg.norm(cost)
+        rings = self.get_agent_groups(rl_ids)
+        if any(vel_stats['min'][rings] < -100) or kwargs['fail']:
+            return 0.
 
-            rew[rl_id] = max(max_cost - cost, 0) / max_cost
-        return rew
+        max_cost = target_vel * np.sqrt(cost_stats['count'][rings])
+        cost = np.sqrt(cost_stats['sum'][rings])
+        rew = np.maximum(max_cost - cost, 0) / max_cost
+
+        return self.agent_dict(rl_ids, rew)
 
     def additional_command(self):
         """Define which vehicles are observed for visualization purposes."""
@@ -125,6 +123,18 @@ class MultiWaveAttenuationPOEnv(MultiEnv):
             lead_id = self.k.vehicle.get_leader(rl_id) or rl_id
             self.k.vehicle.set_observed(lead_id)
 
+    def specify_groups(self):
+        """Group the edges of the network by ring."""
+        num_rings = self.scenario.net_params.additional_params['num_rings']
+        return {str(i): self.gen_edges(i) for i in range(num_rings)}
+
+    def get_agent_groups(self, agent_ids):
+        """Return the ring of every agent, as specified by its id."""
+        names, _ = self._group_tables()
+        ring_index = {name: i for i, name in enumerate(names)}
+        return np.array([ring_index[agent_id.split('_')[1]]
+                         for agent_id in agent_ids], dtype=int)
+
     def gen_edges(self, i):
         """Return the edges corresponding to the rl id"""
         return ['top_{}'.format(i), 'left_{}'.format(i),
@@ -16,6 +16,15 @@ from flow.utils.exceptions import FatalFlowError
 class MultiEnv(MultiAgentEnv, Env):
     """Multi-agent version of base env. See parent class for info"""
 
+    def __init__(self, env_params, sim_params, scenario, simulator='traci'):
+        # tables used to compute group-level statistics, built from the edges
+        # of the network they were computed for (see _group_tables)
+        self._group_names = None
+        self._edge_groups = None
+        self._group_edge_ids = None
+
+        super().__init__(env_params, sim_params, scenario, simulator)
+
     def step(self, rl_actions):
         """Advance the environment by one step.
 
@@ -71,27 +80,34 @@ class MultiEnv(MultiAgentEnv, Env):
                     self.k.vehicle.get_controlled_lc_ids(),
                     direction=direction)
 
-            # perform (optionally) routing actions for all vehicle in the
-            # network, including rl and sumo-controlled vehicles
-            routing_ids = []
+            # perform (optionally) routing actions for all vehicles in the
+            # network, including RL and SUMO-controlled vehicles. Routers are
+            # only called if their trigger occurred in the last step (see
+            # flow.controllers.base_routing_controller.BaseRouter)
+            routing_ids = list(self.k.vehicle.get_routing_ids())
             routing_actions = []
-            for veh_id in self.k.vehicle.get_ids():
-                if self.k.vehicle.get_routing_controller(veh_id) is not None:
-                    routing_ids.append(veh_id)
-                    route_contr = self.k.vehicle.get_routing_controller(veh_id)
-                    routing_actions.append(route_contr.choose_route(self))
+            for veh_id in routing_ids:
+                route_contr = self.k.vehicle.get_routing_controller(veh_id)
+                routing_actions.append(route_contr.choose_route(self))
             self.k.vehicle.choose_routes(routing_ids, routing_actions)
 
             self.apply_rl_actions(rl_actions)
 
             self.additional_command()
 
+            # add the vehicles of managed inflows
+            if self.inflows is not None:
+                self.inflows.step(self.k)
+
             # advance the simulation in the simulator by one step
             self.k.simulation.simulation_step()
 
             # store new observations in the vehicles and traffic lights class
             self.k.update(reset=False)
 
+            if self.metrics is not None:
+                self.metrics.update(self.k)
+
             # update the colors of vehicles
             if self.sim_params.render:
                 self.k.vehicle.update_vehicle_colors()
@@ -115,6 +131,9 @@ class MultiEnv(MultiAgentEnv, Env):
         clipped_actions = self.clip_actions(rl_actions)
         reward = self.compute_reward(clipped_actions, fail=crash)
 
+        if self.metrics is not None:
+            self.metrics.push_reward(reward)
+
         return states, reward, done, infos
 
     def reset(self, new_inflow_rate=None):
@@ -136,9 +155,10 @@ class MultiEnv(MultiAgentEnv, Env):
         # reset the time counter
         self.time_counter = 0
 
-        # warn about not using restart_instance when using inflows
+        # warn about not using restart_instance when using inflows (unless they
+        # are managed by Flow)
         if len(self.scenario.net_params.inflows.get()) > 0 and \
-                not self.sim_params.restart_instance:
+                not self.sim_params.restart_instance and self.inflows is None:
             print(
                 "**********************************************************\n"
                 "**********************************************************\n"
@@ -166,6 +186,10 @@ class MultiEnv(MultiAgentEnv, Env):
         elif self.scenario.initial_config.shuffle:
             self.setup_initial_state()
 
+        # restart the managed inflows, and remove their queued vehicles
+        if self.inflows is not None:
+            self.inflows.reset(self.k)
+
         # clear all vehicles from the network and the vehicles class
         if self.simulator == 'traci':
             for veh_id in self.k.kernel_api.vehicle.getIDList():  # FIXME: hack
@@ -237,6 +261,10 @@ class MultiEnv(MultiAgentEnv, Env):
         for _ in range(self.env_params.warmup_steps):
             observation, _, _, _ = self.step(rl_actions=None)
 
+        # the metrics of the rollout start after the warm-up steps
+        if self.metrics is not None:
+            self.metrics.reset()
+
         # render a frame
         self.render(reset=True)
 
@@ -289,3 +317,154 @@ class MultiEnv(MultiAgentEnv, Env):
         # clip according to the action space requirements
         clipped_actions = self.clip_actions(rl_actions)
         self._apply_rl_actions(clipped_actions)
+
+    def specify_groups(self):
+        """Specify the groups (rings, regions, ...) of the network.
+
+        Groups are used to compute aggregate statistics of the vehicles in
+        different parts of the network (see ``get_group_stats``), and are
+        shared by all the agents located in them (see ``get_agent_groups``).
+        By default, no groups are specified.
+
+        Returns
+        -------
+        dict
+            Key = name of the group, Element = list of edges in the group
+        """
+        return {}
+
+    def _group_tables(self):
+        """Return the tables used to compute group-level statistics.
+
+        The tables are recomputed whenever the edges of the network change
+        (e.g. when a new network is generated during a reset).
+
+        Returns
+        -------
+        list
+            names of the groups, ordered by group index
+        np.ndarray
+            group index of every edge in the network, by edge index. The last
+            element (index -1) corresponds to unknown edges, and is set to -1,
+            as are edges that do not belong to any group
+        """
+        edge_ids = self.k.scenario.edge_ids
+        if self._group_edge_ids is not edge_ids or self._group_names is None:
+            groups = self.specify_groups()
+            names = list(groups.keys())
+            num_edges = 0 if edge_ids is None else len(edge_ids)
+            edge_groups = np.full(num_edges + 1, -1, dtype=int)
+            for i, name in enumerate(names):
+                for edge in groups[name]:
+                    index = self.k.scenario.get_edge_index(edge)
+                    if index >= 0:
+                        edge_groups[index] = i
+            self._group_names = names
+            self._edge_groups = edge_groups
+            self._group_edge_ids = edge_ids
+
+        return self._group_names, self._edge_groups
+
+    def get_vehicle_groups(self, veh_ids):
+        """Return the group index of the current edge of a set of vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            vehicle identifiers
+
+        Returns
+        -------
+        np.ndarray
+            group indices, with -1 for vehicles outside of all groups
+        """
+        _, edge_groups = self._group_tables()
+        edge_index = np.array(self.k.vehicle.get_edge_index(veh_ids),
+                              dtype=int).reshape(-1)
+        return edge_groups[edge_index]
+
+    def get_agent_groups(self, agent_ids):
+        """Return the group index of a set of agents.
+
+        By default, agents are assigned to the group of the edge their
+        vehicle is currently located on. Environments in which agents are
+        bound to a specific group irrespective of their position should
+        override this method.
+
+        Parameters
+        ----------
+        agent_ids : list of str
+            agent identifiers
+
+        Returns
+        -------
+        np.ndarray
+            group indices, with -1 for agents outside of all groups
+        """
+        return self.get_vehicle_groups(agent_ids)
+
+    def get_group_stats(self, values, veh_ids):
+        """Compute aggregate statistics of per-vehicle values within groups.
+
+        The statistics of all groups are computed in a single vectorized pass,
+        and are meant to be computed once per step and then indexed by the
+        group of every agent (see ``get_agent_groups``), instead of collecting
+        the vehicles of each agent's group separately.
+
+        Parameters
+        ----------
+        values : array_like
+            value associated with each vehicle
+        veh_ids : list of str
+            vehicle identifiers, in the same order as the values
+
+        Returns
+        -------
+        dict of np.ndarray
+            statistics indexed by group index, with keys "count", "sum", "min",
+            "max" and "mean". Empty groups have a count and sum of zero, a min
+            of inf, a max of -inf, and a mean of zero
+        """
+        names, _ = self._group_tables()
+        num_groups = len(names)
+        values = np.asarray(values, dtype=float).reshape(-1)
+        groups = self.get_vehicle_groups(veh_ids)
+
+        # ignore vehicles that are not in any group
+        in_group = groups >= 0
+        values, groups = values[in_group], groups[in_group]
+
+        count = np.bincount(groups, minlength=num_groups)
+        total = np.bincount(groups, weights=values, minlength=num_groups)
+        min_val = np.full(num_groups, np.inf)
+        max_val = np.full(num_groups, -np.inf)
+        np.minimum.at(min_val, groups, values)
+        np.maximum.at(max_val, groups, values)
+        mean = total / np.maximum(count, 1)
+
+        return {'count': count, 'sum': total, 'min': min_val,
+                'max': max_val, 'mean': mean}
+
+    @staticmethod
+    def agent_dict(agent_ids, values):
+        """Return a dict view of an array of per-agent values.
+
+        Observations (or rewards) of all agents may be computed at once in a
+        single array of shape (num_agents, ...). The dict returned to RLlib
+        then holds views of the rows of this array, and no copy is made. Note
+        that a new array should be allocated at every step, since the views
+        may be kept by the RL algorithm.
+
+        Parameters
+        ----------
+        agent_ids : list of str
+            agent identifiers, ordered as the rows of the array
+        values : np.ndarray
+            per-agent values
+
+        Returns
+        -------
+        dict
+            Key = agent identifier, Element = row of the array
+        """
+        return dict(zip(agent_ids, values))
@@ -0,0 +1,73 @@
+"""Utility for lazily importing the attributes of a package.
+
+Packages such as flow.envs expose a large number of classes, whose modules
+(and their dependencies) are costly to import. A package may instead declare
+the module each attribute is defined in, and have the module imported on
+first access to the attribute. For example, in the package's __init__.py:
+
+    >>> from flow.utils.lazy_import import lazy_package
+    >>> __all__ = lazy_package(__name__, {'Env': 'flow.envs.base_env'})
+
+After which ``from flow.envs import Env`` only imports flow.envs.base_env when
+it is executed.
+"""
+
+import importlib
+import sys
+import types
+
+
+class LazyPackage(types.ModuleType):
+    """Module type whose attributes are imported on first access."""
+
+    def __getattr__(self, name):
+        """Import and return an attribute that has not been accessed yet.
+
+        This is only called for attributes that are not in the module's
+        namespace. Once imported, the attribute is stored in the namespace so
+        that it is not imported again.
+
+        Raises
+        ------
+        AttributeError
+            if the attribute is not one of the lazy attributes of the package
+        """
+        lazy_attributes = self.__dict__.get('_lazy_attributes', {})
+        if name not in lazy_attributes:
+            raise AttributeError("module '{}' has no attribute '{}'".format(
+                self.__name__, name))
+
+        module = importlib.import_module(lazy_attributes[name])
+        value = getattr(module, name)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        """Include the attributes that have not been imported yet."""
+        lazy_attributes = self.__dict__.get('_lazy_attributes', {})
+        return sorted(set(super().__dir__()) | set(lazy_attributes))
+
+
+def lazy_package(name, attributes):
+    """Make the attributes of a package be imported on first access.
+
+    Parameters
+    ----------
+    name : str
+        name of the package, i.e. ``__name__`` in its __init__.py
+    attributes : dict
+        Key = name of the attribute, Element = name of the module that
+        defines it
+
+    Returns
+    -------
+    list of str
+        names of the lazy attributes, to be used as the ``__all__`` of the
+        package
+    """
+    module = sys.modules[name]
+    module._lazy_attributes = dict(attributes)
+    # assigning the class of a module is supported since python 3.5
+    module.__class__ = LazyPackage
+
+    return list(attributes.keys())
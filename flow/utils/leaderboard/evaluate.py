@@ -3,13 +3,31 @@ Evaluation utility methods for testing the performance of controllers.
 
 This file contains a method to perform the evaluation on all benchmarks in
 flow/benchmarks, as well as method for importing neural network controllers
-from rllab and rllib.
+from rllab and rllib. Evaluation runs are executed in parallel, and may be
+cached by benchmark configuration, policy checkpoint and seed, so that only
+the runs of modified benchmarks or policies are recomputed. Policies that
+cannot be pickled (such as the ones imported from rllab and rllib) may be
+specified by the name of their loader and its arguments, in which case they
+are loaded in every worker process (see ``load_policy``).
 """
 
+from copy import deepcopy
+import hashlib
+import json
+import logging
+import os
+import pickle
+import random
+import shutil
+import tempfile
+
 from flow.core.experiment import Experiment
+from flow.core.sweep import Sweep
 from flow.core.params import InitialConfig
 from flow.core.params import TrafficLightParams
-from flow.utils.rllib import get_flow_params, get_rllib_config
+from flow.utils.exceptions import FatalFlowError
+from flow.utils.rllib import FlowParamsEncoder, get_flow_params, \
+    get_rllib_config
 from flow.utils.registry import make_create_env
 
 from flow.benchmarks.grid0 import flow_params as grid0
@@ -24,11 +42,7 @@ from flow.benchmarks.merge0 import flow_params as merge0
 from flow.benchmarks.merge1 import flow_params as merge1
 from flow.benchmarks.merge2 import flow_params as merge2
 
-import ray
-from ray.rllib.agent import get_agent_class
-from ray.tune.registry import get_registry, register_env
 import numpy as np
-import joblib
 
 # number of simulations to execute when computing performance scores
 NUM_RUNS = 10
@@ -49,44 +63,127 @@ AVAILABLE_BENCHMARKS = {
 }
 
 
-def evaluate_policy(benchmark, _get_actions, _get_states=None):
-    """Evaluate the performance of a controller on a predefined benchmark.
+def get_benchmark_hash(benchmark):
+    """Return a hash of the configuration of a benchmark.
 
     Parameters
     ----------
         benchmark : str
-            name of the benchmark, must be printed as it is in the
-            benchmarks folder; otherwise a ValueError will be raised
-        _get_actions : method
-            the mapping from states to actions for the RL agent(s)
-        _get_states : method, optional
-            a mapping from the environment object in Flow to some state, which
-            overrides the _get_states method of the environment. Note that the
-            same cannot be done for the actions.
+            name of the benchmark
 
     Returns
     -------
-        float
-            mean of the evaluation return of the benchmark from NUM_RUNS number
-            of simulations
-        float
-            standard deviation of the evaluation return of the benchmark from
-            NUM_RUNS number of simulations
+        str
+            sha1 hash of the (JSON-serialized) flow parameters of the benchmark
+    """
+    flow_json = json.dumps(AVAILABLE_BENCHMARKS[benchmark],
+                           cls=FlowParamsEncoder, sort_keys=True)
+    return hashlib.sha1(flow_json.encode()).hexdigest()
+
+
+def get_checkpoint_hash(path):
+    """Return a hash of the contents of a policy checkpoint.
+
+    Parameters
+    ----------
+        path : str
+            path to a checkpoint file (e.g. an rllab pkl file), or to a
+            directory containing checkpoint files, all of which are hashed
+
+    Returns
+    -------
+        str
+            sha1 hash of the contents of the checkpoint
+    """
+    if os.path.isdir(path):
+        paths = []
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            paths.extend(os.path.join(root, name) for name in sorted(files))
+    else:
+        paths = [path]
+
+    sha = hashlib.sha1()
+    for file_path in paths:
+        sha.update(os.path.relpath(file_path, path).encode())
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+    return sha.hexdigest()
+
+
+# policies loaded in the current process, by policy spec (see load_policy)
+_LOADED_POLICIES = {}
+
+
+def load_policy(spec):
+    """Return the compute_action method of a policy specified by its loader.
+
+    Policies are only loaded once per process.
+
+    Parameters
+    ----------
+        spec : tuple
+            name of the loader in POLICY_LOADERS, followed by the arguments of
+            the loader, e.g. ("rllib", path_to_dir, checkpoint_num, alg)
+
+    Returns
+    -------
+        method
+            the mapping from states to actions of the policy
 
     Raises
     ------
         ValueError
-            If the specified benchmark is not available.
+            If the loader is not available.
     """
-    if benchmark not in AVAILABLE_BENCHMARKS.keys():
-        raise ValueError(
-            "benchmark {} is not available. Check spelling?".format(benchmark))
+    if spec not in _LOADED_POLICIES:
+        if spec[0] not in POLICY_LOADERS:
+            raise ValueError(
+                "policy loader {} is not available, must be one of {}".format(
+                    spec[0], sorted(POLICY_LOADERS)))
+        _LOADED_POLICIES[spec] = POLICY_LOADERS[spec[0]](*spec[1:])
+    return _LOADED_POLICIES[spec]
+
+
+def _evaluate_run(benchmark, seed, _get_actions, _get_states=None, **_):
+    """Compute the return of a single evaluation run of a benchmark.
+
+    This is the run function of the evaluation sweep (see
+    ``evaluate_policies``), and is executed in a worker process. The
+    remaining parameters of the cell (i.e. the hashes of the benchmark and the
+    policy) only serve as keys of the cache.
+
+    Parameters
+    ----------
+        benchmark : str
+            name of the benchmark
+        seed : int
+            seed of the run
+        _get_actions : method or tuple
+            the mapping from states to actions for the RL agent(s), or the
+            spec of a policy loaded in the worker (see ``load_policy``)
+        _get_states : method, optional
+            a mapping from the environment object in Flow to some state
+
+    Returns
+    -------
+        dict
+            return and metrics of the run (see
+            flow.core.metrics.RolloutMetrics.summary)
+    """
+    if isinstance(_get_actions, tuple):
+        _get_actions = load_policy(_get_actions)
+
+    random.seed(seed)
+    np.random.seed(seed)
 
     # get the flow params from the benchmark
-    flow_params = AVAILABLE_BENCHMARKS[benchmark]
+    flow_params = deepcopy(AVAILABLE_BENCHMARKS[benchmark])
 
     exp_tag = flow_params["exp_tag"]
     sim_params = flow_params["sim"]
+    sim_params.seed = seed
     vehicles = flow_params["veh"]
     env_params = flow_params["env"]
     env_params.evaluate = True  # Set to true to get evaluation returns
@@ -128,11 +225,207 @@ def evaluate_policy(benchmark, _get_actions, _get_states=None):
 
     # run the experiment and return the reward
     res = exp.run(
-        num_runs=NUM_RUNS,
+        num_runs=1,
         num_steps=env.env_params.horizon,
         rl_actions=_get_actions)
 
-    return np.mean(res["returns"]), np.std(res["returns"])
+    return {key: float(value) for key, value in res["metrics"][0].items()}
+
+
+def _evaluation_sweep(benchmarks,
+                      policy_hash,
+                      cache_path,
+                      num_runs,
+                      num_workers,
+                      kwargs,
+                      run_fn=_evaluate_run):
+    """Return the sweep of the evaluation runs of several benchmarks.
+
+    Every cell of the sweep is one run of a benchmark, keyed by the hash of
+    the configuration of the benchmark, the hash of the policy and the seed
+    of the run (see ``evaluate_policies``).
+
+    Parameters
+    ----------
+        benchmarks : list of str
+            names of the benchmarks
+        policy_hash : str or None
+            hash identifying the policy
+        cache_path : str
+            path to the cache of evaluation returns
+        num_runs : int
+            number of runs per benchmark
+        num_workers : int or None
+            number of worker processes
+        kwargs : dict
+            additional keyword arguments of the run function
+        run_fn : callable, optional
+            function computing the return of a run
+
+    Returns
+    -------
+        flow.core.sweep.Sweep
+            the evaluation sweep
+    """
+    cells = [{"benchmark": benchmark,
+              "config": get_benchmark_hash(benchmark),
+              "policy": policy_hash,
+              "seed": seed}
+             for benchmark in benchmarks for seed in range(num_runs)]
+
+    return Sweep(run_fn, cells, cache_path, num_workers=num_workers,
+                 kwargs=kwargs)
+
+
+def evaluate_policies(benchmarks,
+                      _get_actions,
+                      _get_states=None,
+                      policy_hash=None,
+                      cache_path=None,
+                      num_runs=NUM_RUNS,
+                      num_workers=None):
+    """Evaluate the performance of a controller on several benchmarks.
+
+    The runs of all benchmarks are executed in parallel on a pool of worker
+    processes (see flow.core.sweep.Sweep). Each run is seeded with its index.
+    If a cache is specified, the return of every run is stored in it, keyed by
+    the hash of the configuration of the benchmark, the hash of the policy,
+    and the seed of the run, so that only the runs of modified benchmarks or
+    policies are recomputed when a policy is evaluated again.
+
+    Parameters
+    ----------
+        benchmarks : list of str
+            names of the benchmarks, must be printed as they are in the
+            benchmarks folder; otherwise a ValueError will be raised
+        _get_actions : method or tuple
+            the mapping from states to actions for the RL agent(s). Must be
+            picklable (i.e. defined at the top level of a module) to be
+            evaluated in parallel, otherwise the runs are executed serially.
+            Policies that cannot be pickled may instead be specified by the
+            name of their loader and its arguments, e.g. ("rllib",
+            path_to_dir, checkpoint_num, alg), in which case they are loaded
+            in every worker process (see ``load_policy``).
+        _get_states : method, optional
+            a mapping from the environment object in Flow to some state, which
+            overrides the _get_states method of the environment. Note that the
+            same cannot be done for the actions.
+        policy_hash : str, optional
+            hash identifying the policy, e.g. the hash of its checkpoint (see
+            ``get_checkpoint_hash``). Required to use a cache.
+        cache_path : str, optional
+            path to the cache of evaluation returns. If not specified, all
+            runs are computed and no results are kept.
+        num_runs : int, optional
+            number of runs per benchmark
+        num_workers : int, optional
+            number of worker processes, defaults to the number of cpus
+
+    Returns
+    -------
+        dict < str, (float, float) >
+            mean and standard deviation of the evaluation return of every
+            benchmark from num_runs number of simulations
+
+    Raises
+    ------
+        ValueError
+            If a specified benchmark is not available, or if a cache is
+            specified without a policy hash.
+    """
+    for benchmark in benchmarks:
+        if benchmark not in AVAILABLE_BENCHMARKS.keys():
+            raise ValueError(
+                "benchmark {} is not available. Check spelling?".format(
+                    benchmark))
+
+    if cache_path is not None and policy_hash is None:
+        raise ValueError("A policy hash is required to cache evaluations.")
+
+    # runs are only evaluated in parallel if the policy can be sent to the
+    # worker processes
+    try:
+        pickle.dumps((_get_actions, _get_states))
+    except Exception:
+        logging.warning("The policy cannot be pickled, the evaluation runs "
+                        "are executed serially.")
+        num_workers = 1
+
+    temp_dir = None
+    if cache_path is None:
+        temp_dir = tempfile.mkdtemp()
+        cache_path = os.path.join(temp_dir, "evaluate.db")
+
+    try:
+        sweep = _evaluation_sweep(
+            benchmarks, policy_hash, cache_path, num_runs, num_workers,
+            kwargs={"_get_actions": _get_actions,
+                    "_get_states": _get_states})
+        if sweep.run() > 0:
+            raise FatalFlowError("Some evaluation runs failed, see the logs.")
+
+        results = {}
+        for benchmark in benchmarks:
+            rets = [sweep.store.get(cell)["return"] for cell in sweep.cells()
+                    if cell["benchmark"] == benchmark]
+            results[benchmark] = (np.mean(rets), np.std(rets))
+        sweep.store.close()
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir)
+
+    return results
+
+
+def evaluate_policy(benchmark,
+                    _get_actions,
+                    _get_states=None,
+                    policy_hash=None,
+                    cache_path=None,
+                    num_workers=None):
+    """Evaluate the performance of a controller on a predefined benchmark.
+
+    The runs are executed in parallel, and may be cached (see
+    ``evaluate_policies``).
+
+    Parameters
+    ----------
+        benchmark : str
+            name of the benchmark, must be printed as it is in the
+            benchmarks folder; otherwise a ValueError will be raised
+        _get_actions : method or tuple
+            the mapping from states to actions for the RL agent(s), or the
+            spec of a policy (see ``evaluate_policies``)
+        _get_states : method, optional
+            a mapping from the environment object in Flow to some state, which
+            overrides the _get_states method of the environment. Note that the
+            same cannot be done for the actions.
+        policy_hash : str, optional
+            hash identifying the policy, required to use a cache
+        cache_path : str, optional
+            path to the cache of evaluation returns
+        num_workers : int, optional
+            number of worker processes, defaults to the number of cpus
+
+    Returns
+    -------
+        float
+            mean of the evaluation return of the benchmark from NUM_RUNS number
+            of simulations
+        float
+            standard deviation of the evaluation return of the benchmark from
+            NUM_RUNS number of simulations
+
+    Raises
+    ------
+        ValueError
+            If the specified benchmark is not available.
+    """
+    return evaluate_policies(
+        [benchmark], _get_actions, _get_states,
+        policy_hash=policy_hash,
+        cache_path=cache_path,
+        num_workers=num_workers)[benchmark]
 
 
 def get_compute_action_rllab(path_to_pkl):
@@ -149,6 +442,8 @@ def get_compute_action_rllab(path_to_pkl):
             the compute_action method from the algorithm along with the trained
             parameters
     """
+    import joblib
+
     # get the agent/policy
     data = joblib.load(path_to_pkl)
     agent = data['policy']
@@ -183,6 +478,10 @@ def get_compute_action_rllib(path_to_dir, checkpoint_num, alg):
             the compute_action method from the algorithm along with the trained
             parameters
     """
+    import ray
+    from ray.rllib.agent import get_agent_class
+    from ray.tune.registry import get_registry, register_env
+
     # collect the configuration information from the RLlib checkpoint
     result_dir = path_to_dir if path_to_dir[-1] != '/' else path_to_dir[:-1]
     config = get_rllib_config(result_dir)
@@ -206,3 +505,10 @@ def get_compute_action_rllib(path_to_dir, checkpoint_num, alg):
     agent._restore(checkpoint)
 
     return agent.compute_action
+
+
+# functions loading policies from their checkpoints, by name (see load_policy)
+POLICY_LOADERS = {
+    "rllab": get_compute_action_rllab,
+    "rllib": get_compute_action_rllib
+}
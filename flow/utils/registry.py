@@ -82,11 +82,9 @@ def make_create_env(params, version=0, render=None):
             sim_params.render = render
 
         # check if the environment is a single or multiagent environment, and
-        # get the right address accordingly
-        single_agent_envs = [env for env in dir(flow.envs)
-                             if not env.startswith('__')]
-
-        if params['env_name'] in single_agent_envs:
+        # get the right address accordingly (the environments are not imported
+        # until the gym environment is made, see flow.utils.lazy_import)
+        if params['env_name'] in flow.envs.__all__:
             env_loc = 'flow.envs'
         else:
             env_loc = 'flow.multiagent_envs'
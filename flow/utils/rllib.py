@@ -3,10 +3,14 @@ Utility functions for Flow compatibility with RLlib.
 
 This includes: environment generation, serialization, and visualization.
 """
+import collections
 import dill
 import json
 from copy import deepcopy
 
+from gym.spaces import Box
+import numpy as np
+
 from flow.core.params import SumoLaneChangeParams, SumoCarFollowingParams, \
     SumoParams, InitialConfig, EnvParams, NetParams, InFlows
 from flow.core.params import TrafficLightParams
@@ -150,3 +154,62 @@ def get_rllib_pkl(path):
     with open(pklfile, 'rb') as file:
         pkldata = dill.load(file)
     return pkldata
+
+
+def compute_actions(agent, observations, policy_mapping_fn):
+    """Compute the actions of several agents in a single step.
+
+    Agents are grouped by policy, and the actions of every group are computed
+    in a single (batched) forward pass of the policy, instead of one pass per
+    agent as with ``agent.compute_action``. The observations are preprocessed
+    and filtered as in ``agent.compute_action``. Recurrent policies, or
+    agents that do not expose their policies, fall back to per-agent calls.
+
+    Parameters
+    ----------
+    agent : ray.rllib.agents.Agent
+        RLlib agent (trainer) containing the policies
+    observations : dict
+        observation of every agent, keyed by agent id
+    policy_mapping_fn : function
+        maps agent ids to policy ids
+
+    Returns
+    -------
+    dict
+        action of every agent, keyed by agent id
+    """
+    groups = collections.OrderedDict()
+    for agent_id in observations.keys():
+        groups.setdefault(policy_mapping_fn(agent_id), []).append(agent_id)
+
+    evaluator = getattr(agent, "local_evaluator", None)
+    clip_actions = getattr(agent, "config", {}).get("clip_actions", False)
+
+    actions = {}
+    for policy_id, agent_ids in groups.items():
+        policy = None if evaluator is None \
+            else evaluator.policy_map.get(policy_id)
+
+        if policy is None or policy.get_initial_state():
+            for agent_id in agent_ids:
+                actions[agent_id] = agent.compute_action(
+                    observations[agent_id], policy_id=policy_id)
+            continue
+
+        preprocessor = evaluator.preprocessors[policy_id]
+        obs_filter = evaluator.filters[policy_id]
+        obs_batch = np.stack([
+            obs_filter(preprocessor.transform(observations[agent_id]),
+                       update=False)
+            for agent_id in agent_ids])
+
+        batch_actions = np.asarray(policy.compute_actions(obs_batch, [])[0])
+        if clip_actions and isinstance(policy.action_space, Box):
+            batch_actions = np.clip(batch_actions, policy.action_space.low,
+                                    policy.action_space.high)
+
+        for agent_id, action in zip(agent_ids, batch_actions):
+            actions[agent_id] = action
+
+    return actions
@@ -1,48 +1,137 @@
-"""Generates capacity diagrams for the bottleneck"""
+"""Generates capacity diagrams for the bottleneck.
 
-import csv
-from matplotlib import pyplot as plt
-from matplotlib import rc
-import numpy as np
+The inflows and outflows of every rollout are either read from a csv file
+(as generated by examples/sumo/density_exp.py) or directly from the result
+store of an inflow sweep (see flow.core.sweep).
+
+Usage
+    python capacity_diagram_generator.py [--store STORE] [--csv CSV]
+"""
+
+import argparse
 import os
 
-rc('text', usetex=True)
-font = {'weight': 'bold',
-        'size': 18}
-rc('font', **font)
-
-inflows = []
-outflows = []
-path = os.path.dirname(os.path.abspath(__file__))
-with open(path + '/../../data/inflows_outflows.csv', 'rt') as csvfile:
-    spamreader = csv.reader(csvfile)
-    for row in spamreader:
-        inflows.append(float(row[0]))
-        outflows.append(float(row[1]))
-
-unique_inflows = sorted(list(set(inflows)))
-sorted_outflows = {inflow: [] for inflow in unique_inflows}
-
-for inflow, outlfow in zip(inflows, outflows):
-    sorted_outflows[inflow].append(outlfow)
-
-mean_outflows = np.asarray([np.mean(sorted_outflows[inflow])
-                            for inflow in unique_inflows])
-min_outflows = np.asarray([np.min(sorted_outflows[inflow])
-                           for inflow in unique_inflows])
-max_outflows = np.asarray([np.max(sorted_outflows[inflow])
-                           for inflow in unique_inflows])
-std_outflows = np.asarray([np.std(sorted_outflows[inflow])
-                           for inflow in unique_inflows])
-
-plt.figure(figsize=(27, 9))
-
-plt.plot(unique_inflows, mean_outflows, linewidth=2, color='orange')
-plt.fill_between(unique_inflows, mean_outflows - std_outflows,
-                 mean_outflows + std_outflows, alpha=0.25, color='orange')
-plt.xlabel('Inflow' + r'$ \ \frac{vehs}{hour}$')
-plt.ylabel('Outflow' + r'$ \ \frac{vehs}{hour}$')
-plt.tick_params(labelsize=20)
-plt.rcParams['xtick.minor.size'] = 20
-plt.minorticks_on()
-plt.show()
+import numpy as np
+
+from flow.core.sweep import ResultStore, group_stats
+
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           '../../data/inflows_outflows.csv')
+
+
+def import_data_from_csv(path):
+    """Import the inflows and outflows of every rollout from a csv file.
+
+    Parameters
+    ----------
+    path : str
+        path to the csv file, with one row per rollout consisting of the
+        inflow and the outflow of the rollout
+
+    Returns
+    -------
+    np.ndarray
+        inflow of every rollout
+    np.ndarray
+        outflow of every rollout
+    """
+    data = np.loadtxt(path, delimiter=',', ndmin=2)
+    return data[:, 0], data[:, 1]
+
+
+def import_data_from_store(path):
+    """Import the inflows and outflows of every rollout from a result store.
+
+    Parameters
+    ----------
+    path : str
+        path to the result store of an inflow sweep, whose cells are
+        parametrized by an "inflow" and return an "outflow"
+
+    Returns
+    -------
+    np.ndarray
+        inflow of every rollout
+    np.ndarray
+        outflow of every rollout
+    """
+    store = ResultStore(path)
+    data = store.arrays(['inflow', 'outflow'])
+    store.close()
+    return data['inflow'], data['outflow']
+
+
+def get_capacity_data(inflows, outflows):
+    """Compute the statistics of the outflows for every unique inflow.
+
+    Parameters
+    ----------
+    inflows : array_like
+        inflow of every rollout
+    outflows : array_like
+        outflow of every rollout
+
+    Returns
+    -------
+    np.ndarray
+        unique inflows (sorted)
+    np.ndarray
+        mean outflow per inflow
+    np.ndarray
+        std of the outflows per inflow
+    np.ndarray
+        min outflow per inflow
+    np.ndarray
+        max outflow per inflow
+    """
+    stats = group_stats(inflows, outflows)
+    return stats['keys'], stats['mean'], stats['std'], stats['min'], \
+        stats['max']
+
+
+def plot_capacity_diagram(inflows, outflows):
+    """Plot the mean and std of the outflows as a function of the inflows."""
+    from matplotlib import pyplot as plt
+    from matplotlib import rc
+
+    rc('text', usetex=True)
+    font = {'weight': 'bold',
+            'size': 18}
+    rc('font', **font)
+
+    unique_inflows, mean_outflows, std_outflows, _, _ = \
+        get_capacity_data(inflows, outflows)
+
+    plt.figure(figsize=(27, 9))
+
+    plt.plot(unique_inflows, mean_outflows, linewidth=2, color='orange')
+    plt.fill_between(unique_inflows, mean_outflows - std_outflows,
+                     mean_outflows + std_outflows, alpha=0.25, color='orange')
+    plt.xlabel('Inflow' + r'$ \ \frac{vehs}{hour}$')
+    plt.ylabel('Outflow' + r'$ \ \frac{vehs}{hour}$')
+    plt.tick_params(labelsize=20)
+    plt.rcParams['xtick.minor.size'] = 20
+    plt.minorticks_on()
+    plt.show()
+
+
+def create_parser():
+    """Create the parser to capture CLI arguments."""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description='Generates capacity diagrams for the bottleneck.')
+    parser.add_argument(
+        '--store', type=str, default=None,
+        help='Result store of an inflow sweep. Takes precedence over --csv.')
+    parser.add_argument(
+        '--csv', type=str, default=DEFAULT_CSV,
+        help='csv file with the inflow and outflow of every rollout.')
+    return parser
+
+
+if __name__ == '__main__':
+    args = create_parser().parse_args()
+    if args.store is not None:
+        plot_capacity_diagram(*import_data_from_store(args.store))
+    else:
+        plot_capacity_diagram(*import_data_from_csv(args.csv))
@@ -28,8 +28,10 @@ from ray.rllib.models import ModelCatalog
 import gym
 
 import flow.envs
+from flow.core.metrics import RolloutMetrics
 from flow.core.util import emission_to_csv
 from flow.utils.registry import make_create_env
+from flow.utils.rllib import compute_actions
 from flow.utils.rllib import get_flow_params
 from flow.utils.rllib import get_rllib_config
 from flow.utils.rllib import get_rllib_pkl
@@ -154,10 +156,7 @@ def visualizer_rllib(args):
 
     # check if the environment is a single or multiagent environment, and
     # get the right address accordingly
-    single_agent_envs = [env for env in dir(flow.envs)
-                         if not env.startswith('__')]
-
-    if flow_params['env_name'] in single_agent_envs:
+    if flow_params['env_name'] in flow.envs.__all__:
         env_loc = 'flow.envs'
     else:
         env_loc = 'flow.multiagent_envs'
@@ -199,23 +198,21 @@ def visualizer_rllib(args):
             rets[key] = []
     else:
         rets = []
+    # the speeds and outflows of the rollouts are accumulated by the
+    # environment, see flow/core/metrics.py
+    env.unwrapped.metrics = RolloutMetrics(sim_params.sim_step)
     final_outflows = []
     mean_speed = []
     for i in range(args.num_rollouts):
-        vel = []
         state = env.reset()
         if multiagent:
             ret = {key: [0] for key in rets.keys()}
         else:
             ret = 0
         for _ in range(env_params.horizon):
-            vehicles = env.unwrapped.k.vehicle
-            vel.append(np.mean(vehicles.get_speed(vehicles.get_ids())))
             if multiagent:
-                action = {}
-                for agent_id in state.keys():
-                    action[agent_id] = agent.compute_action(
-                        state[agent_id], policy_id=policy_map_fn(agent_id))
+                # one batched forward pass per policy
+                action = compute_actions(agent, state, policy_map_fn)
             else:
                 action = agent.compute_action(state)
             state, reward, done, _ = env.step(action)
@@ -234,9 +231,9 @@ def visualizer_rllib(args):
                 rets[key].append(ret[key])
         else:
             rets.append(ret)
-        outflow = vehicles.get_outflow_rate(500)
-        final_outflows.append(outflow)
-        mean_speed.append(np.mean(vel))
+        metrics = env.unwrapped.metrics.summary()
+        final_outflows.append(metrics["outflow"])
+        mean_speed.append(metrics["mean_speed"])
         if multiagent:
             for agent_id, rew in rets.items():
                 print('Round {}, Return: {} for agent {}'.format(
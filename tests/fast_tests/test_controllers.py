@@ -3,11 +3,12 @@ import unittest
 from flow.core.experiment import Experiment
 from flow.core.params import EnvParams, InitialConfig, NetParams
 from flow.core.params import VehicleParams
-from flow.core.params import SumoCarFollowingParams
+from flow.core.params import SumoCarFollowingParams, SumoParams
 
 from flow.controllers.routing_controllers import ContinuousRouter
 from flow.controllers.car_following_models import IDMController, \
     OVMController, BCMController, LinearOVM, CFMController
+from flow.controllers.velocity_controllers import FollowerStopper
 from tests.setup_scripts import ring_road_exp_setup
 import os
 import numpy as np
@@ -456,5 +457,83 @@ class TestStaticLaneChanger(unittest.TestCase):
         self.assertEqual(sum(np.array(lanes)), 0)
 
 
+class TestFlyweightControllers(unittest.TestCase):
+    """
+    Tests that controllers are shared by all vehicles of a type when flyweight
+    controllers are enabled, with the same actions as separate controllers.
+    """
+
+    def setUp(self):
+        contr_params = {
+            "time_delay": 0,
+            "k_d": 1,
+            "k_v": 1,
+            "k_c": 1,
+            "d_des": 1,
+            "v_des": 8,
+            "noise": 0
+        }
+
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test_0",
+            acceleration_controller=(CFMController, contr_params),
+            routing_controller=(ContinuousRouter, {}),
+            car_following_params=SumoCarFollowingParams(
+                accel=20, decel=5),
+            num_vehicles=5)
+        # controllers with per-vehicle state are not shared
+        vehicles.add(
+            veh_id="test_1",
+            acceleration_controller=(FollowerStopper, {}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=2)
+
+        self.env, scenario = ring_road_exp_setup(
+            vehicles=vehicles,
+            sim_params=SumoParams(sim_step=0.1, flyweight_controllers=True))
+
+    def tearDown(self):
+        # terminate the traci instance
+        self.env.terminate()
+
+        # free data used by the class
+        self.env = None
+
+    def test_shared_controllers(self):
+        self.env.reset()
+        vehicles = self.env.k.vehicle
+        ids = [veh_id for veh_id in vehicles.get_ids()
+               if vehicles.get_type(veh_id) == "test_0"]
+        other_ids = [veh_id for veh_id in vehicles.get_ids()
+                     if vehicles.get_type(veh_id) == "test_1"]
+
+        controllers = set(id(vehicles.get_acc_controller(veh_id))
+                          for veh_id in ids)
+        self.assertEqual(len(controllers), 1)
+        routers = set(id(vehicles.get_routing_controller(veh_id))
+                      for veh_id in ids + other_ids)
+        self.assertEqual(len(routers), 2)
+        controllers = set(id(vehicles.get_acc_controller(veh_id))
+                          for veh_id in other_ids)
+        self.assertEqual(len(controllers), 2)
+
+        # shared controllers are bound to the requested vehicle
+        for veh_id in ids:
+            self.assertEqual(vehicles.get_acc_controller(veh_id).veh_id,
+                             veh_id)
+
+        test_headways = [5, 10, 15, 20, 25]
+        for i, veh_id in enumerate(ids):
+            vehicles.set_headway(veh_id, test_headways[i])
+
+        requested_accel = [
+            vehicles.get_acc_controller(veh_id).get_action(self.env)
+            for veh_id in ids
+        ]
+        expected_accel = [12., 17., 22., 27., 32.]
+        np.testing.assert_array_almost_equal(requested_accel, expected_accel)
+
+
 if __name__ == '__main__':
     unittest.main()
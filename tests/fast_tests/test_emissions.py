@@ -0,0 +1,32 @@
+import unittest
+import os
+
+from flow.core.emissions import emission_rates, POLLUTANTS
+import numpy as np
+
+os.environ["TEST_FLAG"] = "True"
+
+
+class TestEmissions(unittest.TestCase):
+    """
+    Tests that the emission model matches the emission maps of sumo.
+    """
+
+    def test_emission_rates(self):
+        co2, fuel = POLLUTANTS.index("CO2"), POLLUTANTS.index("fuel")
+
+        rates = emission_rates([0, 10, 10], [0, 1, -3])
+        np.testing.assert_array_almost_equal(
+            rates[:, co2] / 1000, [2.62472, 4.71889, 0], decimal=4)
+        self.assertAlmostEqual(rates[1, fuel] / 1000, 1.50511, places=4)
+
+        # emission classes may differ for every vehicle
+        rates = emission_rates([10, 10], [1, 1], ["PC_G_EU4", "HDV_D_EU4"])
+        np.testing.assert_array_almost_equal(
+            rates[:, co2] / 1000, [4.71889, 31.7889], decimal=3)
+
+        self.assertRaises(KeyError, emission_rates, [10], [1], "unknown")
+
+
+if __name__ == '__main__':
+    unittest.main()
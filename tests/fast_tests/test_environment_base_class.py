@@ -1,7 +1,7 @@
 import unittest
 
 from flow.core.params import SumoParams, EnvParams, InitialConfig, \
-    NetParams, SumoCarFollowingParams
+    NetParams, SumoCarFollowingParams, InFlows
 from flow.core.params import VehicleParams
 
 from flow.controllers.routing_controllers import ContinuousRouter
@@ -10,9 +10,16 @@ from flow.controllers import RLController
 from flow.envs.loop.loop_accel import ADDITIONAL_ENV_PARAMS
 from flow.utils.exceptions import FatalFlowError
 from flow.envs import Env, TestEnv
+from flow.core.kernel.simulation.traci import SERVER_POOL, wait_for_server, \
+    is_listening, listening_ports
+from flow.core.kernel.simulation.sharded import MAX_HANDOFF_STEPS
 
 from tests.setup_scripts import ring_road_exp_setup, highway_exp_setup
+from functools import partial
 import os
+import socket
+import subprocess
+import sys
 import numpy as np
 
 os.environ["TEST_FLAG"] = "True"
@@ -274,6 +281,125 @@ class TestWarmUpSteps(unittest.TestCase):
         self.assertEqual(t2 - t1, warmup_step)
 
 
+class TestFastForward(unittest.TestCase):
+    """Tests that warm-up steps are performed in a single call to the
+    simulator when Flow has nothing to control, with the same results as when
+    they are performed one step at a time."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add("human", num_vehicles=10)
+        vehicles.add("rl", acceleration_controller=(RLController, {}),
+                     num_vehicles=1)
+        _, self.scenario = ring_road_exp_setup(vehicles=vehicles)
+        self.envs = []
+
+    def tearDown(self):
+        for env in self.envs:
+            env.terminate()
+
+    def _env(self, warmup_steps, sims_per_step=1, fast_forward=True):
+        env = TestEnv(EnvParams(warmup_steps=warmup_steps,
+                                sims_per_step=sims_per_step),
+                      SumoParams(sim_step=0.1), self.scenario)
+        if not fast_forward:
+            env.can_fast_forward = lambda: False
+        self.envs.append(env)
+        return env
+
+    def test_can_fast_forward(self):
+        self.assertTrue(self._env(0).can_fast_forward())
+
+        # vehicles with routers or Flow controllers need per-step processing
+        env, _ = ring_road_exp_setup()
+        self.envs.append(env)
+        self.assertFalse(env.can_fast_forward())
+
+    def test_fast_forward(self):
+        states = []
+        for fast_forward in [True, False]:
+            env = self._env(50, sims_per_step=2, fast_forward=fast_forward)
+            env.reset()
+            ids = sorted(env.k.vehicle.get_ids())
+            states.append((env.time_counter,
+                           env.k.kernel_api.simulation.getTime(),
+                           ids,
+                           env.k.vehicle.get_position(ids),
+                           env.k.vehicle.get_speed(ids)))
+
+        self.assertEqual(states[0][0], 100)
+        self.assertAlmostEqual(states[0][1], states[1][1])
+        self.assertListEqual(states[0][2], states[1][2])
+        np.testing.assert_array_almost_equal(states[0][3], states[1][3])
+        np.testing.assert_array_almost_equal(states[0][4], states[1][4])
+
+
+class TestFork(unittest.TestCase):
+    """Tests that the state of an environment can be captured mid-rollout and
+    restored several times, with the same results in every branch."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add("human", num_vehicles=10)
+        vehicles.add("rl", acceleration_controller=(RLController, {}),
+                     num_vehicles=1)
+        _, scenario = ring_road_exp_setup(vehicles=vehicles)
+        self.env = TestEnv(EnvParams(), SumoParams(sim_step=0.1), scenario)
+
+    def tearDown(self):
+        self.env.terminate()
+        self.env = None
+
+    def _branch(self):
+        states = []
+        for _ in range(20):
+            self.env.step(rl_actions=None)
+            # some environment-specific bookkeeping
+            self.env.queue.append(np.random.rand())
+            ids = sorted(self.env.k.vehicle.get_ids())
+            states.append((self.env.time_counter,
+                           self.env.k.kernel_api.simulation.getTime(),
+                           ids,
+                           self.env.k.vehicle.get_position(ids),
+                           self.env.k.vehicle.get_speed(ids),
+                           list(self.env.queue)))
+        return states
+
+    def test_fork(self):
+        self.env.reset()
+        for _ in range(5):
+            self.env.step(rl_actions=None)
+        self.env.queue = []
+
+        checkpoint = self.env.fork()
+        branches = [self._branch()]
+        for _ in range(2):
+            self.env.restore(checkpoint)
+            self.assertEqual(self.env.time_counter, 5)
+            self.assertListEqual(self.env.queue, [])
+            branches.append(self._branch())
+
+        self.assertEqual(branches[0][-1][0], 25)
+        self.assertEqual(branches[0], branches[1])
+        self.assertEqual(branches[0], branches[2])
+
+    def test_release(self):
+        self.env.reset()
+        checkpoint = self.env.fork()
+        state_dir = self.env.k._state_dir
+        self.env.release(checkpoint)
+        self.assertListEqual(os.listdir(state_dir), [])
+
+        # forking at every step does not accumulate saved states
+        for _ in range(10):
+            checkpoint = self.env.fork()
+            self.env.step(rl_actions=None)
+            self.env.restore(checkpoint)
+            self.assertEqual(len(os.listdir(state_dir)), 1)
+            self.env.release(checkpoint)
+        self.assertListEqual(os.listdir(state_dir), [])
+
+
 class TestSimsPerStep(unittest.TestCase):
     """Ensures that the appropriate number of simultaions are run at any given
     steps when using flow.core.params.EnvParams.sims_per_step"""
@@ -300,6 +426,253 @@ class TestSimsPerStep(unittest.TestCase):
         self.assertEqual(t2 - t1, sims_per_step)
 
 
+class TestSumoServerPool(unittest.TestCase):
+    """Tests that sumo servers are reused when restarting an instance with
+    flow.core.params.SumoParams.pool_size set."""
+
+    def tearDown(self):
+        SERVER_POOL.close()
+
+    def test_restart_reuses_server(self):
+        sim_params = SumoParams(restart_instance=True, pool_size=1)
+        env, _ = ring_road_exp_setup(sim_params=sim_params)
+        env.reset()
+        pid = env.k.simulation.sumo_proc.pid
+
+        # the restarted simulation should be run by the same sumo process
+        env.reset()
+        self.assertEqual(env.k.simulation.sumo_proc.pid, pid)
+        self.assertEqual(SERVER_POOL.num_idle(), 0)
+
+        # the server should be returned to the pool once the env is closed
+        env.terminate()
+        self.assertEqual(SERVER_POOL.num_idle(), 1)
+
+    def test_prewarm(self):
+        sim_params = SumoParams(restart_instance=True, pool_size=1,
+                                prewarm_pool=True)
+        env, _ = ring_road_exp_setup(sim_params=sim_params)
+        env.reset()
+
+        # an idle server should have been started along with the simulation
+        self.assertEqual(SERVER_POOL.num_idle(), 1)
+        proc = SERVER_POOL._idle["sumo"][0][0]
+        self.assertIsNone(proc.poll())
+
+        # the restarted simulation should be run by the prewarmed server, and
+        # the pool should be filled again
+        env.reset()
+        self.assertEqual(env.k.simulation.sumo_proc.pid, proc.pid)
+        self.assertEqual(SERVER_POOL.num_idle(), 1)
+        env.terminate()
+
+    def test_failed_startup(self):
+        # a process that exits without opening the port should not be waited
+        # on until the timeout
+        proc = subprocess.Popen([sys.executable, "-c", "pass"])
+        self.assertRaises(FatalFlowError, wait_for_server,
+                          proc=proc, port=0, timeout=60)
+
+    @unittest.skipIf(listening_ports() is None,
+                     "the kernel tables of TCP sockets are not available")
+    def test_is_listening(self):
+        # a bound socket is only reported once it is listening, and probing
+        # it does not take its port
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("localhost", 0))
+        port = sock.getsockname()[1]
+        try:
+            self.assertFalse(is_listening(port))
+            sock.listen(1)
+            self.assertTrue(is_listening(port))
+            self.assertTrue(is_listening(port))
+        finally:
+            sock.close()
+        self.assertFalse(is_listening(port))
+
+
+class TestShardedSimulation(unittest.TestCase):
+    """Tests that networks can be simulated on several sumo instances with
+    flow.core.params.SumoParams.num_shards set."""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add("idm",
+                     acceleration_controller=(IDMController, {}),
+                     routing_controller=(ContinuousRouter, {}),
+                     num_vehicles=4)
+        self.env, _ = ring_road_exp_setup(
+            vehicles=vehicles, sim_params=SumoParams(sim_step=0.1,
+                                                     num_shards=2))
+
+    def tearDown(self):
+        if self.env is not None:
+            self.env.terminate()
+        self.env = None
+
+    def test_partition(self):
+        kernel_api = self.env.k.kernel_api
+        # the ring is cut in two halves of two edges
+        self.assertEqual(sorted(kernel_api.edge_shards.values()),
+                         [0, 0, 1, 1])
+        self.assertEqual(sorted(kernel_api.junction_shards.values()),
+                         [0, 0, 0, 1])
+
+    def test_handoff(self):
+        kernel_api = self.env.k.kernel_api
+        self.env.reset()
+        prev_pos = dict()
+        for _ in range(500):
+            self.env.step(rl_actions=None)
+            ids = self.env.k.vehicle.get_ids()
+
+            # vehicles moving between shards should not be reported as
+            # exiting or entering the network
+            self.assertEqual(len(ids), 4)
+            self.assertEqual(self.env.k.vehicle.get_num_arrived(), 0)
+
+            # every vehicle is simulated by exactly one shard (or is in
+            # transit to another shard)
+            shard_ids = [set(connection.vehicle.getIDList())
+                         for connection in kernel_api.connections]
+            for veh_id in ids:
+                self.assertEqual(
+                    sum(veh_id in s for s in shard_ids) +
+                    (veh_id in kernel_api.in_transit), 1)
+
+            # vehicles keep moving forward across hand-offs
+            for veh_id in ids:
+                pos = self.env.k.vehicle.get_x_by_id(veh_id)
+                if veh_id in prev_pos:
+                    self.assertGreaterEqual(
+                        (pos - prev_pos[veh_id]) % 230, 0)
+                    self.assertLess((pos - prev_pos[veh_id]) % 230, 1)
+                prev_pos[veh_id] = pos
+
+        self.assertGreater(kernel_api.num_handoffs, 0)
+        self.assertTrue(all(np.array(self.env.k.vehicle.get_speed(ids)) > 0))
+
+    def test_release(self):
+        kernel_api = self.env.k.kernel_api
+        self.env.reset()
+        for _ in range(5):
+            checkpoint = self.env.fork()
+            self.env.step(rl_actions=None)
+            self.env.restore(checkpoint)
+            self.env.release(checkpoint)
+
+        # the states of all shards and their bookkeeping are deleted
+        self.assertListEqual(os.listdir(self.env.k._state_dir), [])
+        self.assertDictEqual(kernel_api._saved, {})
+
+    def test_blocked_handoff(self):
+        kernel_api = self.env.k.kernel_api
+        self.env.reset()
+
+        # vehicles handed off to another shard are never inserted, as if their
+        # positions were blocked
+        for connection in kernel_api.connections:
+            connection.vehicle.addFull = partial(connection.vehicle.addFull,
+                                                 depart="1000000")
+
+        for _ in range(500):
+            self.env.step(rl_actions=None)
+            for steps in kernel_api.transit_steps.values():
+                self.assertLessEqual(steps, MAX_HANDOFF_STEPS)
+            if kernel_api.num_dropped > 0:
+                break
+
+        # the dropped vehicles exited the network
+        self.assertGreater(kernel_api.num_dropped, 0)
+        ids = self.env.k.vehicle.get_ids()
+        self.assertEqual(len(ids), 4 - kernel_api.num_dropped)
+        self.assertSetEqual(set(kernel_api.owners), set(ids))
+
+    def test_close(self):
+        procs = list(self.env.k.simulation.sumo_procs)
+        self.assertEqual(len(procs), 2)
+        self.env.terminate()
+        self.env = None
+
+        # the sumo instances of all shards are shut down
+        for proc in procs:
+            self.assertIsNotNone(proc.wait(timeout=10))
+
+
+class TestManagedInflows(unittest.TestCase):
+    """Tests that the vehicles of inflows managed by Flow are inserted by the
+    environment, and that the rates of the inflows can be changed at any
+    step."""
+
+    def setUp(self):
+        inflows = InFlows(managed=True)
+        inflows.add(veh_type="idm", edge="highway_0", vehs_per_hour=1800,
+                    departSpeed=10)
+        inflows.add(veh_type="idm", edge="highway_0", probability=0,
+                    departLane="random")
+        net_params = NetParams(
+            inflows=inflows,
+            additional_params={"length": 100, "lanes": 2, "speed_limit": 30,
+                               "resolution": 40, "num_edges": 1})
+        vehicles = VehicleParams()
+        vehicles.add("idm",
+                     acceleration_controller=(IDMController, {}),
+                     num_vehicles=0)
+        self.env, _ = highway_exp_setup(
+            vehicles=vehicles, net_params=net_params,
+            sim_params=SumoParams(sim_step=0.1, seed=0))
+
+    def tearDown(self):
+        self.env.terminate()
+        self.env = None
+
+    def _inflow_ids(self):
+        return sorted(veh_id for veh_id in self.env.k.vehicle.get_ids()
+                      if veh_id.startswith("flow"))
+
+    def test_managed_inflows(self):
+        # the inflows are not written to the route file of the network
+        with open(os.path.join(self.env.k.scenario.cfg_path,
+                               self.env.k.scenario.roufn)) as f:
+            self.assertNotIn("<flow", f.read())
+        self.assertFalse(self.env.can_fast_forward())
+
+        # one vehicle is inserted every two seconds, starting after a second
+        self.env.reset()
+        for _ in range(35):
+            self.env.step(rl_actions=None)
+        self.assertListEqual(self._inflow_ids(), ["flow_0.0", "flow_0.1"])
+        self.assertGreaterEqual(self.env.k.vehicle.get_speed("flow_0.0"), 10)
+
+        # rates can be changed at any step
+        self.env.inflows.set_rate("flow_0", vehs_per_hour=0)
+        self.env.inflows.set_rate("flow_1", probability=1)
+        self.assertEqual(self.env.inflows.get_rate("flow_1"), 3600)
+        for _ in range(20):
+            self.env.step(rl_actions=None)
+        ids = self._inflow_ids()
+        self.assertNotIn("flow_0.2", ids)
+        self.assertGreater(len([veh_id for veh_id in ids
+                                if veh_id.startswith("flow_1")]), 0)
+
+        # the inflows restart on resets, without any queued vehicle
+        self.env.inflows.set_rate("flow_1", probability=0)
+        self.env.reset()
+        self.assertEqual(self.env.inflows.time, 0)
+        self.assertListEqual(self._inflow_ids(), [])
+        for _ in range(20):
+            self.env.step(rl_actions=None)
+        self.assertListEqual(self._inflow_ids(), [])
+
+    def test_scale_rates(self):
+        self.env.inflows.set_rate("flow_1", probability=0.8)
+        self.env.inflows.scale_rates(2)
+        self.assertEqual(self.env.inflows.get_rate("flow_0"), 3600)
+        self.assertEqual(self.env.inflows.get_rate("flow_1"), 3600)
+        self.assertRaises(KeyError, self.env.inflows.get_rate, "flow_2")
+        self.assertRaises(ValueError, self.env.inflows.set_rate, "flow_0")
+
+
 class TestAbstractMethods(unittest.TestCase):
     """
     These series of tests are meant to ensure that the environment abstractions
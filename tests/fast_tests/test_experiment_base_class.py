@@ -3,6 +3,7 @@ import os
 import time
 
 from flow.core.experiment import Experiment
+from flow.core.metrics import RolloutMetrics
 from flow.core.params import VehicleParams
 from flow.controllers import RLController, ContinuousRouter
 from flow.core.params import SumoCarFollowingParams
@@ -36,6 +37,29 @@ class TestNumSteps(unittest.TestCase):
         self.assertEqual(self.exp.env.time_counter, 10)
 
 
+class TestMetrics(unittest.TestCase):
+    """
+    Tests that the experiment class keeps the metrics attached to the
+    environment, and only creates default metrics otherwise.
+    """
+
+    def test_default_metrics(self):
+        env, scenario = ring_road_exp_setup()
+        exp = Experiment(env)
+        info = exp.run(num_runs=1, num_steps=10)
+        self.assertIsInstance(env.metrics, RolloutMetrics)
+        self.assertEqual(len(info["metrics"]), 1)
+
+    def test_custom_metrics(self):
+        env, scenario = ring_road_exp_setup()
+        metrics = RolloutMetrics(env.sim_step, throughput_window=10)
+        env.metrics = metrics
+        exp = Experiment(env)
+        exp.run(num_runs=2, num_steps=10)
+        self.assertIs(env.metrics, metrics)
+        self.assertEqual(len(metrics.outflow._counts), int(10 / env.sim_step))
+
+
 class TestNumRuns(unittest.TestCase):
     """
     Tests that the experiment class properly resets as many times as requested,
@@ -0,0 +1,101 @@
+import unittest
+import os
+
+from flow.core.experiment import Experiment
+from flow.core.emissions import EmissionsEstimator, POLLUTANTS
+from flow.core.metrics import RunningStat, WindowedRate, RolloutMetrics
+
+from tests.setup_scripts import ring_road_exp_setup
+import numpy as np
+
+os.environ["TEST_FLAG"] = "True"
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Tests that the metrics of rollouts are accumulated while the environment
+    is stepped, and match their batch counterparts.
+    """
+
+    def test_running_stat(self):
+        values = np.random.RandomState(0).normal(3, 2, size=1000)
+        stat = RunningStat()
+        self.assertTrue(np.isnan(stat.mean))
+        for value in values:
+            stat.push(value)
+        self.assertEqual(stat.count, 1000)
+        self.assertAlmostEqual(stat.total, values.sum())
+        self.assertAlmostEqual(stat.mean, values.mean())
+        self.assertAlmostEqual(stat.std, values.std())
+
+    def test_windowed_rate(self):
+        counts = [0, 1, 0, 2, 1, 0, 0, 3]
+        rate = WindowedRate(time_span=0.5, sim_step=0.1)
+        self.assertEqual(rate.rate(), 0)
+        for i, count in enumerate(counts):
+            rate.push(count)
+            window = counts[max(i - 4, 0):i + 1]
+            self.assertAlmostEqual(
+                rate.rate(), 3600 * sum(window) / (len(window) * 0.1))
+            # rates over the last steps of the window
+            window = counts[max(i - 1, 0):i + 1]
+            self.assertAlmostEqual(
+                rate.rate(0.2), 3600 * sum(window) / (len(window) * 0.1))
+        self.assertAlmostEqual(rate.rate(10), rate.rate())
+        rate.clear()
+        self.assertEqual(rate.rate(), 0)
+
+    def test_experiment_metrics(self):
+        env, _ = ring_road_exp_setup()
+        exp = Experiment(env)
+        info_dict = exp.run(num_runs=2, num_steps=10)
+
+        self.assertEqual(len(info_dict["metrics"]), 2)
+        metrics = info_dict["metrics"][-1]
+        self.assertEqual(metrics["num_steps"], 10)
+        self.assertEqual(metrics["outflow"], 0)
+        self.assertAlmostEqual(info_dict["returns"][-1], metrics["return"])
+
+        # the per-step speeds and returns are still returned
+        self.assertEqual(len(info_dict["velocities"][-1]), 10)
+        self.assertEqual(len(info_dict["per_step_returns"][-1]), 10)
+        self.assertAlmostEqual(np.mean(info_dict["velocities"][-1]),
+                               metrics["mean_speed"])
+
+        num_vehicles = len(env.k.vehicle.get_ids())
+        self.assertAlmostEqual(metrics["vehicle_hours"],
+                               num_vehicles * 10 * env.sim_step / 3600)
+        self.assertGreaterEqual(metrics["total_delay"], 0)
+
+        # all vehicles are on some edge of the ring at every step
+        densities = env.metrics.edge_densities()
+        self.assertAlmostEqual(
+            sum(density * env.k.scenario.edge_length(edge)
+                for edge, density in densities.items()),
+            num_vehicles)
+
+    def test_emissions(self):
+        env, _ = ring_road_exp_setup()
+        env.metrics = RolloutMetrics(
+            env.sim_step, emissions=EmissionsEstimator(env.sim_step))
+        env.reset()
+        self.assertEqual(env.metrics.summary()["CO2"], 0)
+        for _ in range(10):
+            env.step(rl_actions=None)
+
+        # the emissions are accumulated at every step
+        summary = env.metrics.summary()
+        for pollutant in POLLUTANTS:
+            self.assertIn(pollutant, summary)
+        self.assertGreater(summary["CO2"], 0)
+        self.assertGreater(summary["fuel"], 0)
+
+        # and cleared on resets
+        env.reset()
+        self.assertEqual(env.metrics.summary()["CO2"], 0)
+        self.assertListEqual(env.metrics.emissions.ids, [])
+        env.terminate()
+
+
+if __name__ == '__main__':
+    unittest.main()
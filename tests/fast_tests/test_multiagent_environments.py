@@ -0,0 +1,206 @@
+import unittest
+import os
+import numpy as np
+
+from flow.core.params import VehicleParams
+from flow.core.params import NetParams, EnvParams, SumoParams, InFlows, \
+    InitialConfig
+from flow.controllers import IDMController, RLController, ContinuousRouter
+from flow.scenarios import HighwayScenario, MultiLoopScenario
+from flow.multiagent_envs import MultiAgentAccelEnv, MultiWaveAttenuationPOEnv
+
+os.environ["TEST_FLAG"] = "True"
+
+
+class TestMultiEnvManagedInflows(unittest.TestCase):
+    """Tests that the vehicles of inflows managed by Flow are inserted by
+    multi-agent environments, and restarted when they are reset."""
+
+    def setUp(self):
+        inflows = InFlows(managed=True)
+        inflows.add(veh_type="idm", edge="highway_0", vehs_per_hour=1800,
+                    departSpeed=10)
+        net_params = NetParams(
+            inflows=inflows,
+            additional_params={"length": 100, "lanes": 2, "speed_limit": 30,
+                               "resolution": 40, "num_edges": 1})
+        vehicles = VehicleParams()
+        vehicles.add("idm",
+                     acceleration_controller=(IDMController, {}),
+                     num_vehicles=0)
+        scenario = HighwayScenario(
+            name="test_multiagent_inflows",
+            vehicles=vehicles,
+            net_params=net_params)
+        env_params = EnvParams(additional_params={
+            "max_accel": 1, "max_decel": 1, "target_velocity": 8,
+            "sort_vehicles": False, "perturb_weight": 0})
+        self.env = MultiAgentAccelEnv(
+            env_params, SumoParams(sim_step=0.1, seed=0), scenario)
+
+    def tearDown(self):
+        self.env.terminate()
+        self.env = None
+
+    def _inflow_ids(self):
+        return sorted(veh_id for veh_id in self.env.k.vehicle.get_ids()
+                      if veh_id.startswith("flow"))
+
+    def test_managed_inflows(self):
+        self.assertIsNotNone(self.env.inflows)
+
+        # one vehicle is inserted every two seconds, starting after a second
+        self.env.reset()
+        for _ in range(35):
+            self.env.step(rl_actions=None)
+        self.assertListEqual(self._inflow_ids(), ["flow_0.0", "flow_0.1"])
+
+        # the inflows restart on resets, without any queued vehicle
+        self.env.inflows.set_rate("flow_0", vehs_per_hour=0)
+        self.env.reset()
+        self.assertEqual(self.env.inflows.time, 0)
+        self.assertListEqual(self._inflow_ids(), [])
+        for _ in range(20):
+            self.env.step(rl_actions=None)
+        self.assertListEqual(self._inflow_ids(), [])
+
+
+class GroupedRingsEnv(MultiWaveAttenuationPOEnv):
+    """Ring environment with an additional group that contains no edges."""
+
+    def specify_groups(self):
+        groups = super().specify_groups()
+        groups["empty"] = []
+        return groups
+
+
+def two_rings_env(env_class=MultiWaveAttenuationPOEnv):
+    """Create a multi-agent ring environment with two rings."""
+    vehicles = VehicleParams()
+    for i in range(2):
+        vehicles.add(
+            veh_id='human_{}'.format(i),
+            acceleration_controller=(IDMController, {'noise': 0.2}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=5)
+        vehicles.add(
+            veh_id='rl_{}'.format(i),
+            acceleration_controller=(RLController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=1)
+    net_params = NetParams(additional_params={
+        'length': 230, 'lanes': 1, 'speed_limit': 30, 'resolution': 40,
+        'num_rings': 2})
+    scenario = MultiLoopScenario(
+        name='test_multiagent_rings',
+        vehicles=vehicles,
+        net_params=net_params,
+        initial_config=InitialConfig(bunching=20.0, spacing='custom'))
+    env_params = EnvParams(additional_params={
+        'max_accel': 1, 'max_decel': 1, 'ring_length': [230, 230],
+        'target_velocity': 4})
+    return env_class(env_params, SumoParams(sim_step=0.1, seed=0), scenario)
+
+
+class TestGroupStats(unittest.TestCase):
+    """Tests that the group-level statistics of flow.multiagent_envs.MultiEnv
+    match the ones computed separately for every group."""
+
+    def setUp(self):
+        self.env = two_rings_env(GroupedRingsEnv)
+        self.env.reset()
+        for _ in range(20):
+            self.env.step(rl_actions=None)
+
+    def tearDown(self):
+        self.env.terminate()
+        self.env = None
+
+    def test_group_stats(self):
+        env = self.env
+        veh_ids = env.k.vehicle.get_ids()
+        speeds = np.array(env.k.vehicle.get_speed(veh_ids))
+        stats = env.get_group_stats(speeds, veh_ids)
+
+        names, _ = env._group_tables()
+        self.assertListEqual(names, ['0', '1', 'empty'])
+        groups = env.specify_groups()
+        for i, name in enumerate(names):
+            values = [env.k.vehicle.get_speed(veh_id) for veh_id in veh_ids
+                      if env.k.vehicle.get_edge(veh_id) in groups[name]]
+            self.assertEqual(stats['count'][i], len(values))
+            self.assertAlmostEqual(stats['sum'][i], sum(values))
+            if len(values) > 0:
+                self.assertAlmostEqual(stats['min'][i], min(values))
+                self.assertAlmostEqual(stats['max'][i], max(values))
+                self.assertAlmostEqual(stats['mean'][i], np.mean(values))
+
+        # every ring holds six vehicles, and the last group is empty
+        np.testing.assert_array_equal(stats['count'], [6, 6, 0])
+        self.assertEqual(stats['min'][2], np.inf)
+        self.assertEqual(stats['max'][2], -np.inf)
+        self.assertEqual(stats['mean'][2], 0)
+
+        # agents are assigned to the ring specified in their id
+        rl_ids = env.k.vehicle.get_rl_ids()
+        np.testing.assert_array_equal(
+            env.get_agent_groups(rl_ids),
+            [int(rl_id.split('_')[1]) for rl_id in rl_ids])
+
+
+class TestMultiWaveAttenuationPOEnv(unittest.TestCase):
+    """Tests that the observations and rewards of MultiWaveAttenuationPOEnv,
+    computed for all agents at once, match the ones of every agent computed
+    separately."""
+
+    def setUp(self):
+        self.env = two_rings_env()
+        self.env.reset()
+        for _ in range(20):
+            self.env.step(rl_actions=None)
+
+    def tearDown(self):
+        self.env.terminate()
+        self.env = None
+
+    def test_observations(self):
+        env = self.env
+        max_speed = 15.
+        max_length = env.env_params.additional_params['ring_length'][1]
+
+        obs = env.get_state()
+        self.assertCountEqual(obs.keys(), env.k.vehicle.get_rl_ids())
+        for rl_id in env.k.vehicle.get_rl_ids():
+            lead_id = env.k.vehicle.get_leader(rl_id) or rl_id
+            expected = np.array([
+                env.k.vehicle.get_speed(rl_id) / max_speed,
+                (env.k.vehicle.get_speed(lead_id) -
+                 env.k.vehicle.get_speed(rl_id)) / max_speed,
+                env.k.vehicle.get_headway(rl_id) / max_length
+            ])
+            np.testing.assert_array_almost_equal(obs[rl_id], expected)
+
+    def test_rewards(self):
+        env = self.env
+        target_vel = env.env_params.additional_params['target_velocity']
+        rl_actions = {rl_id: np.array([0.])
+                      for rl_id in env.k.vehicle.get_rl_ids()}
+
+        reward = env.compute_reward(rl_actions, fail=False)
+        self.assertCountEqual(reward.keys(), rl_actions.keys())
+        for rl_id in rl_actions.keys():
+            edges = env.gen_edges(rl_id.split('_')[1])
+            vel = np.array([
+                env.k.vehicle.get_speed(veh_id)
+                for veh_id in env.k.vehicle.get_ids_by_edge(edges)])
+            max_cost = np.linalg.norm(np.array([target_vel] * len(vel)))
+            cost = np.linalg.norm(vel - target_vel)
+            expected = max(max_cost - cost, 0) / max_cost
+            self.assertAlmostEqual(reward[rl_id], expected)
+
+        # failures (e.g. collisions) are not rewarded
+        self.assertEqual(env.compute_reward(rl_actions, fail=True), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -29,7 +29,10 @@ class TestSumoParams(unittest.TestCase):
              restart_instance=True,
              print_warnings=False,
              teleport_time=-1,
-             sumo_binary=None)
+             sumo_binary=None,
+             pool_size=2,
+             trajectory_path="/trajectories",
+             num_shards=4)
 
         # ensure that the attributes match their correct values
         self.assertEqual(params.port, None)
@@ -47,6 +50,9 @@ class TestSumoParams(unittest.TestCase):
         self.assertEqual(params.restart_instance, True)
         self.assertEqual(params.print_warnings, False)
         self.assertEqual(params.teleport_time, -1)
+        self.assertEqual(params.pool_size, 2)
+        self.assertEqual(params.trajectory_path, "/trajectories")
+        self.assertEqual(params.num_shards, 4)
 
 
 class TestSumoCarFollowingParams(unittest.TestCase):
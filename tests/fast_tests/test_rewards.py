@@ -9,6 +9,8 @@ from flow.core.rewards import average_velocity, total_velocity, min_delay
 from flow.core.rewards import desired_velocity, reward_rl_opening_headways
 from flow.core.rewards import penalize_near_standstill, penalize_standstill
 from flow.core.rewards import punish_small_rl_headways, boolean_action_penalty
+from flow.core.rewards import penalize_emissions
+from flow.core.emissions import EmissionsEstimator, emission_rates, POLLUTANTS
 
 os.environ["TEST_FLAG"] = "True"
 
@@ -247,6 +249,33 @@ class TestRewards(unittest.TestCase):
         env.k.vehicle.set_follower('test_rl_0', None)
         self.assertAlmostEqual(reward_rl_opening_headways(env, 0.5, 2), 0)
 
+    def test_penalize_emissions(self):
+        """Test the penalize_emissions method."""
+        vehicles = VehicleParams()
+        vehicles.add("test", num_vehicles=10)
+
+        env, scenario = ring_road_exp_setup(vehicles=vehicles)
+        estimator = EmissionsEstimator(env.sim_step)
+
+        # all vehicles are idling upon reset
+        idle = emission_rates([0], [0])[0, POLLUTANTS.index("CO2")]
+        self.assertAlmostEqual(penalize_emissions(env, estimator),
+                               -10 * idle * env.sim_step / 1000)
+        self.assertAlmostEqual(penalize_emissions(env, estimator, gain=2),
+                               -20 * idle * env.sim_step / 1000)
+
+        # accelerate one vehicle
+        env.k.vehicle.test_set_speed("test_0", 1)
+        rate = emission_rates([1], [1 / env.sim_step])[0, 0]
+        self.assertAlmostEqual(penalize_emissions(env, estimator),
+                               -(9 * idle + rate) * env.sim_step / 1000)
+
+        # vehicles of types without emissions
+        estimator = EmissionsEstimator(env.sim_step, {"test": "zero"})
+        self.assertEqual(penalize_emissions(env, estimator), 0)
+        self.assertRaises(KeyError, EmissionsEstimator, env.sim_step,
+                          {"test": "unknown"})
+
 
 if __name__ == '__main__':
     unittest.main()
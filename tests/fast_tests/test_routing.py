@@ -0,0 +1,158 @@
+import unittest
+import os
+
+from flow.core.routing import RouteEngine
+
+from tests.setup_scripts import ring_road_exp_setup
+
+os.environ["TEST_FLAG"] = "True"
+
+
+def diamond_network():
+    """Create a network with two paths from "a" to "d".
+
+    The path through "b" is shorter, but the path through "c" is faster. The
+    edges are connected through junctions, whose ids start with ":".
+    """
+    edges = {
+        "a": {"length": 100, "speed": 10},
+        "b": {"length": 100, "speed": 5},
+        "c": {"length": 150, "speed": 30},
+        "d": {"length": 100, "speed": 10},
+        "e": {"length": 100, "speed": 10},
+        ":j_0": {"length": 10, "speed": 10},
+        ":j_1": {"length": 10, "speed": 10},
+        ":k_0": {"length": 5, "speed": 10},
+    }
+    connections = {
+        "a": [":j_0", ":j_1"],
+        ":j_0": ["b"],
+        ":j_1": ["c"],
+        "b": [":k_0"],
+        "c": [":k_0"],
+        ":k_0": ["d"],
+        "d": [],
+        "e": ["a"],
+    }
+    return edges, connections
+
+
+class TestRouteEngine(unittest.TestCase):
+    """Tests the shortest path computations in flow.core.routing.RouteEngine
+    on a small network."""
+
+    def test_length_weight(self):
+        edges, connections = diamond_network()
+        engine = RouteEngine(edges, connections, weight="length")
+
+        # internal edges are collapsed out of the routes
+        self.assertListEqual(engine.route("a", "d"), ["a", "b", "d"])
+        self.assertListEqual(engine.route("e", "d"), ["e", "a", "b", "d"])
+        self.assertListEqual(engine.route("a", "a"), ["a"])
+        self.assertCountEqual(engine.successors("a"), ["b", "c"])
+
+        # the lengths of the junctions are included in the cost
+        self.assertAlmostEqual(engine.distance("a", "d"), 215)
+
+        # unreachable edges
+        self.assertIsNone(engine.route("d", "a"))
+        self.assertEqual(engine.distance("d", "a"), float("inf"))
+        self.assertRaises(KeyError, engine.route, ":j_0", "d")
+
+    def test_time_weight(self):
+        edges, connections = diamond_network()
+        engine = RouteEngine(edges, connections, weight="time")
+        self.assertListEqual(engine.route("a", "d"), ["a", "c", "d"])
+        self.assertAlmostEqual(engine.distance("a", "d"), 1 + 5 + 0.5 + 10)
+
+    def test_update_travel_times(self):
+        edges, connections = diamond_network()
+        engine = RouteEngine(edges, connections, weight="time", tolerance=0.1)
+        self.assertListEqual(engine.route("a", "d"), ["a", "c", "d"])
+
+        # small changes are ignored and do not flush the cache
+        self.assertFalse(engine.update_travel_times({"c": 5.2}))
+        self.assertAlmostEqual(engine.distance("a", "d"), 16.5)
+
+        # congestion on "c" moves the route to "b"
+        self.assertTrue(engine.update_travel_times({"c": 60}))
+        self.assertListEqual(engine.route("a", "d"), ["a", "b", "d"])
+        self.assertAlmostEqual(engine.distance("a", "d"), 1 + 20 + 0.5 + 10)
+
+        # travel times are not used by length-weighted engines
+        engine = RouteEngine(edges, connections, weight="length")
+        self.assertFalse(engine.update_travel_times({"b": 1000}))
+        self.assertListEqual(engine.route("a", "d"), ["a", "b", "d"])
+
+    def test_incremental_invalidation(self):
+        edges, connections = diamond_network()
+        engine = RouteEngine(edges, connections, weight="time")
+        for origin in ["a", "b", "d", "e"]:
+            engine.route(origin, "d")
+
+        # only the trees from which "c" can be reached are removed
+        self.assertTrue(engine.update_travel_times({"c": 60}))
+        self.assertCountEqual(engine._trees.keys(), ["b", "d"])
+        self.assertListEqual(engine.route("e", "d"), ["e", "a", "b", "d"])
+
+        # the same holds for internal edges
+        engine.route("a", "d")
+        self.assertTrue(engine.update_travel_times({":k_0": 100}))
+        self.assertCountEqual(engine._trees.keys(), ["d"])
+        self.assertAlmostEqual(engine.distance("a", "d"), 1 + 20 + 100 + 10)
+
+    def test_update_internal_travel_times(self):
+        # two junction lanes connect "a" to "b"
+        edges = {
+            "a": {"length": 100, "speed": 10},
+            "b": {"length": 100, "speed": 10},
+            ":j_0": {"length": 10, "speed": 10},
+            ":j_1": {"length": 20, "speed": 10},
+        }
+        connections = {"a": [":j_0", ":j_1"], ":j_0": ["b"], ":j_1": ["b"]}
+        engine = RouteEngine(edges, connections, weight="time")
+        self.assertAlmostEqual(engine.distance("a", "b"), 1 + 10)
+
+        # the connection through the congested junction lane is replaced
+        self.assertTrue(engine.update_travel_times({":j_0": 5}))
+        self.assertAlmostEqual(engine.distance("a", "b"), 2 + 10)
+        self.assertTrue(engine.update_travel_times({":j_0": 0.5}))
+        self.assertAlmostEqual(engine.distance("a", "b"), 0.5 + 10)
+
+    def test_cache_size(self):
+        edges, connections = diamond_network()
+        engine = RouteEngine(edges, connections, cache_size=2)
+        engine.route("a", "d")
+        engine.route("b", "d")
+        engine.route("a", "d")
+        engine.route("c", "d")
+
+        # the least recently used tree is removed
+        self.assertListEqual(list(engine._trees.keys()), ["a", "c"])
+
+    def test_bad_weight(self):
+        edges, connections = diamond_network()
+        self.assertRaises(ValueError, RouteEngine, edges, connections,
+                          weight="speed")
+
+
+class TestScenarioRouteEngine(unittest.TestCase):
+    """Tests the route engine generated by the scenario kernel."""
+
+    def test_ring_road(self):
+        env, _ = ring_road_exp_setup()
+        engine = env.k.scenario.get_route_engine()
+
+        # the engine is only built once
+        self.assertIs(env.k.scenario.get_route_engine(), engine)
+
+        self.assertListEqual(engine.route("bottom", "top"),
+                             ["bottom", "right", "top"])
+        self.assertListEqual(engine.route("bottom", "left"),
+                             ["bottom", "right", "top", "left"])
+
+        env.terminate()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,12 @@
 import unittest
 import os
+import shutil
+import tempfile
 import numpy as np
 
 from flow.core.params import InitialConfig, NetParams
-from flow.core.params import VehicleParams
+from flow.core.params import VehicleParams, SumoParams
+from flow.core.kernel.scenario import TraCIScenario
 
 from flow.controllers.routing_controllers import ContinuousRouter
 from flow.controllers.car_following_models import IDMController
@@ -387,6 +390,34 @@ class TestEvenStartPos(unittest.TestCase):
         self.assertEqual(len(pos), 10)
         self.assertEqual(len(lanes), 10)
 
+    def test_cache(self):
+        """
+        Tests that unperturbed uniform starting positions are only computed
+        once, and that the cached positions cannot be modified by the caller.
+        """
+        # create the environment
+        self.setUp_gen_start_pos()
+        scenario = self.env.k.scenario
+
+        pos, lanes = scenario.generate_starting_positions(
+            initial_config=InitialConfig(), num_vehicles=10)
+        expected_pos, expected_lanes = list(pos), list(lanes)
+        pos.pop()
+        lanes.pop()
+
+        pos, lanes = scenario.generate_starting_positions(
+            initial_config=InitialConfig(), num_vehicles=10)
+        self.assertListEqual(pos, expected_pos)
+        self.assertListEqual(lanes, expected_lanes)
+
+        # perturbed starting positions are not cached
+        num_cached = len(scenario._start_pos_cache)
+        scenario.generate_starting_positions(
+            initial_config=InitialConfig(perturbation=1), num_vehicles=10)
+        self.assertEqual(len(scenario._start_pos_cache), num_cached)
+
+        self.tearDown_gen_start_pos()
+
 
 class TestEvenStartPosInternalLinks(unittest.TestCase):
     """
@@ -619,6 +650,52 @@ class TestEdgeLength(unittest.TestCase):
             env.k.scenario.edge_length(":center_1"), 9.40)  # FIXME: 6.2?
 
 
+class TestInternedEdges(unittest.TestCase):
+    """
+    Tests that the edges and junctions of a scenario are assigned integer
+    indices, and that the per-index arrays match the values returned by the
+    scenario methods.
+    """
+
+    def test_interned_edges(self):
+        net_params = NetParams(
+            no_internal_links=False,
+            additional_params={
+                "radius_ring": 30,
+                "lanes": 1,
+                "speed_limit": 60,
+                "resolution": 40
+            })
+
+        env, scenario = figure_eight_exp_setup(net_params=net_params)
+        k = env.k.scenario
+
+        # all edges and junctions are indexed once, edges first
+        num_edges = len(k.get_edge_list())
+        self.assertCountEqual(k.edge_ids[:num_edges], k.get_edge_list())
+        self.assertCountEqual(k.edge_ids[num_edges:], k.get_junction_list())
+        for i, edge in enumerate(k.edge_ids):
+            self.assertEqual(k.edge_index[edge], i)
+            self.assertEqual(k.get_edge_index(edge), i)
+            self.assertAlmostEqual(k.edge_lengths[i], k.edge_length(edge))
+            self.assertEqual(k.edge_num_lanes[i], k.num_lanes(edge))
+            self.assertAlmostEqual(k.edge_speed_limits[i],
+                                   k.speed_limit(edge))
+            self.assertEqual(k.edge_is_internal[i], edge[0] == ':')
+
+        # unknown edges are assigned an index of -1
+        self.assertEqual(k.get_edge_index(""), -1)
+        self.assertListEqual(k.get_edge_index(["bottom", "wrong_name"]),
+                             [k.edge_index["bottom"], -1])
+
+        # the starting positions match the ones specified by the scenario
+        self.assertAlmostEqual(k.edge_offsets[k.edge_index["bottom"]],
+                               k.total_edgestarts_dict["bottom"])
+        self.assertAlmostEqual(k.get_x("bottom", 4.72), 5)
+
+        env.terminate()
+
+
 class TestSpeedLimit(unittest.TestCase):
     """
     Tests the speed_limit() method in the base scenario class.
@@ -825,5 +902,68 @@ class TestNextPrevEdge(unittest.TestCase):
         self.assertTrue(len(prev_edge) == 0)
 
 
+class TestImportEdgesFromNet(unittest.TestCase):
+    """
+    Tests that the edges and connections of a .net.xml file are imported by
+    the _import_edges_from_net method of the TraCI scenario kernel.
+    """
+
+    NET = """<net>
+    <type id="residential" numLanes="2" speed="13.89"/>
+    <edge id=":c_0" function="internal">
+        <lane id=":c_0_0" index="0" speed="8.00" length="5.00"/>
+    </edge>
+    <edge id="a" from="n1" to="n2" type="residential">
+        <lane id="a_0" index="0" speed="20.00" length="100.00"/>
+        <lane id="a_1" index="1" speed="20.00" length="100.00"/>
+        <param key="origId" value="1"/>
+    </edge>
+    <edge id="b" from="n2" to="n3">
+        <lane id="b_0" index="0" speed="25.00" length="50.00">
+            <param key="origId" value="2"/>
+        </lane>
+    </edge>
+    <junction id="n2" type="priority" x="0" y="0"/>
+    <connection from="a" to="b" fromLane="1" toLane="0" via=":c_0_0"/>
+    <connection from=":c_0" to="b" fromLane="0" toLane="0"/>
+</net>
+"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.tmp_dir, "test.net.xml"), "w") as f:
+            f.write(self.NET)
+
+        self.scenario = TraCIScenario(None, SumoParams())
+        self.scenario.cfg_path = self.tmp_dir
+        self.scenario.netfn = "test.net.xml"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_import(self):
+        for no_internal_links in [False, True]:
+            self.scenario.network = type("Network", (object,), {
+                "net_params": NetParams(no_internal_links=no_internal_links)})
+            edges, connections = self.scenario._import_edges_from_net()
+
+            # only lane elements are counted as lanes, and the speed of the
+            # type takes precedence over the speed of the lanes
+            self.assertDictEqual(edges, {
+                ":c_0": {"lanes": 1, "length": 5, "speed": 8},
+                "a": {"lanes": 2, "length": 100, "speed": 13.89},
+                "b": {"lanes": 1, "length": 50, "speed": 25},
+            })
+
+            if no_internal_links:
+                self.assertDictEqual(connections["next"], {
+                    "a": {1: [("b", 0)]}, ":c_0": {0: [("b", 0)]}})
+            else:
+                self.assertDictEqual(connections["next"], {
+                    "a": {1: [(":c_0", 0)]}, ":c_0": {0: [("b", 0)]}})
+                self.assertDictEqual(connections["prev"], {
+                    ":c_0": {0: [("a", 1)]}, "b": {0: [(":c_0", 0)]}})
+
+
 if __name__ == '__main__':
     unittest.main()
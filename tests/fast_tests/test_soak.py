@@ -0,0 +1,68 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from flow.core.params import EnvParams
+from flow.core.soak import soak, container_sizes
+
+from flow.envs.loop.loop_accel import ADDITIONAL_ENV_PARAMS
+from tests.setup_scripts import ring_road_exp_setup
+import numpy as np
+
+os.environ["TEST_FLAG"] = "True"
+
+
+class TestSoak(unittest.TestCase):
+    """
+    Tests that soak runs sample the resources used by an environment across
+    resets, and estimate their growth.
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        env_params = EnvParams(horizon=20,
+                               additional_params=ADDITIONAL_ENV_PARAMS)
+        self.env, _ = ring_road_exp_setup(env_params=env_params)
+
+    def tearDown(self):
+        self.env.terminate()
+        shutil.rmtree(self.path)
+
+    def test_soak(self):
+        monitor = soak(self.env, num_steps=100, sample_every=25)
+        self.assertListEqual(monitor.steps, [0, 25, 50, 75, 100])
+        self.assertEqual(monitor.num_resets, 4)
+        self.assertEqual(monitor.num_restarts, 0)
+
+        # the number of vehicles on the ring is constant, and so is the size
+        # of the sumo observations of the vehicle kernel
+        num_vehicles = len(self.env.k.vehicle.get_ids())
+        self.assertListEqual(
+            monitor.samples["kernel.vehicle.__sumo_obs"], [num_vehicles] * 5)
+        slopes = monitor.slopes()
+        self.assertAlmostEqual(slopes["kernel.vehicle.__sumo_obs"], 0)
+        self.assertGreater(monitor.samples["sumo.rss"][0], 0)
+        self.assertTrue(np.isnan(monitor.samples["step.latency_p99"][0]))
+        self.assertGreater(monitor.samples["step.latency_p99"][-1], 0)
+        self.assertIn("python.heap", monitor.report())
+
+        path = os.path.join(self.path, "soak.csv")
+        monitor.to_csv(path)
+        data = np.genfromtxt(path, delimiter=",", names=True)
+        np.testing.assert_array_equal(data["step"], monitor.steps)
+        monitor.close()
+
+    def test_container_sizes(self):
+        class Kernel(object):
+            def __init__(self):
+                self.__obs = {"a": 1, "b": 2}
+                self.ids = ["a"]
+                self.time = 0
+
+        self.assertDictEqual(container_sizes(Kernel(), "k"),
+                             {"k.__obs": 2, "k.ids": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
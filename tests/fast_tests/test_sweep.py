@@ -0,0 +1,95 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from flow.core.sweep import Sweep, ResultStore, group_stats
+import numpy as np
+
+os.environ["TEST_FLAG"] = "True"
+
+
+def _sweep_cell(inflow, seed):
+    if inflow < 0:
+        raise ValueError("negative inflow")
+    return {"outflow": inflow / 2 + seed}
+
+
+def _sweep_cell_scaled(inflow, seed, scale):
+    return {"outflow": scale * inflow + seed}
+
+
+class TestSweep(unittest.TestCase):
+    """
+    Tests that sweeps checkpoint their results, and skip completed cells when
+    they are resumed.
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.path, "sweep.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_sweep(self):
+        grid = {"inflow": [-100, 100, 200], "seed": [0, 1]}
+        sweep = Sweep(_sweep_cell, grid, self.store_path, num_workers=2)
+        self.assertEqual(len(sweep.cells()), 6)
+
+        # cells with a negative inflow fail, and are left pending
+        self.assertEqual(sweep.run(), 2)
+        self.assertEqual(len(sweep.store), 4)
+        self.assertListEqual(sweep.pending(), [{"inflow": -100, "seed": 0},
+                                               {"inflow": -100, "seed": 1}])
+        self.assertDictEqual(sweep.store.get({"seed": 1, "inflow": 200}),
+                             {"outflow": 101})
+        self.assertIsNone(sweep.store.get({"seed": 1, "inflow": -100}))
+        sweep.store.close()
+
+        # results are reloaded from disk, and completed cells are skipped
+        sweep = Sweep(_sweep_cell, {"inflow": [100, 200, 300], "seed": [0]},
+                      self.store_path, num_workers=1)
+        self.assertListEqual(sweep.pending(), [{"inflow": 300, "seed": 0}])
+        self.assertEqual(sweep.run(), 0)
+        self.assertIn({"inflow": 300, "seed": 0}, sweep.store)
+        self.assertEqual(len(sweep.store), 5)
+
+        data = sweep.store.arrays(["inflow", "outflow"])
+        np.testing.assert_array_equal(data["inflow"],
+                                      [100, 100, 200, 200, 300])
+        np.testing.assert_array_equal(data["outflow"],
+                                      [50, 51, 100, 101, 150])
+        sweep.store.close()
+
+    def test_explicit_cells(self):
+        # cells may be listed explicitly, and shared arguments are not part
+        # of their keys
+        cells = [{"inflow": 100, "seed": 0}, {"inflow": 200, "seed": 3}]
+        sweep = Sweep(_sweep_cell_scaled, cells, self.store_path,
+                      num_workers=2, kwargs={"scale": 2})
+        self.assertListEqual(sweep.cells(), cells)
+        self.assertEqual(sweep.run(), 0)
+        self.assertListEqual(sweep.pending(), [])
+        self.assertDictEqual(sweep.store.get(cells[1]), {"outflow": 403})
+        sweep.store.close()
+
+    def test_group_stats(self):
+        inflows = [200, 100, 200, 100, 300]
+        outflows = [4, 1, 8, 3, 5]
+        stats = group_stats(inflows, outflows)
+        np.testing.assert_array_equal(stats["keys"], [100, 200, 300])
+        np.testing.assert_array_equal(stats["count"], [2, 2, 1])
+        np.testing.assert_array_almost_equal(stats["mean"], [2, 6, 5])
+        np.testing.assert_array_almost_equal(stats["std"], [1, 2, 0])
+        np.testing.assert_array_equal(stats["min"], [1, 4, 5])
+        np.testing.assert_array_equal(stats["max"], [3, 8, 5])
+
+    def test_store_key(self):
+        # the key of a cell does not depend on the order of its parameters
+        self.assertEqual(ResultStore.key({"a": 1, "b": 2}),
+                         ResultStore.key({"b": 2, "a": 1}))
+
+
+if __name__ == '__main__':
+    unittest.main()
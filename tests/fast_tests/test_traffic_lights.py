@@ -1,6 +1,8 @@
 import unittest
 import os
 
+import numpy as np
+
 from tests.setup_scripts import ring_road_exp_setup, grid_mxn_exp_setup
 from flow.core.params import VehicleParams
 from flow.core.params import NetParams
@@ -9,6 +11,7 @@ from flow.core.params import TrafficLightParams
 from flow.core.experiment import Experiment
 from flow.controllers.routing_controllers import GridRouter
 from flow.controllers.car_following_models import IDMController
+from flow.envs.green_wave_env import TrafficLightGridEnv
 
 os.environ["TEST_FLAG"] = "True"
 
@@ -137,6 +140,21 @@ class TestSetState(unittest.TestCase):
 
         self.assertEqual(state[1], "R")
 
+    def test_set_states(self):
+        # reset the environment
+        self.env.reset()
+
+        # set the states of several nodes at once
+        self.env.k.traffic_light.set_states(["top"], ["rY"])
+
+        # run a new step
+        self.env.step([])
+
+        # check the new values
+        state = self.env.k.traffic_light.get_state("top")
+
+        self.assertEqual(state, "rY")
+
 
 class TestPOEnv(unittest.TestCase):
     """
@@ -207,6 +225,66 @@ class TestPOEnv(unittest.TestCase):
             self.assertTrue(self.env.k.vehicle.get_edge(veh_id) in c0_edges)
 
 
+class TestPhases(unittest.TestCase):
+    """
+    Tests the transitions between the phases of the traffic lights in
+    TrafficLightGridEnv.
+    """
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="idm",
+            acceleration_controller=(IDMController, {}),
+            routing_controller=(GridRouter, {}),
+            car_following_params=SumoCarFollowingParams(
+                min_gap=2.5, tau=1.1),
+            num_vehicles=16)
+
+        self.env, scenario = grid_mxn_exp_setup(
+            row_num=1, col_num=3, vehicles=vehicles)
+
+    def tearDown(self):
+        # terminate the traci instance
+        self.env.terminate()
+
+        # free data used by the class
+        self.env = None
+
+    def apply(self, rl_actions):
+        TrafficLightGridEnv._apply_rl_actions(self.env, rl_actions)
+        self.env.k.simulation.simulation_step()
+        self.env.k.update(reset=False)
+        return [self.env.k.traffic_light.get_state(node_id)
+                for node_id in ["center0", "center1", "center2"]]
+
+    def test_continuous(self):
+        # only the first traffic light switches to yellow
+        states = self.apply(np.array([1, -1, -1]))
+        self.assertEqual(states[0], "yryr")
+        np.testing.assert_array_equal(self.env.last_change,
+                                      [[0, 1, 0], [0, 0, 1], [0, 0, 1]])
+
+        # requests are ignored while the light is yellow, and the light turns
+        # red/green once the switch time (3 seconds) is reached
+        for _ in range(2):
+            self.apply(np.array([1, -1, -1]))
+            self.assertEqual(self.env.last_change[0, 2], 0)
+        states = self.apply(np.array([1, -1, -1]))
+        self.assertEqual(states[0], "rGrG")
+        np.testing.assert_array_equal(self.env.last_change,
+                                      [[3, 1, 1], [0, 0, 1], [0, 0, 1]])
+
+    def test_discrete(self):
+        self.env.discrete = True
+
+        # the last traffic light corresponds to the least significant bit
+        states = self.apply(1)
+        self.assertEqual(states[2], "yryr")
+        np.testing.assert_array_equal(self.env.last_change,
+                                      [[0, 0, 1], [0, 0, 1], [0, 1, 0]])
+
+
 class TestItRuns(unittest.TestCase):
     """
     Tests the set_state function
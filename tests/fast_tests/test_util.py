@@ -3,6 +3,13 @@ import csv
 import os
 import json
 import collections
+from copy import deepcopy
+from gym.spaces import Box
+import numpy as np
+import shutil
+import subprocess
+import sys
+import tempfile
 
 from flow.core.params import VehicleParams
 from flow.core.params import TrafficLightParams
@@ -11,8 +18,12 @@ from flow.core.params import SumoParams, EnvParams, NetParams, InitialConfig, \
     InFlows, SumoCarFollowingParams
 from flow.core.util import emission_to_csv
 from flow.utils.flow_warnings import deprecation_warning
+from flow.utils.leaderboard.evaluate import evaluate_policies, \
+    get_benchmark_hash, get_checkpoint_hash, load_policy, \
+    AVAILABLE_BENCHMARKS, POLICY_LOADERS, _evaluation_sweep
 from flow.utils.registry import make_create_env
-from flow.utils.rllib import FlowParamsEncoder, get_flow_params
+from flow.utils.rllib import FlowParamsEncoder, get_flow_params, \
+    compute_actions
 
 os.environ["TEST_FLAG"] = "True"
 
@@ -166,6 +177,155 @@ class TestRegistry(unittest.TestCase):
                          flow_params["scenario"])
 
 
+class TestLeaderboard(unittest.TestCase):
+    """Tests the keys used to cache evaluations of the leaderboard, and that
+    only the runs of modified policies or benchmarks are recomputed."""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_benchmark_hash(self):
+        self.assertEqual(get_benchmark_hash("figureeight0"),
+                         get_benchmark_hash("figureeight0"))
+        self.assertNotEqual(get_benchmark_hash("figureeight0"),
+                            get_benchmark_hash("figureeight1"))
+
+    def test_checkpoint_hash(self):
+        checkpoint = os.path.join(self.path, "checkpoint-1")
+        with open(checkpoint, "w") as f:
+            f.write("weights")
+        file_hash = get_checkpoint_hash(checkpoint)
+        dir_hash = get_checkpoint_hash(self.path)
+
+        # the hash changes with the contents of the checkpoint
+        with open(checkpoint, "w") as f:
+            f.write("other weights")
+        self.assertNotEqual(get_checkpoint_hash(checkpoint), file_hash)
+        self.assertNotEqual(get_checkpoint_hash(self.path), dir_hash)
+
+    def test_evaluation_cache(self):
+        cache_path = os.path.join(self.path, "evaluate.db")
+        runs = []
+
+        def run(benchmark, seed, **_):
+            runs.append((benchmark, seed))
+            return {"return": float(seed)}
+
+        def evaluate(policy_hash):
+            """Run the evaluation sweep, and return the runs it computed."""
+            del runs[:]
+            sweep = _evaluation_sweep(
+                ["figureeight0", "merge0"], policy_hash, cache_path,
+                num_runs=2, num_workers=1, kwargs={}, run_fn=run)
+            self.assertEqual(sweep.run(), 0)
+            sweep.store.close()
+            return sorted(runs)
+
+        self.assertEqual(len(evaluate("policy_a")), 4)
+
+        # evaluating the same policy again does not run any cell
+        self.assertListEqual(evaluate("policy_a"), [])
+
+        # a new policy is evaluated on all benchmarks
+        self.assertEqual(len(evaluate("policy_b")), 4)
+
+        # only the runs of a modified benchmark are computed again
+        benchmark = AVAILABLE_BENCHMARKS["figureeight0"]
+        modified = deepcopy(benchmark)
+        modified["env"].horizon += 1
+        AVAILABLE_BENCHMARKS["figureeight0"] = modified
+        try:
+            self.assertListEqual(evaluate("policy_b"),
+                                 [("figureeight0", 0), ("figureeight0", 1)])
+        finally:
+            AVAILABLE_BENCHMARKS["figureeight0"] = benchmark
+
+    def test_load_policy(self):
+        loads = []
+
+        def loader(path, checkpoint_num):
+            loads.append((path, checkpoint_num))
+            return lambda state: checkpoint_num
+
+        POLICY_LOADERS["test"] = loader
+        try:
+            # policies are loaded once per process, from their spec
+            spec = ("test", self.path, 2)
+            self.assertEqual(load_policy(spec)(None), 2)
+            self.assertEqual(load_policy(spec)(None), 2)
+            self.assertEqual(load_policy(("test", self.path, 3))(None), 3)
+            self.assertListEqual(loads, [(self.path, 2), (self.path, 3)])
+        finally:
+            del POLICY_LOADERS["test"]
+
+        self.assertRaises(ValueError, load_policy, ("no_loader", self.path))
+
+    def test_evaluate_errors(self):
+        self.assertRaises(ValueError, evaluate_policies, ["no_benchmark"],
+                          None)
+        self.assertRaises(ValueError, evaluate_policies, ["figureeight0"],
+                          None, cache_path=os.path.join(self.path, "c.db"))
+
+
+class TestLazyImport(unittest.TestCase):
+    """Tests that environments, and their dependencies, are only imported
+    when they are first used (see flow.utils.lazy_import)."""
+
+    # generous upper bound on the time it takes to import the packages of
+    # flow without any environment, in seconds
+    MAX_IMPORT_TIME = 5
+
+    def _import(self, statement):
+        """Execute an import statement in a new interpreter, and return the
+        time it took and the modules that were imported."""
+        code = ("import sys, time\n"
+                "t = time.time()\n"
+                "{}\n"
+                "print(time.time() - t)\n"
+                "print(' '.join(sys.modules))").format(statement)
+        out = subprocess.check_output([sys.executable, "-c", code])
+        import_time, modules = out.decode().strip().split("\n")[-2:]
+        return float(import_time), set(modules.split())
+
+    def test_minimal_imports(self):
+        heavy_modules = ["pyglet", "matplotlib", "cv2", "imutils", "scipy",
+                         "ray", "flow.renderer.pyglet_renderer"]
+
+        # importing the packages does not import any environment
+        _, modules = self._import(
+            "import flow.envs, flow.multiagent_envs, flow.utils.registry")
+        self.assertNotIn("flow.envs.base_env", modules)
+        for module in heavy_modules:
+            self.assertNotIn(module, modules)
+
+        # the headless training path does not import the renderer or ray
+        _, modules = self._import(
+            "from flow.envs import AccelEnv, WaveAttenuationPOEnv, "
+            "BottleneckEnv, TrafficLightGridEnv")
+        self.assertIn("flow.envs.base_env", modules)
+        for module in heavy_modules:
+            self.assertNotIn(module, modules)
+
+    def test_import_time(self):
+        # the time is measured in a new interpreter, so that no module is
+        # already imported
+        import_time, _ = self._import(
+            "import flow.envs, flow.multiagent_envs, flow.utils.registry")
+        self.assertLess(import_time, self.MAX_IMPORT_TIME)
+
+    def test_lazy_attributes(self):
+        import flow.envs
+        from flow.envs.loop.loop_accel import AccelEnv
+
+        self.assertIs(flow.envs.AccelEnv, AccelEnv)
+        self.assertIn("AccelEnv", dir(flow.envs))
+        self.assertIn("BayBridgeEnv", flow.envs.__all__)
+        self.assertRaises(AttributeError, getattr, flow.envs, "FakeEnv")
+
+
 class TestRllib(unittest.TestCase):
     """Tests the methods located in flow/utils/rllib.py"""
 
@@ -339,5 +499,73 @@ class TestRllib(unittest.TestCase):
                                      flow_params["veh"].__dict__))
 
 
+class _FakePolicy(object):
+    """Linear policy with the interface of an RLlib policy graph."""
+
+    def __init__(self, weight, recurrent=False):
+        self.weight = weight
+        self.recurrent = recurrent
+        self.num_calls = 0
+        self.action_space = Box(low=-1, high=1, shape=(1,), dtype=np.float32)
+
+    def get_initial_state(self):
+        return [np.zeros(1)] if self.recurrent else []
+
+    def compute_actions(self, obs_batch, state_batches):
+        self.num_calls += 1
+        return self.weight * np.asarray(obs_batch)[:, :1], [], {}
+
+
+class _FakeAgent(object):
+    """Agent with the interface of an RLlib agent, containing two policies
+    and observation preprocessors/filters that scale the observations."""
+
+    def __init__(self, recurrent=False):
+        preprocessor = collections.namedtuple("Preprocessor", ["transform"])
+        self.config = {"clip_actions": True}
+        self.local_evaluator = collections.namedtuple(
+            "Evaluator", ["policy_map", "preprocessors", "filters"])(
+            policy_map={"a": _FakePolicy(0.1, recurrent),
+                        "b": _FakePolicy(1)},
+            preprocessors={key: preprocessor(lambda obs: 2 * obs)
+                           for key in ["a", "b"]},
+            filters={key: lambda obs, update: obs + 1 for key in ["a", "b"]})
+
+    def compute_action(self, observation, policy_id):
+        policy = self.local_evaluator.policy_map[policy_id]
+        observation = self.local_evaluator.filters[policy_id](
+            self.local_evaluator.preprocessors[policy_id].transform(
+                observation), update=False)
+        return np.clip(policy.compute_actions([observation], [])[0][0],
+                       -1, 1)
+
+
+class TestComputeActions(unittest.TestCase):
+    """Tests the batched computation of actions of multiple agents."""
+
+    def test_compute_actions(self):
+        observations = {"a_{}".format(i): np.array([i, 0.]) for i in range(5)}
+        observations.update(
+            {"b_{}".format(i): np.array([i, 0.]) for i in range(3)})
+
+        def policy_mapping_fn(agent_id):
+            return agent_id.split("_")[0]
+
+        for recurrent in [False, True]:
+            agent = _FakeAgent(recurrent=recurrent)
+            actions = compute_actions(agent, observations, policy_mapping_fn)
+            self.assertCountEqual(actions.keys(), observations.keys())
+            for agent_id, obs in observations.items():
+                np.testing.assert_array_almost_equal(
+                    actions[agent_id],
+                    agent.compute_action(obs, policy_mapping_fn(agent_id)))
+
+            # non-recurrent policies are called once per step, and recurrent
+            # policies once per agent
+            policy_map = agent.local_evaluator.policy_map
+            self.assertEqual(policy_map["a"].num_calls, 10 if recurrent else 6)
+            self.assertEqual(policy_map["b"].num_calls, 4)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,14 +1,23 @@
 import unittest
 import os
+import glob
+import shutil
+import tempfile
 import numpy as np
 
 from flow.core.params import VehicleParams
 from flow.core.params import SumoCarFollowingParams, NetParams, \
-    InitialConfig, SumoParams, SumoLaneChangeParams
+    InitialConfig, SumoParams, SumoLaneChangeParams, ReplayParams
 from flow.controllers.car_following_models import IDMController, \
     SimCarFollowingController
 from flow.controllers.lane_change_controllers import StaticLaneChanger
 from flow.controllers.rlcontroller import RLController
+from flow.controllers.routing_controllers import ContinuousRouter
+from flow.core import rewards
+from flow.envs.loop.loop_accel import AccelEnv
+from flow.scenarios import LoopScenario
+from flow.core.kernel.vehicle.recorder import TrajectoryRecorder, \
+    TrajectoryReader
 
 from tests.setup_scripts import ring_road_exp_setup, highway_exp_setup
 
@@ -569,6 +578,502 @@ class TestIdsByEdge(unittest.TestCase):
         expected_ids = ["test_0", "test_1", "test_2", "test_3", "test_4"]
         self.assertCountEqual(ids, expected_ids)
 
+    def test_edge_index(self):
+        self.env.reset()
+        ids = self.env.k.vehicle.get_ids()
+        edges = self.env.k.vehicle.get_edge(ids)
+        self.assertListEqual(self.env.k.vehicle.get_edge_index(ids),
+                             self.env.k.scenario.get_edge_index(edges))
+
+        # vehicles that are not in the network
+        self.assertEqual(self.env.k.vehicle.get_edge_index("wrong_id"), -1)
+
+
+class TestSpeedArray(unittest.TestCase):
+    """
+    Tests the get_speed_array() method
+    """
+
+    def setUp(self):
+        self.env, scenario = ring_road_exp_setup()
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+
+    def test_speed_array(self):
+        self.env.reset()
+        for _ in range(5):
+            self.env.step(rl_actions=None)
+            vehicles = self.env.k.vehicle
+            np.testing.assert_array_almost_equal(
+                vehicles.get_speed_array(),
+                vehicles.get_speed(vehicles.get_ids()))
+
+        # the array is updated when vehicles are removed
+        self.env.k.vehicle.remove("test_0")
+        self.assertEqual(len(self.env.k.vehicle.get_speed_array()),
+                         len(self.env.k.vehicle.get_ids()))
+
+
+class TestDiffWrites(unittest.TestCase):
+    """
+    Tests that colors, lane change modes, speed modes, max speeds and routes
+    are only sent to sumo when they change
+    """
+
+    def setUp(self):
+        self.env, scenario = ring_road_exp_setup()
+        self.env.reset()
+
+        # count the commands sent to sumo
+        self.calls = []
+        kernel_api = self.env.k.kernel_api.vehicle
+        for name, method in [("color", "setColor"),
+                             ("lane_change_mode", "setLaneChangeMode"),
+                             ("speed_mode", "setSpeedMode"),
+                             ("max_speed", "setMaxSpeed"),
+                             ("route", "setRoute")]:
+            setattr(kernel_api, method,
+                    self.count_calls(name, getattr(kernel_api, method)))
+
+    def count_calls(self, name, fn):
+        def wrapper(*args, **kwargs):
+            self.calls.append(name)
+            return fn(*args, **kwargs)
+        return wrapper
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+
+    def test_colors(self):
+        vehicles = self.env.k.vehicle
+        veh_id = vehicles.get_ids()[0]
+        vehicles.set_color(veh_id, (255, 0, 0))
+        vehicles.set_color(veh_id, (255, 0, 0))
+        self.assertEqual(self.calls, ["color"])
+        self.assertEqual(vehicles.get_color(veh_id), (255, 0, 0))
+
+        # the color is also set in sumo
+        self.env.step(rl_actions=None)
+        r, g, b, _ = self.env.k.kernel_api.vehicle.getColor(veh_id)
+        self.assertEqual((r, g, b), (255, 0, 0))
+
+        # colors that are not changed are not sent again when rendering
+        vehicles.update_vehicle_colors()
+        num_calls = len(self.calls)
+        vehicles.update_vehicle_colors()
+        self.assertEqual(len(self.calls), num_calls)
+
+    def test_lane_change_mode(self):
+        vehicles = self.env.k.vehicle
+        veh_id = vehicles.get_ids()[0]
+        lc_mode = SumoLaneChangeParams().lane_change_mode
+        self.assertEqual(vehicles.get_lane_change_mode(veh_id), lc_mode)
+
+        vehicles.set_lane_change_mode(veh_id, lc_mode)
+        self.assertEqual(self.calls, [])
+        vehicles.set_lane_change_mode(veh_id, 0)
+        self.assertEqual(self.calls, ["lane_change_mode"])
+        self.assertEqual(vehicles.get_lane_change_mode(veh_id), 0)
+        self.assertEqual(
+            self.env.k.kernel_api.vehicle.getLaneChangeMode(veh_id), 0)
+
+    def test_speed_mode(self):
+        vehicles = self.env.k.vehicle
+        veh_id = vehicles.get_ids()[0]
+        speed_mode = SumoCarFollowingParams(
+            speed_mode="aggressive").speed_mode
+        self.assertEqual(vehicles.get_speed_mode(veh_id), speed_mode)
+
+        vehicles.set_speed_mode(veh_id, speed_mode)
+        self.assertEqual(self.calls, [])
+        vehicles.set_speed_mode(veh_id, 31)
+        self.assertEqual(self.calls, ["speed_mode"])
+        self.assertEqual(vehicles.get_speed_mode(veh_id), 31)
+        self.assertEqual(
+            self.env.k.kernel_api.vehicle.getSpeedMode(veh_id), 31)
+
+    def test_max_speed(self):
+        vehicles = self.env.k.vehicle
+        veh_id = vehicles.get_ids()[0]
+
+        # the max speed is initially the one of the type of the vehicle
+        self.assertEqual(vehicles.get_max_speed(veh_id),
+                         self.env.k.kernel_api.vehicle.getMaxSpeed(veh_id))
+        self.assertEqual(vehicles.get_max_speed("not_a_vehicle"), -1001)
+
+        vehicles.set_max_speed(veh_id, 10)
+        vehicles.set_max_speed(veh_id, 10)
+        self.assertEqual(self.calls, ["max_speed"])
+        self.assertEqual(vehicles.get_max_speed(veh_id), 10)
+        self.assertEqual(
+            self.env.k.kernel_api.vehicle.getMaxSpeed(veh_id), 10)
+
+    def test_max_speed_restart(self):
+        vehicles = self.env.k.vehicle
+        self.env.sim_params.restart_instance = True
+
+        # the max speeds of the types are queried again from the restarted
+        # simulation instead of being kept from the previous one
+        vehicles._type_max_speeds = {veh_type: 1 for veh_type in
+                                     vehicles._type_max_speeds}
+        self.env.reset()
+        for veh_id in vehicles.get_ids():
+            self.assertEqual(
+                vehicles.get_max_speed(veh_id),
+                self.env.k.kernel_api.vehicle.getMaxSpeed(veh_id))
+
+    def test_routes(self):
+        vehicles = self.env.k.vehicle
+        veh_id = vehicles.get_ids()[0]
+        route = list(vehicles.get_route(veh_id))
+
+        # unchanged routes are not sent to sumo
+        vehicles.choose_routes([veh_id], [route])
+        self.assertEqual(self.calls, [])
+
+        # new routes are available immediately
+        new_route = route[:2]
+        vehicles.choose_routes([veh_id], [new_route])
+        self.assertEqual(self.calls, ["route"])
+        self.assertEqual(list(vehicles.get_route(veh_id)), new_route)
+        self.assertEqual(
+            list(self.env.k.kernel_api.vehicle.getRoute(veh_id)), new_route)
+
+
+class TestSortedQueries(unittest.TestCase):
+    """
+    Tests the methods that query the vehicles sorted by position:
+    get_k_closest_to_end(), get_ids_in_range() and get_ids_sorted_by_x()
+    """
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(IDMController, {}),
+            num_vehicles=20)
+        net_params = NetParams(
+            additional_params={
+                "length": 230,
+                "lanes": 2,
+                "speed_limit": 30,
+                "resolution": 40
+            })
+        initial_config = InitialConfig(lanes_distribution=float("inf"))
+
+        self.env, scenario = ring_road_exp_setup(
+            vehicles=vehicles,
+            net_params=net_params,
+            initial_config=initial_config)
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+
+    def test_sorted_queries(self):
+        self.env.reset()
+        vehicles = self.env.k.vehicle
+
+        for _ in range(20):
+            self.env.step(rl_actions=[])
+
+            for edge in ["top", "bottom", "left", "right"]:
+                ids = vehicles.get_ids_by_edge(edge)
+                pos = {veh_id: vehicles.get_position(veh_id) for veh_id in ids}
+
+                # k closest vehicles to the end of the edge
+                expected = sorted(ids, key=lambda x: -pos[x])
+                for k in [0, 1, 3, len(ids) + 1]:
+                    self.assertListEqual(
+                        [pos[veh_id] for veh_id in
+                         vehicles.get_k_closest_to_end(edge, k)],
+                        [pos[veh_id] for veh_id in expected[:k]])
+
+                # vehicles within a range of positions, in a single lane
+                lane_ids = [veh_id for veh_id in ids
+                            if vehicles.get_lane(veh_id) == 1]
+                expected = sorted(
+                    [veh_id for veh_id in lane_ids
+                     if 10 <= pos[veh_id] <= 40], key=lambda x: pos[x])
+                self.assertListEqual(
+                    vehicles.get_ids_in_range(edge, 10, 40, lane=1), expected)
+
+            # all vehicles sorted by absolute position
+            self.assertListEqual(
+                [vehicles.get_x_by_id(veh_id)
+                 for veh_id in vehicles.get_ids_sorted_by_x()],
+                sorted(vehicles.get_x_by_id(veh_id)
+                       for veh_id in vehicles.get_ids()))
+
+    def test_sorted_by_x_after_remove(self):
+        self.env.reset()
+        vehicles = self.env.k.vehicle
+        self.env.step(rl_actions=[])
+
+        # removed vehicles are no longer part of the order once it has been
+        # queried during the step
+        ids = list(vehicles.get_ids_sorted_by_x())
+        vehicles.remove(ids[0])
+        self.assertListEqual(vehicles.get_ids_sorted_by_x(), ids[1:])
+
+
+class TestRoutingIds(unittest.TestCase):
+    """
+    Tests the get_routing_ids() method, which is used to only call routing
+    controllers when the event they are triggered by occurs
+    """
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(IDMController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=20)
+
+        self.env, scenario = ring_road_exp_setup(vehicles=vehicles)
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+
+    def test_routing_ids(self):
+        # all routers are called once the vehicles enter the network
+        self.env.reset()
+        self.assertCountEqual(self.env.k.vehicle.get_routing_ids(),
+                              self.env.k.vehicle.get_ids())
+
+        for _ in range(50):
+            edges = {veh_id: self.env.k.vehicle.get_edge(veh_id)
+                     for veh_id in self.env.k.vehicle.get_ids()}
+            self.env.step(rl_actions=[])
+
+            # only vehicles that moved to a new edge should be routed
+            expected_ids = [
+                veh_id for veh_id in self.env.k.vehicle.get_ids()
+                if self.env.k.vehicle.get_edge(veh_id) != edges[veh_id]]
+            self.assertCountEqual(self.env.k.vehicle.get_routing_ids(),
+                                  expected_ids)
+
+
+class TestTrajectoryRecorder(unittest.TestCase):
+    """
+    Tests the trajectory recorder, which stores the state of all vehicles in
+    binary chunks after every step
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="test",
+            acceleration_controller=(IDMController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=10)
+        sim_params = SumoParams(sim_step=0.1, render=False,
+                                trajectory_path=self.path)
+
+        self.env, scenario = ring_road_exp_setup(
+            sim_params=sim_params, vehicles=vehicles)
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+        shutil.rmtree(self.path)
+
+    def _snapshot(self):
+        """Return the state of every vehicle, as recorded."""
+        vehicles = self.env.k.vehicle
+        return {
+            veh_id: (vehicles.get_edge(veh_id),
+                     vehicles.get_position(veh_id),
+                     vehicles.get_x_by_id(veh_id),
+                     vehicles.get_speed(veh_id),
+                     vehicles.get_leader(veh_id))
+            for veh_id in vehicles.get_ids()}
+
+    def test_recorder(self):
+        self.env.reset()
+        expected = [self._snapshot()]
+        for _ in range(10):
+            self.env.step(rl_actions=[])
+            expected.append(self._snapshot())
+        self.env.k.recorder.close()
+
+        path, = glob.glob(os.path.join(self.path, "*-trajectory"))
+        reader = TrajectoryReader(path)
+        data = reader.rollout(len(reader.rollouts) - 1)
+
+        # one row per vehicle and step
+        self.assertEqual(len(data["id"]), 10 * 11)
+        np.testing.assert_array_almost_equal(
+            np.unique(data["time"]), np.arange(11) * 0.1)
+
+        for i, state in enumerate(expected):
+            rows = np.where(np.isclose(data["time"], i * 0.1))[0]
+            for row in rows:
+                veh_id = reader.veh_ids[data["id"][row]]
+                edge, pos, x, speed, leader = state[veh_id]
+                self.assertEqual(reader.edge_ids[data["edge"][row]], edge)
+                self.assertAlmostEqual(data["position"][row], pos)
+                self.assertAlmostEqual(data["x"][row], x)
+                self.assertAlmostEqual(data["speed"][row], speed, places=4)
+                self.assertEqual(reader.types[data["type"][row]], "test")
+                self.assertEqual(
+                    reader.veh_ids[data["leader"][row]], leader)
+                if i > 0:
+                    prev_speed = expected[i - 1][veh_id][3]
+                    self.assertAlmostEqual(data["accel"][row],
+                                           (speed - prev_speed) / 0.1,
+                                           places=3)
+
+    def test_chunks(self):
+        path = os.path.join(self.path, "chunks")
+        recorder = TrajectoryRecorder(path, sim_step=0.1, fields=["speed"],
+                                      chunk_size=7)
+        self.env.reset()
+        recorder.record(self.env.k, reset=True)
+        speeds = list(self.env.k.vehicle.get_speed(
+            self.env.k.vehicle.get_ids()))
+        for _ in range(3):
+            self.env.step(rl_actions=[])
+            recorder.record(self.env.k, reset=False)
+            speeds.extend(self.env.k.vehicle.get_speed(
+                self.env.k.vehicle.get_ids()))
+        recorder.close()
+
+        reader = TrajectoryReader(path)
+        self.assertListEqual(reader.fields, ["id", "time", "speed"])
+        self.assertEqual(len(glob.glob(os.path.join(path, "*_speed.npy"))),
+                         6)
+        self.assertListEqual(reader.rollouts, [(0, 40)])
+        np.testing.assert_array_almost_equal(reader.column("speed"), speeds,
+                                             decimal=4)
+        np.testing.assert_array_almost_equal(reader.column("speed", 5, 9),
+                                             speeds[5:9], decimal=4)
+
+        # invalid fields
+        self.assertRaises(ValueError, TrajectoryRecorder, path, 0.1,
+                          fields=["color"])
+
+    def test_unknown_edges(self):
+        # scenario kernels that do not intern their edges are recorded with
+        # unknown edges
+        path = os.path.join(self.path, "no_edges")
+        recorder = TrajectoryRecorder(path, sim_step=0.1, fields=["edge"])
+        self.env.reset()
+        edge_index = self.env.k.scenario.edge_index
+        self.env.k.scenario.edge_index = None
+        try:
+            recorder.record(self.env.k, reset=True)
+        finally:
+            self.env.k.scenario.edge_index = edge_index
+        recorder.close()
+
+        reader = TrajectoryReader(path)
+        np.testing.assert_array_equal(reader.column("edge"), [-1] * 10)
+
+
+class TestReplayKernel(unittest.TestCase):
+    """
+    Tests the replay kernel, which feeds recorded trajectories back through
+    the kernel API without running sumo
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.vehicles = VehicleParams()
+        self.vehicles.add(
+            veh_id="human",
+            acceleration_controller=(IDMController, {"noise": 0.2}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=10)
+        self.vehicles.add(
+            veh_id="rl",
+            acceleration_controller=(RLController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=1)
+        sim_params = SumoParams(sim_step=0.1, render=False,
+                                trajectory_path=self.path)
+
+        self.env, self.scenario = ring_road_exp_setup(
+            sim_params=sim_params, vehicles=self.vehicles)
+        self.replay_env = None
+
+    def tearDown(self):
+        # free data used by the class
+        self.env.terminate()
+        self.env = None
+        if self.replay_env is not None:
+            self.replay_env.terminate()
+            self.replay_env = None
+        shutil.rmtree(self.path)
+
+    def _state(self, env):
+        """Return the quantities compared between the simulation and the
+        replay."""
+        vehicles = env.k.vehicle
+        return (rewards.desired_velocity(env),
+                vehicles.get_rl_ids(),
+                sorted(vehicles.get_ids_by_edge("top")),
+                vehicles.get_x_by_id("rl_0"),
+                vehicles.get_leader("rl_0"),
+                vehicles.get_follower("rl_0"),
+                vehicles.get_headway("rl_0"))
+
+    def test_replay(self):
+        # run a rollout in sumo
+        self.env.reset()
+        expected = []
+        for _ in range(20):
+            self.env.step(rl_actions=[1])
+            expected.append(self._state(self.env))
+        self.env.k.recorder.close()
+
+        # replay the rollout (the first one is created by the setup script)
+        path, = glob.glob(os.path.join(self.path, "*-trajectory"))
+        scenario = LoopScenario(
+            name="RingRoadReplay",
+            vehicles=self.vehicles,
+            net_params=self.scenario.net_params,
+            initial_config=self.scenario.initial_config)
+        self.replay_env = AccelEnv(
+            env_params=self.env.env_params,
+            sim_params=ReplayParams(path, rollout=1),
+            scenario=scenario,
+            simulator="replay")
+        self.assertAlmostEqual(self.replay_env.sim_step, 0.1)
+        self.assertEqual(self.replay_env.k.scenario.length(), 230)
+
+        self.replay_env.reset()
+        self.assertEqual(self.replay_env.k.vehicle.num_frames, 21)
+        for state in expected:
+            # actions are ignored in the replay
+            self.replay_env.step(rl_actions=[-1])
+            replay_state = self._state(self.replay_env)
+            self.assertAlmostEqual(replay_state[0], state[0], places=4)
+            self.assertTupleEqual(replay_state[1:3], state[1:3])
+            self.assertAlmostEqual(replay_state[3], state[3])
+            self.assertEqual(replay_state[4:6], state[4:6])
+            self.assertAlmostEqual(replay_state[6], state[6], places=4)
+
+        # replays cannot be rendered
+        sim_params = ReplayParams(path)
+        sim_params.render = "rgb"
+        self.assertRaises(ValueError, AccelEnv,
+                          env_params=self.env.env_params,
+                          sim_params=sim_params,
+                          scenario=scenario,
+                          simulator="replay")
+
 
 class TestObservedIDs(unittest.TestCase):
     """Tests the observed_ids methods, which are used for visualization."""
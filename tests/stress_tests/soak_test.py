@@ -0,0 +1,71 @@
+"""Runs an environment for a long time to measure the growth of resources.
+
+The size of the python heap, the memory of the python and sumo processes,
+the size of the containers of the environment and its kernels, and the
+latency of steps are sampled regularly, and their growth rates are reported
+(see flow/core/soak.py).
+"""
+
+import argparse
+
+from flow.core.soak import soak
+from flow.utils.registry import make_create_env
+
+EXAMPLE_USAGE = """
+example usage:
+    python ./soak_test.py bottleneck0 --num_steps 2000000 --output soak.csv
+
+Here the arguments are:
+bottleneck0 - name of the benchmark (in flow/benchmarks) to run
+num_steps - total number of steps to perform
+output - csv file the samples are written to
+"""
+
+parser = argparse.ArgumentParser(
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+    description="[Flow] Measures the growth of resources over long runs.",
+    epilog=EXAMPLE_USAGE)
+
+# required input parameters
+parser.add_argument(
+    "benchmark_name", type=str, help="Name of the benchmark to run.")
+
+# optional input parameters
+parser.add_argument(
+    "--num_steps",
+    type=int,
+    default=2000000,
+    help="The total number of steps to perform.")
+parser.add_argument(
+    "--sample_every",
+    type=int,
+    default=10000,
+    help="The number of steps in between samples.")
+parser.add_argument(
+    "--horizon",
+    type=int,
+    help="Overrides the horizon of the benchmark, e.g. to test resets.")
+parser.add_argument(
+    "--output", type=str, help="Path to a csv file to write the samples to.")
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    # Import the benchmark and fetch its flow_params
+    benchmark = __import__(
+        "flow.benchmarks.%s" % args.benchmark_name, fromlist=["flow_params"])
+    flow_params = benchmark.flow_params
+    if args.horizon is not None:
+        flow_params["env"].horizon = args.horizon
+
+    create_env, _ = make_create_env(
+        params=flow_params, version=0, render=False)
+    env = create_env()
+
+    monitor = soak(env, args.num_steps, sample_every=args.sample_every)
+    print(monitor.report())
+    if args.output is not None:
+        monitor.to_csv(args.output)
+
+    monitor.close()
+    env.terminate()